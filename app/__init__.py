@@ -5,16 +5,29 @@ Inicializa la aplicación y registra blueprints
 
 from flask import Flask
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
 load_dotenv()
 
 
-def create_app():
+# Segundos que shutdown() espera a que se envíe la cola de WhatsApp
+ESPERA_COLA_AL_APAGAR = 10
+
+_servicios_iniciados = False
+_servicios_lock = threading.Lock()
+
+
+def create_app(iniciar_servicios=True):
     """
     Factory para crear la aplicación Flask
     
+    Args:
+        iniciar_servicios: Llamar a startup() (False para tests o para
+                           iniciarlos después, ej. en el worker tras el fork)
+    
     Returns:
         Flask: Aplicación configurada
     """
@@ -30,9 +43,74 @@ def create_app():
     # Registrar error handlers
     register_error_handlers(app)
     
+    if iniciar_servicios:
+        startup()
+    
     return app
 
 
+def startup():
+    """
+    Arranca los servicios del proceso (una sola vez)
+    Importar los módulos de app no conecta a nada: todo lo que abre
+    conexiones o lanza threads pasa por acá.
+    """
+    global _servicios_iniciados
+    
+    with _servicios_lock:
+        if _servicios_iniciados:
+            return
+        
+        from app.core.config import Config, PELUQUERIAS, iniciar_recarga_configuracion
+        Config.validar()
+        
+        # Configuración de clientes (clientes.json o snapshot de MongoDB)
+        PELUQUERIAS.iniciar_carga()
+        
+        # Índices de MongoDB (en segundo plano, no demora el arranque)
+        from app.core.database import iniciar_indices_en_segundo_plano
+        iniciar_indices_en_segundo_plano()
+        
+        # Recarga en caliente de la configuración (sin reiniciar)
+        iniciar_recarga_configuracion()
+        
+        # Invalidación de caches por cambios en MongoDB
+        from app.core.cache_invalidation import iniciar_invalidacion_cache
+        iniciar_invalidacion_cache()
+        
+        # Handlers, recordatorios y relay de reservas
+        from app.bot.orchestrator import get_bot_orchestrator
+        get_bot_orchestrator()
+        
+        _servicios_iniciados = True
+
+
+def shutdown():
+    """Apaga los servicios del proceso: vacía la cola de WhatsApp y cierra conexiones"""
+    from app.services.whatsapp_service import whatsapp_service
+    
+    limite = time.monotonic() + ESPERA_COLA_AL_APAGAR
+    while whatsapp_service.pendientes() and time.monotonic() < limite:
+        time.sleep(0.2)
+    
+    # Lo que no llegó a salir se descarta avisando (ej: los recordatorios se liberan
+    # y los reintenta la próxima pasada)
+    abandonados = whatsapp_service.abandonar_pendientes()
+    if abandonados:
+        print(f"⚠️ {abandonados} mensajes de WhatsApp sin enviar al apagar")
+    
+    from app.core import cache_invalidation
+    if cache_invalidation.listener:
+        cache_invalidation.listener.cerrar()
+    
+    from app.core.database import cerrar_conexion as cerrar_mongo
+    from app.bot.states.state_manager import cerrar_conexion as cerrar_redis
+    cerrar_mongo()
+    cerrar_redis()
+    
+    print("👋 Servicios detenidos")
+
+
 def register_blueprints(app):
     """Registra todos los blueprints de la aplicación"""
 
@@ -50,6 +128,11 @@ def register_blueprints(app):
     
     from app.api.routes.payments import payments_routes_bp
     app.register_blueprint(payments_routes_bp, url_prefix='/api')    
+
+    # Métricas Prometheus
+    from app.api.routes.metricas import metricas_bp
+    app.register_blueprint(metricas_bp)
+    
     # Rutas estáticas (landing page)
     try:
         from app.api.routes.static import static_bp
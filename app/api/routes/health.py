@@ -79,7 +79,8 @@ def check_config():
 def check_handlers():
     """Verifica que los handlers estén inicializados"""
     try:
-        from app.bot.orchestrator import bot_orchestrator
+        from app.bot.orchestrator import get_bot_orchestrator
+        bot_orchestrator = get_bot_orchestrator()
         
         handlers = {
             "menu": bot_orchestrator.menu_handler is not None,
@@ -163,16 +164,16 @@ def check_services():
     
     # Redis (Estado)
     try:
-        from app.bot.states.state_manager import redis_client
-        redis_client.ping()
+        from app.bot.states.state_manager import get_redis_client
+        get_redis_client().ping()
         services_status["redis"] = "ok"
     except Exception:
         services_status["redis"] = "error"
     
     # MongoDB (opcional)
     try:
-        from app.core.database import MONGODB_DISPONIBLE
-        services_status["mongodb"] = "ok" if MONGODB_DISPONIBLE else "not_configured"
+        from app.core.database import get_mongo_health
+        services_status["mongodb"] = get_mongo_health()
     except ImportError:
         services_status["mongodb"] = "not_available"
     
@@ -197,4 +198,13 @@ def check_services():
 @health_bp.route('/ping', methods=['GET'])
 def ping():
     """Simple ping endpoint"""
-    return jsonify({"status": "pong"}), 200
\ No newline at end of file
+    return jsonify({"status": "pong"}), 200
+
+@health_bp.route('/health/pasos', methods=['GET'])
+def metricas_pasos():
+    """
+    Métricas por paso de conversación (desde que arrancó el proceso)
+    Latencia, errores, transiciones y abandonos (timeout, menu, cancelar)
+    """
+    from app.bot.pasos import pasos
+    return jsonify({"pid": os.getpid(), "pasos": pasos.resumen()}), 200
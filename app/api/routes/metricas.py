@@ -0,0 +1,39 @@
+"""
+Endpoint de métricas para Prometheus
+Expone lo registrado en app/core/metricas.py
+
+Si METRICAS_TOKEN está configurado, el scraper tiene que mandar
+Authorization: Bearer <token> (en Prometheus: authorization.credentials).
+"""
+
+import os
+import hmac
+from flask import Blueprint, Response, request, jsonify
+
+from app.core.metricas import exportar, PROMETHEUS_DISPONIBLE, CONTENT_TYPE_LATEST
+
+metricas_bp = Blueprint('metricas', __name__)
+
+
+@metricas_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas en el formato de texto de Prometheus
+
+    Returns:
+        text/plain con las métricas, 401 si el token no coincide,
+        503 si prometheus_client no está instalado
+    """
+    token = os.getenv("METRICAS_TOKEN")
+    if token:
+        recibido = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(recibido, f"Bearer {token}"):
+            return "", 401
+
+    if not PROMETHEUS_DISPONIBLE:
+        return jsonify({
+            "status": "disabled",
+            "message": "prometheus_client no instalado o METRICAS=false"
+        }), 503
+
+    return Response(exportar(), mimetype=CONTENT_TYPE_LATEST)
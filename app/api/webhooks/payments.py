@@ -7,6 +7,7 @@ from flask import Blueprint, request, jsonify
 from app.services.payment_service import payment_service
 from app.services.whatsapp_service import whatsapp_service
 from app.services.calendar_service import CalendarService
+from app.core.metricas import medir, instrumentar_webhook
 from datetime import datetime
 import json
 
@@ -25,6 +26,7 @@ payments_bp = Blueprint('payments', __name__)
 # ==================== LEMONSQUEEZY WEBHOOK ====================
 
 @payments_bp.route('/webhooks/lemonsqueezy', methods=['POST'])
+@instrumentar_webhook("lemonsqueezy")
 def webhook_lemonsqueezy():
     """
     Webhook de LemonSqueezy
@@ -148,6 +150,7 @@ def procesar_reembolso_lemonsqueezy(data):
 # ==================== MERCADOPAGO WEBHOOK ====================
 
 @payments_bp.route('/webhooks/mercadopago', methods=['POST'])
+@instrumentar_webhook("mercadopago")
 def webhook_mercadopago():
     """
     Webhook de MercadoPago
@@ -258,14 +261,7 @@ def confirmar_turno_con_pago(turno_info):
         turno_info: Información del turno y pago
     """
     try:
-        # Cargar config
-        import json
-        try:
-            with open("config/clientes.json", "r") as f:
-                PELUQUERIAS = json.load(f)
-        except:
-            with open("clientes.json", "r") as f:
-                PELUQUERIAS = json.load(f)
+        from app.core.config import PELUQUERIAS
         
         peluqueria_key = turno_info['peluqueria_key']
         config = PELUQUERIAS.get(peluqueria_key, {})
@@ -343,7 +339,9 @@ def procesar_evento_suscripcion_mp(preapproval_id: str):
 
         # Consultar estado de la suscripcion en MP
         url = f"https://api.mercadopago.com/preapproval/{preapproval_id}"
-        res = req.get(url, headers=headers, timeout=10)
+        with medir("mercadopago", "obtener_suscripcion") as medicion:
+            res = req.get(url, headers=headers, timeout=10)
+            medicion.http(res.status_code)
         if not res.ok:
             print(f"Error consultando preapproval {preapproval_id}: {res.text}")
             return
@@ -423,7 +421,9 @@ def procesar_cobro_mensual_mp(invoice_id: str):
 
         # Consultar el invoice
         url = f"https://api.mercadopago.com/authorized_payments/{invoice_id}"
-        res = req.get(url, headers=headers, timeout=10)
+        with medir("mercadopago", "obtener_cobro") as medicion:
+            res = req.get(url, headers=headers, timeout=10)
+            medicion.http(res.status_code)
         if not res.ok:
             print(f"Error consultando invoice {invoice_id}: {res.text}")
             return
@@ -4,13 +4,15 @@ Recibe y procesa mensajes de WhatsApp vía Twilio
 """
 
 from flask import Blueprint, request, jsonify
-from app.bot.orchestrator import bot_orchestrator
+from app.bot.orchestrator import get_bot_orchestrator
+from app.core.metricas import instrumentar_webhook, establecer_peluqueria
 
 # Crear blueprint
 whatsapp_bp = Blueprint('whatsapp', __name__)
 
 
 @whatsapp_bp.route('/webhook', methods=['POST'])
+@instrumentar_webhook("whatsapp")
 def webhook_whatsapp():
     """
     Webhook principal para recibir mensajes de WhatsApp
@@ -53,29 +55,9 @@ def webhook_whatsapp():
         if not texto and num_media > 0:
             from app.services.whatsapp_service import whatsapp_service
             peluqueria_key_temp = detectar_peluqueria(numero_destino)
+            establecer_peluqueria(peluqueria_key_temp)
 
-            if media_type.startswith("audio"):
-                respuesta = (
-                    "🎤 Recibí tu nota de voz, pero aún no puedo escucharla.\n\n"
-                    "Por favor escribime tu consulta por texto y te respondo enseguida. ✍️"
-                )
-            elif media_type.startswith("image"):
-                respuesta = (
-                    "📷 Recibí tu imagen, pero aún no puedo verla.\n\n"
-                    "Por favor escribime tu consulta por texto y te ayudo. ✍️"
-                )
-            elif media_type.startswith("video"):
-                respuesta = (
-                    "🎥 Recibí tu video, pero aún no puedo reproducirlo.\n\n"
-                    "Por favor escribime tu consulta por texto. ✍️"
-                )
-            else:
-                respuesta = (
-                    "📎 Recibí tu archivo, pero aún no puedo procesarlo.\n\n"
-                    "Por favor escribime tu consulta por texto. ✍️"
-                )
-
-            whatsapp_service.enviar_mensaje(respuesta, numero)
+            whatsapp_service.enviar_mensaje(respuesta_media(media_type), numero)
             print(f"📎 Media recibida de {numero} ({media_type}) - respuesta enviada")
             return "", 200
 
@@ -86,6 +68,7 @@ def webhook_whatsapp():
         
         # Detectar peluquería según número de Twilio
         peluqueria_key = detectar_peluqueria(numero_destino)
+        establecer_peluqueria(peluqueria_key)
         
         if not peluqueria_key:
             print(f"❌ No se pudo identificar la peluquería para {numero_destino}")
@@ -109,7 +92,7 @@ def webhook_whatsapp():
             return "", 200
 
         # Procesar mensaje con el orquestrador
-        bot_orchestrator.procesar_mensaje(numero, texto, peluqueria_key)
+        get_bot_orchestrator().procesar_mensaje(numero, texto, peluqueria_key)
         
         print(f"✅ Mensaje procesado correctamente\n")
         return "", 200
@@ -131,6 +114,37 @@ def webhook_whatsapp():
         return "", 500
 
 
+def respuesta_media(media_type):
+    """
+    Respuesta para mensajes sin texto (fotos, audios, videos, stickers)
+    
+    Args:
+        media_type: MediaContentType0 de Twilio (ej: "image/jpeg", "audio/ogg")
+    
+    Returns:
+        str: Mensaje para el usuario
+    """
+    if media_type.startswith("audio"):
+        return (
+            "🎤 Recibí tu nota de voz, pero aún no puedo escucharla.\n\n"
+            "Por favor escribime tu consulta por texto y te respondo enseguida. ✍️"
+        )
+    if media_type.startswith("image"):
+        return (
+            "📷 Recibí tu imagen, pero aún no puedo verla.\n\n"
+            "Por favor escribime tu consulta por texto y te ayudo. ✍️"
+        )
+    if media_type.startswith("video"):
+        return (
+            "🎥 Recibí tu video, pero aún no puedo reproducirlo.\n\n"
+            "Por favor escribime tu consulta por texto. ✍️"
+        )
+    return (
+        "📎 Recibí tu archivo, pero aún no puedo procesarlo.\n\n"
+        "Por favor escribime tu consulta por texto. ✍️"
+    )
+
+
 @whatsapp_bp.route('/webhook', methods=['GET'])
 def webhook_verify():
     """
@@ -150,25 +164,20 @@ def detectar_peluqueria(numero_twilio):
     Returns:
         str: Key de la peluquería o None si no se encuentra
     """
-    from app.bot.orchestrator import bot_orchestrator
+    from app.core.config import PELUQUERIAS
     
     # Limpiar el número
     numero_limpio = numero_twilio.replace("whatsapp:", "").strip()
     
-    print(f"🔍 Buscando peluquería para número: {numero_limpio}")
-    
-    # Buscar en configuración
-    for key, config in bot_orchestrator.peluquerias.items():
-        numero_config = config.get("numero_twilio", "").strip()
-        
-        if numero_config and numero_config == numero_limpio:
-            print(f"✅ Match encontrado: {key} - {config.get('nombre')}")
-            return key
+    # Índice por número (se rearma en cada recarga de clientes.json)
+    peluqueria_key = PELUQUERIAS.por_numero_twilio(numero_limpio)
+    if peluqueria_key:
+        return peluqueria_key
     
     # Si no se encuentra, mostrar números registrados para debug
     print(f"❌ No se encontró peluquería para: {numero_limpio}")
     print(f"📋 Números registrados:")
-    for key, config in bot_orchestrator.peluquerias.items():
+    for key, config in PELUQUERIAS.items():
         numero_reg = config.get("numero_twilio", "NO CONFIGURADO")
         print(f"   • {key}: {numero_reg}")
     
@@ -176,6 +185,7 @@ def detectar_peluqueria(numero_twilio):
 
 
 @whatsapp_bp.route('/webhook/status', methods=['POST'])
+@instrumentar_webhook("whatsapp_status")
 def webhook_status():
     """
     Recibe actualizaciones de estado de mensajes de Twilio
@@ -186,11 +196,13 @@ def webhook_status():
         
         message_sid = data.get("MessageSid")
         message_status = data.get("MessageStatus")
+        error_code = data.get("ErrorCode")
         
         print(f"📊 Estado de mensaje {message_sid}: {message_status}")
         
-        # Aquí podrías guardar el estado en DB si lo necesitas
-        # Por ejemplo: actualizar_estado_mensaje(message_sid, message_status)
+        # Actualizar el registro de entrega del mensaje
+        from app.services.whatsapp_service import whatsapp_service
+        whatsapp_service.registrar_estado(message_sid, message_status, error_code)
         
         return "", 200
     
@@ -0,0 +1,25 @@
+"""
+Flujos adicionales del bot
+Cada módulo de este paquete registra sus pasos (y opciones de menú) en
+app.bot.pasos.pasos al importarse; el orquestador los carga con cargar_flujos().
+"""
+
+import importlib
+import pkgutil
+
+
+def cargar_flujos():
+    """
+    Importa todos los módulos del paquete
+
+    Returns:
+        list: Nombres de los flujos cargados
+    """
+    cargados = []
+    for modulo in pkgutil.iter_modules(__path__):
+        try:
+            importlib.import_module(f"{__name__}.{modulo.name}")
+            cargados.append(modulo.name)
+        except Exception as e:
+            print(f"❌ Error cargando flujo {modulo.name}: {e}")
+    return cargados
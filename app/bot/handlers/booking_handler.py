@@ -5,20 +5,14 @@ Gestiona el flujo completo de reserva de turnos
 
 from datetime import datetime, timedelta
 from app.bot.utils.formatters import formatear_item_lista, formatear_fecha_espanol
+from app.bot.utils.intenciones import a_numero, parsear_numeros, normalizar
 from app.services.whatsapp_service import whatsapp_service
 from app.services.calendar_service import CalendarService
+from app.services.booking_service import obtener_perfil_cliente
 from app.utils.time_utils import crear_datetime_local
 from app.utils.calendar_utils import CalendarUtils
 from app.bot.states.state_manager import get_state, set_state
 
-try:
-    from app.core.database import guardar_turno, guardar_cliente
-    MONGODB_DISPONIBLE = True
-except ImportError:
-    MONGODB_DISPONIBLE = False
-    def guardar_turno(*args, **kwargs): return None
-    def guardar_cliente(*args, **kwargs): return None
-
 
 class BookingHandler:
     """Manejador del flujo de reserva de turnos"""
@@ -57,10 +51,17 @@ class BookingHandler:
             )
             return
         
+        # Cliente que ya reservó: ofrecer repetir la última reserva
+        perfil = obtener_perfil_cliente(numero_limpio, peluqueria_key)
+        repetir = self._reserva_para_repetir(perfil, config, peluqueros_activos)
+        
         # Cambiar estado a seleccionar peluquero
         estado_usuario = get_state(numero_limpio) or {}
         estado_usuario["paso"] = "seleccionar_peluquero"
         estado_usuario["peluqueros_disponibles"] = peluqueros_activos
+        estado_usuario["cliente_conocido"] = perfil.get("nombre") if perfil else None
+        estado_usuario["repetir"] = repetir
+        estado_usuario.pop("servicios_repetidos", None)
         set_state(numero_limpio, estado_usuario)
         
         # Mostrar lista de peluqueros activos
@@ -89,8 +90,17 @@ class BookingHandler:
                 if mensaje_custom:
                     nota_inactivos += f"\n_{p['nombre']}: {mensaje_custom}_"
         
+        opcion_repetir = ""
+        if repetir:
+            servicios_texto = " + ".join(s["nombre"] for s in repetir["servicios"])
+            opcion_repetir = (
+                "0️⃣ *Lo mismo que la última vez*\n"
+                f"   👤 {repetir['peluquero']} - ✂️ {servicios_texto}\n\n"
+            )
+        
         mensaje = (
             "👤 *¿Con qué peluquero querés tu turno?*\n\n" +
+            opcion_repetir +
             "\n\n".join(lista_peluqueros) +
             nota_inactivos +
             "\n\nElegí un número:"
@@ -117,7 +127,18 @@ class BookingHandler:
                 config = self.peluquerias.get(peluqueria_key, {})
                 peluqueros = [p for p in config.get("peluqueros", []) if p.get("activo", True)]
             
-            index = int(texto) - 1
+            index = a_numero(texto) - 1
+            
+            # Opción 0: mismo peluquero y servicios que la última reserva
+            repetir = estado_usuario.get("repetir")
+            if index == -1 and repetir:
+                index = next(
+                    (i for i, p in enumerate(peluqueros) if p["nombre"] == repetir["peluquero"]),
+                    -1
+                )
+                estado_usuario["servicios_repetidos"] = repetir["servicios"]
+            else:
+                estado_usuario.pop("servicios_repetidos", None)
             
             if 0 <= index < len(peluqueros):
                 peluquero_seleccionado = peluqueros[index]
@@ -206,7 +227,7 @@ class BookingHandler:
             numero: Número completo
         """
         try:
-            index = int(texto) - 1
+            index = a_numero(texto) - 1
             estado_usuario = get_state(numero_limpio) or {}
             dias_iso = estado_usuario.get("dias", [])
             dias = [datetime.fromisoformat(d).date() for d in dias_iso]
@@ -231,20 +252,10 @@ class BookingHandler:
                     return
                 
                 # Convertir horarios a datetime para el estado
-                config = self.peluquerias[peluqueria_key]
-                timezone = config["timezone"]
-                horarios_dt = []
-                for hora_str in horarios:
-                    hora_dt = datetime.strptime(hora_str, "%H:%M").time()
-                    fecha_hora = crear_datetime_local(
-                        dia_elegido.year,
-                        dia_elegido.month,
-                        dia_elegido.day,
-                        hora_dt.hour,
-                        hora_dt.minute,
-                        timezone
-                    )
-                    horarios_dt.append(fecha_hora)
+                horarios_dt = [
+                    crear_datetime_local(peluqueria_key, self.peluquerias, dia_elegido, hora_str)
+                    for hora_str in horarios
+                ]
                 
                 # Guardar en estado
                 estado_usuario["dia"] = dia_elegido.isoformat()
@@ -271,17 +282,21 @@ class BookingHandler:
         except ValueError:
             whatsapp_service.enviar_mensaje("❌ Debe ser un número.", numero)
     
-    def procesar_seleccion_horario(self, numero_limpio, texto, numero):
+    def procesar_seleccion_horario(self, numero_limpio, texto, numero, peluqueria_key=None):
         """
         Procesa la selección del horario
         
+        Si el cliente ya reservó antes no se le vuelve a pedir el nombre, y si
+        eligió repetir la última reserva se confirma directamente.
+        
         Args:
             numero_limpio: Número sin prefijo
             texto: Opción seleccionada
             numero: Número completo
+            peluqueria_key: Identificador del cliente (por defecto, el del estado)
         """
         try:
-            index = int(texto) - 1
+            index = a_numero(texto) - 1
             
             estado_usuario = get_state(numero_limpio) or {}
             horarios_iso = estado_usuario.get("horarios", [])
@@ -294,8 +309,27 @@ class BookingHandler:
                 estado_usuario["fecha_hora"] = fecha_hora.isoformat()
                 estado_usuario["paso"] = "nombre"
                 set_state(numero_limpio, estado_usuario)
-            
-                whatsapp_service.enviar_mensaje("Perfecto ✂️ ¿A nombre de quién tomo el turno?", numero)
+                
+                nombre = estado_usuario.get("cliente_conocido")
+                peluqueria_key = peluqueria_key or estado_usuario.get("peluqueria")
+                
+                if not nombre or peluqueria_key not in self.peluquerias:
+                    whatsapp_service.enviar_mensaje("Perfecto ✂️ ¿A nombre de quién tomo el turno?", numero)
+                    return
+                
+                servicios_repetidos = estado_usuario.get("servicios_repetidos")
+                if not servicios_repetidos:
+                    self.procesar_nombre_cliente(numero_limpio, nombre, peluqueria_key, numero)
+                    return
+                
+                # Repetir la última reserva: saltar nombre y servicios
+                estado_usuario["cliente"] = nombre
+                estado_usuario["servicios_disponibles"] = servicios_repetidos
+                estado_usuario["paso"] = "servicio"
+                set_state(numero_limpio, estado_usuario)
+                
+                seleccion = ",".join(str(i + 1) for i in range(len(servicios_repetidos)))
+                self.procesar_seleccion_servicio(numero_limpio, seleccion, peluqueria_key, numero)
         
         except (ValueError, IndexError):
             whatsapp_service.enviar_mensaje("❌ Número inválido. Elegí uno de la lista.", numero)
@@ -383,22 +417,24 @@ class BookingHandler:
         duracion_total = 0
         
         try:
-            if ',' in texto:
-                indices = [int(num.strip()) - 1 for num in texto.split(',')]
+            numeros = parsear_numeros(texto) or []
+            if len(numeros) > 1:
+                # "1,3" / "1 y 3" / "1️⃣ 3️⃣"
+                indices = [num - 1 for num in numeros]
                 for index in indices:
                     if 0 <= index < len(servicios_disponibles):
                         servicio = servicios_disponibles[index]
                         servicios_seleccionados.append(servicio)
                         duracion_total += servicio.get("duracion", 30)
             else:
-                index = int(texto) - 1
+                index = a_numero(texto) - 1
                 if 0 <= index < len(servicios_disponibles):
                     servicio = servicios_disponibles[index]
                     servicios_seleccionados.append(servicio)
                     duracion_total = servicio.get("duracion", 30)
         except ValueError:
             for serv in servicios_disponibles:
-                if serv["nombre"].lower() == texto.lower():
+                if normalizar(serv["nombre"]) == normalizar(texto):
                     servicios_seleccionados.append(serv)
                     duracion_total = serv.get("duracion", 30)
                     break
@@ -465,7 +501,7 @@ class BookingHandler:
             fecha_formateada = formatear_fecha_espanol(fecha_hora)
             hora = fecha_hora.strftime("%H:%M")
             
-            print("✅ Reserva creada, enviando confirmación...")
+            print("✅ Reserva registrada, enviando confirmación...")
             
             # Enviar confirmación
             whatsapp_service.enviar_mensaje(
@@ -478,17 +514,6 @@ class BookingHandler:
                 "¡Te esperamos! 👈".replace(',', '.'),
                 numero
             )
-            
-            # Notificar al peluquero
-            if peluquero and peluquero.get("telefono"):
-                self._notificar_peluquero(
-                    peluquero,
-                    cliente,
-                    nombre_servicios,
-                    fecha_hora,
-                    config,
-                    numero_limpio
-                )
         else:
             whatsapp_service.enviar_mensaje(
                 "❌ Hubo un error al confirmar tu turno.\n\n"
@@ -500,6 +525,32 @@ class BookingHandler:
         estado_usuario["paso"] = "menu"
         set_state(numero_limpio, estado_usuario)
     
+    def _reserva_para_repetir(self, perfil, config, peluqueros_activos):
+        """
+        Última reserva del cliente, si todavía se puede repetir
+        
+        Args:
+            perfil: Perfil del cliente (o None)
+            config: Configuración de la peluquería
+            peluqueros_activos: Peluqueros que se muestran en la lista
+        
+        Returns:
+            dict | None: {"peluquero": nombre, "servicios": [servicios de config]}
+        """
+        if not perfil or not perfil.get("ultimo_peluquero") or not perfil.get("ultimos_servicios"):
+            return None
+        
+        if not any(p["nombre"] == perfil["ultimo_peluquero"] for p in peluqueros_activos):
+            return None
+        
+        # Tomar precio y duración actuales; si algún servicio ya no existe, no se ofrece
+        servicios_config = {s["nombre"]: s for s in config.get("servicios", [])}
+        servicios = [servicios_config.get(nombre) for nombre in perfil["ultimos_servicios"]]
+        if not all(servicios):
+            return None
+        
+        return {"peluquero": perfil["ultimo_peluquero"], "servicios": servicios}
+    
     def _obtener_hora_cierre(self, peluqueria_key, dia, peluquero):
         """
         Obtiene la hora de cierre para un día específico
@@ -509,11 +560,11 @@ class BookingHandler:
     
     def _crear_reserva(self, peluqueria_key, fecha_hora, cliente, servicios, duracion, telefono, peluquero):
         """
-        Crea la reserva en Google Calendar y MongoDB.
+        Registra la reserva (Google Calendar y MongoDB se aplican vía outbox).
         Verifica disponibilidad justo antes de crear para evitar doble reserva.
         
         Returns:
-            bool: True si se creó exitosamente
+            bool | str: True si se registró, "ocupado" si el slot ya no está libre
         """
         try:
             # Verificar disponibilidad en tiempo real antes de confirmar
@@ -529,71 +580,25 @@ class BookingHandler:
                 print(f"⚠️ Slot {hora_solicitada} ya no disponible para {peluquero.get('nombre') if peluquero else 'peluquero'}")
                 return "ocupado"  # Valor especial para distinguir de error técnico
 
-            # Crear evento en Google Calendar
-            evento = self.calendar_service.crear_evento_calendario(
+            # Registrar la reserva: Calendar, MongoDB y el aviso al peluquero
+            # los aplica el outbox en background
+            from app.services.booking_service import booking_service
+            
+            return booking_service.crear_reserva(
                 peluqueria_key,
-                peluquero,
+                fecha_hora,
                 cliente,
+                servicios,
+                duracion,
                 telefono,
-                fecha_hora,
-                duracion
+                peluquero
             )
-            
-            if not evento:
-                return False
-            
-            # Guardar en MongoDB si está disponible
-            if MONGODB_DISPONIBLE:
-                nombre_servicios = " + ".join(s["nombre"] for s in servicios)
-                precio_total = sum(s["precio"] for s in servicios)
-                
-                guardar_turno(
-                    peluqueria_key,
-                    evento['id'],
-                    fecha_hora,
-                    cliente,
-                    telefono,
-                    nombre_servicios,
-                    precio_total,
-                    duracion,
-                    peluquero.get("nombre") if peluquero else None
-                )
-                
-                guardar_cliente(peluqueria_key, cliente, telefono)
-            
-            return True
         
         except Exception as e:
             print(f"❌ Error al crear reserva: {e}")
             import traceback
             traceback.print_exc()
             return False
-    
-    def _notificar_peluquero(self, peluquero, cliente, servicios, fecha_hora, config, telefono_cliente):
-        """Envía notificación al peluquero sobre el nuevo turno"""
-        try:
-            telefono_peluquero = peluquero.get("telefono")
-            if not telefono_peluquero:
-                return
-            
-            fecha_formateada = formatear_fecha_espanol(fecha_hora)
-            hora = fecha_hora.strftime("%H:%M")
-            telefono_formateado = formatear_telefono(telefono_cliente)
-            
-            mensaje = (
-                f"🆕 *Nuevo turno - {config['nombre']}*\n\n"
-                f"👤 Cliente: {cliente}\n"
-                f"📱 Teléfono: {telefono_formateado}\n"
-                f"📅 Fecha: {fecha_formateada}\n"
-                f"🕐 Hora: {hora}\n"
-                f"✂️ Servicio: {servicios}"
-            )
-            
-            whatsapp_service.enviar_mensaje(mensaje, f"whatsapp:{telefono_peluquero}")
-            print(f"✅ Notificación enviada a {peluquero['nombre']}")
-        
-        except Exception as e:
-            print(f"⚠️ Error al notificar peluquero: {e}")
 
 
 def formatear_telefono(telefono):
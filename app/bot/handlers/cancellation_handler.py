@@ -5,14 +5,19 @@ Gestiona el flujo completo de cancelación de turnos
 
 from datetime import datetime
 from app.bot.utils.formatters import formatear_item_lista
+from app.bot.utils.intenciones import a_numero, parsear_numero, es_afirmativo, es_negativo
 from app.services.whatsapp_service import whatsapp_service
 from app.services.calendar_service import CalendarService
 from app.utils.calendar_utils import CalendarUtils
 from app.bot.states.state_manager import get_state, set_state
 
 try:
-    from app.core.database import cancelar_turno_db, marcar_recordatorio_enviado, recordatorio_ya_enviado
-    MONGODB_DISPONIBLE = True
+    from app.core.database import (
+        cancelar_turno_db,
+        marcar_recordatorio_enviado,
+        recordatorio_ya_enviado,
+        MONGODB_DISPONIBLE
+    )
 except ImportError:
     MONGODB_DISPONIBLE = False
     def cancelar_turno_db(*args, **kwargs): return False
@@ -108,7 +113,7 @@ class CancellationHandler:
             config = self.peluquerias.get(peluqueria_key, {})
             print(f"🔍 [{config.get('nombre', peluqueria_key)}] Usuario {numero_limpio} cancelando turno")
             
-            if texto == "0":
+            if parsear_numero(texto) == 0:
                 print("   ↳ Cancelación abortada")
                 
                 estado_usuario = get_state(numero_limpio) or {}
@@ -119,7 +124,7 @@ class CancellationHandler:
                 return
             
             try:
-                index = int(texto) - 1
+                index = a_numero(texto) - 1
                 print(f"   ↳ Seleccionó turno #{index + 1}")
             except ValueError:
                 print(f"   ↳ Entrada inválida: '{texto}'")
@@ -192,7 +197,7 @@ class CancellationHandler:
             config = self.peluquerias.get(peluqueria_key, {})
             estado_usuario = get_state(numero_limpio) or {}
             
-            if texto.upper() == "SI":
+            if es_afirmativo(texto):
                 turno = estado_usuario.get("turno_a_cancelar")
                 if not turno:
                     whatsapp_service.enviar_mensaje(
@@ -213,7 +218,7 @@ class CancellationHandler:
                 
                 # Cancelar en MongoDB si está disponible
                 if MONGODB_DISPONIBLE:
-                    cancelar_turno_db(peluqueria_key, evento_id)
+                    cancelar_turno_db(evento_id, peluqueria_key)
                 
                 if exito_calendar:
                     inicio = datetime.fromisoformat(turno["inicio"])
@@ -237,7 +242,7 @@ class CancellationHandler:
                     )
                     print(f"❌ Error al cancelar turno: {evento_id}")
             
-            elif texto.upper() == "NO":
+            elif es_negativo(texto):
                 whatsapp_service.enviar_mensaje(
                     "✅ Cancelación abortada.\n\n"
                     "Tu turno sigue activo.\n\n"
@@ -5,8 +5,26 @@ Gestiona FAQ, ubicación, servicios y reagendar
 
 from app.services.whatsapp_service import whatsapp_service
 from app.bot.utils.formatters import formatear_fecha_espanol
+from app.bot.utils.intenciones import a_numero
 from app.utils.calendar_utils import CalendarUtils
 from app.bot.states.state_manager import get_state, set_state
+from app.utils.respuestas import respuestas
+
+FAQ_POR_DEFECTO = """📖 *Preguntas Frecuentes:*
+
+*¿Puedo cambiar la hora?*
+Cancelá el turno actual y reservá uno nuevo
+
+*¿Con cuánto tiempo de anticipación debo reservar?*
+Podés reservar hasta con 7 días de anticipación
+
+*¿Qué pasa si llego tarde?*
+Intentá llegar 5 min antes. Si llegás más de 15 min tarde, tu turno podría ser reasignado
+
+*¿Formas de pago?*
+Efectivo, débito y crédito
+
+Escribí *menu* para volver"""
 
 
 class InfoHandler:
@@ -30,30 +48,34 @@ class InfoHandler:
             peluqueria_key: Identificador del cliente
             numero: Número de WhatsApp del usuario
         """
-        config = self.peluquerias.get(peluqueria_key, {})
+        mensaje = respuestas.obtener(
+            self.peluquerias, peluqueria_key, "servicios", self._generar_servicios
+        )
+        whatsapp_service.enviar_mensaje(mensaje, numero)
+    
+    def _generar_servicios(self, config, idioma="es"):
+        """Lista de servicios de la peluquería (se renderiza una vez por versión de config)"""
         servicios = config.get("servicios", [])
         
         if not servicios:
-            whatsapp_service.enviar_mensaje(
+            return (
                 "✂️ *Nuestros servicios:*\n\n"
                 "Contactanos para conocer nuestros servicios.\n\n"
-                "Escribí *menu* para volver",
-                numero
-            )
-        else:
-            lista_servicios = []
-            for servicio in servicios:
-                nombre = servicio["nombre"]
-                precio = f"${servicio['precio']:,}".replace(',', '.')
-                duracion = servicio["duracion"]
-                lista_servicios.append(f"• {nombre} - {precio} ({duracion} min)")
-            
-            mensaje = (
-                f"✂️ *Servicios de {config['nombre']}:*\n\n" +
-                "\n".join(lista_servicios) +
-                "\n\nEscribí *menu* para volver"
+                "Escribí *menu* para volver"
             )
-            whatsapp_service.enviar_mensaje(mensaje, numero)
+        
+        lista_servicios = []
+        for servicio in servicios:
+            nombre = servicio["nombre"]
+            precio = f"${servicio['precio']:,}".replace(',', '.')
+            duracion = servicio["duracion"]
+            lista_servicios.append(f"• {nombre} - {precio} ({duracion} min)")
+        
+        return (
+            f"✂️ *Servicios de {config['nombre']}:*\n\n" +
+            "\n".join(lista_servicios) +
+            "\n\nEscribí *menu* para volver"
+        )
     
     def procesar_faq(self, numero, peluqueria_key=None):
         """
@@ -64,41 +86,24 @@ class InfoHandler:
             numero: Número de WhatsApp del usuario
             peluqueria_key: Identificador del cliente (opcional)
         """
-        # Verificar si hay FAQs personalizadas
-        faqs_custom = None
-        if peluqueria_key:
-            config = self.peluquerias.get(peluqueria_key, {})
-            faqs_custom = config.get("faq")
+        mensaje = respuestas.obtener(self.peluquerias, peluqueria_key, "faq", self._generar_faq)
+        whatsapp_service.enviar_mensaje(mensaje, numero)
+    
+    def _generar_faq(self, config, idioma="es"):
+        """FAQs personalizadas de la peluquería o las por defecto"""
+        faqs_custom = config.get("faq")
         
-        if faqs_custom:
-            # Usar FAQs personalizadas
-            mensaje_partes = ["📖 *Preguntas Frecuentes:*\n"]
-            for faq in faqs_custom:
-                pregunta = faq.get("pregunta", "")
-                respuesta = faq.get("respuesta", "")
-                mensaje_partes.append(f"*{pregunta}*\n{respuesta}\n")
-            
-            mensaje_partes.append("Escribí *menu* para volver")
-            mensaje = "\n".join(mensaje_partes)
-        else:
-            # FAQs por defecto
-            mensaje = """📖 *Preguntas Frecuentes:*
-
-*¿Puedo cambiar la hora?*
-Cancelá el turno actual y reservá uno nuevo
-
-*¿Con cuánto tiempo de anticipación debo reservar?*
-Podés reservar hasta con 7 días de anticipación
-
-*¿Qué pasa si llego tarde?*
-Intentá llegar 5 min antes. Si llegás más de 15 min tarde, tu turno podría ser reasignado
-
-*¿Formas de pago?*
-Efectivo, débito y crédito
-
-Escribí *menu* para volver"""
+        if not faqs_custom:
+            return FAQ_POR_DEFECTO
         
-        whatsapp_service.enviar_mensaje(mensaje, numero)
+        mensaje_partes = ["📖 *Preguntas Frecuentes:*\n"]
+        for faq in faqs_custom:
+            pregunta = faq.get("pregunta", "")
+            respuesta = faq.get("respuesta", "")
+            mensaje_partes.append(f"*{pregunta}*\n{respuesta}\n")
+        
+        mensaje_partes.append("Escribí *menu* para volver")
+        return "\n".join(mensaje_partes)
     
     def procesar_ubicacion(self, peluqueria_key, numero):
         """
@@ -108,7 +113,13 @@ Escribí *menu* para volver"""
             peluqueria_key: Identificador del cliente
             numero: Número de WhatsApp del usuario
         """
-        config = self.peluquerias.get(peluqueria_key, {})
+        mensaje = respuestas.obtener(
+            self.peluquerias, peluqueria_key, "ubicacion", self._generar_ubicacion
+        )
+        whatsapp_service.enviar_mensaje(mensaje, numero)
+    
+    def _generar_ubicacion(self, config, idioma="es"):
+        """Ubicación, horarios y contacto (se renderiza una vez por versión de config)"""
         nombre = config.get("nombre", "Peluquería")
         
         # Obtener datos de ubicación de la config
@@ -143,7 +154,7 @@ Teléfono: {telefono}"""
         
         mensaje += "\n\nEscribí *menu* para volver"
         
-        whatsapp_service.enviar_mensaje(mensaje, numero)
+        return mensaje
     
     def procesar_reagendar_inicio(self, numero_limpio, peluqueria_key, numero):
         """
@@ -198,7 +209,7 @@ Teléfono: {telefono}"""
             numero: Número completo
         """
         try:
-            opcion = int(texto) - 1
+            opcion = a_numero(texto) - 1
             
             # Obtener de Redis
             estado_usuario = get_state(numero_limpio) or {}
@@ -284,9 +295,9 @@ Teléfono: {telefono}"""
         # Agrupar días con el mismo horario
         horarios_agrupados = {}
         for dia, horario in horarios_config.items():
-            if isinstance(horario, list) and len(horario) >= 2:
-                # Formato simple o partidos
-                if isinstance(horario[0], list):
+            if isinstance(horario, (list, tuple)) and len(horario) >= 2:
+                # Formato simple o partidos (tuplas en la config congelada)
+                if isinstance(horario[0], (list, tuple)):
                     # Horarios partidos: [["09:00", "13:00"], ["15:00", "19:00"]]
                     horario_str = " y ".join([f"{h[0]} - {h[1]}" for h in horario])
                 else:
@@ -5,6 +5,8 @@ Gestiona el menú principal y las opciones del bot
 
 from app.services.whatsapp_service import whatsapp_service
 from app.utils.translations import t
+from app.utils.respuestas import respuestas
+from app.bot.pasos import pasos
 
 
 class MenuHandler:
@@ -28,66 +30,41 @@ class MenuHandler:
             numero: Número de WhatsApp del usuario
             idioma: Idioma del menú (default: español)
         """
+        # El idioma configurado en la peluquería tiene prioridad
         config = self.peluquerias.get(peluqueria_key, {})
-        nombre = config.get("nombre", "Peluquería")
-        
-        # Detectar idioma del cliente si está configurado
         idioma_config = config.get("idioma", idioma)
         
-        # Generar menú
-        mensaje = self._generar_menu(nombre, idioma_config)
+        # Renderizado una vez por peluquería/idioma/versión de config
+        mensaje = respuestas.obtener(
+            self.peluquerias, peluqueria_key, "menu", self._generar_menu, idioma_config
+        )
         
         whatsapp_service.enviar_mensaje(mensaje, numero)
     
-    def _generar_menu(self, nombre_peluqueria, idioma="es"):
+    def _generar_menu(self, config, idioma="es"):
         """
         Genera el texto del menú principal
         
         Args:
-            nombre_peluqueria: Nombre de la peluquería
+            config: Configuración de la peluquería
             idioma: Idioma del menú
         
         Returns:
             str: Mensaje del menú formateado
         """
-        if idioma == "en":
-            return self._generar_menu_ingles(nombre_peluqueria)
-        else:
-            return self._generar_menu_espanol(nombre_peluqueria)
-    
-    def _generar_menu_espanol(self, nombre):
-        """Genera el menú en español"""
-        return f"""👋 *¡Bienvenido a {nombre}!*
-
-¿Qué querés hacer?
-
-1️⃣ Pedir turno
-2️⃣ Ver mis turnos
-3️⃣ Cancelar turno
-4️⃣ Ver servicios
-5️⃣ Reagendar turno
-6️⃣ Preguntas frecuentes
-7️⃣ Ubicación y contacto
-0️⃣ Salir
-
-Escribí el número de la opción que querés"""
-    
-    def _generar_menu_ingles(self, nombre):
-        """Genera el menú en inglés"""
-        return f"""👋 *Welcome to {nombre}!*
-
-What would you like to do?
-
-1️⃣ Book appointment
-2️⃣ View my appointments
-3️⃣ Cancel appointment
-4️⃣ View services
-5️⃣ Reschedule appointment
-6️⃣ FAQ
-7️⃣ Location & contact
-0️⃣ Exit
-
-Type the number of the option you want"""
+        # Opciones base, las que agregan los flujos (app/bot/flujos/) y Salir al final
+        opciones = "\n".join(
+            [t(f"menu_option_{opcion}", idioma) for opcion in range(1, 8)] +
+            pasos.titulos_extra_menu() +
+            [t("menu_option_0", idioma)]
+        )
+        
+        return (
+            f"{t('menu_welcome', idioma, nombre=config.get('nombre', 'Peluquería'))}\n\n"
+            f"{t('menu_question', idioma)}\n\n"
+            f"{opciones}\n\n"
+            f"{t('menu_prompt', idioma)}"
+        )
     
     def mostrar_mensaje_bienvenida(self, peluqueria_key, numero, idioma="es"):
         """
@@ -98,25 +75,20 @@ Type the number of the option you want"""
             numero: Número de WhatsApp
             idioma: Idioma del mensaje
         """
-        config = self.peluquerias.get(peluqueria_key, {})
-        nombre = config.get("nombre", "Peluquería")
-        
-        # Mensaje personalizado si existe en config
-        mensaje_custom = config.get("mensaje_bienvenida")
-        
-        if mensaje_custom:
-            whatsapp_service.enviar_mensaje(mensaje_custom, numero)
-        else:
-            if idioma == "en":
-                mensaje = f"👋 Hello! Welcome to {nombre}'s booking system"
-            else:
-                mensaje = f"👋 ¡Hola! Bienvenido al sistema de turnos de {nombre}"
-            
-            whatsapp_service.enviar_mensaje(mensaje, numero)
+        mensaje = respuestas.obtener(
+            self.peluquerias, peluqueria_key, "bienvenida", self._generar_bienvenida, idioma
+        )
+        whatsapp_service.enviar_mensaje(mensaje, numero)
         
         # Mostrar menú
         self.mostrar_menu_principal(peluqueria_key, numero, idioma)
     
+    def _generar_bienvenida(self, config, idioma="es"):
+        """Mensaje personalizado de la config o el genérico del idioma"""
+        return config.get("mensaje_bienvenida") or t(
+            "welcome_message", idioma, nombre=config.get("nombre", "Peluquería")
+        )
+    
     def mostrar_opcion_invalida(self, numero, texto="", idioma="es"):
         """
         Muestra mensaje cuando el usuario envía una opción inválida
@@ -126,10 +98,7 @@ Type the number of the option you want"""
             texto: Texto enviado por el usuario
             idioma: Idioma del mensaje
         """
-        if idioma == "en":
-            mensaje = f"❓ I didn't understand '{texto}'\n\nPlease choose a number from the menu:"
-        else:
-            mensaje = f"❓ No entendí '{texto}'\n\nPor favor elegí un número del menú:"
+        mensaje = f"{t('invalid_option', idioma, texto=texto)}\n\n{t('choose_menu_number', idioma)}"
         
         whatsapp_service.enviar_mensaje(mensaje, numero)
 
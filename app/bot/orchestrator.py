@@ -4,15 +4,28 @@ Coordina todos los handlers y servicios del bot
 """
 
 import os
-import json
+import time
+import threading
+from app.core.config import PELUQUERIAS
 from app.bot.handlers.menu_handler import MenuHandler
 from app.bot.handlers.booking_handler import BookingHandler
 from app.bot.handlers.cancellation_handler import CancellationHandler
 from app.bot.handlers.info_handler import InfoHandler
 from app.services.whatsapp_service import whatsapp_service
 from app.services.notification_service import inicializar_notification_service
+from app.services.booking_service import inicializar_booking_service
 from app.utils.calendar_utils import inicializar_calendar_utils
 from app.bot.states.state_manager import get_state, set_state
+from app.bot.utils.intenciones import detectar_intencion, parsear_numero
+from app.bot.pasos import pasos, Mensaje, PASO_MENU
+from app.bot.flujos import cargar_flujos
+
+# Marca para "el estado todavía no se leyó de Redis" (None significa usuario nuevo)
+ESTADO_NO_CARGADO = object()
+
+# Inactividad máxima en los pasos de reserva: los horarios ofrecidos ya pueden estar ocupados
+TIMEOUT_PASO_RESERVA = int(os.getenv("TIMEOUT_PASO_RESERVA", "900"))
+TIMEOUT_PASO_CANCELACION = int(os.getenv("TIMEOUT_PASO_CANCELACION", "600"))
 
 
 class BotOrchestrator:
@@ -48,6 +61,13 @@ class BotOrchestrator:
         self.info_handler = InfoHandler(peluquerias_config)
         print("   ✅ InfoHandler")
         
+        # Tabla de pasos: los base y los de los flujos de app/bot/flujos/
+        self.pasos = pasos
+        self._registrar_pasos()
+        flujos = cargar_flujos()
+        print(f"   ✅ {len(self.pasos.pasos)} pasos registrados" +
+              (f" (flujos: {', '.join(flujos)})" if flujos else ""))
+        
         # Inicializar utilidades globales
         print("🔧 Inicializando utilidades...")
         inicializar_calendar_utils(peluquerias_config)
@@ -67,6 +87,10 @@ class BotOrchestrator:
         )
         print("   ✅ NotificationService")
         
+        # Outbox de reservas (Calendar, MongoDB y avisos en background)
+        self.booking_service = inicializar_booking_service(peluquerias_config)
+        print("   ✅ BookingService")
+        
         # Iniciar sistema de recordatorios en background (solo en producción)
         modo_desarrollo = os.getenv('FLASK_ENV') == 'development'
         if not modo_desarrollo:
@@ -77,26 +101,35 @@ class BotOrchestrator:
         
         print("="*60)
         print("✅ BOT ORCHESTRATOR INICIALIZADO CORRECTAMENTE")
-        print(f"📊 Clientes configurados: {len(peluquerias_config)}")
-        for key, config in peluquerias_config.items():
-            print(f"   • {config.get('nombre', key)} ({key})")
+        # Con el registro de MongoDB, len() o items() traerían todas las peluquerías
+        cargadas = getattr(peluquerias_config, "cargadas", None)
+        if cargadas is None:
+            cargadas = len(peluquerias_config)
+        print(f"📊 Clientes cargados: {cargadas}")
         print("="*60 + "\n")
     
-    def procesar_mensaje(self, numero, texto, peluqueria_key):
+    def procesar_mensaje(self, numero, texto, peluqueria_key, estado_usuario=ESTADO_NO_CARGADO):
         """
         Procesa un mensaje entrante y lo dirige al handler apropiado
+        Todas las respuestas del turno se agrupan y se envían como un solo mensaje
         
         Args:
             numero: Número de WhatsApp completo (con whatsapp:)
             texto: Texto del mensaje
             peluqueria_key: Identificador del cliente
+            estado_usuario: Estado ya leído de Redis (el modo async lo carga en paralelo)
         """
+        with whatsapp_service.respuesta_agrupada(numero):
+            self._procesar_mensaje(numero, texto, peluqueria_key, estado_usuario)
+    
+    def _procesar_mensaje(self, numero, texto, peluqueria_key, estado_usuario=ESTADO_NO_CARGADO):
+        """Lógica de procesar_mensaje (se ejecuta dentro del buffer de respuesta)"""
         try:
             numero_limpio = numero.replace("whatsapp:", "").strip()
-            texto_lower = texto.lower()
             
             # Obtener o crear estado del usuario
-            estado_usuario = get_state(numero_limpio)
+            if estado_usuario is ESTADO_NO_CARGADO:
+                estado_usuario = get_state(numero_limpio)
             
             if not estado_usuario:
                 # Usuario nuevo - crear estado inicial
@@ -113,6 +146,7 @@ class BotOrchestrator:
             
             # Usuario existente
             paso_actual = estado_usuario.get("paso", "menu")
+            self.pasos.registrar_transicion(estado_usuario.get("ultimo_paso"), paso_actual)
             
             # Si estaba finalizado, reactivar
             if paso_actual == "finalizado":
@@ -122,28 +156,48 @@ class BotOrchestrator:
                 self.menu_handler.mostrar_mensaje_bienvenida(peluqueria_key, numero)
                 return
             
-            # Actualizar peluquería por si cambió
+            # Paso vencido por inactividad: volver al menú
+            ultima_actividad = estado_usuario.get("actividad")
+            if ultima_actividad and self.pasos.vencido(paso_actual, time.time() - ultima_actividad):
+                print(f"⌛ Paso {paso_actual} vencido para {numero_limpio}")
+                self.pasos.registrar_abandono(paso_actual, "timeout")
+                estado_usuario.update(paso="menu", ultimo_paso="menu", actividad=time.time())
+                set_state(numero_limpio, estado_usuario)
+                whatsapp_service.enviar_mensaje(
+                    "⌛ Pasó mucho tiempo y la operación anterior venció.\n\nEmpecemos de nuevo:",
+                    numero
+                )
+                self.menu_handler.mostrar_menu_principal(peluqueria_key, numero)
+                return
+            
+            # Actualizar peluquería por si cambió (y el paso/hora de este mensaje)
             estado_usuario["peluqueria"] = peluqueria_key
+            estado_usuario["ultimo_paso"] = paso_actual
+            estado_usuario["actividad"] = time.time()
             set_state(numero_limpio, estado_usuario)
             
-            # Comandos globales para volver al menú
-            comandos_menu = [
-                "menu", "menú", "inicio", "hola", "hi", "hey",
-                "buenas", "buenos dias", "buenas tardes", "buen dia",
-                "buenos días", "buenas noches"
-            ]
+            # Comandos globales (menú / cancelar), tolerando acentos, signos y typos.
+            # En pasos de texto libre solo cuentan las frases exactas: "Lola" es un nombre
+            idioma = self.peluquerias.get(peluqueria_key, {}).get("idioma", "es")
+            texto_libre = self.pasos.es_texto_libre(paso_actual)
+            intencion = detectar_intencion(
+                texto, idioma, prefijo=paso_actual == "menu", difuso=not texto_libre
+            )
             
-            if texto_lower in comandos_menu:
+            if intencion == "menu":
                 print(f"🏠 Comando de menú detectado: '{texto}'")
+                if paso_actual != "menu":
+                    self.pasos.registrar_abandono(paso_actual, "menu")
                 estado_usuario["paso"] = "menu"
                 set_state(numero_limpio, estado_usuario)
                 self.menu_handler.mostrar_menu_principal(peluqueria_key, numero)
                 return
             
             # Comando para cancelar operación actual
-            if texto_lower in ["cancelar", "salir", "abortar", "stop", "volver"]:
+            if intencion == "cancelar":
                 if paso_actual != "menu":
                     print(f"❌ Usuario canceló operación: {paso_actual}")
+                    self.pasos.registrar_abandono(paso_actual, "cancelar")
                     estado_usuario["paso"] = "menu"
                     set_state(numero_limpio, estado_usuario)
                     whatsapp_service.enviar_mensaje(
@@ -155,7 +209,7 @@ class BotOrchestrator:
             
             # Enrutar según estado
             print(f"📍 Estado actual: {paso_actual}")
-            self._enrutar_mensaje(numero_limpio, texto, paso_actual, peluqueria_key, numero)
+            self._enrutar_mensaje(numero_limpio, texto, paso_actual, peluqueria_key, numero, estado_usuario)
         
         except Exception as e:
             print(f"\n{'='*60}")
@@ -178,120 +232,130 @@ class BotOrchestrator:
             except:
                 pass
     
-    def _enrutar_mensaje(self, numero_limpio, texto, paso, peluqueria_key, numero):
-        """
-        Enruta el mensaje al handler apropiado según el paso/estado
+    def _registrar_pasos(self):
+        """Pasos y opciones de menú base (los flujos agregan los suyos en app/bot/flujos/)"""
+        booking = self.booking_handler
+        cancelacion = self.cancellation_handler
+        info = self.info_handler
         
-        Args:
-            numero_limpio: Número sin prefijo
-            texto: Texto del mensaje
-            paso: Estado actual del usuario
-            peluqueria_key: Identificador del cliente
-            numero: Número completo
-        """
         # MENÚ PRINCIPAL
-        if paso == "menu":
-            self._procesar_opcion_menu(numero_limpio, texto, peluqueria_key, numero)
+        self.pasos.registrar(PASO_MENU, self._procesar_opcion_menu)
         
         # FLUJO DE RESERVA
-        elif paso == "seleccionar_peluquero":
-            self.booking_handler.procesar_seleccion_peluquero(
-                numero_limpio, texto, peluqueria_key, numero
-            )
-        
-        elif paso == "seleccionar_dia":
-            self.booking_handler.procesar_seleccion_dia(
-                numero_limpio, texto, peluqueria_key, numero
-            )
-        
-        elif paso == "seleccionar_horario":
-            self.booking_handler.procesar_seleccion_horario(
-                numero_limpio, texto, numero
-            )
-        
-        elif paso == "nombre":
-            self.booking_handler.procesar_nombre_cliente(
-                numero_limpio, texto, peluqueria_key, numero
-            )
-        
-        elif paso == "servicio":
-            self.booking_handler.procesar_seleccion_servicio(
-                numero_limpio, texto, peluqueria_key, numero
-            )
+        self.pasos.registrar(
+            "seleccionar_peluquero",
+            lambda m: booking.procesar_seleccion_peluquero(m.numero_limpio, m.texto, m.peluqueria_key, m.numero),
+            siguientes=("seleccionar_dia",),
+            timeout=TIMEOUT_PASO_RESERVA
+        )
+        self.pasos.registrar(
+            "seleccionar_dia",
+            lambda m: booking.procesar_seleccion_dia(m.numero_limpio, m.texto, m.peluqueria_key, m.numero),
+            siguientes=("seleccionar_horario",),
+            timeout=TIMEOUT_PASO_RESERVA
+        )
+        self.pasos.registrar(
+            "seleccionar_horario",
+            lambda m: booking.procesar_seleccion_horario(m.numero_limpio, m.texto, m.numero, m.peluqueria_key),
+            siguientes=("nombre", "servicio"),
+            timeout=TIMEOUT_PASO_RESERVA
+        )
+        self.pasos.registrar(
+            "nombre",
+            lambda m: booking.procesar_nombre_cliente(m.numero_limpio, m.texto, m.peluqueria_key, m.numero),
+            siguientes=("servicio",),
+            timeout=TIMEOUT_PASO_RESERVA,
+            texto_libre=True
+        )
+        self.pasos.registrar(
+            "servicio",
+            lambda m: booking.procesar_seleccion_servicio(m.numero_limpio, m.texto, m.peluqueria_key, m.numero),
+            timeout=TIMEOUT_PASO_RESERVA,
+            siguientes=()
+        )
         
         # FLUJO DE CANCELACIÓN
-        elif paso == "seleccionar_turno_cancelar":
-            self.cancellation_handler.procesar_seleccion_turno(
-                numero_limpio, texto, peluqueria_key, numero
-            )
-        
-        elif paso == "confirmar_cancelacion":
-            self.cancellation_handler.procesar_confirmacion(
-                numero_limpio, texto, peluqueria_key, numero
-            )
+        self.pasos.registrar(
+            "seleccionar_turno_cancelar",
+            lambda m: cancelacion.procesar_seleccion_turno(m.numero_limpio, m.texto, m.peluqueria_key, m.numero),
+            siguientes=("confirmar_cancelacion",),
+            timeout=TIMEOUT_PASO_CANCELACION
+        )
+        self.pasos.registrar(
+            "confirmar_cancelacion",
+            lambda m: cancelacion.procesar_confirmacion(m.numero_limpio, m.texto, m.peluqueria_key, m.numero),
+            siguientes=(),
+            timeout=TIMEOUT_PASO_CANCELACION
+        )
         
         # FLUJO DE REAGENDAR
-        elif paso == "seleccionar_turno_reagendar":
-            self.info_handler.procesar_seleccion_turno_reagendar(
-                numero_limpio, texto, numero
-            )
+        self.pasos.registrar(
+            "seleccionar_turno_reagendar",
+            lambda m: info.procesar_seleccion_turno_reagendar(m.numero_limpio, m.texto, m.numero),
+            siguientes=()
+        )
         
-        # Estado desconocido - resetear a menú
-        else:
-            print(f"⚠️ Estado desconocido: {paso} - Reseteando a menú")
-            estado_usuario = get_state(numero_limpio) or {}
-            estado_usuario["paso"] = "menu"
-            set_state(numero_limpio, estado_usuario)
-            
-            whatsapp_service.enviar_mensaje(
-                "❓ Hubo un error. Volvamos al inicio.\n\n",
-                numero
-            )
-            self.menu_handler.mostrar_menu_principal(peluqueria_key, numero)
+        # OPCIONES DEL MENÚ (los títulos ya están en las traducciones)
+        opciones = {
+            0: lambda m: self._procesar_salir(m.numero_limpio, m.peluqueria_key, m.numero),
+            1: lambda m: booking.iniciar_reserva(m.numero_limpio, m.peluqueria_key, m.numero),
+            2: lambda m: info.procesar_ver_turnos(m.numero_limpio, m.peluqueria_key, m.numero),
+            3: lambda m: cancelacion.iniciar_cancelacion(m.numero_limpio, m.peluqueria_key, m.numero),
+            4: lambda m: info.procesar_servicios(m.peluqueria_key, m.numero),
+            5: lambda m: info.procesar_reagendar_inicio(m.numero_limpio, m.peluqueria_key, m.numero),
+            6: lambda m: info.procesar_faq(m.numero, m.peluqueria_key),
+            7: lambda m: info.procesar_ubicacion(m.peluqueria_key, m.numero)
+        }
+        for opcion, handler in opciones.items():
+            self.pasos.registrar_opcion_menu(opcion, handler)
     
-    def _procesar_opcion_menu(self, numero_limpio, texto, peluqueria_key, numero):
+    def _enrutar_mensaje(self, numero_limpio, texto, paso, peluqueria_key, numero, estado_usuario=None):
         """
-        Procesa la opción seleccionada del menú principal
+        Enruta el mensaje al handler del paso (tabla de app.bot.pasos)
         
         Args:
             numero_limpio: Número sin prefijo
-            texto: Opción seleccionada (1-7, 0)
+            texto: Texto del mensaje
+            paso: Estado actual del usuario
             peluqueria_key: Identificador del cliente
             numero: Número completo
+            estado_usuario: Estado ya leído (se pasa al handler)
         """
-        # Verificar que sea una opción válida
-        if texto not in ["0", "1", "2", "3", "4", "5", "6", "7"]:
-            print(f"❓ Opción inválida: {texto}")
-            self.menu_handler.mostrar_opcion_invalida(numero, texto)
-            self.menu_handler.mostrar_menu_principal(peluqueria_key, numero)
-            return
+        mensaje = Mensaje(numero_limpio, texto, peluqueria_key, numero, estado_usuario)
         
-        print(f"✅ Opción de menú: {texto}")
-        
-        # Procesar cada opción
-        if texto == "0":  # Salir
-            self._procesar_salir(numero_limpio, peluqueria_key, numero)
-        
-        elif texto == "1":  # Pedir turno
-            self.booking_handler.iniciar_reserva(numero_limpio, peluqueria_key, numero)
-        
-        elif texto == "2":  # Ver turnos
-            self.info_handler.procesar_ver_turnos(numero_limpio, peluqueria_key, numero)
+        if self.pasos.despachar(paso, mensaje):
+            return
         
-        elif texto == "3":  # Cancelar turno
-            self.cancellation_handler.iniciar_cancelacion(numero_limpio, peluqueria_key, numero)
+        # Estado desconocido - resetear a menú
+        print(f"⚠️ Estado desconocido: {paso} - Reseteando a menú")
+        estado_usuario = get_state(numero_limpio) or {}
+        estado_usuario["paso"] = "menu"
+        set_state(numero_limpio, estado_usuario)
         
-        elif texto == "4":  # Servicios
-            self.info_handler.procesar_servicios(peluqueria_key, numero)
+        whatsapp_service.enviar_mensaje(
+            "❓ Hubo un error. Volvamos al inicio.\n\n",
+            numero
+        )
+        self.menu_handler.mostrar_menu_principal(peluqueria_key, numero)
+    
+    def _procesar_opcion_menu(self, mensaje):
+        """
+        Procesa la opción seleccionada del menú principal
         
-        elif texto == "5":  # Reagendar
-            self.info_handler.procesar_reagendar_inicio(numero_limpio, peluqueria_key, numero)
+        Args:
+            mensaje: Mensaje con la opción ("3", "3️⃣", "opción 3")
+        """
+        opcion = parsear_numero(mensaje.texto)
         
-        elif texto == "6":  # FAQ
-            self.info_handler.procesar_faq(numero, peluqueria_key)
+        # Verificar que sea una opción registrada
+        if opcion not in self.pasos.opciones_menu:
+            print(f"❓ Opción inválida: {mensaje.texto}")
+            self.menu_handler.mostrar_opcion_invalida(mensaje.numero, mensaje.texto)
+            self.menu_handler.mostrar_menu_principal(mensaje.peluqueria_key, mensaje.numero)
+            return
         
-        elif texto == "7":  # Ubicación
-            self.info_handler.procesar_ubicacion(peluqueria_key, numero)
+        print(f"✅ Opción de menú: {opcion}")
+        self.pasos.despachar_opcion_menu(opcion, mensaje)
     
     def _procesar_salir(self, numero_limpio, peluqueria_key, numero):
         """Procesa la opción de salir del menú"""
@@ -310,14 +374,30 @@ class BotOrchestrator:
         set_state(numero_limpio, estado_usuario)
 
 
-# Cargar configuración de clientes
-try:
-    with open("config/clientes.json", "r", encoding="utf-8") as f:
-        PELUQUERIAS = json.load(f)
-except FileNotFoundError:
-    print("⚠️ Usando clientes.json en raíz")
-    with open("clientes.json", "r", encoding="utf-8") as f:
-        PELUQUERIAS = json.load(f)
+# Instancia global del orquestador (se crea con get_bot_orchestrator)
+_bot_orchestrator = None
+_bot_orchestrator_lock = threading.Lock()
+
+
+def get_bot_orchestrator():
+    """
+    Orquestador del proceso (se crea en el primer uso o en app.startup())
+    Comparte el registro de configuración, así ve las recargas sin reiniciar
+    
+    Returns:
+        BotOrchestrator: Instancia global
+    """
+    global _bot_orchestrator
+    
+    if _bot_orchestrator is None:
+        with _bot_orchestrator_lock:
+            if _bot_orchestrator is None:
+                _bot_orchestrator = BotOrchestrator(PELUQUERIAS)
+    return _bot_orchestrator
+
 
-# Instancia global del orquestador
-bot_orchestrator = BotOrchestrator(PELUQUERIAS)
\ No newline at end of file
+def __getattr__(nombre):
+    """Compatibilidad: `from app.bot.orchestrator import bot_orchestrator` crea la instancia recién ahí"""
+    if nombre == "bot_orchestrator":
+        return get_bot_orchestrator()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
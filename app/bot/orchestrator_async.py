@@ -0,0 +1,167 @@
+"""
+Bot Orchestrator en threads (adaptador para ASGI)
+Atiende el webhook desde el event loop de asgi.py delegando el procesamiento a un
+pool de threads. No es un orquestador async: los handlers siguen siendo los sync
+de BotOrchestrator y todo su I/O (Google Calendar, MongoDB, Redis) es bloqueante.
+
+- Lo único nativo de asyncio es la carga del estado (state_manager_async)
+- verificar_suscripcion y BotOrchestrator.procesar_mensaje corren en el pool;
+  la concurrencia real la pone ASYNC_HANDLER_THREADS, no el loop
+- Los envíos de WhatsApp ya son fire-and-forget: los encola whatsapp_service
+- Los mensajes de un mismo usuario se procesan en orden (un lock por número)
+
+El camino sync (Flask + BotOrchestrator.procesar_mensaje) sigue funcionando igual.
+"""
+
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from app.bot.states import state_manager_async
+from app.core.metricas import establecer_peluqueria
+from app.services.whatsapp_service import whatsapp_service
+from app.utils.verificar_suscripcion import verificar_suscripcion
+
+# Threads del pool: cada conversación en curso ocupa uno mientras corren sus handlers
+ASYNC_HANDLER_THREADS = int(os.getenv("ASYNC_HANDLER_THREADS", "32"))
+
+
+class OrquestadorEnThreads:
+    """
+    Adaptador de BotOrchestrator para el event loop de ASGI
+    Corre los mismos handlers sync en un pool de threads para no bloquear el loop;
+    no los convierte en async
+    """
+
+    def __init__(self, bot_orchestrator):
+        """
+        Args:
+            bot_orchestrator: Orquestador sync con los handlers ya inicializados
+        """
+        self.bot = bot_orchestrator
+        self.executor = ThreadPoolExecutor(
+            max_workers=ASYNC_HANDLER_THREADS,
+            thread_name_prefix="bot-handler"
+        )
+        self.locks_usuario = {}
+
+    async def _en_thread(self, funcion, *args):
+        """
+        Ejecuta una función bloqueante en el pool de handlers
+        Con el contexto de la tarea (run_in_executor no copia los contextvars):
+        así las métricas del thread quedan etiquetadas con la peluquería
+        """
+        loop = asyncio.get_running_loop()
+        contexto = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, contexto.run, funcion, *args)
+
+    async def procesar_webhook(self, data):
+        """
+        Procesa el payload del webhook de Twilio (mismo flujo que webhook_whatsapp)
+
+        Args:
+            data: Dict con los campos del form de Twilio
+
+        Returns:
+            int: Código HTTP para responder a Twilio
+        """
+        from app.api.webhooks.whatsapp import detectar_peluqueria, respuesta_media
+
+        numero = data.get("From")
+        texto = (data.get("Body") or "").strip()
+        numero_destino = data.get("To") or ""
+        num_media = int(data.get("NumMedia") or 0)
+        media_type = data.get("MediaContentType0", "")
+
+        if not numero:
+            print("⚠️ Request sin numero de origen")
+            return 400
+
+        print(f"📨 [asgi] Mensaje de {numero} a {numero_destino}: {texto or '(sin texto)'}")
+
+        if not texto and num_media > 0:
+            whatsapp_service.enviar_mensaje(respuesta_media(media_type), numero)
+            return 200
+
+        if not texto:
+            return 200
+
+        peluqueria_key = detectar_peluqueria(numero_destino)
+
+        if not peluqueria_key:
+            print(f"❌ No se pudo identificar la peluquería para {numero_destino}")
+            whatsapp_service.enviar_mensaje(
+                "Lo siento, hubo un error de configuración. Por favor contacta con soporte.",
+                numero
+            )
+            return 404
+
+        # Cada request corre en su propia tarea: la peluquería no se filtra a otros mensajes
+        establecer_peluqueria(peluqueria_key)
+
+        await self.procesar_mensaje(numero, texto, peluqueria_key)
+        return 200
+
+    async def procesar_mensaje(self, numero, texto, peluqueria_key):
+        """
+        Procesa un mensaje de texto ya identificado
+
+        Args:
+            numero: Número de WhatsApp completo (con whatsapp:)
+            texto: Texto del mensaje
+            peluqueria_key: Identificador del cliente
+        """
+        numero_limpio = numero.replace("whatsapp:", "").strip()
+
+        # [lock, mensajes en curso o esperando] por usuario
+        entrada = self.locks_usuario.setdefault(numero_limpio, [asyncio.Lock(), 0])
+        entrada[1] += 1
+        try:
+            async with entrada[0]:
+                # Suscripción y estado del usuario en paralelo
+                suscripcion, estado_usuario = await asyncio.gather(
+                    self._en_thread(verificar_suscripcion, peluqueria_key),
+                    state_manager_async.get_state(numero_limpio)
+                )
+
+                if not suscripcion["activa"]:
+                    print(f"⛔ Bot bloqueado para {peluqueria_key}: {suscripcion['motivo']}")
+                    return
+
+                await self._en_thread(
+                    self.bot.procesar_mensaje, numero, texto, peluqueria_key, estado_usuario
+                )
+        finally:
+            # Liberar el lock si nadie más está esperando por este usuario
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del self.locks_usuario[numero_limpio]
+
+    def cerrar(self):
+        """Espera a que terminen los pasos en curso y libera el pool"""
+        self.executor.shutdown(wait=True)
+
+
+_orquestador_threads = None
+
+
+def get_orquestador_threads():
+    """
+    Obtiene el adaptador de threads (lo crea en el primer uso)
+
+    Returns:
+        OrquestadorEnThreads: Instancia compartida del proceso
+    """
+    global _orquestador_threads
+
+    if _orquestador_threads is None:
+        from app.bot.orchestrator import get_bot_orchestrator
+        _orquestador_threads = OrquestadorEnThreads(get_bot_orchestrator())
+
+    return _orquestador_threads
+
+
+# Nombres anteriores
+AsyncBotOrchestrator = OrquestadorEnThreads
+get_async_orchestrator = get_orquestador_threads
@@ -0,0 +1,270 @@
+"""
+Registro de Pasos
+Tabla paso -> handler que usa el orquestador para enrutar cada mensaje en O(1).
+
+Cada paso declara:
+- handler: función que recibe un Mensaje
+- siguientes: pasos a los que puede pasar (None = cualquiera); volver al menú siempre vale
+- timeout: segundos de inactividad tras los que el paso vence y se vuelve al menú
+- texto_libre: el usuario escribe texto arbitrario (no se corrigen typos de comandos)
+
+Además lleva métricas por paso (latencia, errores, transiciones y abandonos) que
+se consultan en /health/pasos.
+
+Los flujos nuevos se registran solos desde app/bot/flujos/ sin tocar el orquestador:
+
+    from app.bot.pasos import pasos
+
+    @pasos.paso("encuesta_puntaje", siguientes=("menu",), timeout=600)
+    def procesar_puntaje(mensaje):
+        ...
+
+    pasos.registrar_opcion_menu(8, iniciar_encuesta, titulo="8️⃣ Dejar una reseña")
+"""
+
+import time
+import threading
+
+from app.core.metricas import observar_paso
+
+PASO_MENU = "menu"
+
+
+class Mensaje:
+    """Datos de un mensaje entrante que recibe el handler de un paso"""
+
+    __slots__ = ("numero_limpio", "texto", "peluqueria_key", "numero", "estado")
+
+    def __init__(self, numero_limpio, texto, peluqueria_key, numero, estado=None):
+        self.numero_limpio = numero_limpio
+        self.texto = texto
+        self.peluqueria_key = peluqueria_key
+        self.numero = numero
+        self.estado = estado
+
+
+class Paso:
+    """Definición de un paso de conversación"""
+
+    __slots__ = ("nombre", "handler", "siguientes", "timeout", "texto_libre")
+
+    def __init__(self, nombre, handler, siguientes=None, timeout=None, texto_libre=False):
+        self.nombre = nombre
+        self.handler = handler
+        self.siguientes = frozenset(siguientes) if siguientes is not None else None
+        self.timeout = timeout
+        self.texto_libre = texto_libre
+
+    def permite(self, hacia):
+        """True si se puede pasar de este paso a `hacia`"""
+        return (
+            self.siguientes is None
+            or hacia in (self.nombre, PASO_MENU)
+            or hacia in self.siguientes
+        )
+
+
+class MetricasPaso:
+    """Contadores de un paso (se modifican con el lock del registro)"""
+
+    __slots__ = ("mensajes", "errores", "latencia_total", "latencia_maxima",
+                 "entradas", "transiciones", "transiciones_invalidas", "abandonos")
+
+    def __init__(self):
+        self.mensajes = 0
+        self.errores = 0
+        self.latencia_total = 0.0
+        self.latencia_maxima = 0.0
+        self.entradas = 0
+        self.transiciones = {}  # paso destino -> cantidad
+        self.transiciones_invalidas = 0
+        self.abandonos = {}     # motivo -> cantidad
+
+    def resumen(self):
+        abandonos = sum(self.abandonos.values())
+        return {
+            "mensajes": self.mensajes,
+            "errores": self.errores,
+            "latencia_promedio_ms": round(self.latencia_total / self.mensajes * 1000, 2) if self.mensajes else 0,
+            "latencia_maxima_ms": round(self.latencia_maxima * 1000, 2),
+            "entradas": self.entradas,
+            "transiciones": dict(self.transiciones),
+            "transiciones_invalidas": self.transiciones_invalidas,
+            "abandonos": dict(self.abandonos),
+            "tasa_abandono": round(abandonos / self.entradas, 3) if self.entradas else 0
+        }
+
+
+class RegistroPasos:
+    """
+    Pasos de conversación y opciones del menú principal
+
+    Uso:
+        pasos.registrar("nombre", handler, siguientes=("servicio",), timeout=900, texto_libre=True)
+        pasos.despachar("nombre", Mensaje(...))
+    """
+
+    def __init__(self):
+        self.pasos = {}
+        self.opciones_menu = {}  # número -> (handler, título o None)
+        self.metricas = {}
+        self.lock = threading.Lock()
+
+    # ---- Registro ----
+
+    def registrar(self, nombre, handler, siguientes=None, timeout=None, texto_libre=False):
+        """
+        Registra (o reemplaza) un paso
+
+        Args:
+            nombre: Valor de estado["paso"]
+            handler: Función handler(mensaje)
+            siguientes: Pasos a los que puede pasar (None = sin restricción)
+            timeout: Segundos de inactividad tras los que vence (None = el TTL del estado)
+            texto_libre: Si el usuario escribe texto arbitrario en este paso
+
+        Returns:
+            Paso: El paso registrado
+        """
+        paso = Paso(nombre, handler, siguientes, timeout, texto_libre)
+        with self.lock:
+            if nombre in self.pasos:
+                print(f"⚠️ Paso '{nombre}' registrado de nuevo (se reemplaza)")
+            self.pasos[nombre] = paso
+            self.metricas.setdefault(nombre, MetricasPaso())
+        return paso
+
+    def paso(self, nombre, **opciones):
+        """Decorador de registrar() para los flujos de app/bot/flujos/"""
+        def decorador(handler):
+            self.registrar(nombre, handler, **opciones)
+            return handler
+        return decorador
+
+    def registrar_opcion_menu(self, opcion, handler, titulo=None):
+        """
+        Registra una opción del menú principal
+
+        Args:
+            opcion: Número de la opción
+            handler: Función handler(mensaje)
+            titulo: Texto de la opción en el menú (None = ya está en las traducciones)
+        """
+        with self.lock:
+            if opcion in self.opciones_menu:
+                print(f"⚠️ Opción de menú {opcion} registrada de nuevo (se reemplaza)")
+            self.opciones_menu[opcion] = (handler, titulo)
+
+    def titulos_extra_menu(self):
+        """Títulos de las opciones agregadas por flujos, en orden"""
+        return [
+            titulo for opcion, (_, titulo) in sorted(self.opciones_menu.items())
+            if titulo
+        ]
+
+    # ---- Despacho ----
+
+    def get(self, nombre):
+        return self.pasos.get(nombre)
+
+    def despachar(self, nombre, mensaje):
+        """
+        Ejecuta el handler del paso midiendo la latencia
+
+        Returns:
+            bool: False si el paso no está registrado
+        """
+        paso = self.pasos.get(nombre)
+        if paso is None:
+            return False
+
+        self._medir(nombre, paso.handler, mensaje)
+        return True
+
+    def despachar_opcion_menu(self, opcion, mensaje):
+        """
+        Ejecuta la opción del menú principal
+
+        Returns:
+            bool: False si la opción no existe
+        """
+        opcion_menu = self.opciones_menu.get(opcion)
+        if opcion_menu is None:
+            return False
+
+        self._medir(f"{PASO_MENU}:{opcion}", opcion_menu[0], mensaje)
+        return True
+
+    def _medir(self, nombre, handler, mensaje):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            handler(mensaje)
+        except Exception:
+            error = True
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self.lock:
+                metricas = self.metricas.setdefault(nombre, MetricasPaso())
+                metricas.mensajes += 1
+                metricas.errores += error
+                metricas.latencia_total += duracion
+                metricas.latencia_maxima = max(metricas.latencia_maxima, duracion)
+            observar_paso(nombre, mensaje.peluqueria_key, duracion, error)
+
+    # ---- Transiciones, vencimientos y abandonos ----
+
+    def registrar_transicion(self, desde, hacia):
+        """
+        Registra el paso de `desde` a `hacia` (entre dos mensajes del usuario)
+
+        Returns:
+            bool: False si la transición no está permitida
+        """
+        if desde == hacia or desde is None:
+            return True
+
+        paso = self.pasos.get(desde)
+        permitida = paso is None or paso.permite(hacia)
+
+        with self.lock:
+            origen = self.metricas.setdefault(desde, MetricasPaso())
+            origen.transiciones[hacia] = origen.transiciones.get(hacia, 0) + 1
+            if not permitida:
+                origen.transiciones_invalidas += 1
+            self.metricas.setdefault(hacia, MetricasPaso()).entradas += 1
+
+        if not permitida:
+            print(f"⚠️ Transición no declarada: {desde} -> {hacia}")
+        return permitida
+
+    def vencido(self, nombre, segundos_inactivo):
+        """True si el usuario estuvo inactivo más que el timeout del paso"""
+        paso = self.pasos.get(nombre)
+        return bool(paso and paso.timeout and segundos_inactivo > paso.timeout)
+
+    def registrar_abandono(self, nombre, motivo):
+        """
+        Cuenta un abandono del paso
+
+        Args:
+            nombre: Paso que se abandonó
+            motivo: "timeout", "menu" o "cancelar"
+        """
+        with self.lock:
+            metricas = self.metricas.setdefault(nombre, MetricasPaso())
+            metricas.abandonos[motivo] = metricas.abandonos.get(motivo, 0) + 1
+
+    def es_texto_libre(self, nombre):
+        paso = self.pasos.get(nombre)
+        return bool(paso and paso.texto_libre)
+
+    def resumen(self):
+        """Métricas de todos los pasos (para /health/pasos)"""
+        with self.lock:
+            return {nombre: metricas.resumen() for nombre, metricas in self.metricas.items()}
+
+
+# Instancia global (el orquestador registra los pasos base y los flujos los suyos)
+pasos = RegistroPasos()
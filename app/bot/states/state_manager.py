@@ -5,27 +5,24 @@ Versión Mejorada - Enero 2026
 
 import os
 import json
+import time
+import threading
 import redis
+from collections.abc import Mapping
 from datetime import datetime, date
+from app.core.metricas import instrumentar_redis
 
 # Railway inyecta REDIS_URL automáticamente
 # En local, se usa localhost
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-try:
-    r = redis.Redis.from_url(
-        REDIS_URL,
-        decode_responses=True,
-        socket_connect_timeout=5,
-        socket_timeout=5
-    )
-    # Test de conexión
-    r.ping()
-    print("✅ Conectado a Redis")
-except Exception as e:
-    print(f"❌ Error conectando a Redis: {e}")
-    print("   Verifica que Redis esté corriendo o que REDIS_URL sea correcto")
-    r = None
+# Si Redis no respondió, cada cuánto se vuelve a intentar (segundos)
+REDIS_REINTENTO = 30
+
+_client = None
+_client_pid = None
+_proximo_intento = 0
+_client_lock = threading.Lock()
 
 STATE_TTL = 30 * 60  # 30 minutos
 
@@ -39,6 +36,7 @@ def get_state(user_id):
     Returns:
         dict: Estado del usuario o None si no existe
     """
+    r = get_redis_client()
     if not r:
         print("⚠️ Redis no disponible")
         return None
@@ -61,6 +59,7 @@ def set_state(user_id, state):
     Returns:
         bool: True si se guardó correctamente
     """
+    r = get_redis_client()
     if not r:
         print("⚠️ Redis no disponible")
         return False
@@ -77,6 +76,32 @@ def set_state(user_id, state):
         print(f"❌ Error guardando estado de {user_id}: {e}")
         return False
 
+def get_states_batch(user_ids):
+    """
+    Obtiene los estados de varios usuarios con un solo MGET
+    
+    Args:
+        user_ids: Lista de identificadores de usuario
+    
+    Returns:
+        dict: {user_id: estado} solo para los usuarios que tienen estado
+    """
+    r = get_redis_client()
+    if not r or not user_ids:
+        return {}
+    
+    try:
+        user_ids = list(dict.fromkeys(user_ids))
+        datos = r.mget([f"user_state:{user_id}" for user_id in user_ids])
+        return {
+            user_id: json.loads(data)
+            for user_id, data in zip(user_ids, datos)
+            if data
+        }
+    except Exception as e:
+        print(f"❌ Error obteniendo estados en lote: {e}")
+        return {}
+
 def clear_state(user_id):
     """
     Elimina el estado del usuario
@@ -87,6 +112,7 @@ def clear_state(user_id):
     Returns:
         bool: True si se eliminó correctamente
     """
+    r = get_redis_client()
     if not r:
         return False
     
@@ -108,6 +134,7 @@ def renovar_ttl(user_id):
     Returns:
         bool: True si se renovó el TTL
     """
+    r = get_redis_client()
     if not r:
         return False
     
@@ -124,7 +151,8 @@ def renovar_ttl(user_id):
 def serializar_estado(estado):
     """
     Convierte objetos datetime/date a strings ISO para guardar en Redis
-    Maneja recursivamente dicts y listas anidadas
+    Maneja recursivamente dicts y listas anidadas (también las configs
+    congeladas: MappingProxyType y tuplas)
     
     Args:
         estado: Diccionario con el estado (puede contener datetime/date)
@@ -132,7 +160,7 @@ def serializar_estado(estado):
     Returns:
         dict: Estado serializado (todos los valores JSON-compatibles)
     """
-    if not isinstance(estado, dict):
+    if not isinstance(estado, Mapping):
         return estado
     
     estado_limpio = {}
@@ -142,18 +170,18 @@ def serializar_estado(estado):
             # Convertir datetime/date a ISO string
             estado_limpio[key] = value.isoformat()
         
-        elif isinstance(value, list):
+        elif isinstance(value, (list, tuple)):
             # Manejar listas que puedan contener dicts o datetime
             estado_limpio[key] = []
             for item in value:
-                if isinstance(item, dict):
+                if isinstance(item, Mapping):
                     estado_limpio[key].append(serializar_estado(item))  # Recursivo
                 elif isinstance(item, (datetime, date)):
                     estado_limpio[key].append(item.isoformat())
                 else:
                     estado_limpio[key].append(item)
         
-        elif isinstance(value, dict):
+        elif isinstance(value, Mapping):
             # Recursivo para dicts anidados
             estado_limpio[key] = serializar_estado(value)
         
@@ -188,6 +216,7 @@ def obtener_todos_estados():
     Returns:
         list: Lista de estados activos con user_id
     """
+    r = get_redis_client()
     if not r:
         return []
     
@@ -217,6 +246,7 @@ def contar_usuarios_activos():
     Returns:
         int: Número de usuarios activos
     """
+    r = get_redis_client()
     if not r:
         return 0
     
@@ -235,6 +265,7 @@ def limpiar_estados_expirados():
     Returns:
         int: Número de estados eliminados
     """
+    r = get_redis_client()
     if not r:
         return 0
     
@@ -264,6 +295,7 @@ def get_redis_health():
     Returns:
         dict: Estado de Redis (para health check)
     """
+    r = get_redis_client()
     if not r:
         return {
             "status": "disconnected",
@@ -286,14 +318,72 @@ def get_redis_health():
             "mensaje": str(e)
         }
 
-# Exportar cliente Redis para otros módulos
-redis_client = r
-
 def get_redis_client():
     """
     Retorna el cliente Redis para uso en otros módulos
+    Se conecta en el primer uso (no al importar) y de nuevo después de un fork
     
     Returns:
-        Redis: Cliente Redis o None
+        Redis: Cliente Redis o None si Redis no responde
+               (se reintenta cada REDIS_REINTENTO segundos)
     """
-    return r
\ No newline at end of file
+    global _client, _client_pid, _proximo_intento
+    
+    pid = os.getpid()
+    if _client_pid == pid and (_client is not None or time.monotonic() < _proximo_intento):
+        return _client
+    
+    with _client_lock:
+        if _client_pid == pid and (_client is not None or time.monotonic() < _proximo_intento):
+            return _client
+        
+        try:
+            cliente = redis.Redis.from_url(
+                REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_timeout=5
+            )
+            # Test de conexión
+            cliente.ping()
+            print("✅ Conectado a Redis")
+            # Cada comando (de cualquier módulo que use este cliente) queda en /metrics
+            _client = instrumentar_redis(cliente)
+        except Exception as e:
+            print(f"❌ Error conectando a Redis: {e}")
+            print("   Verifica que Redis esté corriendo o que REDIS_URL sea correcto")
+            _client = None
+            _proximo_intento = time.monotonic() + REDIS_REINTENTO
+        
+        _client_pid = pid
+        return _client
+
+
+def cerrar_conexion():
+    """Cierra el pool de conexiones del proceso (al apagar el worker)"""
+    global _client, _client_pid
+    
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def reiniciar_conexion():
+    """
+    Descarta el cliente heredado sin cerrarlo (después de un fork)
+    Cerrarlo desconectaría también al proceso padre
+    """
+    global _client, _client_pid
+    
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+
+def __getattr__(nombre):
+    """Compatibilidad: state_manager.r / state_manager.redis_client conectan en el primer uso"""
+    if nombre in ("r", "redis_client"):
+        return get_redis_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
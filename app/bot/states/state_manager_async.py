@@ -0,0 +1,160 @@
+"""
+State Manager Async - Estados de usuario en Redis con redis.asyncio
+Mismas claves, TTL y serialización que state_manager.py, para usar desde un worker async
+"""
+
+import os
+import json
+import asyncio
+
+import redis.asyncio as aioredis
+
+from app.bot.states.state_manager import REDIS_URL, STATE_TTL, serializar_estado
+
+# Conexiones del pool async (por proceso)
+REDIS_MAX_CONEXIONES = int(os.getenv("REDIS_MAX_CONEXIONES", "50"))
+
+_client = None
+_client_pid = None
+_client_loop = None
+
+
+def get_redis_client():
+    """
+    Obtiene el cliente redis.asyncio del proceso y event loop actuales
+    Las conexiones quedan atadas al loop, por eso se recrea si el loop cambia
+
+    Returns:
+        redis.asyncio.Redis: Cliente async
+    """
+    global _client, _client_pid, _client_loop
+
+    pid = os.getpid()
+    loop = asyncio.get_running_loop()
+
+    if _client is None or _client_pid != pid or _client_loop is not loop:
+        _client = aioredis.Redis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            max_connections=REDIS_MAX_CONEXIONES
+        )
+        _client_pid = pid
+        _client_loop = loop
+
+    return _client
+
+
+async def cerrar_conexion():
+    """Cierra el pool async (al apagar el worker)"""
+    global _client, _client_pid, _client_loop
+
+    if _client is not None and _client_pid == os.getpid():
+        await _client.aclose()
+    _client = None
+    _client_pid = None
+    _client_loop = None
+
+
+async def get_state(user_id):
+    """
+    Obtiene el estado del usuario desde Redis
+
+    Args:
+        user_id: Identificador único del usuario (número de teléfono limpio)
+
+    Returns:
+        dict: Estado del usuario o None si no existe
+    """
+    try:
+        data = await get_redis_client().get(f"user_state:{user_id}")
+        return json.loads(data) if data else None
+    except Exception as e:
+        print(f"❌ Error obteniendo estado de {user_id}: {e}")
+        return None
+
+
+async def set_state(user_id, state):
+    """
+    Guarda el estado del usuario en Redis con TTL
+
+    Args:
+        user_id: Identificador único del usuario
+        state: Diccionario con el estado a guardar
+
+    Returns:
+        bool: True si se guardó correctamente
+    """
+    try:
+        await get_redis_client().setex(
+            f"user_state:{user_id}",
+            STATE_TTL,
+            json.dumps(serializar_estado(state), ensure_ascii=False)
+        )
+        return True
+    except Exception as e:
+        print(f"❌ Error guardando estado de {user_id}: {e}")
+        return False
+
+
+async def get_states_batch(user_ids):
+    """
+    Obtiene los estados de varios usuarios con un solo MGET
+
+    Returns:
+        dict: {user_id: estado} solo para los usuarios que tienen estado
+    """
+    if not user_ids:
+        return {}
+
+    try:
+        user_ids = list(dict.fromkeys(user_ids))
+        datos = await get_redis_client().mget([f"user_state:{user_id}" for user_id in user_ids])
+        return {
+            user_id: json.loads(data)
+            for user_id, data in zip(user_ids, datos)
+            if data
+        }
+    except Exception as e:
+        print(f"❌ Error obteniendo estados en lote: {e}")
+        return {}
+
+
+async def clear_state(user_id):
+    """Elimina el estado del usuario"""
+    try:
+        await get_redis_client().delete(f"user_state:{user_id}")
+        return True
+    except Exception as e:
+        print(f"❌ Error eliminando estado de {user_id}: {e}")
+        return False
+
+
+async def renovar_ttl(user_id):
+    """Renueva el TTL del estado sin modificar los datos"""
+    try:
+        return bool(await get_redis_client().expire(f"user_state:{user_id}", STATE_TTL))
+    except Exception as e:
+        print(f"❌ Error renovando TTL de {user_id}: {e}")
+        return False
+
+
+async def get_redis_health():
+    """
+    Verifica el estado de salud de Redis
+
+    Returns:
+        dict: Estado de Redis (para health check)
+    """
+    try:
+        await get_redis_client().ping()
+        return {
+            "status": "ok",
+            "mensaje": "Redis funcionando correctamente"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "mensaje": str(e)
+        }
@@ -0,0 +1,259 @@
+"""
+Detección de Intenciones
+Reconoce comandos globales (menú, cancelar) y respuestas sí/no en los mensajes,
+tolerando acentos, signos, mayúsculas, letras repetidas ("holaaa") y un error
+de tipeo ("meni", "cancelr").
+
+Las frases salen de INTENCIONES en app/utils/translations.py y se compilan una
+sola vez por idioma:
+- set de frases normalizadas (coincidencia exacta en O(1))
+- trie por palabras (el mensaje empieza con una frase: "hola buen dia, quiero turno")
+- índice de borrados (coincidencia con distancia de edición 1 sin recorrer las frases)
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+from app.utils.translations import INTENCIONES
+
+IDIOMA_POR_DEFECTO = "es"
+
+# Frases más cortas no se corrigen ("si" / "no" / "hi" están a un error de muchas cosas)
+LARGO_MINIMO_DIFUSO = 4
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9 ]+")
+_ESPACIOS = re.compile(r"\s+")
+_REPETIDAS = re.compile(r"([a-z])\1{2,}")
+# Guion (o raya/menos) antes de un número: "-1" o "1-3" no son opciones válidas
+_GUION_NUMERO = re.compile(r"[-\u2010-\u2015\u2212]\s*\d")
+
+_NUMEROS_ESCRITOS = {
+    "es": ("cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez"),
+    "en": ("zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten"),
+    "pt": ("zero", "um", "dois", "tres", "quatro", "cinco", "seis", "sete", "oito", "nove", "dez")
+}
+
+# Palabras que pueden acompañar al número de una opción ("opción 2", "el 3")
+_RELLENO_NUMERO = frozenset((
+    "opcion", "opciones", "numero", "nro", "el", "la", "los", "quiero", "elijo",
+    "option", "number", "the", "opcao", "o", "a", "y", "e", "and"
+))
+
+
+@lru_cache(maxsize=4096)
+def normalizar(texto):
+    """
+    Normaliza un mensaje para compararlo
+
+    "¡Menú!" -> "menu", "Holaaa  " -> "holaa", "1️⃣" -> "1"
+
+    Args:
+        texto: Texto del mensaje
+
+    Returns:
+        str: Texto en minúsculas, sin acentos, signos ni espacios de más
+    """
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = unicodedata.normalize("NFKD", texto)
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = _NO_ALFANUMERICO.sub(" ", texto)
+    texto = _REPETIDAS.sub(r"\1\1", texto)
+    return _ESPACIOS.sub(" ", texto).strip()
+
+
+def _borrados(palabra):
+    """Variantes de la palabra con una letra menos"""
+    return {palabra[:i] + palabra[i + 1:] for i in range(len(palabra))}
+
+
+def _a_distancia_uno(a, b):
+    """True si a y b difieren en a lo sumo una inserción, borrado o sustitución"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class MatcherIntenciones:
+    """
+    Matcher compilado para un idioma
+
+    Uso:
+        matcher = MatcherIntenciones({"menu": ["menu", "hola"], "cancelar": ["salir"]})
+        matcher.detectar("¡Holaa!")  # "menu"
+    """
+
+    def __init__(self, frases_por_intencion):
+        """
+        Args:
+            frases_por_intencion: Dict intención -> lista de frases
+        """
+        self.exactas = {}   # frase normalizada -> intención
+        self.trie = {}      # palabra -> {palabra -> ..., None: intención}
+        self.borrados = {}  # frase con una letra menos -> set de frases
+        self.largo_maximo = 0
+
+        for intencion, frases in frases_por_intencion.items():
+            for frase in frases:
+                frase = normalizar(frase)
+                if not frase:
+                    continue
+
+                self.exactas[frase] = intencion
+                self.largo_maximo = max(self.largo_maximo, len(frase))
+
+                nodo = self.trie
+                for palabra in frase.split(" "):
+                    nodo = nodo.setdefault(palabra, {})
+                nodo[None] = intencion
+
+                if len(frase) >= LARGO_MINIMO_DIFUSO:
+                    for borrado in _borrados(frase):
+                        self.borrados.setdefault(borrado, set()).add(frase)
+
+    def detectar(self, texto, prefijo=False, difuso=True):
+        """
+        Intención del mensaje
+
+        Args:
+            texto: Texto del mensaje (sin normalizar)
+            prefijo: Aceptar mensajes que empiezan con una frase ("hola, quiero un turno")
+            difuso: Aceptar un error de tipeo (no usar en pasos de texto libre, ej. el nombre)
+
+        Returns:
+            str: Intención o None
+        """
+        normalizado = normalizar(texto)
+        if not normalizado:
+            return None
+
+        intencion = self.exactas.get(normalizado)
+        if intencion is not None:
+            return intencion
+
+        if prefijo:
+            intencion = self._detectar_prefijo(normalizado)
+            if intencion is not None:
+                return intencion
+
+        if difuso and LARGO_MINIMO_DIFUSO - 1 <= len(normalizado) <= self.largo_maximo + 1:
+            return self._detectar_difuso(normalizado)
+
+        return None
+
+    def _detectar_prefijo(self, normalizado):
+        """Frase más larga con la que empieza el mensaje (palabra por palabra)"""
+        nodo = self.trie
+        encontrada = None
+        for palabra in normalizado.split(" "):
+            nodo = nodo.get(palabra)
+            if nodo is None:
+                break
+            encontrada = nodo.get(None, encontrada)
+        return encontrada
+
+    def _detectar_difuso(self, normalizado):
+        """Frase a distancia de edición 1 (None si no hay o si es ambiguo)"""
+        # Al mensaje le falta una letra
+        candidatas = set(self.borrados.get(normalizado, ()))
+        for borrado in _borrados(normalizado):
+            # Le sobra una letra
+            if len(borrado) >= LARGO_MINIMO_DIFUSO and borrado in self.exactas:
+                candidatas.add(borrado)
+            # Una letra cambiada (o dos borrados distintos: se descarta abajo)
+            candidatas.update(self.borrados.get(borrado, ()))
+
+        intenciones = {
+            self.exactas[frase]
+            for frase in candidatas
+            if _a_distancia_uno(frase, normalizado)
+        }
+        return intenciones.pop() if len(intenciones) == 1 else None
+
+
+@lru_cache(maxsize=None)
+def get_matcher(idioma=IDIOMA_POR_DEFECTO):
+    """Matcher compilado del idioma (fallback a español)"""
+    return MatcherIntenciones(INTENCIONES.get(idioma, INTENCIONES[IDIOMA_POR_DEFECTO]))
+
+
+def detectar_intencion(texto, idioma=IDIOMA_POR_DEFECTO, prefijo=False, difuso=True):
+    """
+    Intención del mensaje ("menu", "cancelar", "si", "no") o None
+
+    Args:
+        texto: Texto del mensaje
+        idioma: Idioma de la peluquería
+        prefijo: Aceptar frases al principio de un mensaje más largo
+        difuso: Tolerar un error de tipeo
+    """
+    return get_matcher(idioma).detectar(texto, prefijo=prefijo, difuso=difuso)
+
+
+def es_afirmativo(texto, idioma=IDIOMA_POR_DEFECTO):
+    return detectar_intencion(texto, idioma) == "si"
+
+
+def es_negativo(texto, idioma=IDIOMA_POR_DEFECTO):
+    return detectar_intencion(texto, idioma) == "no"
+
+
+def parsear_numeros(texto, idioma=IDIOMA_POR_DEFECTO):
+    """
+    Números de opción de un mensaje
+
+    "2" -> [2], "1️⃣" -> [1], "opción 3" -> [3], "1, 3 y 4" -> [1, 3, 4], "dos" -> [2]
+    "-1" y "1-3" -> None (normalizar() borra el guion y quedarían como 1 y [1, 3])
+
+    Returns:
+        list: Números encontrados, o None si el mensaje tiene otra cosa además de números
+    """
+    if _GUION_NUMERO.search(texto):
+        return None
+
+    escritos = _NUMEROS_ESCRITOS.get(idioma, _NUMEROS_ESCRITOS[IDIOMA_POR_DEFECTO])
+    numeros = []
+
+    for palabra in normalizar(texto).split(" "):
+        if palabra.isdigit():
+            numeros.append(int(palabra))
+        elif palabra in escritos:
+            numeros.append(escritos.index(palabra))
+        elif palabra and palabra not in _RELLENO_NUMERO:
+            return None
+
+    return numeros or None
+
+
+def parsear_numero(texto, idioma=IDIOMA_POR_DEFECTO):
+    """
+    Número de opción de un mensaje ("3", "3️⃣", "opción 3", "tres")
+
+    Returns:
+        int: Número, o None si no hay exactamente uno
+    """
+    numeros = parsear_numeros(texto, idioma)
+    return numeros[0] if numeros and len(numeros) == 1 else None
+
+
+def a_numero(texto, idioma=IDIOMA_POR_DEFECTO):
+    """
+    Como int(texto) pero tolerante a emojis y palabras de relleno
+
+    Raises:
+        ValueError: Si el mensaje no es un número de opción
+    """
+    numero = parsear_numero(texto, idioma)
+    if numero is None:
+        raise ValueError(f"No es un número de opción: {texto!r}")
+    return numero
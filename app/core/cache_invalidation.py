@@ -0,0 +1,448 @@
+"""
+Invalidación de Caches
+Escucha los cambios de MongoDB (change streams) y avisa a todos los procesos
+para que descarten las entradas afectadas de sus caches en memoria.
+
+- Un solo proceso (el líder, elegido con un lock en Redis) escucha el change stream
+- El resume token se guarda en Redis: un nuevo líder sigue desde donde quedó el anterior
+- Los eventos se publican en el canal Redis CANAL_INVALIDACIONES y cada proceso
+  los aplica a sus CacheTTL registrados
+- Con MongoDB standalone (sin replica set, ej. tests) se usa polling por actualizado_en;
+  los borrados (que no dejan actualizado_en) se detectan comparando los _id de las
+  colecciones que tienen caches con los del poll anterior
+
+Así los caches pueden tener TTL largos aunque los scripts de scripts/ o los webhooks
+de pagos modifiquen clientes/turnos por fuera del bot.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from datetime import datetime
+
+# Colecciones que se vigilan
+COLECCIONES_VIGILADAS = ("clientes", "turnos")
+
+# Campos del documento que sirven como clave de cache
+CAMPOS_CLAVE = ("peluqueria_key", "peluqueria", "telefono")
+
+CANAL_INVALIDACIONES = "cache:invalidaciones"
+CLAVE_RESUME_TOKEN = "cache:resume_token"
+CLAVE_ULTIMO_POLL = "cache:ultimo_poll"
+CLAVE_LIDER = "cache:lider"
+
+LIDER_TTL = 30  # segundos
+INTERVALO_POLLING = int(os.getenv("CACHE_INTERVALO_POLLING", "10"))
+
+# Error de MongoDB cuando no hay replica set ("$changeStream only supported on replica sets")
+_ERROR_SIN_REPLICA_SET = 40573
+
+# El resume token ya no está en el oplog (ChangeStreamHistoryLost / ChangeStreamFatalError)
+_ERRORES_TOKEN_INVALIDO = (280, 286)
+
+
+class CacheTTL:
+    """
+    Cache en memoria con expiración por entrada, invalidable por eventos de MongoDB
+
+    Uso:
+        cache = CacheTTL("suscripciones", ttl=3600, coleccion="clientes", campo_clave="peluqueria_key")
+        doc = cache.obtener_o_cargar(peluqueria_key, lambda: cargar(peluqueria_key))
+    """
+
+    def __init__(self, nombre, ttl, coleccion=None, campo_clave=None, max_entradas=10000):
+        """
+        Args:
+            nombre: Nombre del cache (para logs)
+            ttl: Segundos que vive cada entrada
+            coleccion: Colección cuyos cambios invalidan el cache
+            campo_clave: Campo del documento cambiado que coincide con la clave del cache
+                         (None = cualquier cambio en la colección vacía el cache)
+            max_entradas: Tope de entradas (al superarlo se descartan las más viejas)
+        """
+        self.nombre = nombre
+        self.ttl = ttl
+        self.coleccion = coleccion
+        self.campo_clave = campo_clave
+        self.max_entradas = max_entradas
+        self.entradas = {}  # clave -> (vence_en, valor)
+        self.lock = threading.Lock()
+        # Invalidaciones durante una carga: clave -> [cargas en curso, generación]
+        # (limpiar() sube la generación de todo el cache)
+        self.en_curso = {}
+        self.generacion = 0
+
+        if coleccion:
+            _registrar_cache(self)
+
+    def get(self, clave, default=None):
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                return default
+            if entrada[0] < time.monotonic():
+                del self.entradas[clave]
+                return default
+            return entrada[1]
+
+    def set(self, clave, valor):
+        with self.lock:
+            self._guardar(clave, valor)
+
+    def _guardar(self, clave, valor):
+        if len(self.entradas) >= self.max_entradas and clave not in self.entradas:
+            # dict mantiene orden de inserción: la primera es la más vieja
+            del self.entradas[next(iter(self.entradas))]
+        self.entradas[clave] = (time.monotonic() + self.ttl, valor)
+
+    def obtener_o_cargar(self, clave, cargar):
+        """
+        Devuelve el valor cacheado o lo carga con cargar() y lo guarda
+
+        Los valores None también se cachean (ej: "no existe en MongoDB").
+        Si la clave se invalida mientras cargar() corre, el valor se devuelve
+        pero no se guarda: pudo leerse antes del cambio.
+        """
+        faltante = object()
+        valor = self.get(clave, faltante)
+        if valor is not faltante:
+            return valor
+
+        with self.lock:
+            carga = self.en_curso.setdefault(clave, [0, 0])
+            carga[0] += 1
+            generacion = (self.generacion, carga[1])
+
+        try:
+            valor = cargar()
+        finally:
+            with self.lock:
+                vigente = (self.generacion, carga[1]) == generacion
+                carga[0] -= 1
+                if not carga[0]:
+                    del self.en_curso[clave]
+
+        if vigente:
+            with self.lock:
+                self._guardar(clave, valor)
+        return valor
+
+    def invalidar(self, clave):
+        with self.lock:
+            self.entradas.pop(clave, None)
+            if clave in self.en_curso:
+                self.en_curso[clave][1] += 1
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.generacion += 1
+
+    def aplicar_evento(self, evento):
+        """Invalida lo que corresponda según un evento de cambio"""
+        if evento.get("coleccion") != self.coleccion:
+            return
+
+        clave = evento.get("claves", {}).get(self.campo_clave) if self.campo_clave else None
+
+        if clave is None:
+            # Sin clave (delete, o cache sin campo_clave): no se sabe qué cambió
+            self.limpiar()
+        else:
+            self.invalidar(clave)
+
+    def __len__(self):
+        return len(self.entradas)
+
+
+# ==================== REGISTRO DE CACHES ====================
+
+_caches = []
+_caches_lock = threading.Lock()
+
+
+def _registrar_cache(cache):
+    with _caches_lock:
+        _caches.append(cache)
+
+
+def _colecciones_con_cache():
+    with _caches_lock:
+        return {cache.coleccion for cache in _caches}
+
+
+def aplicar_evento(evento):
+    """Aplica un evento de invalidación a todos los caches del proceso"""
+    with _caches_lock:
+        caches = list(_caches)
+    for cache in caches:
+        cache.aplicar_evento(evento)
+
+
+def publicar_evento(evento):
+    """
+    Publica un evento para todos los procesos
+    Sin Redis se aplica solo en el proceso actual
+    """
+    redis = _get_redis()
+    if redis is None:
+        aplicar_evento(evento)
+        return
+
+    try:
+        redis.publish(CANAL_INVALIDACIONES, json.dumps(evento))
+    except Exception as e:
+        print(f"⚠️ No se pudo publicar invalidación: {e}")
+        aplicar_evento(evento)
+
+
+def _evento_desde_documento(coleccion, operacion, documento):
+    return {
+        "coleccion": coleccion,
+        "operacion": operacion,
+        "claves": {
+            campo: documento[campo]
+            for campo in CAMPOS_CLAVE
+            if documento.get(campo) is not None
+        }
+    }
+
+
+# ==================== LISTENER ====================
+
+class ListenerInvalidaciones:
+    """
+    Threads de invalidación del proceso:
+    - suscriptor: recibe los eventos del canal Redis y los aplica
+    - vigilante: si este proceso es el líder, lee el change stream (o hace polling) y publica
+    """
+
+    def __init__(self):
+        self.identidad = f"{socket.gethostname()}:{os.getpid()}"
+        self.detener = threading.Event()
+        self.hilos = []
+        self.ultimo_poll = None
+        # coleccion -> {_id: evento de borrado} del último poll (para detectar borrados)
+        self.ids_polling = {}
+
+    def iniciar(self):
+        redis = _get_redis()
+
+        if redis is not None:
+            self._lanzar(self._loop_suscriptor, "CacheSuscriptorThread")
+        self._lanzar(self._loop_vigilante, "CacheVigilanteThread")
+
+        print("✅ Invalidación de caches activada")
+
+    def _lanzar(self, target, nombre):
+        hilo = threading.Thread(target=target, daemon=True, name=nombre)
+        hilo.start()
+        self.hilos.append(hilo)
+
+    def _loop_suscriptor(self):
+        while not self.detener.is_set():
+            try:
+                pubsub = _get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CANAL_INVALIDACIONES)
+
+                while not self.detener.is_set():
+                    mensaje = pubsub.get_message(timeout=1.0)
+                    if mensaje and mensaje["type"] == "message":
+                        aplicar_evento(json.loads(mensaje["data"]))
+
+            except Exception as e:
+                print(f"⚠️ Suscriptor de invalidaciones reconectando: {e}")
+                # Pudimos perder eventos: vaciar todo es lo seguro
+                for coleccion in COLECCIONES_VIGILADAS:
+                    aplicar_evento({"coleccion": coleccion, "operacion": "reconexion", "claves": {}})
+                self.detener.wait(5)
+
+    def _es_lider(self):
+        """Toma o renueva el lock de líder (sin Redis, cada proceso es su propio líder)"""
+        redis = _get_redis()
+        if redis is None:
+            return True
+
+        try:
+            if redis.set(CLAVE_LIDER, self.identidad, nx=True, ex=LIDER_TTL):
+                return True
+            if redis.get(CLAVE_LIDER) == self.identidad:
+                redis.expire(CLAVE_LIDER, LIDER_TTL)
+                return True
+        except Exception as e:
+            print(f"⚠️ Error con el lock de líder de caches: {e}")
+        return False
+
+    def _loop_vigilante(self):
+        usar_polling = False
+
+        while not self.detener.is_set():
+            if not self._es_lider():
+                # Lo que se borre mientras otro es líder no se compara contra esta foto
+                self.ids_polling.clear()
+                self.detener.wait(LIDER_TTL / 3)
+                continue
+
+            try:
+                if usar_polling:
+                    self._poll()
+                    self.detener.wait(INTERVALO_POLLING)
+                else:
+                    self._escuchar_change_stream()
+
+            except Exception as e:
+                codigo = getattr(e, "code", None)
+                if codigo == _ERROR_SIN_REPLICA_SET:
+                    print("ℹ️ MongoDB sin replica set: invalidación de caches por polling")
+                    usar_polling = True
+                elif codigo in _ERRORES_TOKEN_INVALIDO:
+                    # Se perdieron cambios: empezar de nuevo y vaciar todos los caches
+                    print("⚠️ Resume token vencido, reiniciando change stream")
+                    _guardar_resume_token(None)
+                    for coleccion in COLECCIONES_VIGILADAS:
+                        publicar_evento({"coleccion": coleccion, "operacion": "invalidate", "claves": {}})
+                else:
+                    print(f"⚠️ Error vigilando cambios de MongoDB: {e}")
+                    self.detener.wait(5)
+
+    def _escuchar_change_stream(self):
+        """Lee el change stream mientras siga siendo líder"""
+        from app.core.database import get_db
+
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": list(COLECCIONES_VIGILADAS)}}},
+            {"$project": {
+                "operationType": 1,
+                "ns": 1,
+                **{f"fullDocument.{campo}": 1 for campo in CAMPOS_CLAVE}
+            }}
+        ]
+
+        with get_db().watch(
+            pipeline,
+            full_document="updateLookup",
+            resume_after=_leer_resume_token(),
+            max_await_time_ms=LIDER_TTL * 1000 // 3
+        ) as stream:
+            while not self.detener.is_set() and self._es_lider():
+                cambio = stream.try_next()
+
+                if cambio is not None:
+                    publicar_evento(_evento_desde_documento(
+                        cambio["ns"]["coll"],
+                        cambio["operationType"],
+                        cambio.get("fullDocument") or {}
+                    ))
+
+                if stream.resume_token:
+                    _guardar_resume_token(stream.resume_token)
+
+    def _poll(self):
+        """Fallback sin change streams: documentos con actualizado_en posterior al último poll"""
+        from app.core.database import get_db
+
+        redis = _get_redis()
+        ahora = datetime.utcnow()
+        desde = _leer_ultimo_poll(redis) or ahora
+        proyeccion = {campo: 1 for campo in CAMPOS_CLAVE}
+
+        for coleccion in COLECCIONES_VIGILADAS:
+            cambiados = get_db()[coleccion].find({"actualizado_en": {"$gt": desde, "$lte": ahora}}, proyeccion)
+            for documento in cambiados:
+                publicar_evento(_evento_desde_documento(coleccion, "update", documento))
+
+        # Solo las colecciones con caches: recorre todos los _id de la colección
+        for coleccion in _colecciones_con_cache() & set(COLECCIONES_VIGILADAS):
+            self._poll_borrados(coleccion, proyeccion)
+
+        if redis is not None:
+            redis.set(CLAVE_ULTIMO_POLL, ahora.isoformat())
+        else:
+            self.ultimo_poll = ahora
+
+    def _poll_borrados(self, coleccion, proyeccion):
+        """Publica un delete por cada documento que estaba en el poll anterior y ya no está"""
+        from app.core.database import get_db
+
+        actuales = {
+            documento["_id"]: _evento_desde_documento(coleccion, "delete", documento)
+            for documento in get_db()[coleccion].find({}, proyeccion)
+        }
+        anteriores = self.ids_polling.get(coleccion)
+        self.ids_polling[coleccion] = actuales
+
+        if anteriores is None:
+            # Sin foto anterior (primer poll o líder nuevo) no se sabe qué se borró antes
+            publicar_evento({"coleccion": coleccion, "operacion": "delete", "claves": {}})
+            return
+
+        for documento_id in anteriores.keys() - actuales.keys():
+            publicar_evento(anteriores[documento_id])
+
+    def cerrar(self):
+        self.detener.set()
+
+
+def _leer_resume_token():
+    redis = _get_redis()
+    if redis is None:
+        return None
+    try:
+        dato = redis.get(CLAVE_RESUME_TOKEN)
+        return json.loads(dato) if dato else None
+    except Exception:
+        return None
+
+
+def _guardar_resume_token(token):
+    redis = _get_redis()
+    if redis is None:
+        return
+    try:
+        if token is None:
+            redis.delete(CLAVE_RESUME_TOKEN)
+        else:
+            redis.set(CLAVE_RESUME_TOKEN, json.dumps(token, default=str))
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el resume token: {e}")
+
+
+def _leer_ultimo_poll(redis):
+    if redis is None:
+        return listener.ultimo_poll if listener else None
+    dato = redis.get(CLAVE_ULTIMO_POLL)
+    return datetime.fromisoformat(dato) if dato else None
+
+
+def _get_redis():
+    """Cliente Redis compartido (import diferido para no conectar al importar)"""
+    try:
+        from app.bot.states.state_manager import get_redis_client
+        return get_redis_client()
+    except Exception:
+        return None
+
+
+# Instancia global (se crea con iniciar_invalidacion_cache)
+listener = None
+
+
+def iniciar_invalidacion_cache():
+    """
+    Arranca la invalidación de caches del proceso
+    Se desactiva con CACHE_INVALIDACION=false
+    """
+    global listener
+
+    from app.core.database import MONGODB_DISPONIBLE
+
+    if not MONGODB_DISPONIBLE or os.getenv("CACHE_INVALIDACION", "true").lower() == "false":
+        return None
+
+    if listener is None:
+        listener = ListenerInvalidaciones()
+        listener.iniciar()
+
+    return listener
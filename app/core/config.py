@@ -4,6 +4,10 @@ Configuración centralizada de la aplicación
 import os
 import sys
 import json
+import threading
+from types import MappingProxyType
+from collections.abc import Mapping
+from functools import lru_cache
 from dotenv import load_dotenv
 from zoneinfo import available_timezones
 
@@ -46,7 +50,7 @@ class Config:
     GOOGLE_SCOPES = ['https://www.googleapis.com/auth/calendar']
     
     # Archivos
-    ARCHIVO_RECORDATORIOS = "recordatorios_enviados.json"
+    ARCHIVO_RECORDATORIOS = "recordatorios_enviados.log"
     ARCHIVO_ESTADOS = "user_states.json"
     ARCHIVO_CLIENTES = "clientes.json"
     
@@ -90,43 +94,550 @@ class Config:
         print("✅ Configuración validada correctamente")
 
 
-def cargar_clientes():
-    """Carga la configuración de clientes desde JSON"""
-    ruta_clientes = os.path.join(Config.DIR_CONFIG, Config.ARCHIVO_CLIENTES)
+# Recarga en caliente de clientes.json
+CANAL_RECARGA_CONFIG = "config:recargar"
+CONFIG_INTERVALO_RECARGA = float(os.getenv("CONFIG_INTERVALO_RECARGA", "5"))  # segundos
+
+# Fuente de la configuración de clientes: "json" (clientes.json) o "mongodb"
+CONFIG_FUENTE = os.getenv("CONFIG_FUENTE", "json").lower()
+CONFIG_SNAPSHOT = os.getenv("CONFIG_SNAPSHOT", os.path.join("config", ".snapshot_configuraciones.json"))
+
+
+@lru_cache(maxsize=1)
+def timezones_validas():
+    """Timezones de zoneinfo (available_timezones() recorre tzdata: se calcula una vez)"""
+    return frozenset(available_timezones())
+
+
+def ruta_clientes():
+    """Ruta de clientes.json (config/ o, como fallback, la raíz del proyecto)"""
+    ruta = os.path.join(Config.DIR_CONFIG, Config.ARCHIVO_CLIENTES)
+    if not os.path.exists(ruta):
+        ruta = Config.ARCHIVO_CLIENTES
+    return ruta
+
+
+def validar_clientes(peluquerias):
+    """
+    Valida la configuración de todos los clientes
     
-    # Intentar cargar desde config/
-    if not os.path.exists(ruta_clientes):
-        # Fallback a raíz del proyecto
-        ruta_clientes = Config.ARCHIVO_CLIENTES
+    Raises:
+        ValueError: Si falta el timezone o es inválido
+    """
+    for cliente_id, config in peluquerias.items():
+        tz = config.get("timezone")
+        if not tz:
+            raise ValueError(f"❌ Cliente {cliente_id} no tiene timezone configurado")
+        if tz not in timezones_validas():
+            raise ValueError(f"❌ Timezone inválido para {cliente_id}: {tz}")
+
+
+def cargar_clientes(ruta=None):
+    """Carga y valida la configuración de clientes desde JSON"""
+    ruta = ruta or ruta_clientes()
     
     try:
-        with open(ruta_clientes, "r", encoding="utf-8") as f:
+        with open(ruta, "r", encoding="utf-8") as f:
             peluquerias = json.load(f)
         
-        # Validar timezones
-        for cliente_id, config in peluquerias.items():
-            tz = config.get("timezone")
-            if not tz:
-                raise ValueError(f"❌ Cliente {cliente_id} no tiene timezone configurado")
-            if tz not in available_timezones():
-                raise ValueError(f"❌ Timezone inválido para {cliente_id}: {tz}")
-        
-        print(f"✅ Clientes cargados: {len(peluquerias)}")
-        for key, config in peluquerias.items():
-            print(f"   • {config['nombre']} ({key})")
-        
+        validar_clientes(peluquerias)
         return peluquerias
         
     except FileNotFoundError:
-        raise FileNotFoundError(f"❌ No se encontró {ruta_clientes}")
+        raise FileNotFoundError(f"❌ No se encontró {ruta}")
     except json.JSONDecodeError:
-        raise ValueError(f"❌ {ruta_clientes} está corrupto")
+        raise ValueError(f"❌ {ruta} está corrupto")
+
+
+def _congelar(valor):
+    """Copia de solo lectura en todos los niveles: dicts -> MappingProxyType, listas -> tuplas"""
+    if isinstance(valor, MappingProxyType):
+        # Ya congelado por _congelar (las configs de un snapshot anterior)
+        return valor
+    if isinstance(valor, Mapping):
+        return MappingProxyType({clave: _congelar(v) for clave, v in valor.items()})
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
 
+def descongelar(valor):
+    """
+    Copia mutable (dicts y listas) de una config congelada
+    Para lo que sale del proceso (JSON, Redis) o para modificar una copia
+    """
+    if isinstance(valor, Mapping):
+        return {clave: descongelar(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [descongelar(v) for v in valor]
+    return valor
 
-# Inicializar
-Config.validar()
-PELUQUERIAS = cargar_clientes()
+
+class _Snapshot:
+    """Configuración completa en un momento dado (no se modifica después de publicarse)"""
+    
+    __slots__ = ("peluquerias", "por_numero", "version", "firma")
+    
+    def __init__(self, peluquerias, version, firma):
+        self.peluquerias = {key: _congelar(config) for key, config in peluquerias.items()}
+        self.por_numero = {
+            config["numero_twilio"].strip(): key
+            for key, config in peluquerias.items()
+            if config.get("numero_twilio", "").strip()
+        }
+        self.version = version
+        self.firma = firma
+
+
+class RegistroPeluquerias(Mapping):
+    """
+    Configuración de clientes con recarga en caliente
+    
+    Se comporta como el dict de clientes.json (peluqueria_key -> config) y se
+    puede pasar a los handlers y servicios en su lugar. Al recargar se arma un
+    snapshot nuevo y se reemplaza de una sola asignación: quien está leyendo
+    sigue viendo una configuración completa, vieja o nueva.
+    
+    Las configs por peluquería son de solo lectura en todos los niveles: los dicts
+    son MappingProxyType y las listas tuplas (servicios, peluqueros, horarios).
+    Para modificar una, trabajar sobre descongelar(config).
+    """
+    
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self._actual = _Snapshot({}, 0, None)
+        self._lock = threading.Lock()
+        self._lock_inicio = threading.RLock()
+        self._iniciado = False
+        self._iniciando = False
+        self._hilo = None
+    
+    @property
+    def _snapshot(self):
+        # La carga inicial se hace en el primer acceso (no al importar el módulo)
+        if not self._iniciado:
+            self._iniciar_una_vez()
+        return self._actual
+    
+    @_snapshot.setter
+    def _snapshot(self, snapshot):
+        self._actual = snapshot
+    
+    def iniciar_carga(self):
+        """Fuerza la carga inicial ahora (app.startup() la hace antes de recibir mensajes)"""
+        self._snapshot
+    
+    def _iniciar_una_vez(self):
+        with self._lock_inicio:
+            # _iniciando: iniciar() lee el snapshot (vacío) desde el mismo thread
+            if self._iniciado or self._iniciando:
+                return
+            self._iniciando = True
+            try:
+                self.iniciar()
+                self._iniciado = True
+            finally:
+                self._iniciando = False
+    
+    # ---- Mapping ----
+    
+    def __getitem__(self, peluqueria_key):
+        config = self.get(peluqueria_key)
+        if config is None:
+            raise KeyError(peluqueria_key)
+        return config
+    
+    def __iter__(self):
+        return iter(self._snapshot.peluquerias)
+    
+    def __len__(self):
+        return len(self._snapshot.peluquerias)
+    
+    def get(self, peluqueria_key, default=None):
+        config = self._snapshot.peluquerias.get(peluqueria_key)
+        if config is None:
+            config = self._cargar_faltante(peluqueria_key=peluqueria_key)
+        return default if config is None else config
+    
+    def items(self):
+        return self._snapshot.peluquerias.items()
+    
+    def keys(self):
+        return self._snapshot.peluquerias.keys()
+    
+    def values(self):
+        return self._snapshot.peluquerias.values()
+    
+    # ---- Índices ----
+    
+    @property
+    def version(self):
+        """Se incrementa en cada recarga (sirve para invalidar datos derivados)"""
+        return self._snapshot.version
+    
+    @property
+    def cargadas(self):
+        """Peluquerías en el snapshot actual (a diferencia de len(), nunca fuerza la carga completa)"""
+        return len(self._snapshot.peluquerias)
+    
+    def por_numero_twilio(self, numero_twilio):
+        """
+        Peluquería que atiende un número de Twilio
+        
+        Args:
+            numero_twilio: Número con o sin prefijo whatsapp:
+        
+        Returns:
+            str: peluqueria_key o None
+        """
+        numero = numero_twilio.replace("whatsapp:", "").strip()
+        peluqueria_key = self._snapshot.por_numero.get(numero)
+        if peluqueria_key is None and numero and self._cargar_faltante(numero_twilio=numero) is not None:
+            peluqueria_key = self._snapshot.por_numero.get(numero)
+        return peluqueria_key
+    
+    def _cargar_faltante(self, peluqueria_key=None, numero_twilio=None):
+        """Hook para fuentes con carga lazy: config de una peluquería que no está en el snapshot"""
+        return None
+    
+    # ---- Carga ----
+    
+    def iniciar(self):
+        """Carga inicial (se llama sola en el primer acceso)"""
+        self.recargar()
+    
+    def _firma_archivo(self, ruta):
+        estado = os.stat(ruta)
+        return (ruta, estado.st_mtime_ns, estado.st_size)
+    
+    def recargar(self, forzar=False):
+        """
+        Vuelve a leer clientes.json si cambió
+        
+        Si el archivo nuevo es inválido se mantiene la configuración anterior.
+        
+        Args:
+            forzar: Releer aunque la fecha de modificación no haya cambiado
+        
+        Returns:
+            bool: True si se publicó una configuración nueva
+        """
+        with self._lock:
+            ruta = self.ruta or ruta_clientes()
+            
+            try:
+                firma = self._firma_archivo(ruta)
+            except OSError:
+                if self._snapshot.version == 0:
+                    raise FileNotFoundError(f"❌ No se encontró {ruta}")
+                print(f"⚠️ No se pudo leer {ruta}, se mantiene la configuración actual")
+                return False
+            
+            if not forzar and firma == self._snapshot.firma:
+                return False
+            
+            try:
+                peluquerias = cargar_clientes(ruta)
+            except (ValueError, OSError) as e:
+                if self._snapshot.version == 0:
+                    raise
+                print(f"⚠️ Configuración nueva descartada: {e}")
+                return False
+            
+            anteriores = set(self._snapshot.peluquerias)
+            self._snapshot = _Snapshot(peluquerias, self._snapshot.version + 1, firma)
+        
+        if self._snapshot.version == 1:
+            print(f"✅ Clientes cargados: {len(peluquerias)}")
+            for key, config in peluquerias.items():
+                print(f"   • {config['nombre']} ({key})")
+        else:
+            nuevos = set(peluquerias) - anteriores
+            quitados = anteriores - set(peluquerias)
+            print(f"🔄 Configuración recargada (v{self._snapshot.version}): {len(peluquerias)} clientes"
+                  + (f", nuevos: {', '.join(sorted(nuevos))}" if nuevos else "")
+                  + (f", quitados: {', '.join(sorted(quitados))}" if quitados else ""))
+        return True
+    
+    def iniciar_recarga_automatica(self):
+        """
+        Thread que recarga la configuración cuando cambia clientes.json
+        o cuando llega una señal por el canal Redis CANAL_RECARGA_CONFIG
+        """
+        if self._hilo and self._hilo.is_alive():
+            return self._hilo
+        
+        self._hilo = threading.Thread(target=self._loop_recarga, daemon=True, name="RecargaConfigThread")
+        self._hilo.start()
+        return self._hilo
+    
+    def _loop_recarga(self):
+        import time
+        pubsub = None
+        
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = _suscribir_recarga()
+                
+                forzar = False
+                if pubsub is not None:
+                    mensaje = pubsub.get_message(timeout=CONFIG_INTERVALO_RECARGA)
+                    forzar = bool(mensaje and mensaje["type"] == "message")
+                else:
+                    time.sleep(CONFIG_INTERVALO_RECARGA)
+                
+                self.recargar(forzar=forzar)
+            
+            except Exception as e:
+                print(f"⚠️ Error en recarga de configuración: {e}")
+                pubsub = None
+                time.sleep(CONFIG_INTERVALO_RECARGA)
+
+
+class RegistroPeluqueriasMongo(RegistroPeluquerias):
+    """
+    Configuración de clientes guardada en MongoDB (colección configuraciones)
+    
+    - Arranque: lee el snapshot local (CONFIG_SNAPSHOT) sin tocar la red
+    - Carga lazy: una peluquería que no está en el snapshot se trae en el
+      primer mensaje (por key o por número de Twilio)
+    - Actualización: compara la versión global y trae solo los documentos con
+      versión mayor a la del snapshot (delta), después guarda el snapshot en disco
+    - Huecos: la versión se toma del contador antes de escribir el documento, así que
+      un escritor puede publicar v5 mientras v4 todavía no llegó. Las versiones que
+      faltan se vuelven a pedir durante VENTANA_HUECOS segundos (después se asume
+      que esa versión se reemplazó por una posterior o que la escritura falló)
+    - Recorrer todas las peluquerías (recordatorios) carga todas una vez
+    """
+    
+    # Cuánto se recuerda que una key/número no existe (evita una consulta por mensaje)
+    TTL_INEXISTENTES = 60
+    # Cuánto se espera una versión salteada, y cuántas versiones para atrás se miran
+    VENTANA_HUECOS = 30
+    MAX_HUECOS = 100
+    
+    def __init__(self, ruta_snapshot=None):
+        super().__init__()
+        self.ruta_snapshot = ruta_snapshot or CONFIG_SNAPSHOT
+        self._completo = False
+        self._inexistentes = {}
+        # {versión que todavía no se vio: vencimiento (monotonic)}
+        self._huecos = {}
+    
+    # ---- Recorrido completo ----
+    
+    def _asegurar_completo(self):
+        self._snapshot  # carga inicial desde el snapshot en disco
+        if not self._completo:
+            self.recargar(forzar=True)
+    
+    def __iter__(self):
+        self._asegurar_completo()
+        return super().__iter__()
+    
+    def __len__(self):
+        self._asegurar_completo()
+        return super().__len__()
+    
+    def items(self):
+        self._asegurar_completo()
+        return super().items()
+    
+    def keys(self):
+        self._asegurar_completo()
+        return super().keys()
+    
+    def values(self):
+        self._asegurar_completo()
+        return super().values()
+    
+    # ---- Carga ----
+    
+    def iniciar(self):
+        """Arranque rápido desde el snapshot en disco (la sincronización va en background)"""
+        try:
+            with open(self.ruta_snapshot, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            self._snapshot = _Snapshot(datos["peluquerias"], datos["version"], None)
+            self._completo = datos.get("completo", False)
+            print(f"✅ Configuración desde snapshot local: {len(datos['peluquerias'])} clientes (v{datos['version']})")
+        except FileNotFoundError:
+            print("ℹ️ Sin snapshot local de configuración: se carga cada cliente en su primer mensaje")
+        except (ValueError, KeyError) as e:
+            print(f"⚠️ Snapshot de configuración inválido, se ignora: {e}")
+    
+    def recargar(self, forzar=False):
+        """
+        Trae de MongoDB las configuraciones que cambiaron
+        
+        Args:
+            forzar: Traer todas (no solo el delta) y marcar el snapshot como completo
+        
+        Returns:
+            bool: True si se publicó una configuración nueva
+        """
+        import time
+        from app.core.database import obtener_version_configuracion, obtener_configuraciones
+        
+        with self._lock:
+            actual = self._snapshot
+            ahora = time.monotonic()
+            self._huecos = {v: vence for v, vence in self._huecos.items() if vence > ahora}
+            
+            if not forzar and not self._huecos and obtener_version_configuracion() <= actual.version:
+                return False
+            
+            peluquerias = {} if forzar else dict(actual.peluquerias)
+            desde = 0 if forzar else min([actual.version, *(v - 1 for v in self._huecos)])
+            base = 0 if forzar else actual.version
+            version = base
+            vistas = set()
+            cambios = 0
+            
+            for documento in obtener_configuraciones(desde):
+                vistas.add(documento["version"])
+                # Ya aplicado en una pasada anterior (se trajo de nuevo por un hueco más viejo)
+                if documento["version"] <= base and documento["version"] not in self._huecos:
+                    continue
+                version = max(version, documento["version"])
+                if documento.get("eliminado") or not self._es_valida(documento["_id"], documento["config"]):
+                    peluquerias.pop(documento["_id"], None)
+                else:
+                    peluquerias[documento["_id"]] = documento["config"]
+                cambios += 1
+            
+            for v in range(max(base, version - self.MAX_HUECOS) + 1, version):
+                if v not in vistas:
+                    self._huecos.setdefault(v, ahora + self.VENTANA_HUECOS)
+            for v in vistas:
+                self._huecos.pop(v, None)
+            
+            if not cambios and not forzar:
+                return False
+            
+            self._snapshot = _Snapshot(peluquerias, version, None)
+            self._completo = self._completo or forzar
+            self._inexistentes.clear()
+        
+        print(f"🔄 Configuración sincronizada (v{version}): {cambios} cambios, {len(peluquerias)} clientes")
+        self._guardar_snapshot()
+        return True
+    
+    def _cargar_faltante(self, peluqueria_key=None, numero_twilio=None):
+        import time
+        from app.core.database import obtener_configuracion
+        
+        clave = peluqueria_key or f"numero:{numero_twilio}"
+        with self._lock:
+            if self._inexistentes.get(clave, 0) > time.monotonic():
+                return None
+        
+        try:
+            documento = obtener_configuracion(peluqueria_key=peluqueria_key, numero_twilio=numero_twilio)
+        except Exception as e:
+            print(f"❌ Error cargando configuración de {clave}: {e}")
+            return None
+        
+        if not documento or not self._es_valida(documento["_id"], documento["config"]):
+            with self._lock:
+                self._inexistentes[clave] = time.monotonic() + self.TTL_INEXISTENTES
+            return None
+        
+        with self._lock:
+            actual = self._snapshot
+            peluquerias = dict(actual.peluquerias)
+            peluquerias[documento["_id"]] = documento["config"]
+            self._snapshot = _Snapshot(peluquerias, actual.version, None)
+        
+        print(f"📥 Configuración de {documento['_id']} cargada bajo demanda")
+        return self._snapshot.peluquerias[documento["_id"]]
+    
+    def _es_valida(self, peluqueria_key, config):
+        try:
+            validar_clientes({peluqueria_key: config})
+            return True
+        except ValueError as e:
+            print(f"⚠️ Configuración de {peluqueria_key} ignorada: {e}")
+            return False
+    
+    def _guardar_snapshot(self):
+        """Snapshot compacto en disco para el próximo arranque (escritura atómica)"""
+        snapshot = self._snapshot
+        # Con huecos abiertos, el próximo arranque vuelve a pedir desde el más viejo
+        version = min([snapshot.version, *(v - 1 for v in self._huecos)])
+        temporal = f"{self.ruta_snapshot}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": version,
+                    "completo": self._completo,
+                    "peluquerias": {key: descongelar(config) for key, config in snapshot.peluquerias.items()}
+                }, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temporal, self.ruta_snapshot)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el snapshot de configuración: {e}")
+    
+    def _loop_recarga(self):
+        # Sincronizar apenas arranca el thread (el snapshot en disco puede estar viejo)
+        try:
+            self.recargar()
+        except Exception as e:
+            print(f"⚠️ Error sincronizando configuración: {e}")
+        super()._loop_recarga()
+
+
+def _suscribir_recarga():
+    """Suscripción al canal de recarga (None sin Redis)"""
+    try:
+        from app.bot.states.state_manager import get_redis_client
+        redis = get_redis_client()
+    except Exception:
+        return None
+    if redis is None:
+        return None
+    
+    pubsub = redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CANAL_RECARGA_CONFIG)
+    return pubsub
+
+
+def publicar_recarga():
+    """
+    Pide a todos los procesos que recarguen la configuración ya
+    (sin esperar al próximo chequeo de CONFIG_INTERVALO_RECARGA)
+    
+    Returns:
+        bool: True si se publicó la señal
+    """
+    try:
+        from app.bot.states.state_manager import get_redis_client
+        redis = get_redis_client()
+        if redis is None:
+            return False
+        redis.publish(CANAL_RECARGA_CONFIG, "recargar")
+        return True
+    except Exception as e:
+        print(f"⚠️ No se pudo publicar la recarga de configuración: {e}")
+        return False
+
+
+def iniciar_recarga_configuracion():
+    """
+    Activa la recarga en caliente de la configuración (clientes.json o MongoDB)
+    Se desactiva con CONFIG_RECARGA=false
+    """
+    if os.getenv("CONFIG_RECARGA", "true").lower() == "false":
+        return None
+    return PELUQUERIAS.iniciar_recarga_automatica()
+
+
+# Registro global (se carga en el primer acceso; Config.validar() lo llama app.startup())
+if CONFIG_FUENTE == "mongodb":
+    PELUQUERIAS = RegistroPeluqueriasMongo()
+else:
+    PELUQUERIAS = RegistroPeluquerias()
 
 # Crear directorios necesarios
 os.makedirs(Config.DIR_TOKENS, exist_ok=True)
-os.makedirs(Config.DIR_CONFIG, exist_ok=True)
\ No newline at end of file
+os.makedirs(Config.DIR_CONFIG, exist_ok=True)
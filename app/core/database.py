@@ -1,57 +1,376 @@
 import os
-from pymongo import MongoClient
+import threading
+from pymongo import MongoClient, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from datetime import datetime, timedelta
 import pytz
+from app.core.metricas import observar_llamada, PROMETHEUS_DISPONIBLE
+
+# ==================== CONEXIÓN ====================
+
+# Conexión a MongoDB Atlas (sin URI no hay MongoDB: no se usa localhost por defecto)
+MONGO_URI = os.getenv("MONGODB_URI")
+MONGODB_DB = os.getenv("MONGODB_DB", "peluqueria_bot")
+
+# Pool de conexiones (por proceso: cada worker de gunicorn tiene el suyo)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "20"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_TIMEOUT_MS = int(os.getenv("MONGODB_TIMEOUT_MS", "5000"))
+
+MONGODB_DISPONIBLE = bool(MONGO_URI)
+
+if not MONGODB_DISPONIBLE:
+    print("⚠️ MONGODB_URI no configurada - MongoDB deshabilitado")
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _compresores():
+    """Compresores de red disponibles, en orden de preferencia"""
+    compresores = []
+    try:
+        import zstandard  # noqa: F401
+        compresores.append("zstd")
+    except ImportError:
+        pass
+    try:
+        import snappy  # noqa: F401
+        compresores.append("snappy")
+    except ImportError:
+        pass
+    compresores.append("zlib")
+    return compresores
+
+
+class MetricasComandos(monitoring.CommandListener):
+    """
+    Registra cada comando de MongoDB (find, insert, update, aggregate...) en /metrics
+    pymongo llama al listener en el thread que ejecutó el comando, así que la
+    peluquería sale del contexto del request.
+    """
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        observar_llamada("mongo", event.command_name, event.duration_micros / 1e6, "ok")
+    
+    def failed(self, event):
+        observar_llamada("mongo", event.command_name, event.duration_micros / 1e6, "error")
+
+
+def get_client():
+    """
+    Obtiene el cliente de MongoDB del proceso actual (se crea en el primer uso)
+    
+    Si el proceso se forkeó (workers de gunicorn) se crea un cliente nuevo:
+    los sockets del pool del padre no se pueden compartir con el hijo.
+    
+    Returns:
+        MongoClient: Cliente con pool propio del proceso
+    
+    Raises:
+        RuntimeError: Si MONGODB_URI no está configurada
+    """
+    global _client, _client_pid
+    
+    if not MONGODB_DISPONIBLE:
+        raise RuntimeError("MONGODB_URI no configurada")
+    
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=MONGODB_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS,
+                connectTimeoutMS=MONGODB_TIMEOUT_MS,
+                retryWrites=True,
+                compressors=_compresores(),
+                appname="bot-peluqueria",
+                event_listeners=[MetricasComandos()] if PROMETHEUS_DISPONIBLE else []
+            )
+            _client_pid = pid
+            print(f"✅ Cliente MongoDB creado (pid {pid}, pool {MONGODB_MIN_POOL_SIZE}-{MONGODB_MAX_POOL_SIZE})")
+    
+    return _client
+
+
+def get_db():
+    """Obtiene la base de datos del bot"""
+    return get_client()[MONGODB_DB]
+
+
+def cerrar_conexion():
+    """Cierra el cliente del proceso actual (al apagar la app)"""
+    global _client, _client_pid
+    
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def reiniciar_conexion():
+    """
+    Descarta el cliente heredado sin cerrarlo (después de un fork)
+    Cerrarlo cortaría las conexiones que sigue usando el proceso padre
+    """
+    global _client, _client_pid
+    
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+
+def get_mongo_health():
+    """
+    Verifica la conexión con MongoDB
+    
+    Returns:
+        str: "ok", "error" o "not_configured"
+    """
+    if not MONGODB_DISPONIBLE:
+        return "not_configured"
+    
+    try:
+        get_client().admin.command("ping")
+        return "ok"
+    except Exception as e:
+        print(f"❌ MongoDB no responde: {e}")
+        return "error"
+
+
+class _ColeccionLazy:
+    """
+    Referencia a una colección que no abre la conexión hasta el primer uso
+    Permite seguir importando turnos_collection, etc. sin conectar al importar
+    """
+    
+    def __init__(self, nombre):
+        self._nombre = nombre
+    
+    def _coleccion(self):
+        return get_db()[self._nombre]
+    
+    def __getattr__(self, atributo):
+        return getattr(self._coleccion(), atributo)
+    
+    def __repr__(self):
+        return f"<Colección lazy '{self._nombre}'>"
 
-# Conexión a MongoDB Atlas (gratis)
-MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
-db = client["peluqueria_bot"]
 
 # Colecciones
-turnos_collection = db["turnos"]
-clientes_collection = db["clientes"]
-recordatorios_collection = db["recordatorios"]
+turnos_collection = _ColeccionLazy("turnos")
+clientes_collection = _ColeccionLazy("clientes")
+recordatorios_collection = _ColeccionLazy("recordatorios")
+estadisticas_collection = _ColeccionLazy("estadisticas_diarias")
+reservas_outbox_collection = _ColeccionLazy("reservas_outbox")
+configuraciones_collection = _ColeccionLazy("configuraciones")
+
+# ==================== CONSULTAS LIVIANAS ====================
+
+# Documentos por lote al iterar un cursor
+BATCH_SIZE_DEFAULT = 100
+
+
+class TurnoFila:
+    """
+    Fila liviana de un turno (solo los campos que usa el bot)
+    
+    Se accede por atributo (turno.fecha_hora) o como dict (turno["fecha_hora"],
+    turno.get("peluquero")) para ser compatible con el código que usaba documentos.
+    """
+    
+    __slots__ = (
+        "_id", "peluqueria", "telefono", "cliente", "servicio",
+        "peluquero", "fecha_hora", "estado", "google_event_id"
+    )
+    
+    def __init__(self, documento):
+        for campo in self.__slots__:
+            setattr(self, campo, documento.get(campo))
+    
+    @property
+    def id(self):
+        """ID del turno como string"""
+        return str(self._id)
+    
+    @property
+    def resumen(self):
+        """Texto "peluquero - servicio - cliente" (igual que los eventos de Calendar)"""
+        partes = [self.peluquero, self.servicio, self.cliente]
+        return " - ".join(p for p in partes if p) or "Turno"
+    
+    def inicio_en(self, tz):
+        """
+        Fecha del turno en la zona horaria indicada
+        MongoDB devuelve datetimes naive en UTC
+        """
+        inicio = self.fecha_hora
+        if inicio.tzinfo is None:
+            inicio = pytz.utc.localize(inicio)
+        return inicio.astimezone(tz)
+    
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo)
+    
+    def get(self, campo, default=None):
+        valor = getattr(self, campo, None)
+        return default if valor is None else valor
+    
+    def __repr__(self):
+        return f"<TurnoFila {self._id} {self.fecha_hora}>"
+
+
+# Proyección con los campos de TurnoFila (_id viene siempre)
+PROYECCION_TURNO = {campo: 1 for campo in TurnoFila.__slots__ if campo != "_id"}
+
+
+def iterar(coleccion, filtro, proyeccion=None, orden=None, batch_size=BATCH_SIZE_DEFAULT, limite=0, fila=None):
+    """
+    Itera una consulta de a lotes sin cargar todos los documentos en memoria
+    
+    Args:
+        coleccion: Colección a consultar
+        filtro: Filtro de la consulta
+        proyeccion: Campos a traer (None = documento completo)
+        orden: Lista de (campo, dirección) para sort
+        batch_size: Documentos por viaje al servidor
+        limite: Máximo de documentos (0 = sin límite)
+        fila: Clase con la que envolver cada documento (ej: TurnoFila)
+    
+    Returns:
+        iterator: Documentos (o filas) a medida que llegan del cursor
+    """
+    cursor = coleccion.find(filtro, proyeccion, batch_size=batch_size, limit=limite)
+    if orden:
+        cursor = cursor.sort(orden)
+    
+    if fila is None:
+        return cursor
+    return (fila(documento) for documento in cursor)
+
+
+def iterar_turnos(filtro, orden=None, batch_size=BATCH_SIZE_DEFAULT, limite=0):
+    """Itera turnos como TurnoFila trayendo solo PROYECCION_TURNO"""
+    return iterar(
+        turnos_collection,
+        filtro,
+        proyeccion=PROYECCION_TURNO,
+        orden=orden,
+        batch_size=batch_size,
+        limite=limite,
+        fila=TurnoFila
+    )
 
 # ==================== FUNCIONES PARA TURNOS ====================
 
-def guardar_turno(peluqueria_key, telefono, cliente_nombre, servicio, fecha_hora, peluquero=None, precio=0, duracion=30, google_event_id=None):
-    """Guarda un turno en MongoDB"""
+def documento_turno(peluqueria_key, telefono, cliente_nombre, servicio, fecha_hora, peluquero=None, precio=0, duracion=30, google_event_id=None, reserva_id=None):
+    """
+    Arma el documento de un turno nuevo (compartido con database_async)
+    
+    Returns:
+        dict: Documento listo para insert_one o para el $setOnInsert de la reserva
+    """
+    ahora = datetime.utcnow()
+    turno = {
+        "peluqueria": peluqueria_key,
+        "telefono": telefono,
+        "cliente": cliente_nombre,
+        "servicio": servicio,
+        "fecha_hora": fecha_hora,
+        "peluquero": peluquero["nombre"] if peluquero else None,
+        "precio": precio,
+        "duracion": duracion,
+        "google_event_id": google_event_id,
+        "estado": "confirmado",
+        "creado_en": ahora,
+        "actualizado_en": ahora
+    }
+    if reserva_id:
+        turno["reserva_id"] = reserva_id
+    return turno
+
+def upsert_turno_reserva(turno):
+    """
+    Upsert idempotente del turno de una reserva (compartido con database_async)
+    
+    Returns:
+        tuple: (filtro, update) para update_one(..., upsert=True)
+    """
+    return {"reserva_id": turno["reserva_id"]}, {"$setOnInsert": turno}
+
+def guardar_turno(peluqueria_key, telefono, cliente_nombre, servicio, fecha_hora, peluquero=None, precio=0, duracion=30, google_event_id=None, reserva_id=None):
+    """
+    Guarda un turno en MongoDB
+    Con reserva_id es idempotente: si el turno de esa reserva ya existe no se duplica
+    """
     try:
-        turno = {
-            "peluqueria": peluqueria_key,
-            "telefono": telefono,
-            "cliente": cliente_nombre,
-            "servicio": servicio,
-            "fecha_hora": fecha_hora,
-            "peluquero": peluquero["nombre"] if peluquero else None,
-            "precio": precio,
-            "duracion": duracion,
-            "google_event_id": google_event_id,
-            "estado": "confirmado",
-            "creado_en": datetime.utcnow(),
-            "actualizado_en": datetime.utcnow()
-        }
+        turno = documento_turno(
+            peluqueria_key, telefono, cliente_nombre, servicio, fecha_hora,
+            peluquero, precio, duracion, google_event_id, reserva_id
+        )
         
-        resultado = turnos_collection.insert_one(turno)
-        print(f"✅ Turno guardado en MongoDB: {resultado.inserted_id}")
-        return str(resultado.inserted_id)
+        if reserva_id:
+            filtro, update = upsert_turno_reserva(turno)
+            resultado = turnos_collection.update_one(filtro, update, upsert=True)
+            if resultado.upserted_id is None:
+                existente = turnos_collection.find_one(filtro, {"_id": 1})
+                return str(existente["_id"])
+            turno_id = resultado.upserted_id
+        else:
+            turno_id = turnos_collection.insert_one(turno).inserted_id
+        
+        print(f"✅ Turno guardado en MongoDB: {turno_id}")
+        
+        actualizar_estadisticas(turno, None, "confirmado")
+        return str(turno_id)
     
     except Exception as e:
         print(f"❌ Error guardando turno: {e}")
         return None
 
+def filtro_turnos_cliente(peluqueria_key, telefono, desde):
+    """Filtro de los turnos confirmados de un cliente desde una fecha (compartido con database_async)"""
+    return {
+        "peluqueria": peluqueria_key,
+        "telefono": telefono,
+        "fecha_hora": {"$gte": desde},
+        "estado": "confirmado"
+    }
+
+def filtro_turnos_rango(peluqueria_key, desde, hasta):
+    """Filtro de los turnos confirmados de un rango (compartido con database_async)"""
+    return {
+        "peluqueria": peluqueria_key,
+        "fecha_hora": {
+            "$gte": desde,
+            "$lte": hasta
+        },
+        "estado": "confirmado"
+    }
+
 def obtener_turnos_por_telefono(peluqueria_key, telefono):
     """Obtiene todos los turnos futuros de un cliente"""
     try:
         ahora = datetime.utcnow()
         
-        turnos = turnos_collection.find({
-            "peluqueria": peluqueria_key,
-            "telefono": telefono,
-            "fecha_hora": {"$gte": ahora},
-            "estado": "confirmado"
-        }).sort("fecha_hora", 1)
+        turnos = iterar_turnos(
+            filtro_turnos_cliente(peluqueria_key, telefono, ahora),
+            orden=[("fecha_hora", 1)],
+            batch_size=20
+        )
         
         return list(turnos)
     
@@ -59,25 +378,75 @@ def obtener_turnos_por_telefono(peluqueria_key, telefono):
         print(f"❌ Error obteniendo turnos: {e}")
         return []
 
-def cancelar_turno_db(turno_id):
-    """Marca un turno como cancelado"""
+def cancelar_turno_db(turno_id, peluqueria_key=None):
+    """
+    Marca un turno como cancelado
+    
+    Args:
+        turno_id: _id del turno o ID del evento de Google Calendar
+        peluqueria_key: Identificador del cliente (necesario si turno_id es de Calendar)
+    """
+    return _cambiar_estado_turno(turno_id, "cancelado", peluqueria_key, {"cancelado_en": datetime.utcnow()})
+
+def completar_turno_db(turno_id, peluqueria_key=None):
+    """Marca un turno confirmado como completado (el cliente vino)"""
+    return _cambiar_estado_turno(turno_id, "completado", peluqueria_key, {"completado_en": datetime.utcnow()})
+
+def _filtro_turno(turno_id, peluqueria_key=None):
+    """
+    Filtro por _id o por el ID del evento de Calendar
+    
+    Un ID con forma de ObjectId también se busca como google_event_id: los eventos
+    que creó el outbox antes del prefijo "res" tienen como ID el _id de la reserva
+    (24 hex), que no es el _id del turno
+    """
+    normalizado = _normalizar_turno_id(turno_id)
+    
+    por_evento = {"google_event_id": str(turno_id)}
+    if peluqueria_key:
+        por_evento["peluqueria"] = peluqueria_key
+    
+    if isinstance(normalizado, str):
+        return por_evento
+    
+    return {"$or": [{"_id": normalizado}, por_evento]}
+
+def cambio_estado_turno(turno_id, estado_nuevo, peluqueria_key=None, campos=None):
+    """
+    Arma el find_one_and_update de un cambio de estado (compartido con database_async)
+    El filtro excluye los turnos que ya están en estado_nuevo: repetir el cambio no
+    vuelve a contar en las estadísticas
+    
+    Returns:
+        tuple: (filtro, update)
+    """
+    filtro = _filtro_turno(turno_id, peluqueria_key)
+    filtro["estado"] = {"$ne": estado_nuevo}
+    update = {"$set": {"estado": estado_nuevo, "actualizado_en": datetime.utcnow(), **(campos or {})}}
+    return filtro, update
+
+def _cambiar_estado_turno(turno_id, estado_nuevo, peluqueria_key=None, campos=None):
+    """Cambia el estado de un turno y actualiza las estadísticas con la transición"""
     try:
-        from bson.objectid import ObjectId
+        from pymongo import ReturnDocument
         
-        resultado = turnos_collection.update_one(
-            {"_id": ObjectId(turno_id)},
-            {
-                "$set": {
-                    "estado": "cancelado",
-                    "cancelado_en": datetime.utcnow()
-                }
-            }
+        filtro, update = cambio_estado_turno(turno_id, estado_nuevo, peluqueria_key, campos)
+        
+        anterior = turnos_collection.find_one_and_update(
+            filtro,
+            update,
+            projection=PROYECCION_ESTADISTICAS,
+            return_document=ReturnDocument.BEFORE
         )
         
-        return resultado.modified_count > 0
+        if not anterior:
+            return False
+        
+        actualizar_estadisticas(anterior, anterior.get("estado"), estado_nuevo)
+        return True
     
     except Exception as e:
-        print(f"❌ Error cancelando turno: {e}")
+        print(f"❌ Error cambiando turno a {estado_nuevo}: {e}")
         return False
 
 def obtener_turnos_proximos_db(peluqueria_key, horas_anticipacion=24):
@@ -87,14 +456,7 @@ def obtener_turnos_proximos_db(peluqueria_key, horas_anticipacion=24):
         tiempo_inicio = ahora + timedelta(hours=horas_anticipacion - 1)
         tiempo_fin = ahora + timedelta(hours=horas_anticipacion + 1)
         
-        turnos = turnos_collection.find({
-            "peluqueria": peluqueria_key,
-            "fecha_hora": {
-                "$gte": tiempo_inicio,
-                "$lte": tiempo_fin
-            },
-            "estado": "confirmado"
-        })
+        turnos = iterar_turnos(filtro_turnos_rango(peluqueria_key, tiempo_inicio, tiempo_fin))
         
         return list(turnos)
     
@@ -102,26 +464,69 @@ def obtener_turnos_proximos_db(peluqueria_key, horas_anticipacion=24):
         print(f"❌ Error obteniendo turnos próximos: {e}")
         return []
 
+def obtener_turnos_rango_db(peluqueria_key, desde, hasta):
+    """
+    Obtiene los turnos confirmados de un rango con una sola consulta
+    (usado por los recordatorios para cubrir todas las anticipaciones a la vez)
+    
+    Returns:
+        list | None: TurnoFila del rango o None si la consulta falló
+    """
+    try:
+        turnos = iterar_turnos(filtro_turnos_rango(peluqueria_key, desde, hasta), orden=[("fecha_hora", 1)])
+        
+        return list(turnos)
+    
+    except Exception as e:
+        print(f"❌ Error obteniendo turnos del rango: {e}")
+        return None
+
 # ==================== FUNCIONES PARA CLIENTES ====================
 
-def guardar_cliente(telefono, nombre, peluqueria_key, preferencias=None):
-    """Guarda o actualiza info del cliente"""
+def upsert_cliente(telefono, nombre, peluqueria_key, preferencias=None, peluquero=None, servicios=None):
+    """
+    Arma el upsert del cliente (compartido con database_async)
+    
+    Returns:
+        tuple: (filtro, update) para update_one(..., upsert=True)
+    """
+    ahora = datetime.utcnow()
+    cliente = {
+        "nombre": nombre,
+        "peluqueria": peluqueria_key,
+        "ultimo_contacto": ahora,
+        "actualizado_en": ahora
+    }
+    if preferencias is not None:
+        cliente["preferencias"] = preferencias
+    
+    update = {"$set": cliente, "$setOnInsert": {"primer_contacto": ahora}}
+    
+    if servicios:
+        cliente["ultimo_peluquero"] = peluquero
+        cliente["ultimos_servicios"] = list(servicios)
+        cliente["ultima_reserva"] = ahora
+        update["$inc"] = {"cantidad_reservas": 1}
+    
+    return {"telefono": telefono, "peluqueria": peluqueria_key}, update
+
+def guardar_cliente(telefono, nombre, peluqueria_key, preferencias=None, peluquero=None, servicios=None):
+    """
+    Guarda o actualiza info del cliente
+    
+    Args:
+        telefono: Teléfono del cliente
+        nombre: Nombre del cliente
+        peluqueria_key: Identificador de la peluquería
+        preferencias: Dict de preferencias (None = no se modifican)
+        peluquero: Nombre del peluquero de la reserva (historial para "lo mismo que la última vez")
+        servicios: Lista de nombres de servicios de la reserva
+    """
     try:
-        cliente = {
-            "telefono": telefono,
-            "nombre": nombre,
-            "peluqueria": peluqueria_key,
-            "preferencias": preferencias or {},
-            "primer_contacto": datetime.utcnow(),
-            "ultimo_contacto": datetime.utcnow()
-        }
+        filtro, update = upsert_cliente(telefono, nombre, peluqueria_key, preferencias, peluquero, servicios)
         
         # Upsert: actualiza si existe, crea si no
-        clientes_collection.update_one(
-            {"telefono": telefono, "peluqueria": peluqueria_key},
-            {"$set": cliente, "$setOnInsert": {"primer_contacto": datetime.utcnow()}},
-            upsert=True
-        )
+        clientes_collection.update_one(filtro, update, upsert=True)
         
         print(f"✅ Cliente guardado: {nombre}")
         return True
@@ -143,15 +548,37 @@ def obtener_cliente(telefono, peluqueria_key):
         print(f"❌ Error obteniendo cliente: {e}")
         return None
 
+# Campos del perfil que usa el flujo de reserva
+PROYECCION_PERFIL = {
+    "_id": 0, "peluqueria": 1, "nombre": 1, "ultimo_peluquero": 1,
+    "ultimos_servicios": 1, "ultima_reserva": 1, "cantidad_reservas": 1
+}
+
+def obtener_perfiles_cliente(telefono):
+    """
+    Perfil del cliente en cada peluquería donde reservó (una sola consulta por teléfono)
+    
+    Returns:
+        dict | None: {peluqueria_key: perfil} o None si la consulta falló
+    """
+    try:
+        return {
+            perfil["peluqueria"]: perfil
+            for perfil in clientes_collection.find({"telefono": telefono}, PROYECCION_PERFIL)
+            if perfil.get("peluqueria")
+        }
+    
+    except Exception as e:
+        print(f"❌ Error obteniendo perfil de {telefono}: {e}")
+        return None
+
 # ==================== FUNCIONES PARA RECORDATORIOS ====================
 
 def marcar_recordatorio_enviado(turno_id, tipo="24h"):
     """Marca un recordatorio como enviado"""
     try:
-        from bson.objectid import ObjectId
-        
         recordatorio = {
-            "turno_id": ObjectId(turno_id),
+            "turno_id": _normalizar_turno_id(turno_id),
             "tipo": tipo,
             "enviado_en": datetime.utcnow()
         }
@@ -159,17 +586,53 @@ def marcar_recordatorio_enviado(turno_id, tipo="24h"):
         recordatorios_collection.insert_one(recordatorio)
         return True
     
+    except DuplicateKeyError:
+        # Ya estaba marcado (índice único turno_id + tipo)
+        return True
+    
     except Exception as e:
         print(f"❌ Error marcando recordatorio: {e}")
         return False
 
+def reclamar_recordatorio(turno_id, tipo="24h"):
+    """
+    Reserva un recordatorio antes de enviarlo (insert con el índice único turno_id + tipo)
+    Si varios workers llegan al mismo turno, solo uno gana el insert
+    
+    Returns:
+        bool | None: True si este proceso lo reservó, False si ya estaba
+                     reservado o enviado, None si MongoDB falló
+    """
+    try:
+        recordatorios_collection.insert_one({
+            "turno_id": _normalizar_turno_id(turno_id),
+            "tipo": tipo,
+            "enviado_en": datetime.utcnow()
+        })
+        return True
+    
+    except DuplicateKeyError:
+        return False
+    
+    except Exception as e:
+        print(f"❌ Error reservando recordatorio: {e}")
+        return None
+
+def liberar_recordatorio(turno_id, tipo="24h"):
+    """Libera un recordatorio reservado cuyo envío falló (la próxima pasada lo reintenta)"""
+    try:
+        recordatorios_collection.delete_one({
+            "turno_id": _normalizar_turno_id(turno_id),
+            "tipo": tipo
+        })
+    except Exception as e:
+        print(f"❌ Error liberando recordatorio: {e}")
+
 def recordatorio_ya_enviado(turno_id, tipo="24h"):
     """Verifica si ya se envió un recordatorio"""
     try:
-        from bson.objectid import ObjectId
-        
         existe = recordatorios_collection.find_one({
-            "turno_id": ObjectId(turno_id),
+            "turno_id": _normalizar_turno_id(turno_id),
             "tipo": tipo
         })
         
@@ -179,29 +642,259 @@ def recordatorio_ya_enviado(turno_id, tipo="24h"):
         print(f"❌ Error verificando recordatorio: {e}")
         return False
 
-# ==================== ESTADÍSTICAS ====================
-
-def obtener_estadisticas(peluqueria_key, dias=30):
-    """Obtiene estadísticas de turnos"""
+def recordatorios_enviados_batch(turno_ids, tipo="24h"):
+    """
+    Verifica en una sola consulta qué recordatorios ya se enviaron
+    
+    Args:
+        turno_ids: Lista de IDs de turnos
+        tipo: Tipo de recordatorio ("24h", "2h")
+    
+    Returns:
+        set: IDs (como string) de los turnos que ya tienen recordatorio
+    """
+    if not turno_ids:
+        return set()
+    
     try:
-        desde = datetime.utcnow() - timedelta(days=dias)
+        ids = [_normalizar_turno_id(turno_id) for turno_id in turno_ids]
         
-        pipeline = [
-            {
-                "$match": {
-                    "peluqueria": peluqueria_key,
-                    "creado_en": {"$gte": desde}
-                }
-            },
+        enviados = recordatorios_collection.find(
+            {"turno_id": {"$in": ids}, "tipo": tipo},
+            {"turno_id": 1, "_id": 0}
+        )
+        
+        return {str(r["turno_id"]) for r in enviados}
+    
+    except Exception as e:
+        print(f"❌ Error verificando recordatorios en lote: {e}")
+        return set()
+
+def marcar_recordatorios_enviados_batch(turno_ids, tipo="24h"):
+    """Marca varios recordatorios como enviados con un solo insert_many"""
+    if not turno_ids:
+        return True
+    
+    try:
+        ahora = datetime.utcnow()
+        recordatorios = [
             {
-                "$group": {
-                    "_id": "$estado",
-                    "cantidad": {"$sum": 1}
-                }
+                "turno_id": _normalizar_turno_id(turno_id),
+                "tipo": tipo,
+                "enviado_en": ahora
             }
+            for turno_id in turno_ids
         ]
         
-        resultados = list(turnos_collection.aggregate(pipeline))
+        recordatorios_collection.insert_many(recordatorios, ordered=False)
+        return True
+    
+    except BulkWriteError as e:
+        # Con ordered=False se insertan todos los nuevos; los duplicados ya estaban marcados
+        errores = e.details.get("writeErrors", [])
+        if all(err.get("code") == _ERROR_CLAVE_DUPLICADA for err in errores):
+            return True
+        print(f"❌ Error marcando recordatorios en lote: {e}")
+        return False
+    
+    except Exception as e:
+        print(f"❌ Error marcando recordatorios en lote: {e}")
+        return False
+
+def _normalizar_turno_id(turno_id):
+    """
+    Convierte el ID a ObjectId si es válido
+    Los turnos que vienen de Google Calendar tienen IDs propios y se guardan como string
+    """
+    from bson.objectid import ObjectId
+    
+    if isinstance(turno_id, ObjectId):
+        return turno_id
+    if ObjectId.is_valid(str(turno_id)):
+        return ObjectId(str(turno_id))
+    return str(turno_id)
+
+# ==================== OUTBOX DE RESERVAS ====================
+
+def registrar_reserva_outbox(reserva):
+    """
+    Guarda la intención de reserva para que la aplique el relay
+    
+    Args:
+        reserva: Dict con los datos de la reserva (ver BookingService.crear_reserva)
+    
+    Returns:
+        str | None: ID de la reserva, "ocupado" si el slot ya tiene una reserva en vuelo,
+                    o None si falló la escritura
+    """
+    try:
+        ahora = datetime.utcnow()
+        reserva = {
+            **reserva,
+            "estado": "pendiente",
+            "pasos": {},
+            "intentos": 0,
+            "proximo_intento": ahora,
+            "lease_hasta": ahora,
+            "creado_en": ahora
+        }
+        resultado = reservas_outbox_collection.insert_one(reserva)
+        return str(resultado.inserted_id)
+    
+    except DuplicateKeyError:
+        return "ocupado"
+    
+    except Exception as e:
+        print(f"❌ Error registrando reserva en outbox: {e}")
+        return None
+
+def tomar_reserva_outbox(lease_segundos=120):
+    """
+    Toma la próxima reserva pendiente lista para procesar
+    El lease evita que otro worker la procese al mismo tiempo; si el worker
+    muere, la reserva vuelve a estar disponible cuando vence
+    
+    Returns:
+        dict | None: Reserva tomada o None si no hay
+    """
+    try:
+        from pymongo import ReturnDocument
+        
+        ahora = datetime.utcnow()
+        return reservas_outbox_collection.find_one_and_update(
+            {
+                "estado": "pendiente",
+                "proximo_intento": {"$lte": ahora},
+                "lease_hasta": {"$lte": ahora}
+            },
+            {"$set": {"lease_hasta": ahora + timedelta(seconds=lease_segundos)}},
+            sort=[("proximo_intento", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    except Exception as e:
+        print(f"❌ Error tomando reserva del outbox: {e}")
+        return None
+
+def marcar_paso_reserva(reserva_id, paso, valor=True):
+    """Registra que un paso de la reserva ya se aplicó (para no repetirlo)"""
+    reservas_outbox_collection.update_one(
+        {"_id": _normalizar_turno_id(reserva_id)},
+        {"$set": {f"pasos.{paso}": valor}}
+    )
+
+def reprogramar_reserva_outbox(reserva_id, error, proximo_intento=None):
+    """
+    Registra un intento fallido
+    
+    Args:
+        reserva_id: ID de la reserva
+        error: Descripción del error
+        proximo_intento: Cuándo reintentar (None = no reintentar más, queda "fallida")
+    """
+    cambios = {"ultimo_error": str(error), "lease_hasta": datetime.utcnow()}
+    if proximo_intento is None:
+        cambios["estado"] = "fallida"
+    else:
+        cambios["proximo_intento"] = proximo_intento
+    
+    reservas_outbox_collection.update_one(
+        {"_id": _normalizar_turno_id(reserva_id)},
+        {"$set": cambios, "$inc": {"intentos": 1}}
+    )
+
+def finalizar_reserva_outbox(reserva_id):
+    """Marca la reserva como aplicada (libera el slot del índice único)"""
+    reservas_outbox_collection.update_one(
+        {"_id": _normalizar_turno_id(reserva_id)},
+        {"$set": {"estado": "aplicada", "aplicada_en": datetime.utcnow()}}
+    )
+
+# ==================== ESTADÍSTICAS ====================
+
+# Contadores por peluquería y día (día de creación del turno, en UTC):
+# {
+#     "peluqueria": "cliente_001", "dia": "2026-01-15",
+#     "estados":    {"confirmado": 3, "cancelado": 1},
+#     "peluqueros": {"Juan": {"confirmado": 2, ...}, ...},
+#     "servicios":  {"Corte": {"confirmado": 3, ...}, ...},
+#     "ingresos":   {"confirmado": 15000, ...}
+# }
+# Se actualizan con $inc al crear, cancelar o completar turnos y se reconcilian
+# cada noche contra la colección turnos.
+
+# Campos del turno que necesitan las estadísticas
+PROYECCION_ESTADISTICAS = {
+    "peluqueria": 1, "estado": 1, "peluquero": 1, "servicio": 1, "precio": 1, "creado_en": 1
+}
+
+# Días hacia atrás que recalcula la reconciliación nocturna
+DIAS_RECONCILIACION = int(os.getenv("DIAS_RECONCILIACION", "35"))
+
+
+def _dia(fecha):
+    """Clave de día "YYYY-MM-DD" (UTC)"""
+    return (fecha or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def _clave(nombre):
+    """Nombre de peluquero/servicio usable como campo de MongoDB (sin puntos ni $)"""
+    clave = str(nombre or "sin_asignar").replace(".", "_").lstrip("$")
+    return clave or "sin_asignar"
+
+
+def incrementos_estadisticas(turno, estado_anterior, estado_nuevo):
+    """
+    Arma el upsert $inc para la transición de estado de un turno
+    (compartido con database_async)
+    
+    Args:
+        turno: Documento del turno (con los campos de PROYECCION_ESTADISTICAS)
+        estado_anterior: Estado previo (None si el turno es nuevo)
+        estado_nuevo: Estado nuevo
+    
+    Returns:
+        tuple: (filtro, update) para update_one(..., upsert=True)
+    """
+    peluquero = _clave(turno.get("peluquero"))
+    servicio = _clave(turno.get("servicio"))
+    precio = turno.get("precio") or 0
+    
+    incrementos = {}
+    for estado, signo in ((estado_anterior, -1), (estado_nuevo, 1)):
+        if not estado:
+            continue
+        for campo in (f"estados.{estado}", f"peluqueros.{peluquero}.{estado}", f"servicios.{servicio}.{estado}"):
+            incrementos[campo] = incrementos.get(campo, 0) + signo
+        incrementos[f"ingresos.{estado}"] = incrementos.get(f"ingresos.{estado}", 0) + signo * precio
+    
+    filtro = {"peluqueria": turno.get("peluqueria"), "dia": _dia(turno.get("creado_en"))}
+    update = {"$inc": incrementos, "$set": {"actualizado_en": datetime.utcnow()}}
+    return filtro, update
+
+
+def actualizar_estadisticas(turno, estado_anterior, estado_nuevo):
+    """Aplica la transición de estado de un turno a los contadores del día"""
+    try:
+        filtro, update = incrementos_estadisticas(turno, estado_anterior, estado_nuevo)
+        estadisticas_collection.update_one(filtro, update, upsert=True)
+        return True
+    
+    except Exception as e:
+        # La reconciliación nocturna corrige lo que se pierda acá
+        print(f"❌ Error actualizando estadísticas: {e}")
+        return False
+
+
+def obtener_estadisticas(peluqueria_key, dias=30):
+    """Obtiene estadísticas de turnos (lee los contadores diarios, no recorre turnos)"""
+    try:
+        desde = _dia(datetime.utcnow() - timedelta(days=dias))
+        
+        documentos = estadisticas_collection.find(
+            {"peluqueria": peluqueria_key, "dia": {"$gte": desde}},
+            {"estados": 1, "_id": 0}
+        )
         
         stats = {
             "confirmados": 0,
@@ -210,11 +903,10 @@ def obtener_estadisticas(peluqueria_key, dias=30):
             "total": 0
         }
         
-        for r in resultados:
-            estado = r["_id"]
-            cantidad = r["cantidad"]
-            stats[estado] = cantidad
-            stats["total"] += cantidad
+        for documento in documentos:
+            for estado, cantidad in documento.get("estados", {}).items():
+                stats[f"{estado}s"] = stats.get(f"{estado}s", 0) + cantidad
+                stats["total"] += cantidad
         
         return stats
     
@@ -222,36 +914,433 @@ def obtener_estadisticas(peluqueria_key, dias=30):
         print(f"❌ Error obteniendo estadísticas: {e}")
         return None
 
-# ==================== ÍNDICES (EJECUTAR UNA VEZ) ====================
 
-def crear_indices():
-    """Crea índices para optimizar consultas"""
+def obtener_estadisticas_detalladas(peluqueria_key, dias=30):
+    """
+    Estadísticas para el dashboard y los reportes de facturación
+    
+    Returns:
+        dict: {
+            "por_dia": [{"dia", "estados", "ingresos"}, ...],
+            "peluqueros": {nombre: {estado: cantidad}},
+            "servicios": {nombre: {estado: cantidad}},
+            "ingresos": {estado: monto}
+        } o None si falla
+    """
     try:
-        # Índice para buscar turnos por teléfono
-        turnos_collection.create_index([
-            ("peluqueria", 1),
-            ("telefono", 1),
-            ("fecha_hora", -1)
-        ])
-        
-        # Índice para recordatorios
-        turnos_collection.create_index([
-            ("peluqueria", 1),
-            ("fecha_hora", 1),
-            ("estado", 1)
-        ])
-        
-        # Índice para clientes
-        clientes_collection.create_index([
-            ("telefono", 1),
-            ("peluqueria", 1)
-        ], unique=True)
+        desde = _dia(datetime.utcnow() - timedelta(days=dias))
         
-        print("✅ Índices creados correctamente")
+        documentos = estadisticas_collection.find(
+            {"peluqueria": peluqueria_key, "dia": {"$gte": desde}},
+            {"_id": 0, "peluqueria": 0, "actualizado_en": 0}
+        ).sort("dia", 1)
+        
+        resumen = {"por_dia": [], "peluqueros": {}, "servicios": {}, "ingresos": {}}
+        
+        for documento in documentos:
+            resumen["por_dia"].append({
+                "dia": documento["dia"],
+                "estados": documento.get("estados", {}),
+                "ingresos": documento.get("ingresos", {})
+            })
+            for grupo in ("peluqueros", "servicios"):
+                for nombre, estados in documento.get(grupo, {}).items():
+                    acumulado = resumen[grupo].setdefault(nombre, {})
+                    for estado, cantidad in estados.items():
+                        acumulado[estado] = acumulado.get(estado, 0) + cantidad
+            for estado, monto in documento.get("ingresos", {}).items():
+                resumen["ingresos"][estado] = resumen["ingresos"].get(estado, 0) + monto
+        
+        return resumen
     
     except Exception as e:
-        print(f"❌ Error creando índices: {e}")
+        print(f"❌ Error obteniendo estadísticas detalladas: {e}")
+        return None
+
 
-# Crear índices al importar (solo se ejecuta una vez)
-if os.getenv("CREATE_INDEXES") == "true":
-    crear_indices()
\ No newline at end of file
+def reconciliar_estadisticas(peluqueria_key=None, dias=DIAS_RECONCILIACION):
+    """
+    Recalcula los contadores de los últimos `dias` desde la colección turnos
+    Corrige incrementos perdidos (errores de red, turnos editados a mano)
+    
+    Args:
+        peluqueria_key: Solo esta peluquería (None = todas)
+        dias: Días hacia atrás a recalcular
+    
+    Returns:
+        int: Cantidad de documentos diarios reescritos o None si falla
+    """
+    try:
+        inicio_hoy = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        desde = inicio_hoy - timedelta(days=dias)
+        
+        filtro = {"creado_en": {"$gte": desde}}
+        if peluqueria_key:
+            filtro["peluqueria"] = peluqueria_key
+        
+        grupos = turnos_collection.aggregate([
+            {"$match": filtro},
+            {"$group": {
+                "_id": {
+                    "peluqueria": "$peluqueria",
+                    "dia": {"$dateToString": {"format": "%Y-%m-%d", "date": "$creado_en"}},
+                    "estado": "$estado",
+                    "peluquero": "$peluquero",
+                    "servicio": "$servicio"
+                },
+                "cantidad": {"$sum": 1},
+                "ingresos": {"$sum": {"$ifNull": ["$precio", 0]}}
+            }}
+        ], allowDiskUse=True)
+        
+        documentos = {}
+        for grupo in grupos:
+            g = grupo["_id"]
+            documento = documentos.setdefault((g["peluqueria"], g["dia"]), {
+                "peluqueria": g["peluqueria"],
+                "dia": g["dia"],
+                "estados": {},
+                "peluqueros": {},
+                "servicios": {},
+                "ingresos": {}
+            })
+            estado = g["estado"]
+            cantidad = grupo["cantidad"]
+            
+            documento["estados"][estado] = documento["estados"].get(estado, 0) + cantidad
+            documento["ingresos"][estado] = documento["ingresos"].get(estado, 0) + grupo["ingresos"]
+            for campo, nombre in (("peluqueros", g.get("peluquero")), ("servicios", g.get("servicio"))):
+                por_estado = documento[campo].setdefault(_clave(nombre), {})
+                por_estado[estado] = por_estado.get(estado, 0) + cantidad
+        
+        ahora = datetime.utcnow()
+        for (peluqueria, dia), documento in documentos.items():
+            documento["actualizado_en"] = ahora
+            estadisticas_collection.replace_one({"peluqueria": peluqueria, "dia": dia}, documento, upsert=True)
+        
+        # Días que ya no tienen turnos (borrados a mano)
+        filtro_dias = {"dia": {"$gte": _dia(desde)}, "actualizado_en": {"$lt": ahora}}
+        if peluqueria_key:
+            filtro_dias["peluqueria"] = peluqueria_key
+        estadisticas_collection.delete_many(filtro_dias)
+        
+        print(f"✅ Estadísticas reconciliadas: {len(documentos)} días")
+        return len(documentos)
+    
+    except Exception as e:
+        print(f"❌ Error reconciliando estadísticas: {e}")
+        return None
+
+# ==================== CONFIGURACIÓN DE PELUQUERÍAS ====================
+# Un documento por peluquería: {_id: peluqueria_key, config, version, eliminado, actualizado_en}
+# El documento _version guarda el contador global: cada escritura lo incrementa y
+# estampa el valor en el documento, así los procesos traen solo lo que cambió.
+# Tomar la versión y escribir son dos operaciones: dos escritores pueden publicar
+# v5 antes que v4. RegistroPeluqueriasMongo.recargar vuelve a pedir las versiones
+# salteadas por un rato en lugar de asumir que el delta llega en orden.
+
+ID_VERSION_CONFIGURACION = "_version"
+
+
+def _siguiente_version_configuracion():
+    from pymongo import ReturnDocument
+    
+    contador = configuraciones_collection.find_one_and_update(
+        {"_id": ID_VERSION_CONFIGURACION},
+        {"$inc": {"valor": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return contador["valor"]
+
+
+def guardar_configuracion(peluqueria_key, config):
+    """
+    Crea o reemplaza la configuración de una peluquería
+    
+    Returns:
+        int: Versión asignada o None si falla
+    """
+    try:
+        version = _siguiente_version_configuracion()
+        configuraciones_collection.replace_one(
+            {"_id": peluqueria_key},
+            {
+                "config": config,
+                "version": version,
+                "eliminado": False,
+                "actualizado_en": datetime.utcnow()
+            },
+            upsert=True
+        )
+        print(f"✅ Configuración de {peluqueria_key} guardada (v{version})")
+        return version
+    
+    except Exception as e:
+        print(f"❌ Error guardando configuración de {peluqueria_key}: {e}")
+        return None
+
+
+def eliminar_configuracion(peluqueria_key):
+    """Baja lógica: queda versionada para que los procesos la quiten de su snapshot"""
+    try:
+        version = _siguiente_version_configuracion()
+        resultado = configuraciones_collection.update_one(
+            {"_id": peluqueria_key},
+            {"$set": {"eliminado": True, "version": version, "actualizado_en": datetime.utcnow()}}
+        )
+        return version if resultado.matched_count else None
+    
+    except Exception as e:
+        print(f"❌ Error eliminando configuración de {peluqueria_key}: {e}")
+        return None
+
+
+def obtener_version_configuracion():
+    """Versión global actual (0 si todavía no hay configuraciones)"""
+    contador = configuraciones_collection.find_one({"_id": ID_VERSION_CONFIGURACION}, {"valor": 1})
+    return contador["valor"] if contador else 0
+
+
+def obtener_configuraciones(desde_version=0):
+    """
+    Configuraciones que cambiaron después de desde_version (0 = todas)
+    
+    Returns:
+        iterator: Documentos {_id, config, version, eliminado} en orden de versión
+    """
+    return iterar(
+        configuraciones_collection,
+        {"version": {"$gt": desde_version}},
+        proyeccion={"config": 1, "version": 1, "eliminado": 1},
+        orden=[("version", 1)]
+    )
+
+
+def obtener_configuracion(peluqueria_key=None, numero_twilio=None):
+    """
+    Configuración de una peluquería por key o por número de Twilio
+    
+    Returns:
+        dict | None: Documento {_id, config, version} (None si no existe o está eliminada)
+    """
+    filtro = {"eliminado": {"$ne": True}}
+    if peluqueria_key:
+        filtro["_id"] = peluqueria_key
+    else:
+        filtro["config.numero_twilio"] = numero_twilio
+    
+    return configuraciones_collection.find_one(filtro, {"config": 1, "version": 1})
+
+# ==================== ÍNDICES ====================
+
+# Días que se guarda cada recordatorio enviado antes de que MongoDB lo borre
+RECORDATORIOS_TTL_DIAS = int(os.getenv("RECORDATORIOS_TTL_DIAS", "30"))
+
+# Registro declarativo de índices por colección
+# Los índices sin "name" usan el nombre por defecto de MongoDB para no duplicar
+# los que ya se habían creado con la versión anterior de crear_indices()
+INDICES = {
+    "turnos": [
+        # Turnos de un cliente (cancelación, "mis turnos")
+        {"keys": [("peluqueria", 1), ("telefono", 1), ("fecha_hora", -1)]},
+        # Turnos creados por el outbox de reservas (upsert idempotente)
+        {
+            "keys": [("reserva_id", 1)],
+            "name": "turnos_reserva_id",
+            "unique": True,
+            "partialFilterExpression": {"reserva_id": {"$exists": True}}
+        },
+        # Recordatorios: solo turnos confirmados, ordenados por fecha
+        {
+            "keys": [("peluqueria", 1), ("fecha_hora", 1)],
+            "name": "turnos_confirmados_por_fecha",
+            "partialFilterExpression": {"estado": "confirmado"}
+        },
+    ],
+    "clientes": [
+        {"keys": [("telefono", 1), ("peluqueria", 1)], "unique": True},
+        # verificar_suscripcion busca por peluqueria_key
+        {"keys": [("peluqueria_key", 1)], "name": "clientes_peluqueria_key"},
+    ],
+    "reservas_outbox": [
+        # Reservas que el relay tiene que aplicar
+        {"keys": [("estado", 1), ("proximo_intento", 1)], "name": "outbox_pendientes"},
+        # Un slot no se puede reservar dos veces mientras la reserva está en vuelo
+        {
+            "keys": [("peluqueria", 1), ("peluquero_nombre", 1), ("fecha_hora", 1)],
+            "name": "outbox_slot_unico",
+            "unique": True,
+            "partialFilterExpression": {"estado": "pendiente"}
+        },
+    ],
+    "estadisticas_diarias": [
+        {"keys": [("peluqueria", 1), ("dia", 1)], "name": "estadisticas_por_dia", "unique": True},
+    ],
+    "configuraciones": [
+        # Pull de cambios por versión
+        {"keys": [("version", 1)], "name": "configuraciones_version"},
+        # detectar_peluqueria para un tenant que todavía no se cargó
+        {"keys": [("config.numero_twilio", 1)], "name": "configuraciones_numero_twilio"},
+    ],
+    "recordatorios": [
+        # Deduplicación: un recordatorio por turno y tipo
+        {"keys": [("turno_id", 1), ("tipo", 1)], "name": "recordatorio_unico", "unique": True},
+        # Expiración automática de recordatorios viejos
+        {
+            "keys": [("enviado_en", 1)],
+            "name": "recordatorio_ttl",
+            "expireAfterSeconds": RECORDATORIOS_TTL_DIAS * 24 * 3600
+        },
+    ],
+}
+
+# Códigos de error de MongoDB
+_ERROR_CLAVE_DUPLICADA = 11000
+_ERRORES_INDICE_EN_CONFLICTO = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+_ERROR_INDICE_INEXISTENTE = 27  # IndexNotFound
+
+# Índices que reemplazó el registro INDICES (se borran en crear_indices)
+INDICES_OBSOLETOS = {
+    "turnos": [
+        # (peluqueria, fecha_hora, estado) de la versión anterior: lo reemplaza
+        # turnos_confirmados_por_fecha (parcial) y ninguna consulta lo usa ya.
+        # Cada turno nuevo seguía pagando la escritura en los dos índices
+        "peluqueria_1_fecha_hora_1_estado_1",
+    ],
+}
+
+
+def crear_indices():
+    """
+    Aplica el registro INDICES (idempotente, se puede ejecutar en cada arranque)
+    
+    Returns:
+        bool: True si todos los índices quedaron creados
+    """
+    if not MONGODB_DISPONIBLE:
+        return False
+    
+    ok = True
+    
+    for nombre_coleccion, indices in INDICES.items():
+        for indice in indices:
+            try:
+                _crear_indice(nombre_coleccion, indice)
+            except Exception as e:
+                ok = False
+                print(f"❌ Error creando índice {nombre_coleccion} {indice['keys']}: {e}")
+    
+    if ok:
+        _eliminar_indices_obsoletos()
+        print("✅ Índices creados correctamente")
+    
+    return ok
+
+
+def _eliminar_indices_obsoletos():
+    """
+    Borra los índices de INDICES_OBSOLETOS (solo después de crear sus reemplazos)
+    """
+    from pymongo.errors import OperationFailure
+    
+    for nombre_coleccion, nombres in INDICES_OBSOLETOS.items():
+        for nombre in nombres:
+            try:
+                get_db()[nombre_coleccion].drop_index(nombre)
+                print(f"🗑️ Índice obsoleto {nombre_coleccion}.{nombre} eliminado")
+            except OperationFailure as e:
+                if e.code != _ERROR_INDICE_INEXISTENTE:
+                    print(f"⚠️ No se pudo eliminar el índice {nombre_coleccion}.{nombre}: {e}")
+
+
+def _crear_indice(nombre_coleccion, indice):
+    """Crea un índice del registro resolviendo los casos conocidos de conflicto"""
+    from pymongo.errors import OperationFailure
+    
+    coleccion = get_db()[nombre_coleccion]
+    opciones = {k: v for k, v in indice.items() if k != "keys"}
+    
+    try:
+        coleccion.create_index(indice["keys"], **opciones)
+    
+    except OperationFailure as e:
+        if e.code == _ERROR_CLAVE_DUPLICADA and nombre_coleccion == "recordatorios":
+            # Datos de antes del índice único: limpiar duplicados y reintentar
+            eliminados = _eliminar_recordatorios_duplicados()
+            print(f"🧹 {eliminados} recordatorios duplicados eliminados")
+            coleccion.create_index(indice["keys"], **opciones)
+        
+        elif e.code in _ERRORES_INDICE_EN_CONFLICTO and "expireAfterSeconds" in opciones:
+            # Cambió la retención: actualizar el TTL sin recrear el índice
+            get_db().command(
+                "collMod",
+                nombre_coleccion,
+                index={
+                    "keyPattern": dict(indice["keys"]),
+                    "expireAfterSeconds": opciones["expireAfterSeconds"]
+                }
+            )
+        
+        else:
+            raise
+
+
+def _eliminar_recordatorios_duplicados():
+    """Deja un solo documento por (turno_id, tipo) en recordatorios"""
+    duplicados = recordatorios_collection.aggregate([
+        {"$group": {
+            "_id": {"turno_id": "$turno_id", "tipo": "$tipo"},
+            "ids": {"$push": "$_id"},
+            "cantidad": {"$sum": 1}
+        }},
+        {"$match": {"cantidad": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    
+    eliminados = 0
+    for grupo in duplicados:
+        resultado = recordatorios_collection.delete_many({"_id": {"$in": grupo["ids"][1:]}})
+        eliminados += resultado.deleted_count
+    
+    return eliminados
+
+
+def iniciar_indices_en_segundo_plano():
+    """
+    Aplica los índices en un thread aparte para no demorar el arranque
+    Se desactiva con CREATE_INDEXES=false
+    """
+    if not MONGODB_DISPONIBLE or os.getenv("CREATE_INDEXES", "true").lower() == "false":
+        return None
+    
+    hilo = threading.Thread(target=crear_indices, daemon=True, name="mongo-indices")
+    hilo.start()
+    return hilo
+
+
+def reporte_uso_indices():
+    """
+    Uso de cada índice según $indexStats (contadores desde el último reinicio de MongoDB)
+    
+    Returns:
+        list: [{"coleccion", "indice", "accesos", "desde"}] ordenado por accesos
+    """
+    if not MONGODB_DISPONIBLE:
+        return []
+    
+    reporte = []
+    
+    for nombre_coleccion in INDICES:
+        try:
+            for stats in get_db()[nombre_coleccion].aggregate([{"$indexStats": {}}]):
+                reporte.append({
+                    "coleccion": nombre_coleccion,
+                    "indice": stats["name"],
+                    "accesos": stats["accesses"]["ops"],
+                    "desde": stats["accesses"]["since"]
+                })
+        except Exception as e:
+            print(f"❌ Error obteniendo uso de índices de {nombre_coleccion}: {e}")
+    
+    reporte.sort(key=lambda r: r["accesos"])
+    return reporte
@@ -0,0 +1,403 @@
+"""
+Acceso a MongoDB con asyncio (Motor)
+Mismas funciones que app/core/database.py para usar desde un worker async:
+mientras una consulta espera la red, el event loop atiende otras conversaciones.
+
+Uso:
+    from app.core.database_async import obtener_turnos_por_telefono
+    turnos = await obtener_turnos_por_telefono("cliente_001", "5491112345678")
+"""
+
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.database import (
+    MONGO_URI,
+    MONGODB_DB,
+    MONGODB_DISPONIBLE,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_TIMEOUT_MS,
+    TurnoFila,
+    PROYECCION_TURNO,
+    PROYECCION_ESTADISTICAS,
+    incrementos_estadisticas,
+    documento_turno,
+    upsert_turno_reserva,
+    cambio_estado_turno,
+    filtro_turnos_cliente,
+    filtro_turnos_rango,
+    upsert_cliente,
+    BATCH_SIZE_DEFAULT,
+    _compresores,
+    _normalizar_turno_id,
+    MetricasComandos,
+    _ERROR_CLAVE_DUPLICADA
+)
+from app.core.metricas import PROMETHEUS_DISPONIBLE
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    MOTOR_DISPONIBLE = True
+except ImportError:
+    AsyncIOMotorClient = None
+    MOTOR_DISPONIBLE = False
+    print("⚠️ motor no instalado - acceso async a MongoDB deshabilitado")
+
+_client = None
+_client_pid = None
+_client_loop = None
+
+
+# ==================== CONEXIÓN ====================
+
+def get_client():
+    """
+    Obtiene el cliente Motor del proceso y event loop actuales
+
+    Motor queda atado al loop en el que se usa por primera vez, así que si
+    cambia el loop (o el proceso se forkeó) se crea un cliente nuevo.
+
+    Returns:
+        AsyncIOMotorClient: Cliente async con pool propio
+
+    Raises:
+        RuntimeError: Si falta MONGODB_URI o motor no está instalado
+    """
+    global _client, _client_pid, _client_loop
+
+    if not MONGODB_DISPONIBLE:
+        raise RuntimeError("MONGODB_URI no configurada")
+    if not MOTOR_DISPONIBLE:
+        raise RuntimeError("motor no instalado")
+
+    pid = os.getpid()
+    loop = asyncio.get_running_loop()
+
+    if _client is None or _client_pid != pid or _client_loop is not loop:
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS,
+            connectTimeoutMS=MONGODB_TIMEOUT_MS,
+            retryWrites=True,
+            compressors=_compresores(),
+            appname="bot-peluqueria-async",
+            event_listeners=[MetricasComandos()] if PROMETHEUS_DISPONIBLE else []
+        )
+        _client_pid = pid
+        _client_loop = loop
+        print(f"✅ Cliente Motor creado (pid {pid})")
+
+    return _client
+
+
+def get_db():
+    """Obtiene la base de datos del bot"""
+    return get_client()[MONGODB_DB]
+
+
+def _coleccion(nombre):
+    return get_db()[nombre]
+
+
+def cerrar_conexion():
+    """Cierra el cliente async (al apagar el worker)"""
+    global _client, _client_pid, _client_loop
+
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client = None
+    _client_pid = None
+    _client_loop = None
+
+
+async def get_mongo_health():
+    """
+    Verifica la conexión con MongoDB
+
+    Returns:
+        str: "ok", "error" o "not_configured"
+    """
+    if not MONGODB_DISPONIBLE or not MOTOR_DISPONIBLE:
+        return "not_configured"
+
+    try:
+        await get_client().admin.command("ping")
+        return "ok"
+    except Exception as e:
+        print(f"❌ MongoDB no responde: {e}")
+        return "error"
+
+
+async def iterar_turnos(filtro, orden=None, batch_size=BATCH_SIZE_DEFAULT, limite=0):
+    """
+    Itera turnos como TurnoFila de a lotes (async generator)
+
+    Uso:
+        async for turno in iterar_turnos({...}):
+            ...
+    """
+    cursor = _coleccion("turnos").find(filtro, PROYECCION_TURNO, batch_size=batch_size, limit=limite)
+    if orden:
+        cursor = cursor.sort(orden)
+
+    async for documento in cursor:
+        yield TurnoFila(documento)
+
+
+# ==================== FUNCIONES PARA TURNOS ====================
+
+async def guardar_turno(peluqueria_key, telefono, cliente_nombre, servicio, fecha_hora, peluquero=None, precio=0, duracion=30, google_event_id=None, reserva_id=None):
+    """
+    Guarda un turno en MongoDB
+    Con reserva_id es idempotente: si el turno de esa reserva ya existe no se duplica
+    """
+    try:
+        turno = documento_turno(
+            peluqueria_key, telefono, cliente_nombre, servicio, fecha_hora,
+            peluquero, precio, duracion, google_event_id, reserva_id
+        )
+
+        if reserva_id:
+            filtro, update = upsert_turno_reserva(turno)
+            resultado = await _coleccion("turnos").update_one(filtro, update, upsert=True)
+            if resultado.upserted_id is None:
+                existente = await _coleccion("turnos").find_one(filtro, {"_id": 1})
+                return str(existente["_id"])
+            turno_id = resultado.upserted_id
+        else:
+            turno_id = (await _coleccion("turnos").insert_one(turno)).inserted_id
+
+        print(f"✅ Turno guardado en MongoDB: {turno_id}")
+
+        await actualizar_estadisticas(turno, None, "confirmado")
+        return str(turno_id)
+
+    except Exception as e:
+        print(f"❌ Error guardando turno: {e}")
+        return None
+
+
+async def obtener_turnos_por_telefono(peluqueria_key, telefono):
+    """Obtiene todos los turnos futuros de un cliente"""
+    try:
+        ahora = datetime.utcnow()
+
+        return [
+            turno async for turno in iterar_turnos(
+                filtro_turnos_cliente(peluqueria_key, telefono, ahora),
+                orden=[("fecha_hora", 1)],
+                batch_size=20
+            )
+        ]
+
+    except Exception as e:
+        print(f"❌ Error obteniendo turnos: {e}")
+        return []
+
+
+async def cancelar_turno_db(turno_id, peluqueria_key=None):
+    """Marca un turno como cancelado (por _id o ID del evento de Calendar)"""
+    return await _cambiar_estado_turno(turno_id, "cancelado", peluqueria_key, {"cancelado_en": datetime.utcnow()})
+
+
+async def completar_turno_db(turno_id, peluqueria_key=None):
+    """Marca un turno confirmado como completado"""
+    return await _cambiar_estado_turno(turno_id, "completado", peluqueria_key, {"completado_en": datetime.utcnow()})
+
+
+async def _cambiar_estado_turno(turno_id, estado_nuevo, peluqueria_key=None, campos=None):
+    """Cambia el estado de un turno y actualiza las estadísticas con la transición"""
+    try:
+        from pymongo import ReturnDocument
+
+        filtro, update = cambio_estado_turno(turno_id, estado_nuevo, peluqueria_key, campos)
+
+        anterior = await _coleccion("turnos").find_one_and_update(
+            filtro,
+            update,
+            projection=PROYECCION_ESTADISTICAS,
+            return_document=ReturnDocument.BEFORE
+        )
+
+        if not anterior:
+            return False
+
+        await actualizar_estadisticas(anterior, anterior.get("estado"), estado_nuevo)
+        return True
+
+    except Exception as e:
+        print(f"❌ Error cambiando turno a {estado_nuevo}: {e}")
+        return False
+
+
+async def actualizar_estadisticas(turno, estado_anterior, estado_nuevo):
+    """Aplica la transición de estado de un turno a los contadores del día"""
+    try:
+        filtro, update = incrementos_estadisticas(turno, estado_anterior, estado_nuevo)
+        await _coleccion("estadisticas_diarias").update_one(filtro, update, upsert=True)
+        return True
+
+    except Exception as e:
+        print(f"❌ Error actualizando estadísticas: {e}")
+        return False
+
+
+async def obtener_turnos_proximos_db(peluqueria_key, horas_anticipacion=24):
+    """Obtiene turnos próximos para enviar recordatorios"""
+    ahora = datetime.utcnow()
+    turnos = await obtener_turnos_rango_db(
+        peluqueria_key,
+        ahora + timedelta(hours=horas_anticipacion - 1),
+        ahora + timedelta(hours=horas_anticipacion + 1)
+    )
+    return turnos or []
+
+
+async def obtener_turnos_rango_db(peluqueria_key, desde, hasta):
+    """
+    Obtiene los turnos confirmados de un rango con una sola consulta
+
+    Returns:
+        list | None: TurnoFila del rango o None si la consulta falló
+    """
+    try:
+        return [
+            turno async for turno in iterar_turnos(
+                filtro_turnos_rango(peluqueria_key, desde, hasta),
+                orden=[("fecha_hora", 1)]
+            )
+        ]
+
+    except Exception as e:
+        print(f"❌ Error obteniendo turnos del rango: {e}")
+        return None
+
+
+# ==================== FUNCIONES PARA CLIENTES ====================
+
+async def guardar_cliente(telefono, nombre, peluqueria_key, preferencias=None, peluquero=None, servicios=None):
+    """Guarda o actualiza info del cliente (ver database.guardar_cliente)"""
+    try:
+        filtro, update = upsert_cliente(telefono, nombre, peluqueria_key, preferencias, peluquero, servicios)
+        await _coleccion("clientes").update_one(filtro, update, upsert=True)
+
+        print(f"✅ Cliente guardado: {nombre}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error guardando cliente: {e}")
+        return False
+
+
+async def obtener_cliente(telefono, peluqueria_key):
+    """Obtiene info del cliente"""
+    try:
+        return await _coleccion("clientes").find_one({
+            "telefono": telefono,
+            "peluqueria": peluqueria_key
+        })
+
+    except Exception as e:
+        print(f"❌ Error obteniendo cliente: {e}")
+        return None
+
+
+async def obtener_suscripcion(peluqueria_key, proyeccion=None):
+    """Documento de suscripción de la peluquería (el que lee verificar_suscripcion)"""
+    try:
+        return await _coleccion("clientes").find_one({"peluqueria_key": peluqueria_key}, proyeccion)
+
+    except Exception as e:
+        print(f"❌ Error obteniendo suscripción de {peluqueria_key}: {e}")
+        return None
+
+
+# ==================== FUNCIONES PARA RECORDATORIOS ====================
+
+async def marcar_recordatorio_enviado(turno_id, tipo="24h"):
+    """Marca un recordatorio como enviado"""
+    try:
+        await _coleccion("recordatorios").insert_one({
+            "turno_id": _normalizar_turno_id(turno_id),
+            "tipo": tipo,
+            "enviado_en": datetime.utcnow()
+        })
+        return True
+
+    except DuplicateKeyError:
+        return True
+
+    except Exception as e:
+        print(f"❌ Error marcando recordatorio: {e}")
+        return False
+
+
+async def recordatorio_ya_enviado(turno_id, tipo="24h"):
+    """Verifica si ya se envió un recordatorio"""
+    try:
+        existe = await _coleccion("recordatorios").find_one(
+            {"turno_id": _normalizar_turno_id(turno_id), "tipo": tipo},
+            {"_id": 1}
+        )
+        return existe is not None
+
+    except Exception as e:
+        print(f"❌ Error verificando recordatorio: {e}")
+        return False
+
+
+async def recordatorios_enviados_batch(turno_ids, tipo="24h"):
+    """
+    Verifica en una sola consulta qué recordatorios ya se enviaron
+
+    Returns:
+        set: IDs (como string) de los turnos que ya tienen recordatorio
+    """
+    if not turno_ids:
+        return set()
+
+    try:
+        ids = [_normalizar_turno_id(turno_id) for turno_id in turno_ids]
+        cursor = _coleccion("recordatorios").find(
+            {"turno_id": {"$in": ids}, "tipo": tipo},
+            {"turno_id": 1, "_id": 0}
+        )
+        return {str(r["turno_id"]) async for r in cursor}
+
+    except Exception as e:
+        print(f"❌ Error verificando recordatorios en lote: {e}")
+        return set()
+
+
+async def marcar_recordatorios_enviados_batch(turno_ids, tipo="24h"):
+    """Marca varios recordatorios como enviados con un solo insert_many"""
+    if not turno_ids:
+        return True
+
+    try:
+        ahora = datetime.utcnow()
+        await _coleccion("recordatorios").insert_many(
+            [
+                {"turno_id": _normalizar_turno_id(turno_id), "tipo": tipo, "enviado_en": ahora}
+                for turno_id in turno_ids
+            ],
+            ordered=False
+        )
+        return True
+
+    except BulkWriteError as e:
+        errores = e.details.get("writeErrors", [])
+        if all(err.get("code") == _ERROR_CLAVE_DUPLICADA for err in errores):
+            return True
+        print(f"❌ Error marcando recordatorios en lote: {e}")
+        return False
+
+    except Exception as e:
+        print(f"❌ Error marcando recordatorios en lote: {e}")
+        return False
@@ -0,0 +1,304 @@
+"""
+Métricas Prometheus
+Latencia del webhook, de cada paso de la conversación y de cada llamada externa
+(Google Calendar, Twilio, MongoDB, Redis, MercadoPago, LemonSqueezy), etiquetadas
+por peluquería y resultado. Se exponen en /metrics (app/api/routes/metricas.py).
+
+La peluquería de cada llamada sale del contexto del request: el webhook la fija con
+establecer_peluqueria() y todo lo que se llame desde ahí queda etiquetado. Lo que
+corre en otros threads (cola de WhatsApp, recordatorios) la pasa explícita.
+
+Uso:
+    from app.core.metricas import medir, instrumentar
+
+    with medir("mercadopago", "crear_preferencia") as medicion:
+        response = requests.post(url, json=payload)
+        medicion.http(response.status_code)
+
+    @instrumentar("twilio", "messages.fetch")
+    def obtener_mensaje(sid):
+        ...
+
+Si prometheus_client no está instalado (o METRICAS=false) todo funciona igual
+pero no se registra nada.
+"""
+
+import os
+import time
+from functools import wraps
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+METRICAS_HABILITADAS = os.getenv("METRICAS", "true").lower() != "false"
+
+try:
+    from prometheus_client import (
+        Counter, Histogram, CollectorRegistry, REGISTRY,
+        generate_latest, multiprocess, CONTENT_TYPE_LATEST
+    )
+    PROMETHEUS_DISPONIBLE = METRICAS_HABILITADAS
+except ImportError:
+    PROMETHEUS_DISPONIBLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    if METRICAS_HABILITADAS:
+        print("⚠️ prometheus_client no instalado - métricas deshabilitadas")
+
+# Etiqueta de las llamadas que no pertenecen a una peluquería (ej: onboarding, healthchecks)
+SIN_PELUQUERIA = "ninguna"
+
+# Buckets en segundos
+BUCKETS_WEBHOOK = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_LLAMADAS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_peluqueria = ContextVar("peluqueria_metricas", default=None)
+
+
+class _MetricaNula:
+    """Reemplazo de las métricas cuando no hay prometheus_client"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, valor):
+        pass
+
+    def inc(self, valor=1):
+        pass
+
+
+if PROMETHEUS_DISPONIBLE:
+    WEBHOOK_SEGUNDOS = Histogram(
+        "bot_webhook_segundos", "Latencia de los webhooks",
+        ["webhook", "peluqueria", "resultado"], buckets=BUCKETS_WEBHOOK
+    )
+    PASO_SEGUNDOS = Histogram(
+        "bot_paso_segundos", "Latencia del handler de cada paso de la conversación",
+        ["paso", "peluqueria", "resultado"], buckets=BUCKETS_WEBHOOK
+    )
+    LLAMADAS = Counter(
+        "bot_llamadas_externas", "Llamadas a servicios externos",
+        ["servicio", "operacion", "peluqueria", "resultado"]
+    )
+    LLAMADAS_SEGUNDOS = Histogram(
+        "bot_llamada_externa_segundos", "Latencia de las llamadas a servicios externos",
+        ["servicio", "operacion", "peluqueria", "resultado"], buckets=BUCKETS_LLAMADAS
+    )
+else:
+    WEBHOOK_SEGUNDOS = PASO_SEGUNDOS = LLAMADAS = LLAMADAS_SEGUNDOS = _MetricaNula()
+
+
+# ==================== PELUQUERÍA DEL CONTEXTO ====================
+
+def establecer_peluqueria(peluqueria_key):
+    """Etiqueta con esta peluquería las métricas del request actual"""
+    _peluqueria.set(peluqueria_key)
+
+
+def peluqueria_actual():
+    """Peluquería del request actual (None fuera de un webhook)"""
+    return _peluqueria.get()
+
+
+@contextmanager
+def contexto_peluqueria(peluqueria_key):
+    """Etiqueta con esta peluquería lo que se ejecute dentro del bloque"""
+    token = _peluqueria.set(peluqueria_key)
+    try:
+        yield
+    finally:
+        _peluqueria.reset(token)
+
+
+def _etiqueta(peluqueria_key):
+    return peluqueria_key or _peluqueria.get() or SIN_PELUQUERIA
+
+
+# ==================== LLAMADAS EXTERNAS ====================
+
+def resultado_http(estado):
+    """ "ok" para 1xx-3xx, "http_<estado>" para los errores"""
+    return "ok" if estado < 400 else f"http_{estado}"
+
+
+def resultado_excepcion(error):
+    """
+    Resultado de una llamada que lanzó una excepción
+
+    Usa el código HTTP si la excepción lo trae (HttpError de Google, TwilioRestException)
+    """
+    estado = getattr(getattr(error, "resp", None), "status", None) or getattr(error, "status", None)
+    if isinstance(estado, int) or (isinstance(estado, str) and estado.isdigit()):
+        return resultado_http(int(estado))
+    return "error"
+
+
+def observar_llamada(servicio, operacion, duracion, resultado="ok", peluqueria_key=None):
+    """
+    Registra una llamada externa ya medida
+
+    Args:
+        servicio: "calendar", "twilio", "mongo", "redis", "mercadopago", "lemonsqueezy"
+        operacion: Método o comando (ej: "events.list", "find", "get")
+        duracion: Segundos
+        resultado: "ok", "error" o "http_<estado>"
+        peluqueria_key: Peluquería (None = la del contexto)
+    """
+    etiquetas = (servicio, operacion, _etiqueta(peluqueria_key), resultado)
+    LLAMADAS.labels(*etiquetas).inc()
+    LLAMADAS_SEGUNDOS.labels(*etiquetas).observe(duracion)
+
+
+class Medicion:
+    """Resultado de una llamada dentro de medir() (se puede cambiar antes de salir)"""
+
+    __slots__ = ("resultado",)
+
+    def __init__(self):
+        self.resultado = "ok"
+
+    def http(self, estado):
+        self.resultado = resultado_http(estado)
+
+
+@contextmanager
+def medir(servicio, operacion, peluqueria_key=None):
+    """
+    Mide una llamada externa; si el bloque lanza una excepción se registra como error
+
+    Args:
+        servicio: Servicio externo
+        operacion: Método o comando
+        peluqueria_key: Peluquería (None = la del contexto)
+
+    Yields:
+        Medicion: para marcar el resultado (ej: medicion.http(response.status_code))
+    """
+    medicion = Medicion()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    except Exception as e:
+        medicion.resultado = resultado_excepcion(e)
+        raise
+    finally:
+        observar_llamada(servicio, operacion, time.perf_counter() - inicio,
+                         medicion.resultado, peluqueria_key)
+
+
+def instrumentar(servicio, operacion=None):
+    """
+    Decorador de medir() (la operación por defecto es el nombre de la función)
+    """
+    def decorador(funcion):
+        nombre = operacion or funcion.__name__
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(servicio, nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def instrumentar_redis(cliente):
+    """
+    Mide cada comando de un cliente Redis (y cada pipeline como una sola llamada)
+
+    Args:
+        cliente: redis.Redis ya creado
+
+    Returns:
+        El mismo cliente
+    """
+    if not PROMETHEUS_DISPONIBLE or cliente is None:
+        return cliente
+
+    ejecutar = cliente.execute_command
+    crear_pipeline = cliente.pipeline
+
+    def execute_command(*args, **opciones):
+        with medir("redis", str(args[0]).lower()):
+            return ejecutar(*args, **opciones)
+
+    def pipeline(*args, **kwargs):
+        pipe = crear_pipeline(*args, **kwargs)
+        ejecutar_pipe = pipe.execute
+
+        def execute(*a, **kw):
+            with medir("redis", "pipeline"):
+                return ejecutar_pipe(*a, **kw)
+
+        pipe.execute = execute
+        return pipe
+
+    cliente.execute_command = execute_command
+    cliente.pipeline = pipeline
+    return cliente
+
+
+# ==================== WEBHOOKS Y PASOS ====================
+
+def _estado_respuesta(respuesta):
+    """Código HTTP de lo que devolvió una vista de Flask"""
+    if isinstance(respuesta, tuple) and len(respuesta) > 1 and isinstance(respuesta[1], int):
+        return respuesta[1]
+    return getattr(respuesta, "status_code", 200)
+
+
+def instrumentar_webhook(nombre):
+    """
+    Decorador para las vistas de webhooks: mide la latencia total y el código HTTP
+
+    La vista puede fijar la peluquería con establecer_peluqueria() cuando la conoce.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            # Los threads de gunicorn se reutilizan: no heredar la peluquería del request anterior
+            token = _peluqueria.set(None)
+            inicio = time.perf_counter()
+            estado = 500
+            try:
+                respuesta = vista(*args, **kwargs)
+                estado = _estado_respuesta(respuesta)
+                return respuesta
+            finally:
+                WEBHOOK_SEGUNDOS.labels(nombre, _etiqueta(None), resultado_http(estado)).observe(
+                    time.perf_counter() - inicio
+                )
+                _peluqueria.reset(token)
+        return envoltura
+    return decorador
+
+
+def observar_paso(paso, peluqueria_key, duracion, error=False):
+    """Registra la ejecución del handler de un paso (lo llama RegistroPasos)"""
+    PASO_SEGUNDOS.labels(paso, _etiqueta(peluqueria_key), "error" if error else "ok").observe(duracion)
+
+
+# ==================== EXPORTACIÓN ====================
+
+def exportar():
+    """
+    Texto de todas las métricas en el formato de Prometheus
+
+    Con varios workers de gunicorn (PROMETHEUS_MULTIPROC_DIR) junta las de todos los procesos.
+
+    Returns:
+        bytes
+    """
+    if not PROMETHEUS_DISPONIBLE:
+        return b""
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro)
+
+    return generate_latest(REGISTRY)
+
+
+def marcar_proceso_terminado(pid):
+    """Descarta los archivos de métricas de un worker que terminó (modo multiproceso)"""
+    if PROMETHEUS_DISPONIBLE and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
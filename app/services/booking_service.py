@@ -0,0 +1,347 @@
+"""
+Servicio de Reservas
+Outbox de reservas: la intención se guarda una vez en MongoDB, el cliente recibe
+la confirmación en el momento y un relay en background aplica los pasos externos
+(Google Calendar, turno en MongoDB, cliente, aviso al peluquero) con reintentos.
+
+Cada paso es idempotente:
+- Calendar: el evento se crea con ID propio (derivado de la reserva); un 409 significa que ya existe
+- Turno: upsert por reserva_id
+- Cliente: upsert por teléfono + peluquería
+- Aviso al peluquero: se registra como hecho apenas se encola
+"""
+
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+from app.services.calendar_service import CalendarService
+from app.core.cache_invalidation import CacheTTL
+
+try:
+    from app.core.database import (
+        guardar_turno,
+        guardar_cliente,
+        registrar_reserva_outbox,
+        tomar_reserva_outbox,
+        marcar_paso_reserva,
+        reprogramar_reserva_outbox,
+        finalizar_reserva_outbox,
+        obtener_perfiles_cliente,
+        MONGODB_DISPONIBLE
+    )
+except ImportError:
+    MONGODB_DISPONIBLE = False
+    def guardar_turno(*args, **kwargs): return None
+    def guardar_cliente(*args, **kwargs): return None
+    def obtener_perfiles_cliente(*args, **kwargs): return None
+
+# Reintentos del relay
+OUTBOX_MAX_INTENTOS = int(os.getenv("OUTBOX_MAX_INTENTOS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "10"))  # segundos
+OUTBOX_BACKOFF_MAX = 30 * 60
+
+# Cada cuánto revisa el relay si hay reservas para reintentar
+OUTBOX_INTERVALO = 15
+
+# Orden en que se aplican los pasos
+PASOS = ("calendar", "turno", "cliente", "notificacion")
+
+# Prefijo del ID de evento de las reservas: con el _id pelado (24 hex) el ID
+# parecería un ObjectId y cancelar_turno_db buscaría el turno por _id
+PREFIJO_EVENTO_RESERVA = "res"
+
+# Perfiles de clientes por teléfono ({peluqueria_key: perfil}); se invalidan
+# al guardar el cliente y por los cambios en la colección clientes
+CACHE_PERFIL_TTL = int(os.getenv("CACHE_PERFIL_TTL", "86400"))  # segundos
+perfiles_cache = CacheTTL("perfiles_cliente", ttl=CACHE_PERFIL_TTL, coleccion="clientes", campo_clave="telefono")
+
+
+def id_evento_reserva(reserva_id):
+    """
+    ID del evento de Calendar de una reserva
+    Base32hex (0-9, a-v) como exige Calendar y nunca un ObjectId válido
+    """
+    return f"{PREFIJO_EVENTO_RESERVA}{reserva_id}"
+
+
+class ErrorPasoReserva(Exception):
+    """Un paso de la reserva no se pudo aplicar (se reintenta)"""
+
+
+class BookingService:
+    """Crea reservas y aplica sus efectos externos a través del outbox"""
+
+    def __init__(self, peluquerias_config):
+        """
+        Args:
+            peluquerias_config: Diccionario con configuración de clientes
+        """
+        self.peluquerias = peluquerias_config
+        self.calendar_service = CalendarService(peluquerias_config)
+        self.despertar = threading.Event()
+        self.hilo_relay = None
+
+    def crear_reserva(self, peluqueria_key, fecha_hora, cliente, servicios, duracion, telefono, peluquero):
+        """
+        Registra una reserva (la disponibilidad ya se verificó)
+
+        Con MongoDB la reserva queda en el outbox y se aplica en background.
+        Sin MongoDB se aplican los pasos en el momento (comportamiento anterior).
+
+        Args:
+            peluqueria_key: Identificador del cliente
+            fecha_hora: Datetime (con timezone) del turno
+            cliente: Nombre del cliente
+            servicios: Lista de servicios seleccionados
+            duracion: Duración total en minutos
+            telefono: Teléfono del cliente (sin whatsapp:)
+            peluquero: Diccionario del peluquero o None
+
+        Returns:
+            bool | str: True si quedó registrada, "ocupado" si el slot ya
+                        tiene otra reserva en vuelo, False si falló
+        """
+        reserva = {
+            "peluqueria": peluqueria_key,
+            "telefono": telefono,
+            "cliente": cliente,
+            "servicio": " + ".join(s["nombre"] for s in servicios),
+            "servicios_nombres": [s["nombre"] for s in servicios],
+            "precio": sum(s["precio"] for s in servicios),
+            "duracion": duracion,
+            "fecha_hora": fecha_hora,
+            "fecha_hora_iso": fecha_hora.isoformat(),
+            "peluquero": peluquero,
+            "peluquero_nombre": peluquero.get("nombre") if peluquero else None
+        }
+
+        if not MONGODB_DISPONIBLE:
+            try:
+                self._aplicar_pasos(reserva, persistir=False)
+                return True
+            except ErrorPasoReserva as e:
+                print(f"❌ Error al crear reserva: {e}")
+                return False
+
+        reserva_id = registrar_reserva_outbox(reserva)
+
+        if reserva_id == "ocupado" or reserva_id is None:
+            return reserva_id or False
+
+        print(f"📥 Reserva {reserva_id} registrada en outbox")
+        self.iniciar_relay()
+        self.despertar.set()
+        return True
+
+    # ==================== RELAY ====================
+
+    def iniciar_relay(self):
+        """Inicia el thread del relay (una vez por proceso)"""
+        if not MONGODB_DISPONIBLE:
+            return None
+
+        if self.hilo_relay and self.hilo_relay.is_alive():
+            return self.hilo_relay
+
+        self.hilo_relay = threading.Thread(
+            target=self.relay_loop,
+            daemon=True,
+            name="OutboxReservasThread"
+        )
+        self.hilo_relay.start()
+        print("✅ Relay de reservas activado en background")
+        return self.hilo_relay
+
+    def relay_loop(self):
+        """Procesa reservas pendientes hasta vaciar el outbox y después espera"""
+        while True:
+            try:
+                while self.procesar_siguiente():
+                    pass
+            except Exception as e:
+                print(f"❌ Error en relay de reservas: {e}")
+
+            self.despertar.wait(OUTBOX_INTERVALO)
+            self.despertar.clear()
+
+    def procesar_siguiente(self):
+        """
+        Toma y aplica una reserva del outbox
+
+        Returns:
+            bool: True si procesó una (puede haber más), False si no había
+        """
+        reserva = tomar_reserva_outbox()
+        if not reserva:
+            return False
+
+        reserva_id = str(reserva["_id"])
+
+        try:
+            self._aplicar_pasos(reserva, persistir=True)
+            finalizar_reserva_outbox(reserva_id)
+            print(f"✅ Reserva {reserva_id} aplicada")
+
+        except Exception as e:
+            intentos = reserva.get("intentos", 0) + 1
+
+            if intentos >= OUTBOX_MAX_INTENTOS:
+                print(f"❌ Reserva {reserva_id} fallida tras {intentos} intentos: {e}")
+                reprogramar_reserva_outbox(reserva_id, e)
+                self._avisar_reserva_fallida(reserva)
+            else:
+                espera = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** (intentos - 1)))
+                espera *= random.uniform(0.8, 1.2)
+                print(f"⚠️ Reserva {reserva_id} intento {intentos} falló ({e}), reintento en {espera:.0f}s")
+                reprogramar_reserva_outbox(reserva_id, e, datetime.utcnow() + timedelta(seconds=espera))
+
+        return True
+
+    # ==================== PASOS ====================
+
+    def _aplicar_pasos(self, reserva, persistir):
+        """
+        Aplica los pasos que falten, en orden, registrando cada uno al terminar
+
+        Raises:
+            ErrorPasoReserva: Si un paso falla (los anteriores quedan registrados)
+        """
+        pasos = reserva.setdefault("pasos", {})
+        fecha_hora = datetime.fromisoformat(reserva["fecha_hora_iso"])
+
+        for paso in PASOS:
+            if pasos.get(paso):
+                continue
+
+            resultado = getattr(self, f"_paso_{paso}")(reserva, fecha_hora)
+            pasos[paso] = resultado
+
+            if persistir:
+                marcar_paso_reserva(reserva["_id"], paso, resultado)
+
+    def _paso_calendar(self, reserva, fecha_hora):
+        """Crea el evento con un ID derivado de la reserva (reintentar no lo duplica)"""
+        evento = self.calendar_service.crear_evento_calendario(
+            reserva["peluqueria"],
+            reserva["peluquero"],
+            reserva["cliente"],
+            reserva["telefono"],
+            fecha_hora,
+            reserva["duracion"],
+            evento_id=id_evento_reserva(reserva["_id"]) if "_id" in reserva else None
+        )
+        if not evento:
+            raise ErrorPasoReserva("no se pudo crear el evento en Google Calendar")
+        return evento["id"]
+
+    def _paso_turno(self, reserva, fecha_hora):
+        if not MONGODB_DISPONIBLE:
+            return "omitido"
+
+        turno_id = guardar_turno(
+            reserva["peluqueria"],
+            reserva["telefono"],
+            reserva["cliente"],
+            reserva["servicio"],
+            fecha_hora,
+            peluquero=reserva["peluquero"],
+            precio=reserva["precio"],
+            duracion=reserva["duracion"],
+            google_event_id=reserva["pasos"]["calendar"],
+            reserva_id=str(reserva["_id"])
+        )
+        if not turno_id:
+            raise ErrorPasoReserva("no se pudo guardar el turno")
+        return turno_id
+
+    def _paso_cliente(self, reserva, fecha_hora):
+        if not MONGODB_DISPONIBLE:
+            return "omitido"
+
+        guardado = guardar_cliente(
+            reserva["telefono"],
+            reserva["cliente"],
+            reserva["peluqueria"],
+            peluquero=reserva.get("peluquero_nombre"),
+            servicios=reserva.get("servicios_nombres")
+        )
+        perfiles_cache.invalidar(reserva["telefono"])
+
+        if not guardado:
+            raise ErrorPasoReserva("no se pudo guardar el cliente")
+        return True
+
+    def _paso_notificacion(self, reserva, fecha_hora):
+        """Avisa al peluquero (se encola en whatsapp_service)"""
+        peluquero = reserva.get("peluquero")
+        if not peluquero or not peluquero.get("telefono"):
+            return "sin_telefono"
+
+        from app.services.notification_service import notification_service
+
+        notification_service.notificar_peluquero(
+            peluquero,
+            reserva["cliente"],
+            reserva["servicio"],
+            fecha_hora,
+            self.peluquerias[reserva["peluqueria"]],
+            reserva["telefono"]
+        )
+        return True
+
+    def _avisar_reserva_fallida(self, reserva):
+        """Avisa al cliente que la reserva no se pudo completar"""
+        if reserva.get("pasos", {}).get("calendar"):
+            # El turno ya está en la agenda del local; lo demás se puede arreglar a mano
+            return
+
+        from app.services.whatsapp_service import whatsapp_service, PRIORIDAD_NOTIFICACION
+
+        fecha_hora = datetime.fromisoformat(reserva["fecha_hora_iso"])
+        whatsapp_service.enviar_mensaje(
+            "❌ *No pudimos registrar tu turno*\n\n"
+            f"📅 {fecha_hora.strftime('%d/%m/%Y')} a las {fecha_hora.strftime('%H:%M')}\n\n"
+            "Por favor contactá directamente al negocio o "
+            "escribí *menu* para intentar de nuevo.",
+            f"whatsapp:{reserva['telefono']}",
+            prioridad=PRIORIDAD_NOTIFICACION
+        )
+
+
+def obtener_perfil_cliente(telefono, peluqueria_key):
+    """
+    Perfil de un cliente que ya reservó (nombre, último peluquero y servicios)
+
+    Args:
+        telefono: Teléfono del cliente (sin whatsapp:)
+        peluqueria_key: Identificador de la peluquería
+
+    Returns:
+        dict | None: Perfil o None si es un cliente nuevo (o sin MongoDB)
+    """
+    if not MONGODB_DISPONIBLE:
+        return None
+
+    perfiles = perfiles_cache.get(telefono)
+    if perfiles is None:
+        perfiles = obtener_perfiles_cliente(telefono)
+        if perfiles is None:
+            # Error de MongoDB: no se cachea, el flujo sigue como cliente nuevo
+            return None
+        perfiles_cache.set(telefono, perfiles)
+
+    return perfiles.get(peluqueria_key)
+
+
+# Instancia global (se crea con inicializar_booking_service)
+booking_service = None
+
+
+def inicializar_booking_service(peluquerias_config):
+    """Inicializa el servicio de reservas global y arranca el relay"""
+    global booking_service
+    booking_service = BookingService(peluquerias_config)
+    booking_service.iniciar_relay()
+    return booking_service
@@ -0,0 +1,542 @@
+"""
+Backend de Google Calendar en memoria
+Implementa el subconjunto de la API que usa el bot, con la misma forma que
+googleapiclient (service.events().list(...).execute()):
+
+- events(): list (timeMin/timeMax, q, paginado, syncToken), get, insert, delete, watch
+- freebusy(): query
+- channels(): stop
+- new_batch_http_request(): lotes con callback por request
+
+Cada llamada pasa por una LatenciaSimulada (demora y errores HTTP configurables)
+para medir cache, prefetch y concurrencia sin cuentas de Google.
+
+Uso:
+    from app.services.calendar_service import configurar_proveedor
+    from app.services.calendar_falso import ProveedorCalendarFalso, LatenciaSimulada
+
+    proveedor = ProveedorCalendarFalso(LatenciaSimulada(mediana_ms=120, tasa_error=0.01, semilla=1))
+    configurar_proveedor(proveedor)
+
+o sin tocar código: CALENDAR_PROVEEDOR=falso (ver ProveedorCalendarFalso.desde_entorno).
+"""
+
+import os
+import copy
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime, date, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from app.core.metricas import medir
+
+# Máximo de requests por lote que acepta la API real
+MAXIMO_LOTE = 1000
+
+# Resultados por página cuando no se pasa maxResults
+RESULTADOS_POR_PAGINA = 250
+
+_ALFABETO_ID = "0123456789abcdefghijklmnopqrstuv"  # base32hex, como exige Calendar
+
+
+def _error_http(estado, mensaje):
+    """HttpError igual al que lanza googleapiclient (los handlers miran e.resp.status)"""
+    resp = httplib2.Response({"status": estado})
+    resp.reason = mensaje
+    return HttpError(resp, f'{{"error": {{"code": {estado}, "message": "{mensaje}"}}}}'.encode())
+
+
+class LatenciaSimulada:
+    """
+    Demora y errores de cada request
+
+    La demora sigue una log-normal alrededor de la mediana (dispersion=0 la hace fija).
+    Con dormir=False no se espera: la demora se suma en `acumulada` y los benchmarks
+    miden cuánto tiempo de Calendar se habría gastado, de forma determinística.
+    """
+
+    def __init__(self, mediana_ms=0.0, dispersion=0.0, tasa_error=0.0,
+                 estados_error=(429, 503), semilla=None, dormir=True):
+        """
+        Args:
+            mediana_ms: Demora mediana por request
+            dispersion: Sigma de la log-normal (0.5 ≈ p99 de 3x la mediana)
+            tasa_error: Probabilidad de que un request falle (0-1)
+            estados_error: Códigos HTTP de los errores simulados
+            semilla: Semilla del generador (None = aleatorio)
+            dormir: Si False, no duerme y solo acumula la demora
+        """
+        self.mediana_ms = mediana_ms
+        self.dispersion = dispersion
+        self.tasa_error = tasa_error
+        self.estados_error = tuple(estados_error)
+        self.dormir = dormir
+        self.random = random.Random(semilla)
+        self.acumulada = 0.0
+        self.lock = threading.Lock()
+
+    def aplicar(self):
+        """
+        Espera la demora del request y decide si falla
+
+        Returns:
+            int: Código HTTP del error a devolver, o None si sale bien
+        """
+        with self.lock:
+            demora = self.mediana_ms / 1000
+            if demora and self.dispersion:
+                demora *= self.random.lognormvariate(0, self.dispersion)
+            falla = self.tasa_error and self.random.random() < self.tasa_error
+            estado = self.random.choice(self.estados_error) if falla else None
+            self.acumulada += demora
+
+        if demora and self.dormir:
+            time.sleep(demora)
+        return estado
+
+
+class _Request:
+    """Request diferido (como googleapiclient.http.HttpRequest)"""
+
+    def __init__(self, backend, metodo, funcion, peluqueria_key=None):
+        self.backend = backend
+        self.metodo = metodo
+        self.funcion = funcion
+        self.peluqueria_key = peluqueria_key
+
+    def execute(self, num_retries=0, http=None):
+        # Mismas métricas que el request real (app.core.metricas)
+        with medir("calendar", self.metodo, self.peluqueria_key):
+            for intento in range(num_retries + 1):
+                self.backend.contar(self.metodo)
+                estado = self.backend.latencia.aplicar()
+                if estado is None:
+                    return self.funcion()
+                if intento == num_retries:
+                    raise _error_http(estado, f"Error simulado en {self.metodo}")
+
+
+class _Lote:
+    """Lote de requests: una sola demora para todo el lote, errores por request"""
+
+    def __init__(self, backend, callback=None):
+        self.backend = backend
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self.requests) >= MAXIMO_LOTE:
+            raise ValueError(f"Un lote admite hasta {MAXIMO_LOTE} requests")
+        request_id = request_id or str(len(self.requests) + 1)
+        if any(existente == request_id for existente, _, _ in self.requests):
+            raise KeyError(f"request_id repetido en el lote: {request_id}")
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self, http=None):
+        self.backend.contar("batch")
+        estado_lote = self.backend.latencia.aplicar()
+
+        for request_id, request, callback in self.requests:
+            self.backend.contar(request.metodo)
+            respuesta, excepcion = None, None
+            estado = estado_lote or self._error_individual()
+            try:
+                if estado is not None:
+                    raise _error_http(estado, f"Error simulado en {request.metodo}")
+                respuesta = request.funcion()
+            except HttpError as e:
+                excepcion = e
+            if callback:
+                callback(request_id, respuesta, excepcion)
+
+    def _error_individual(self):
+        latencia = self.backend.latencia
+        with latencia.lock:
+            if latencia.tasa_error and latencia.random.random() < latencia.tasa_error:
+                return latencia.random.choice(latencia.estados_error)
+        return None
+
+
+class CalendarFalso:
+    """
+    Calendarios en memoria (compartidos por todos los servicios de un proveedor)
+
+    Cada cambio incrementa una secuencia global: un syncToken es la secuencia al
+    momento de listar, y los eventos borrados quedan como "cancelled" para que
+    la sincronización incremental los devuelva.
+    """
+
+    def __init__(self, latencia=None, zona_por_defecto="UTC"):
+        """
+        Args:
+            latencia: LatenciaSimulada (None = sin demora ni errores)
+            zona_por_defecto: Timezone de los calendarios que no se registraron
+        """
+        self.latencia = latencia or LatenciaSimulada()
+        self.zona_por_defecto = zona_por_defecto
+        self.calendarios = {}  # calendar_id -> {"zona": str, "eventos": {event_id: evento}}
+        self.canales = {}      # channel_id -> canal de watch()
+        self.notificaciones = []
+        self.llamadas = Counter()
+        self.secuencia = 0
+        self.lock = threading.RLock()
+
+    # ---- Administración (no pasan por la latencia) ----
+
+    def registrar_calendario(self, calendar_id, zona=None):
+        with self.lock:
+            calendario = self.calendarios.setdefault(
+                calendar_id, {"zona": zona or self.zona_por_defecto, "eventos": {}}
+            )
+            if zona:
+                calendario["zona"] = zona
+        return calendario
+
+    def contar(self, metodo):
+        with self.lock:
+            self.llamadas[metodo] += 1
+
+    def eventos(self, calendar_id, incluir_cancelados=False):
+        """Eventos guardados de un calendario (para verificar en benchmarks)"""
+        with self.lock:
+            calendario = self.calendarios.get(calendar_id, {"eventos": {}})
+            return [
+                copy.deepcopy(evento) for evento in calendario["eventos"].values()
+                if incluir_cancelados or evento["status"] != "cancelled"
+            ]
+
+    def limpiar(self):
+        with self.lock:
+            self.calendarios.clear()
+            self.canales.clear()
+            self.notificaciones.clear()
+            self.llamadas.clear()
+
+    def servicio(self, peluqueria_key=None):
+        return ServicioCalendarFalso(self, peluqueria_key)
+
+    # ---- Fechas ----
+
+    def _zona(self, calendar_id, zona=None):
+        return ZoneInfo(zona or self.registrar_calendario(calendar_id)["zona"])
+
+    @staticmethod
+    def _a_datetime(valor, zona):
+        """RFC3339, ISO sin offset (se interpreta en `zona`) o dict start/end del evento"""
+        if isinstance(valor, dict):
+            if valor.get("dateTime"):
+                return CalendarFalso._a_datetime(valor["dateTime"], ZoneInfo(valor.get("timeZone") or zona.key))
+            return datetime.combine(date.fromisoformat(valor["date"]), datetime.min.time(), zona)
+
+        fecha = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+        return fecha if fecha.tzinfo else fecha.replace(tzinfo=zona)
+
+    def _para_respuesta(self, evento, zona):
+        """Copia del evento con las fechas en RFC3339 en la zona pedida (como la API)"""
+        evento = copy.deepcopy(evento)
+        for campo in ("start", "end"):
+            if evento.get(campo, {}).get("dateTime"):
+                fecha = self._a_datetime(evento[campo], zona).astimezone(zona)
+                evento[campo]["dateTime"] = fecha.isoformat()
+        evento.pop("_secuencia", None)
+        return evento
+
+    def _tocar(self, evento):
+        self.secuencia += 1
+        evento["_secuencia"] = self.secuencia
+        evento["updated"] = datetime.now(dt_timezone.utc).isoformat().replace("+00:00", "Z")
+        evento["etag"] = f'"{self.secuencia}"'
+
+    def _nuevo_id(self):
+        # Derivado de la secuencia: único y reproducible entre corridas
+        numero, caracteres = self.secuencia + 1, []
+        while numero:
+            numero, resto = divmod(numero, 32)
+            caracteres.append(_ALFABETO_ID[resto])
+        return "evento" + "".join(reversed(caracteres)).rjust(20, "0")
+
+    # ---- events() ----
+
+    def listar(self, calendarId, timeMin=None, timeMax=None, timeZone=None, q=None,
+               singleEvents=None, orderBy=None, showDeleted=False, maxResults=None,
+               pageToken=None, syncToken=None, **kwargs):
+        zona = self._zona(calendarId, timeZone)
+
+        if syncToken is not None and (timeMin or timeMax or q or orderBy):
+            raise _error_http(400, "syncToken no se puede combinar con timeMin, timeMax, q ni orderBy")
+        if orderBy == "startTime" and not singleEvents:
+            raise _error_http(400, "orderBy=startTime requiere singleEvents=True")
+
+        with self.lock:
+            calendario = self.registrar_calendario(calendarId)
+            eventos = list(calendario["eventos"].values())
+            secuencia_actual = self.secuencia
+
+        if syncToken is not None:
+            try:
+                desde = int(syncToken)
+            except ValueError:
+                raise _error_http(410, "Sync token inválido, hacer una sincronización completa")
+            if desde > secuencia_actual:
+                raise _error_http(410, "Sync token inválido, hacer una sincronización completa")
+            # Incremental: todo lo que cambió, incluidos los borrados
+            eventos = [evento for evento in eventos if evento["_secuencia"] > desde]
+        else:
+            inicio = self._a_datetime(timeMin, zona) if timeMin else None
+            fin = self._a_datetime(timeMax, zona) if timeMax else None
+            eventos = [
+                evento for evento in eventos
+                if (showDeleted or evento["status"] != "cancelled")
+                and (fin is None or self._a_datetime(evento["start"], zona) < fin)
+                and (inicio is None or self._a_datetime(evento["end"], zona) > inicio)
+                and (not q or q.lower() in f"{evento.get('summary', '')} {evento.get('description', '')}".lower())
+            ]
+
+        if orderBy == "startTime":
+            eventos.sort(key=lambda evento: self._a_datetime(evento["start"], zona))
+        elif orderBy == "updated":
+            eventos.sort(key=lambda evento: evento["_secuencia"])
+
+        tamanio = min(maxResults or RESULTADOS_POR_PAGINA, 2500)
+        desplazamiento = int(pageToken or 0)
+        pagina = eventos[desplazamiento:desplazamiento + tamanio]
+
+        respuesta = {
+            "kind": "calendar#events",
+            "summary": calendarId,
+            "timeZone": zona.key,
+            "items": [self._para_respuesta(evento, zona) for evento in pagina]
+        }
+        if desplazamiento + tamanio < len(eventos):
+            respuesta["nextPageToken"] = str(desplazamiento + tamanio)
+        else:
+            # Como la API: el syncToken solo viene en la última página
+            respuesta["nextSyncToken"] = str(secuencia_actual)
+        return respuesta
+
+    def obtener(self, calendarId, eventId, **kwargs):
+        with self.lock:
+            evento = self.registrar_calendario(calendarId)["eventos"].get(eventId)
+            if evento is None:
+                raise _error_http(404, "Not Found")
+            return self._para_respuesta(evento, self._zona(calendarId))
+
+    def insertar(self, calendarId, body, **kwargs):
+        zona = self._zona(calendarId)
+        if "start" not in body or "end" not in body:
+            raise _error_http(400, "Missing start or end time")
+        if self._a_datetime(body["end"], zona) < self._a_datetime(body["start"], zona):
+            raise _error_http(400, "The specified time range is empty")
+
+        evento = copy.deepcopy(body)
+
+        with self.lock:
+            evento_id = evento.get("id") or self._nuevo_id()
+            eventos = self.registrar_calendario(calendarId)["eventos"]
+            if evento_id in eventos:
+                # Calendar no reutiliza ids, ni siquiera de eventos borrados
+                raise _error_http(409, "The requested identifier already exists")
+
+            evento.update({
+                "kind": "calendar#event",
+                "id": evento_id,
+                "status": evento.get("status", "confirmed"),
+                "iCalUID": f"{evento_id}@google.com",
+                "htmlLink": f"https://www.google.com/calendar/event?eid={evento_id}",
+                "created": datetime.now(dt_timezone.utc).isoformat().replace("+00:00", "Z")
+            })
+            self._tocar(evento)
+            eventos[evento_id] = evento
+            self._notificar(calendarId)
+            return self._para_respuesta(evento, zona)
+
+    def borrar(self, calendarId, eventId, **kwargs):
+        with self.lock:
+            evento = self.registrar_calendario(calendarId)["eventos"].get(eventId)
+            if evento is None:
+                raise _error_http(404, "Not Found")
+            if evento["status"] == "cancelled":
+                raise _error_http(410, "Resource has been deleted")
+            evento["status"] = "cancelled"
+            self._tocar(evento)
+            self._notificar(calendarId)
+        return ""
+
+    def observar(self, calendarId, body, **kwargs):
+        """events().watch(): registra un canal de notificaciones push"""
+        if not body.get("id") or not body.get("address"):
+            raise _error_http(400, "El canal necesita id y address")
+
+        with self.lock:
+            self.registrar_calendario(calendarId)
+            canal = {
+                "kind": "api#channel",
+                "id": body["id"],
+                "resourceId": f"recurso-{calendarId}",
+                "resourceUri": f"https://www.googleapis.com/calendar/v3/calendars/{calendarId}/events",
+                "token": body.get("token"),
+                "expiration": body.get("expiration") or str(int((time.time() + 7 * 86400) * 1000)),
+                "address": body["address"],
+                "calendarId": calendarId
+            }
+            self.canales[canal["id"]] = canal
+            self._notificar(calendarId, estado="sync", canales=[canal])
+        return {clave: valor for clave, valor in canal.items() if clave not in ("address", "calendarId")}
+
+    def detener_canal(self, body, **kwargs):
+        with self.lock:
+            if self.canales.pop(body.get("id"), None) is None:
+                raise _error_http(404, "Channel not found")
+        return ""
+
+    def _notificar(self, calendar_id, estado="exists", canales=None):
+        """
+        Registra la notificación que Google mandaría a cada canal
+        (mismos headers X-Goog-* que recibiría el webhook)
+        """
+        if canales is None:
+            canales = [canal for canal in self.canales.values() if canal["calendarId"] == calendar_id]
+        for canal in canales:
+            self.notificaciones.append({
+                "address": canal["address"],
+                "X-Goog-Channel-ID": canal["id"],
+                "X-Goog-Channel-Token": canal["token"],
+                "X-Goog-Resource-ID": canal["resourceId"],
+                "X-Goog-Resource-State": estado,
+                "X-Goog-Message-Number": str(self.secuencia)
+            })
+
+    # ---- freebusy() ----
+
+    def consultar_ocupado(self, body, **kwargs):
+        zona = ZoneInfo(body.get("timeZone") or self.zona_por_defecto)
+        inicio = self._a_datetime(body["timeMin"], zona)
+        fin = self._a_datetime(body["timeMax"], zona)
+
+        calendarios = {}
+        with self.lock:
+            for item in body.get("items", []):
+                calendar_id = item["id"]
+                calendario = self.calendarios.get(calendar_id)
+                if calendario is None:
+                    calendarios[calendar_id] = {
+                        "errors": [{"domain": "global", "reason": "notFound"}],
+                        "busy": []
+                    }
+                    continue
+
+                ocupados = []
+                for evento in calendario["eventos"].values():
+                    if evento["status"] == "cancelled" or evento.get("transparency") == "transparent":
+                        continue
+                    evento_inicio = self._a_datetime(evento["start"], zona)
+                    evento_fin = self._a_datetime(evento["end"], zona)
+                    if evento_inicio < fin and evento_fin > inicio:
+                        ocupados.append((max(evento_inicio, inicio), min(evento_fin, fin)))
+
+                # La API devuelve los intervalos ocupados ya fusionados
+                fusionados = []
+                for desde, hasta in sorted(ocupados):
+                    if fusionados and desde <= fusionados[-1][1]:
+                        fusionados[-1][1] = max(fusionados[-1][1], hasta)
+                    else:
+                        fusionados.append([desde, hasta])
+
+                calendarios[calendar_id] = {"busy": [
+                    {"start": desde.astimezone(zona).isoformat(), "end": hasta.astimezone(zona).isoformat()}
+                    for desde, hasta in fusionados
+                ]}
+
+        return {
+            "kind": "calendar#freeBusy",
+            "timeMin": body["timeMin"],
+            "timeMax": body["timeMax"],
+            "calendars": calendarios
+        }
+
+
+class _Recurso:
+    """Colección de métodos que devuelven requests diferidos (events(), freebusy(), channels())"""
+
+    def __init__(self, backend, prefijo, metodos, peluqueria_key=None):
+        self._backend = backend
+        self._prefijo = prefijo
+        self._metodos = metodos
+        self._peluqueria_key = peluqueria_key
+
+    def __getattr__(self, nombre):
+        funcion = self._metodos.get(nombre)
+        if funcion is None:
+            raise AttributeError(f"{self._prefijo}().{nombre} no está implementado en el backend falso")
+
+        def crear_request(**kwargs):
+            return _Request(self._backend, f"{self._prefijo}.{nombre}", lambda: funcion(**kwargs),
+                            self._peluqueria_key)
+        return crear_request
+
+
+class ServicioCalendarFalso:
+    """Equivalente al Resource de build('calendar', 'v3')"""
+
+    def __init__(self, backend, peluqueria_key=None):
+        self.backend = backend
+        self.peluqueria_key = peluqueria_key
+
+    def events(self):
+        return _Recurso(self.backend, "events", {
+            "list": self.backend.listar,
+            "get": self.backend.obtener,
+            "insert": self.backend.insertar,
+            "delete": self.backend.borrar,
+            "watch": self.backend.observar
+        }, self.peluqueria_key)
+
+    def freebusy(self):
+        return _Recurso(self.backend, "freebusy", {"query": self.backend.consultar_ocupado},
+                        self.peluqueria_key)
+
+    def channels(self):
+        return _Recurso(self.backend, "channels", {"stop": self.backend.detener_canal},
+                        self.peluqueria_key)
+
+    def new_batch_http_request(self, callback=None):
+        return _Lote(self.backend, callback)
+
+
+class ProveedorCalendarFalso:
+    """
+    Proveedor para CalendarService que devuelve servicios del backend en memoria
+    Todos los clientes comparten el mismo backend (cada uno con su calendar_id).
+    """
+
+    def __init__(self, latencia=None, backend=None):
+        """
+        Args:
+            latencia: LatenciaSimulada (ignorado si se pasa backend)
+            backend: CalendarFalso existente (None = uno nuevo)
+        """
+        self.backend = backend or CalendarFalso(latencia)
+
+    def crear_servicio(self, peluqueria_key, config):
+        self.backend.registrar_calendario(config["calendar_id"], config.get("timezone"))
+        return self.backend.servicio(peluqueria_key)
+
+    @classmethod
+    def desde_entorno(cls):
+        """
+        Proveedor configurado por variables de entorno:
+        CALENDAR_FALSO_LATENCIA_MS, CALENDAR_FALSO_DISPERSION,
+        CALENDAR_FALSO_ERRORES (tasa 0-1) y CALENDAR_FALSO_SEMILLA
+        """
+        semilla = os.getenv("CALENDAR_FALSO_SEMILLA")
+        return cls(LatenciaSimulada(
+            mediana_ms=float(os.getenv("CALENDAR_FALSO_LATENCIA_MS", "0")),
+            dispersion=float(os.getenv("CALENDAR_FALSO_DISPERSION", "0")),
+            tasa_error=float(os.getenv("CALENDAR_FALSO_ERRORES", "0")),
+            semilla=int(semilla) if semilla else None
+        ))
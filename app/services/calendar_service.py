@@ -5,12 +5,18 @@ Maneja toda la interacción con la API de Google Calendar
 
 import os
 import json
+import time
 from datetime import datetime, timedelta
+from collections.abc import Mapping
+import httplib2
+import google_auth_httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from threading import Lock
+from googleapiclient.http import HttpRequest
+from threading import Lock, local
+from app.core.metricas import medir
 
 # Cache de servicios por cliente (thread-safe)
 services_cache = {}
@@ -18,20 +24,194 @@ services_lock = Lock()
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Máximo de requests por batch que acepta la API de Calendar
+LOTE_CALENDAR = 50
+
+# Errores de cuota / transitorios que se reintentan en los lotes
+_ESTADOS_REINTENTABLES = (403, 429, 500, 503)
+
+
+class _RequestMedido(HttpRequest):
+    """HttpRequest que registra cada execute() en las métricas de la peluquería"""
+    
+    peluqueria_key = None
+    
+    def execute(self, *args, **kwargs):
+        operacion = (self.methodId or "desconocido").replace("calendar.", "", 1)
+        with medir("calendar", operacion, self.peluqueria_key):
+            return super().execute(*args, **kwargs)
+
+
+def _request_builder(creds, peluqueria_key=None):
+    """
+    Construye los requests con un transporte httplib2 por thread y por proceso
+    httplib2.Http no es thread-safe, y el socket heredado de un fork lo
+    compartirían padre e hijos.
+    """
+    transportes = local()
+    
+    def construir(http, *args, **kwargs):
+        if getattr(transportes, "pid", None) != os.getpid():
+            transportes.http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+            transportes.pid = os.getpid()
+        request = _RequestMedido(transportes.http, *args, **kwargs)
+        request.peluqueria_key = peluqueria_key
+        return request
+    
+    return construir
+
+
+def cuerpo_evento(peluquero_nombre, cliente_nombre, cliente_telefono, fecha_hora_inicio,
+                  duracion_minutos, timezone, evento_id=None):
+    """
+    Arma el body de un evento de turno para la API de Calendar
+    
+    Args:
+        peluquero_nombre: Nombre del peluquero
+        cliente_nombre: Nombre del cliente
+        cliente_telefono: Teléfono del cliente
+        fecha_hora_inicio: Datetime del inicio del turno
+        duracion_minutos: Duración del turno
+        timezone: Timezone de la peluquería
+        evento_id: ID propio del evento (base32hex) o None
+    
+    Returns:
+        dict: Body del evento
+    """
+    fecha_hora_fin = fecha_hora_inicio + timedelta(minutes=duracion_minutos)
+    
+    evento = {
+        'summary': f'{peluquero_nombre} - {cliente_nombre}',
+        'description': f'Cliente: {cliente_nombre}\nTeléfono: {cliente_telefono}',
+        'start': {
+            'dateTime': fecha_hora_inicio.isoformat(),
+            'timeZone': timezone,
+        },
+        'end': {
+            'dateTime': fecha_hora_fin.isoformat(),
+            'timeZone': timezone,
+        },
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'popup', 'minutes': 60},
+            ],
+        },
+    }
+    
+    if evento_id:
+        evento['id'] = evento_id
+    
+    return evento
+
+
+class ProveedorGoogle:
+    """
+    Proveedor de servicios de Calendar: API real de Google
+    
+    Un proveedor solo sabe crear el servicio (Resource) de un cliente;
+    CalendarService se encarga del cache y de toda la lógica de turnos.
+    Ver app/services/calendar_falso.py para el backend en memoria.
+    """
+    
+    def crear_servicio(self, peluqueria_key, config):
+        """
+        Crea el servicio de Google Calendar con el token del cliente
+        
+        Args:
+            peluqueria_key: Identificador del cliente
+            config: Configuración del cliente
+        
+        Returns:
+            Resource: Servicio de Google Calendar
+        """
+        # Construir ruta del token
+        token_path = f"tokens/{peluqueria_key}_token.json"
+        
+        if not os.path.exists(token_path):
+            raise FileNotFoundError(
+                f"No se encontró token para {peluqueria_key} en {token_path}"
+            )
+        
+        # Cargar credenciales
+        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+        
+        # Refrescar si es necesario
+        if creds and creds.expired and creds.refresh_token:
+            print(f"Renovando token de Calendar para {peluqueria_key}...")
+            creds.refresh(Request())
+            # Guardar credenciales actualizadas
+            with open(token_path, 'w') as token:
+                token.write(creds.to_json())
+            print(f"Token renovado para {peluqueria_key}")
+        
+        if not creds or not creds.valid:
+            raise ValueError(
+                f"Token invalido para {peluqueria_key}. "
+                f"Necesitas reautorizar Google Calendar."
+            )
+        
+        # Crear servicio
+        service = build(
+            'calendar', 'v3',
+            credentials=creds,
+            requestBuilder=_request_builder(creds, peluqueria_key)
+        )
+        
+        print(f"✅ Servicio de Calendar creado para {peluqueria_key}")
+        return service
+
+
+# Proveedor de todos los CalendarService que no reciben uno propio
+_proveedor = None
+
+
+def configurar_proveedor(proveedor):
+    """
+    Cambia el proveedor por defecto (ej: el backend falso en benchmarks y CI)
+    Llamar antes de crear servicios: los ya cacheados no se reemplazan.
+    
+    Args:
+        proveedor: Objeto con crear_servicio(peluqueria_key, config), o None para volver al de entorno
+    """
+    global _proveedor
+    _proveedor = proveedor
+
+
+def get_proveedor():
+    """
+    Proveedor por defecto según CALENDAR_PROVEEDOR ("google" o "falso")
+    
+    Returns:
+        ProveedorGoogle o ProveedorCalendarFalso
+    """
+    global _proveedor
+    if _proveedor is None:
+        if os.getenv("CALENDAR_PROVEEDOR", "google").lower() == "falso":
+            from app.services.calendar_falso import ProveedorCalendarFalso
+            _proveedor = ProveedorCalendarFalso.desde_entorno()
+            print("🧪 Google Calendar: usando backend en memoria (CALENDAR_PROVEEDOR=falso)")
+        else:
+            _proveedor = ProveedorGoogle()
+    return _proveedor
+
 
 class CalendarService:
     """Servicio para interactuar con Google Calendar"""
     
-    def __init__(self, peluquerias_config):
+    def __init__(self, peluquerias_config, proveedor=None):
         """
         Inicializa el servicio de calendario
         
         Args:
             peluquerias_config: Diccionario con configuración de clientes
+            proveedor: Proveedor de servicios de Calendar (None = get_proveedor())
         """
         self.peluquerias = peluquerias_config
+        self.proveedor = proveedor
         self.services_cache = {}
         self.cache_lock = Lock()
+        self.cache_pid = os.getpid()
     
     def get_calendar_service(self, peluqueria_key):
         """
@@ -44,6 +224,11 @@ class CalendarService:
             Resource: Servicio de Google Calendar
         """
         with self.cache_lock:
+            # Después de un fork (gunicorn preload) los servicios del padre no se reutilizan
+            if self.cache_pid != os.getpid():
+                self.services_cache.clear()
+                self.cache_pid = os.getpid()
+            
             # Si ya está en cache, devolverlo
             if peluqueria_key in self.services_cache:
                 return self.services_cache[peluqueria_key]
@@ -56,41 +241,10 @@ class CalendarService:
             if not calendar_id:
                 raise ValueError(f"Cliente {peluqueria_key} no tiene calendar_id configurado")
             
-            # Construir ruta del token
-            token_path = f"tokens/{peluqueria_key}_token.json"
-            
-            if not os.path.exists(token_path):
-                raise FileNotFoundError(
-                    f"No se encontró token para {peluqueria_key} en {token_path}"
-                )
-            
-            # Cargar credenciales
-            creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-            
-            # Refrescar si es necesario e invalidar cache viejo
-            if creds and creds.expired and creds.refresh_token:
-                print(f"Renovando token de Calendar para {peluqueria_key}...")
-                creds.refresh(Request())
-                # Guardar credenciales actualizadas
-                with open(token_path, 'w') as token:
-                    token.write(creds.to_json())
-                # Invalidar cache para forzar nuevo servicio con creds frescas
-                self.services_cache.pop(peluqueria_key, None)
-                print(f"Token renovado y cache invalidado para {peluqueria_key}")
-            
-            if not creds or not creds.valid:
-                raise ValueError(
-                    f"Token invalido para {peluqueria_key}. "
-                    f"Necesitas reautorizar Google Calendar."
-                )
-            
-            # Crear servicio
-            service = build('calendar', 'v3', credentials=creds)
+            service = (self.proveedor or get_proveedor()).crear_servicio(peluqueria_key, config)
             
             # Guardar en cache
             self.services_cache[peluqueria_key] = service
-            
-            print(f"✅ Servicio de Calendar creado para {peluqueria_key}")
             return service
     
     def buscar_turnos_disponibles(self, peluqueria_key, peluquero, dia, duracion_minutos=30):
@@ -126,13 +280,14 @@ class CalendarService:
             # 3. Diccionario (legacy): {"inicio": "09:00", "fin": "18:00"}
             def parsear_franjas(horario):
                 """Devuelve lista de tuplas (hora_inicio_str, hora_fin_str)"""
-                if isinstance(horario, dict):
+                if isinstance(horario, Mapping):
                     return [(horario.get("inicio", "09:00"), horario.get("fin", "18:00"))]
-                if isinstance(horario, list):
+                # La config del registro llega congelada: las listas son tuplas
+                if isinstance(horario, (list, tuple)):
                     if len(horario) == 0:
                         return []
                     # Horario partido: [["09:00", "13:00"], ["17:00", "20:00"]]
-                    if isinstance(horario[0], list):
+                    if isinstance(horario[0], (list, tuple)):
                         return [(h[0], h[1]) for h in horario if len(h) >= 2]
                     # Lista simple: ["09:00", "18:00"]
                     if len(horario) >= 2 and isinstance(horario[0], str):
@@ -207,7 +362,7 @@ class CalendarService:
             return []
     
     def crear_evento_calendario(self, peluqueria_key, peluquero, cliente_nombre, cliente_telefono, 
-                               fecha_hora_inicio, duracion_minutos=30):
+                               fecha_hora_inicio, duracion_minutos=30, evento_id=None):
         """
         Crea un evento en Google Calendar
         
@@ -218,6 +373,7 @@ class CalendarService:
             cliente_telefono: Teléfono del cliente
             fecha_hora_inicio: Datetime del inicio del turno
             duracion_minutos: Duración del turno
+            evento_id: ID propio del evento (base32hex) para que reintentar sea idempotente
         
         Returns:
             dict: Información del evento creado o None si falló
@@ -230,24 +386,15 @@ class CalendarService:
             
             fecha_hora_fin = fecha_hora_inicio + timedelta(minutes=duracion_minutos)
             
-            evento = {
-                'summary': f'{peluquero["nombre"]} - {cliente_nombre}',
-                'description': f'Cliente: {cliente_nombre}\nTeléfono: {cliente_telefono}',
-                'start': {
-                    'dateTime': fecha_hora_inicio.isoformat(),
-                    'timeZone': timezone,
-                },
-                'end': {
-                    'dateTime': fecha_hora_fin.isoformat(),
-                    'timeZone': timezone,
-                },
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'popup', 'minutes': 60},
-                    ],
-                },
-            }
+            evento = cuerpo_evento(
+                peluquero["nombre"],
+                cliente_nombre,
+                cliente_telefono,
+                fecha_hora_inicio,
+                duracion_minutos,
+                timezone,
+                evento_id
+            )
             
             evento_creado = service.events().insert(
                 calendarId=calendar_id, 
@@ -264,12 +411,75 @@ class CalendarService:
             }
         
         except HttpError as e:
+            if evento_id and e.resp.status == 409:
+                # Ya existe: un intento anterior lo creó
+                print(f"ℹ️ Evento {evento_id} ya existía")
+                return {
+                    'id': evento_id,
+                    'link': None,
+                    'inicio': fecha_hora_inicio,
+                    'fin': fecha_hora_inicio + timedelta(minutes=duracion_minutos)
+                }
             print(f"❌ Error al crear evento: {e}")
             return None
         except Exception as e:
             print(f"❌ Error inesperado al crear evento: {e}")
             return None
     
+    def crear_eventos_lote(self, peluqueria_key, eventos, reintentos=3):
+        """
+        Crea varios eventos usando batch requests (LOTE_CALENDAR por request HTTP)
+        
+        Los eventos deben traer ID propio: un 409 (ya existe) cuenta como creado,
+        así repetir un lote no duplica nada.
+        
+        Args:
+            peluqueria_key: Identificador del cliente
+            eventos: Lista de bodies de evento (ver cuerpo_evento)
+            reintentos: Pasadas para los errores de cuota o transitorios
+        
+        Returns:
+            dict: {evento_id: None si quedó creado, o el texto del error}
+        """
+        service = self.get_calendar_service(peluqueria_key)
+        calendar_id = self.peluquerias[peluqueria_key]["calendar_id"]
+        
+        resultados = {}
+        pendientes = list(eventos)
+        
+        for intento in range(reintentos):
+            reintentar = []
+            
+            for i in range(0, len(pendientes), LOTE_CALENDAR):
+                lote = {evento["id"]: evento for evento in pendientes[i:i + LOTE_CALENDAR]}
+                
+                def registrar(request_id, response, exception, lote=lote):
+                    estado = getattr(getattr(exception, "resp", None), "status", None)
+                    if exception is None or estado == 409:
+                        resultados[request_id] = None
+                        return
+                    resultados[request_id] = str(exception)
+                    if estado in _ESTADOS_REINTENTABLES:
+                        reintentar.append(lote[request_id])
+                
+                batch = service.new_batch_http_request(callback=registrar)
+                for evento_id, evento in lote.items():
+                    batch.add(
+                        service.events().insert(calendarId=calendar_id, body=evento),
+                        request_id=evento_id
+                    )
+                with medir("calendar", "batch", peluqueria_key):
+                    batch.execute()
+            
+            if not reintentar:
+                break
+            
+            print(f"⚠️ {len(reintentar)} eventos con error de cuota, reintentando...")
+            pendientes = reintentar
+            time.sleep(2 ** (intento + 1))
+        
+        return resultados
+    
     def cancelar_evento_calendario(self, peluqueria_key, evento_id):
         """
         Cancela un evento en Google Calendar
@@ -3,42 +3,56 @@ Servicio de Notificaciones y Recordatorios
 Gestiona recordatorios automáticos y notificaciones
 """
 
+import os
+import socket
 import threading
 import time
 from datetime import datetime, timedelta
-import json
-import os
-from threading import Lock
-from app.services.whatsapp_service import whatsapp_service
+from zoneinfo import ZoneInfo
+from app.services.whatsapp_service import (
+    whatsapp_service,
+    PRIORIDAD_NOTIFICACION,
+    PRIORIDAD_RECORDATORIO
+)
+from app.services.recordatorios_ledger import RecordatoriosLedger
 from app.services.calendar_service import CalendarService
 from app.bot.utils.formatters import formatear_fecha_espanol
 from app.utils.time_utils import ahora_local
-from app.bot.states.state_manager import get_state
+from app.bot.states.state_manager import get_state, get_states_batch
 
 try:
     from app.core.database import (
         obtener_turnos_proximos_db,
+        obtener_turnos_rango_db,
         marcar_recordatorio_enviado,
-        recordatorio_ya_enviado
+        recordatorio_ya_enviado,
+        recordatorios_enviados_batch,
+        marcar_recordatorios_enviados_batch,
+        reclamar_recordatorio,
+        liberar_recordatorio,
+        reconciliar_estadisticas,
+        MONGODB_DISPONIBLE
     )
-    MONGODB_DISPONIBLE = True
 except ImportError:
     MONGODB_DISPONIBLE = False
     def obtener_turnos_proximos_db(*args, **kwargs): return []
+    def obtener_turnos_rango_db(*args, **kwargs): return None
     def marcar_recordatorio_enviado(*args, **kwargs): return False
     def recordatorio_ya_enviado(*args, **kwargs): return False
+    def recordatorios_enviados_batch(*args, **kwargs): return set()
+    def marcar_recordatorios_enviados_batch(*args, **kwargs): return False
+    def reclamar_recordatorio(*args, **kwargs): return None
+    def liberar_recordatorio(*args, **kwargs): return None
+    def reconciliar_estadisticas(*args, **kwargs): return None
 
 # Redis para deduplicacion de recordatorios (sobrevive reinicios de Railway)
-try:
-    from app.bot.states.state_manager import redis_client as _redis
-    REDIS_DISPONIBLE = True
-except Exception:
-    _redis = None
-    REDIS_DISPONIBLE = False
+# (el cliente se pide en cada uso: se conecta recién la primera vez)
+from app.bot.states.state_manager import get_redis_client as _get_redis
 
 def _recordatorio_ya_enviado_redis(recordatorio_id: str) -> bool:
     """Verifica en Redis si ya se envio este recordatorio."""
-    if not REDIS_DISPONIBLE or not _redis:
+    _redis = _get_redis()
+    if not _redis:
         return False
     try:
         return bool(_redis.exists(f"rec:{recordatorio_id}"))
@@ -47,13 +61,87 @@ def _recordatorio_ya_enviado_redis(recordatorio_id: str) -> bool:
 
 def _marcar_recordatorio_redis(recordatorio_id: str):
     """Marca en Redis que este recordatorio fue enviado. Expira en 48hs."""
-    if not REDIS_DISPONIBLE or not _redis:
+    _redis = _get_redis()
+    if not _redis:
         return
     try:
         _redis.setex(f"rec:{recordatorio_id}", 172800, "1")  # 48hs en segundos
     except Exception as e:
         print(f"Advertencia: no se pudo marcar recordatorio en Redis: {e}")
 
+def _reclamar_recordatorio_redis(recordatorio_id: str):
+    """
+    Reserva el recordatorio en Redis con SET NX (misma clave que lo marca como enviado)
+    
+    Returns:
+        bool | None: True si se reservó, False si ya estaba, None sin Redis
+    """
+    _redis = _get_redis()
+    if not _redis:
+        return None
+    try:
+        return bool(_redis.set(f"rec:{recordatorio_id}", "1", nx=True, ex=172800))
+    except Exception as e:
+        print(f"Advertencia: no se pudo reservar recordatorio en Redis: {e}")
+        return None
+
+def _liberar_recordatorio_redis(recordatorio_id: str):
+    """Borra la reserva en Redis de un recordatorio que no se pudo enviar."""
+    _redis = _get_redis()
+    if not _redis:
+        return
+    try:
+        _redis.delete(f"rec:{recordatorio_id}")
+    except Exception as e:
+        print(f"Advertencia: no se pudo liberar recordatorio en Redis: {e}")
+
+def _recordatorios_enviados_redis_batch(recordatorio_ids) -> set:
+    """Verifica en Redis con un solo MGET cuáles recordatorios ya se enviaron."""
+    _redis = _get_redis()
+    if not _redis or not recordatorio_ids:
+        return set()
+    try:
+        valores = _redis.mget([f"rec:{rid}" for rid in recordatorio_ids])
+        return {rid for rid, valor in zip(recordatorio_ids, valores) if valor}
+    except Exception:
+        return set()
+
+def _marcar_recordatorios_redis_batch(recordatorio_ids):
+    """Marca varios recordatorios en Redis con un pipeline de SETEX. Expiran en 48hs."""
+    _redis = _get_redis()
+    if not _redis or not recordatorio_ids:
+        return
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for rid in recordatorio_ids:
+            pipe.setex(f"rec:{rid}", 172800, "1")
+        pipe.execute()
+    except Exception as e:
+        print(f"Advertencia: no se pudieron marcar recordatorios en Redis: {e}")
+
+# Anticipaciones por defecto si el cliente no configura "recordatorios_horas"
+HORAS_RECORDATORIO_DEFAULT = [24, 2]
+
+# Hora (UTC) a partir de la cual corre la reconciliación diaria de estadísticas
+HORA_RECONCILIACION = int(os.getenv("HORA_RECONCILIACION", "4"))
+
+# Cada cuánto se verifican los recordatorios; el lock evita pasadas repetidas entre workers
+INTERVALO_RECORDATORIOS = 3600
+CLAVE_PASADA_RECORDATORIOS = "recordatorios:pasada"
+
+# Con gunicorn (gunicorn.conf.py) cada worker tiene su thread de recordatorios
+VARIOS_PROCESOS = os.getenv("SERVICIOS_EN_WORKER") == "1" or int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+def _turno_id(turno):
+    """
+    ID de deduplicación del turno: el mismo venga de Calendar o de MongoDB
+    
+    Se usa el id del evento de Google Calendar cuando existe (en MongoDB es
+    google_event_id), así el turno no cambia de clave si una pasada lee de
+    Calendar y la siguiente de MongoDB. Los turnos sin evento usan el _id.
+    """
+    return str(turno.get("google_event_id") or turno.get("_id") or turno.get("id"))
+
 
 class NotificationService:
     """Servicio para gestionar notificaciones y recordatorios"""
@@ -70,160 +158,314 @@ class NotificationService:
         self.calendar_service = CalendarService(peluquerias_config)
         self.templates = templates_config or {}
         
-        # Cache en memoria como fallback si Redis no está disponible
-        self.recordatorios_enviados = set()
-        self.recordatorios_lock = Lock()
-        
-        # Archivo para persistencia (fallback si Redis no disponible)
-        self.archivo_recordatorios = "recordatorios_enviados.json"
+        # Ledger append-only en disco como fallback si Redis no está disponible
+        # (solo guarda envíos de las últimas 48hs, igual que las claves de Redis)
+        self.archivo_recordatorios = "recordatorios_enviados.log"
+        self.recordatorios_enviados = RecordatoriosLedger(self.archivo_recordatorios)
+        self.recordatorios_enviados.importar_json_legacy("recordatorios_enviados.json")
+        self.ultima_reconciliacion = None
         
-        if REDIS_DISPONIBLE:
+        if _get_redis() is not None:
             print("   ✅ Recordatorios: usando Redis (persistente entre reinicios)")
         else:
-            print("   ⚠️  Recordatorios: usando archivo JSON (se pierde al reiniciar)")
-            self._cargar_recordatorios_enviados()
-    
-    def _cargar_recordatorios_enviados(self):
-        """Carga los recordatorios enviados desde archivo JSON"""
-        if os.path.exists(self.archivo_recordatorios):
-            try:
-                with open(self.archivo_recordatorios, "r", encoding="utf-8") as f:
-                    datos = json.load(f)
-                    with self.recordatorios_lock:
-                        self.recordatorios_enviados = set(datos)
-                print(f"📂 Cargados {len(self.recordatorios_enviados)} recordatorios previos")
-            except json.JSONDecodeError:
-                print("⚠️ Archivo corrupto, creando backup...")
-                os.rename(self.archivo_recordatorios, f"{self.archivo_recordatorios}.backup")
-            except Exception as e:
-                print(f"⚠️ Error cargando recordatorios: {e}")
+            print(f"   ⚠️  Recordatorios: usando ledger local ({len(self.recordatorios_enviados)} vigentes)")
     
-    def _guardar_recordatorios_enviados(self):
-        """Guarda los recordatorios enviados en archivo JSON"""
-        try:
-            with self.recordatorios_lock:
-                with open(self.archivo_recordatorios, "w", encoding="utf-8") as f:
-                    json.dump(list(self.recordatorios_enviados), f, indent=2)
-        except Exception as e:
-            print(f"❌ Error guardando recordatorios: {e}")
+    def horas_recordatorio(self, peluqueria_key):
+        """
+        Anticipaciones de recordatorio configuradas para el cliente
+        Se configuran con "recordatorios_horas" en clientes.json (default: [24, 2])
+        
+        Returns:
+            list: Horas de anticipación ordenadas de mayor a menor
+        """
+        config = self.peluquerias.get(peluqueria_key, {})
+        horas = config.get("recordatorios_horas") or HORAS_RECORDATORIO_DEFAULT
+        return sorted({int(h) for h in horas if int(h) > 0}, reverse=True)
     
-    def obtener_turnos_proximos(self, peluqueria_key, horas_anticipacion=24):
+    def obtener_turnos_rango(self, peluqueria_key, horas_hasta=25):
         """
-        Obtiene turnos que ocurrirán en X horas
+        Obtiene con una sola consulta todos los turnos entre ahora y ahora + X horas
+        
+        La fuente se elige por cliente ("fuente_recordatorios" en clientes.json).
+        Por defecto se usa Google Calendar (fuente de verdad de los eventos) y
+        MongoDB solo si Calendar falla o no está configurado. Un resultado vacío
+        es un resultado válido y no dispara la consulta a la otra fuente.
         
         Args:
             peluqueria_key: Identificador del cliente
-            horas_anticipacion: Horas de anticipación (24 o 2)
+            horas_hasta: Fin de la ventana en horas desde ahora
         
         Returns:
-            list: Lista de turnos próximos
+            list: Turnos normalizados {"id", "google_event_id", "telefono", "inicio", "resumen", "peluqueria"}
         """
-        try:
-            # Intentar obtener de MongoDB primero
-            if MONGODB_DISPONIBLE:
-                turnos_db = obtener_turnos_proximos_db(peluqueria_key, horas_anticipacion)
-                if turnos_db:
-                    return turnos_db
+        config = self.peluquerias.get(peluqueria_key, {})
+        if not config:
+            return []
+        
+        ahora = ahora_local(peluqueria_key, self.peluquerias)
+        hasta = ahora + timedelta(hours=horas_hasta)
+        
+        fuente = config.get("fuente_recordatorios")
+        if fuente:
+            fuentes = [fuente]
+        elif config.get("calendar_id"):
+            fuentes = ["calendar", "mongodb"]
+        else:
+            fuentes = ["mongodb"]
+        
+        for fuente in fuentes:
+            if fuente == "mongodb":
+                if not MONGODB_DISPONIBLE:
+                    continue
+                turnos = self._turnos_rango_mongodb(peluqueria_key, ahora, hasta)
+            else:
+                turnos = self._turnos_rango_calendar(peluqueria_key, ahora, hasta)
             
-            # Fallback a Google Calendar
-            config = self.peluquerias.get(peluqueria_key, {})
-            if not config:
-                return []
+            if turnos is not None:
+                return turnos
             
-            timezone = config.get("timezone", "America/Argentina/Buenos_Aires")
+            print(f"   ⚠️ No se pudo consultar {fuente} para {peluqueria_key}")
+        
+        return []
+    
+    def _turnos_rango_mongodb(self, peluqueria_key, desde, hasta):
+        """
+        Turnos confirmados del rango desde MongoDB
+        
+        Returns:
+            list | None: Turnos normalizados o None si la consulta falló
+        """
+        turnos_db = obtener_turnos_rango_db(peluqueria_key, desde, hasta)
+        if turnos_db is None:
+            return None
+        
+        tz = ZoneInfo(self.peluquerias[peluqueria_key]["timezone"])
+        turnos = []
+        
+        for turno in turnos_db:
+            turnos.append({
+                "_id": turno._id,
+                "id": turno.id,
+                "google_event_id": turno.google_event_id,
+                "telefono": turno.telefono,
+                "inicio": turno.inicio_en(tz),
+                "resumen": turno.resumen,
+                "peluqueria": peluqueria_key
+            })
+        
+        return turnos
+    
+    def _turnos_rango_calendar(self, peluqueria_key, desde, hasta):
+        """
+        Turnos del rango desde Google Calendar
+        
+        Returns:
+            list | None: Turnos normalizados o None si la consulta falló
+        """
+        try:
+            config = self.peluquerias[peluqueria_key]
             calendar_id = config.get("calendar_id")
             
             if not calendar_id:
-                return []
+                return None
             
             service = self.calendar_service.get_calendar_service(peluqueria_key)
             
-            # Calcular ventana de tiempo
-            ahora = ahora_local(peluqueria_key, self.peluquerias)
-            tiempo_inicio = ahora + timedelta(hours=horas_anticipacion - 1)
-            tiempo_fin = ahora + timedelta(hours=horas_anticipacion + 1)
-            
             # Obtener eventos del calendario
             eventos = service.events().list(
                 calendarId=calendar_id,
-                timeMin=tiempo_inicio.isoformat(),
-                timeMax=tiempo_fin.isoformat(),
+                timeMin=desde.isoformat(),
+                timeMax=hasta.isoformat(),
                 singleEvents=True,
                 orderBy='startTime'
             ).execute()
-            
-            turnos_recordar = []
-            
-            if "items" in eventos:
-                for event in eventos["items"]:
-                    try:
-                        inicio_str = event["start"].get("dateTime")
-                        if not inicio_str:
-                            continue
-                        
-                        # Parsear fecha con timezone
-                        if inicio_str.endswith('Z'):
-                            inicio = datetime.fromisoformat(inicio_str.replace("Z", "+00:00"))
-                        else:
-                            inicio = datetime.fromisoformat(inicio_str)
-                        
-                        # Extraer teléfono de la descripción
-                        descripcion = event.get("description", "")
-                        telefono = None
-                        for linea in descripcion.split("\n"):
-                            if "Tel:" in linea or "Teléfono:" in linea:
-                                telefono = linea.split(":")[-1].strip()
-                                break
-                        
-                        if telefono:
-                            turno_info = {
-                                "telefono": telefono,
-                                "inicio": inicio,
-                                "resumen": event.get("summary", "Turno"),
-                                "id": event["id"],
-                                "peluqueria": peluqueria_key
-                            }
-                            turnos_recordar.append(turno_info)
-                    
-                    except Exception as e:
-                        print(f"❌ Error procesando evento para recordatorio: {e}")
-                        continue
-            
-            return turnos_recordar
         
         except Exception as e:
-            print(f"❌ Error obteniendo turnos próximos: {e}")
+            print(f"❌ Error obteniendo turnos próximos de Calendar: {e}")
+            return None
+        
+        turnos_recordar = []
+        
+        for event in eventos.get("items", []):
+            try:
+                inicio_str = event["start"].get("dateTime")
+                if not inicio_str:
+                    continue
+                
+                # Parsear fecha con timezone
+                if inicio_str.endswith('Z'):
+                    inicio = datetime.fromisoformat(inicio_str.replace("Z", "+00:00"))
+                else:
+                    inicio = datetime.fromisoformat(inicio_str)
+                
+                # Extraer teléfono de la descripción
+                descripcion = event.get("description", "")
+                telefono = None
+                for linea in descripcion.split("\n"):
+                    if "Tel:" in linea or "Teléfono:" in linea:
+                        telefono = linea.split(":")[-1].strip()
+                        break
+                
+                if telefono:
+                    turno_info = {
+                        "telefono": telefono,
+                        "inicio": inicio,
+                        "resumen": event.get("summary", "Turno"),
+                        "id": event["id"],
+                        "google_event_id": event["id"],
+                        "peluqueria": peluqueria_key
+                    }
+                    turnos_recordar.append(turno_info)
+            
+            except Exception as e:
+                print(f"❌ Error procesando evento para recordatorio: {e}")
+                continue
+        
+        return turnos_recordar
+    
+    def agrupar_por_anticipacion(self, peluqueria_key, turnos, horas_lista):
+        """
+        Reparte en memoria los turnos de la ventana completa en cada anticipación
+        Un turno entra en la anticipación H si empieza entre H-1 y H+1 horas desde ahora
+        
+        Args:
+            peluqueria_key: Identificador del cliente
+            turnos: Turnos de obtener_turnos_rango
+            horas_lista: Anticipaciones configuradas
+        
+        Returns:
+            dict: {horas: [turnos]}
+        """
+        ahora = ahora_local(peluqueria_key, self.peluquerias)
+        grupos = {horas: [] for horas in horas_lista}
+        
+        for turno in turnos:
+            faltan = (turno["inicio"] - ahora).total_seconds() / 3600
+            for horas in horas_lista:
+                if horas - 1 <= faltan <= horas + 1:
+                    grupos[horas].append(turno)
+        
+        return grupos
+    
+    def obtener_turnos_proximos(self, peluqueria_key, horas_anticipacion=24):
+        """
+        Obtiene turnos que ocurrirán en X horas
+        
+        Args:
+            peluqueria_key: Identificador del cliente
+            horas_anticipacion: Horas de anticipación (24 o 2)
+        
+        Returns:
+            list: Lista de turnos próximos
+        """
+        turnos = self.obtener_turnos_rango(peluqueria_key, horas_anticipacion + 1)
+        grupos = self.agrupar_por_anticipacion(peluqueria_key, turnos, [horas_anticipacion])
+        return grupos[horas_anticipacion]
+    
+    def filtrar_recordatorios_pendientes(self, turnos, horas_anticipacion=24):
+        """
+        Filtra en lote los turnos que todavía necesitan recordatorio
+        Hace un MGET en Redis, una consulta $in en MongoDB y un MGET de estados
+        en lugar de varias consultas por cada turno
+        
+        Args:
+            turnos: Lista de turnos candidatos
+            horas_anticipacion: 24 o 2 horas
+        
+        Returns:
+            list: Turnos que no tienen recordatorio enviado y cuyo usuario
+                  no desactivó los recordatorios
+        """
+        if not turnos:
             return []
+        
+        tipo_recordatorio = f"{horas_anticipacion}h"
+        ids = [f"{_turno_id(turno)}_{tipo_recordatorio}" for turno in turnos]
+        
+        # 1. Redis + ledger local
+        enviados = _recordatorios_enviados_redis_batch(ids)
+        enviados.update(rid for rid in ids if rid in self.recordatorios_enviados)
+        
+        pendientes = [turno for turno, rid in zip(turnos, ids) if rid not in enviados]
+        
+        # 2. MongoDB
+        if MONGODB_DISPONIBLE and pendientes:
+            en_db = recordatorios_enviados_batch(
+                [_turno_id(turno) for turno in pendientes],
+                tipo_recordatorio
+            )
+            pendientes = [turno for turno in pendientes if _turno_id(turno) not in en_db]
+        
+        # 3. Usuarios con recordatorios desactivados
+        estados = get_states_batch([turno["telefono"] for turno in pendientes])
+        resultado = []
+        for turno in pendientes:
+            estado_usuario = estados.get(turno["telefono"])
+            if estado_usuario and not estado_usuario.get("recordatorios_activos", True):
+                print(f"⏭️ Usuario {turno['telefono']} tiene recordatorios desactivados")
+                continue
+            resultado.append(turno)
+        
+        return resultado
     
-    def enviar_recordatorio(self, turno, horas_anticipacion=24):
+    def marcar_recordatorios_enviados(self, turnos, horas_anticipacion=24):
         """
-        Envía un recordatorio de turno al cliente
+        Marca los recordatorios enviados (pipeline de Redis + insert_many)
+        La pasada lo llama por cada envío exitoso, no al final del grupo
         
         Args:
-            turno: Diccionario con información del turno
+            turnos: Lista de turnos a los que se les envió el recordatorio
             horas_anticipacion: 24 o 2 horas
+        """
+        if not turnos:
+            return
+        
+        tipo_recordatorio = f"{horas_anticipacion}h"
+        ids = [f"{_turno_id(turno)}_{tipo_recordatorio}" for turno in turnos]
+        
+        _marcar_recordatorios_redis_batch(ids)
+        self.recordatorios_enviados.agregar_varios(ids)
+        
+        if MONGODB_DISPONIBLE:
+            marcar_recordatorios_enviados_batch(
+                [_turno_id(turno) for turno in turnos],
+                tipo_recordatorio
+            )
+    
+    def enviar_recordatorio(self, turno, horas_anticipacion=24, verificado=False, al_terminar=None):
+        """
+        Encola un recordatorio de turno para el cliente
+        
+        Args:
+            turno: Diccionario con información del turno
+            horas_anticipacion: Horas de anticipación configuradas (ej: 24 o 2)
+            verificado: True si el turno ya pasó por filtrar_recordatorios_pendientes.
+                        En ese caso no se consulta ni se marca nada por turno
+            al_terminar: Callback (sid, error) de la cola de WhatsApp: sid si Twilio
+                         lo aceptó, None si se descartó
         
         Returns:
-            bool: True si se envió exitosamente
+            bool: True si quedó encolado (el resultado del envío llega a al_terminar)
         """
         try:
             telefono = turno["telefono"]
             peluqueria_key = turno.get("peluqueria")
             
-            # Verificar si ya se envió (MongoDB)
-            if MONGODB_DISPONIBLE:
-                turno_id = turno.get("_id") or turno.get("id")
-                tipo_recordatorio = "24h" if horas_anticipacion == 24 else "2h"
-                if recordatorio_ya_enviado(turno_id, tipo_recordatorio):
-                    print(f"⏭️ Recordatorio ya enviado para {turno_id}")
-                    return False
-            
-            # Verificar si el usuario tiene recordatorios activos
-            estado_usuario = get_state(telefono)
-            if estado_usuario:
-                if not estado_usuario.get("recordatorios_activos", True):
-                    print(f"⏭️ Usuario {telefono} tiene recordatorios desactivados")
-                    return False
+            if not verificado:
+                # Verificar si ya se envió (MongoDB)
+                if MONGODB_DISPONIBLE:
+                    turno_id = _turno_id(turno)
+                    tipo_recordatorio = f"{horas_anticipacion}h"
+                    if recordatorio_ya_enviado(turno_id, tipo_recordatorio):
+                        print(f"⏭️ Recordatorio ya enviado para {turno_id}")
+                        return False
+                
+                # Verificar si el usuario tiene recordatorios activos
+                estado_usuario = get_state(telefono)
+                if estado_usuario:
+                    if not estado_usuario.get("recordatorios_activos", True):
+                        print(f"⏭️ Usuario {telefono} tiene recordatorios desactivados")
+                        return False
             
             # Formatear datos
             fecha = formatear_fecha_espanol(turno["inicio"])
@@ -251,8 +493,18 @@ class NotificationService:
             
             print(f"📤 Enviando recordatorio a {telefono} ({horas_faltantes}h antes)")
             
-            # Enviar según tipo de recordatorio
-            if horas_anticipacion == 24:
+            def terminado(sid, error):
+                # Se marca recién cuando Twilio lo aceptó, no al encolarlo
+                if sid and MONGODB_DISPONIBLE and not verificado:
+                    marcar_recordatorio_enviado(_turno_id(turno), f"{horas_anticipacion}h")
+                    print("✅ Recordatorio marcado en MongoDB")
+                if al_terminar:
+                    al_terminar(sid, error)
+            
+            # Enviar según tipo de recordatorio: con un día o más de anticipación
+            # se usa la plantilla, con pocas horas el mensaje urgente
+            resultado = False
+            if horas_anticipacion >= 12:
                 # Usar plantilla si está configurada
                 template_sid = self.templates.get("TEMPLATE_RECORDATORIO")
                 if template_sid:
@@ -264,7 +516,9 @@ class NotificationService:
                             "2": fecha,
                             "3": hora,
                             "4": servicio
-                        }
+                        },
+                        prioridad=PRIORIDAD_RECORDATORIO,
+                        al_terminar=terminado
                     )
                 else:
                     # Mensaje normal
@@ -274,14 +528,16 @@ class NotificationService:
                         f"📅 Fecha: {fecha}\n"
                         f"🕐 Hora: {hora}\n"
                         f"✂️ Servicio: {servicio}\n\n"
-                        f"¡Te esperamos mañana! 👈"
+                        + ("¡Te esperamos mañana! 👈" if horas_anticipacion == 24 else "¡Te esperamos! 👈")
+                    )
+                    resultado = whatsapp_service.enviar_mensaje(
+                        mensaje, telefono, prioridad=PRIORIDAD_RECORDATORIO, al_terminar=terminado
                     )
-                    resultado = whatsapp_service.enviar_mensaje(mensaje, telefono)
                 
                 if resultado:
-                    print("✅ Recordatorio 24h enviado")
+                    print(f"✅ Recordatorio {horas_anticipacion}h encolado")
             
-            elif horas_anticipacion == 2:
+            else:
                 mensaje = (
                     f"⏰ *Recordatorio urgente*\n\n"
                     f"Tu turno es en {horas_faltantes} horas:\n\n"
@@ -289,19 +545,14 @@ class NotificationService:
                     f"✂️ {servicio}\n\n"
                     f"¡Nos vemos pronto! 👈"
                 )
-                resultado = whatsapp_service.enviar_mensaje(mensaje, telefono)
+                resultado = whatsapp_service.enviar_mensaje(
+                    mensaje, telefono, prioridad=PRIORIDAD_RECORDATORIO, al_terminar=terminado
+                )
                 
                 if resultado:
-                    print("✅ Recordatorio 2h enviado")
-            
-            # Marcar como enviado en MongoDB
-            if resultado and MONGODB_DISPONIBLE:
-                turno_id = turno.get("_id") or turno.get("id")
-                tipo_recordatorio = "24h" if horas_anticipacion == 24 else "2h"
-                marcar_recordatorio_enviado(turno_id, tipo_recordatorio)
-                print("✅ Recordatorio marcado en MongoDB")
+                    print(f"✅ Recordatorio {horas_anticipacion}h encolado")
             
-            return resultado
+            return bool(resultado)
         
         except Exception as e:
             print(f"❌ Error enviando recordatorio: {e}")
@@ -310,79 +561,174 @@ class NotificationService:
             return False
     
     def _ya_enviado(self, recordatorio_id: str) -> bool:
-        """Verifica si ya se envio un recordatorio. Redis > MongoDB > memoria."""
+        """Verifica si ya se envio un recordatorio. Redis > ledger local."""
         # 1. Redis (persiste entre reinicios)
         if _recordatorio_ya_enviado_redis(recordatorio_id):
             return True
-        # 2. Memoria in-process (fallback)
-        with self.recordatorios_lock:
-            return recordatorio_id in self.recordatorios_enviados
+        # 2. Ledger en disco (fallback)
+        return recordatorio_id in self.recordatorios_enviados
 
     def _marcar_enviado(self, recordatorio_id: str):
-        """Marca un recordatorio como enviado en Redis y en memoria."""
+        """Marca un recordatorio como enviado en Redis y en el ledger."""
         _marcar_recordatorio_redis(recordatorio_id)
-        with self.recordatorios_lock:
-            self.recordatorios_enviados.add(recordatorio_id)
-        self._guardar_recordatorios_enviados()
+        self.recordatorios_enviados.agregar(recordatorio_id)
 
     def sistema_recordatorios_loop(self):
         """
         Loop principal del sistema de recordatorios
-        Se ejecuta en un thread separado
+        Se ejecuta en un thread separado (uno por worker): cada hora solo uno
+        de todos los workers e instancias hace la pasada
         """
         print("📢 Sistema de recordatorios iniciado")
         
         while True:
+            if self._tomar_pasada():
+                self._pasada_recordatorios()
+            else:
+                print("\n⏭️ Recordatorios: la pasada de esta hora la hace otro worker")
+            
+            # Esperar 1 hora
+            time.sleep(INTERVALO_RECORDATORIOS)
+    
+    def _tomar_pasada(self):
+        """
+        Lock en Redis por la pasada de esta hora
+        
+        Si el lock no se puede tomar (sin Redis o con error) la pasada solo se hace
+        cuando es segura: con MongoDB cada recordatorio se reserva con un insert único
+        antes de enviarse (ver _reclamar_recordatorio), y en un solo proceso no hay
+        con quién competir. Con varios workers y sin MongoDB se saltea la pasada:
+        el ledger en disco es por proceso y no evita que dos workers envíen lo mismo.
+        
+        Returns:
+            bool: True si este proceso tiene que hacer la pasada
+        """
+        redis = _get_redis()
+        if redis is not None:
             try:
-                # Obtener hora actual para logging
-                print(f"\n⏰ Verificando turnos próximos...")
-                
-                # Verificar TODAS las peluquerías
-                for peluqueria_key in self.peluquerias.keys():
-                    try:
-                        config = self.peluquerias[peluqueria_key]
-                        print(f"   Verificando {config['nombre']}...")
+                return bool(redis.set(
+                    CLAVE_PASADA_RECORDATORIOS,
+                    f"{socket.gethostname()}:{os.getpid()}",
+                    nx=True,
+                    ex=INTERVALO_RECORDATORIOS - 60
+                ))
+            except Exception as e:
+                print(f"⚠️ No se pudo tomar el lock de recordatorios: {e}")
+        
+        if MONGODB_DISPONIBLE or not VARIOS_PROCESOS:
+            return True
+        
+        print("⚠️ Recordatorios: sin lock de Redis ni MongoDB con varios workers, se saltea la pasada")
+        return False
+    
+    def _reclamar_recordatorio(self, turno, horas_anticipacion):
+        """
+        Reserva el recordatorio antes de enviarlo para que solo un worker lo envíe
+        MongoDB (índice único turno_id + tipo) y, si falla, SET NX en Redis
+        
+        Returns:
+            bool: True si este proceso tiene que enviarlo
+        """
+        turno_id = _turno_id(turno)
+        tipo_recordatorio = f"{horas_anticipacion}h"
+        
+        if MONGODB_DISPONIBLE:
+            reclamado = reclamar_recordatorio(turno_id, tipo_recordatorio)
+            if reclamado is not None:
+                return reclamado
+        
+        reclamado = _reclamar_recordatorio_redis(f"{turno_id}_{tipo_recordatorio}")
+        # Sin MongoDB ni Redis solo queda el lock de la pasada (un solo proceso)
+        return True if reclamado is None else reclamado
+    
+    def _liberar_recordatorio(self, turno, horas_anticipacion):
+        """Libera la reserva de un recordatorio que no se pudo enviar"""
+        turno_id = _turno_id(turno)
+        tipo_recordatorio = f"{horas_anticipacion}h"
+        
+        if MONGODB_DISPONIBLE:
+            liberar_recordatorio(turno_id, tipo_recordatorio)
+        _liberar_recordatorio_redis(f"{turno_id}_{tipo_recordatorio}")
+    
+    def _al_terminar_recordatorio(self, turno, horas_anticipacion):
+        """
+        Callback de la cola de WhatsApp para un recordatorio reservado
+        Lo marca apenas Twilio lo acepta (si el proceso se corta, lo enviado no se
+        repite) y lo libera si se descartó, para que lo reintente la próxima pasada
+        """
+        def terminado(sid, error):
+            if sid:
+                self.marcar_recordatorios_enviados([turno], horas_anticipacion)
+                print(f"   📤 Recordatorio {horas_anticipacion}h enviado para turno {turno['inicio'].strftime('%d/%m %H:%M')}")
+            else:
+                print(f"   ⚠️ Recordatorio {horas_anticipacion}h a {turno['telefono']} no enviado ({error}), se reintenta en la próxima pasada")
+                self._liberar_recordatorio(turno, horas_anticipacion)
+        return terminado
+    
+    def _pasada_recordatorios(self):
+        """Verifica todas las peluquerías y envía los recordatorios pendientes"""
+        try:
+            # Obtener hora actual para logging
+            print(f"\n⏰ Verificando turnos próximos...")
+            
+            # Verificar TODAS las peluquerías
+            # items() de un solo snapshot: una recarga de config no corta la pasada
+            for peluqueria_key, config in list(self.peluquerias.items()):
+                try:
+                    print(f"   Verificando {config['nombre']}...")
+                    
+                    # Una sola consulta por cliente para todas las anticipaciones
+                    horas_lista = self.horas_recordatorio(peluqueria_key)
+                    turnos = self.obtener_turnos_rango(peluqueria_key, max(horas_lista) + 1)
+                    grupos = self.agrupar_por_anticipacion(peluqueria_key, turnos, horas_lista)
+                    
+                    for horas, turnos_grupo in grupos.items():
+                        pendientes = self.filtrar_recordatorios_pendientes(turnos_grupo, horas)
                         
-                        # Recordatorios de 24 horas
-                        turnos_24h = self.obtener_turnos_proximos(peluqueria_key, horas_anticipacion=24)
-                        for turno in turnos_24h:
-                            recordatorio_id = f"{turno['id']}_24h"
-                            if self._ya_enviado(recordatorio_id):
+                        for turno in pendientes:
+                            if not self._reclamar_recordatorio(turno, horas):
                                 continue
-                            if self.enviar_recordatorio(turno, horas_anticipacion=24):
-                                self._marcar_enviado(recordatorio_id)
-                                print(f"   📤 Recordatorio 24h enviado para turno {turno['inicio'].strftime('%d/%m %H:%M')}")
-
-                        # Recordatorios de 2 horas
-                        turnos_2h = self.obtener_turnos_proximos(peluqueria_key, horas_anticipacion=2)
-                        for turno in turnos_2h:
-                            recordatorio_id = f"{turno['id']}_2h"
-                            if self._ya_enviado(recordatorio_id):
-                                continue
-                            if self.enviar_recordatorio(turno, horas_anticipacion=2):
-                                self._marcar_enviado(recordatorio_id)
-                                print(f"   📤 Recordatorio 2h enviado para turno {turno['inicio'].strftime('%d/%m %H:%M')}")
-                    
-                    except Exception as e:
-                        print(f"   ❌ Error procesando {peluqueria_key}: {e}")
-                        continue
+                            
+                            encolado = self.enviar_recordatorio(
+                                turno,
+                                horas_anticipacion=horas,
+                                verificado=True,
+                                al_terminar=self._al_terminar_recordatorio(turno, horas)
+                            )
+                            if not encolado:
+                                self._liberar_recordatorio(turno, horas)
                 
-                print("   ✅ Verificación completada. Próxima en 1 hora.")
-                
-                # Limpiar recordatorios antiguos
-                with self.recordatorios_lock:
-                    if len(self.recordatorios_enviados) > 1000:
-                        self.recordatorios_enviados.clear()
-                        self._guardar_recordatorios_enviados()
-                        print("   🗑️ Limpieza de cache completada")
+                except Exception as e:
+                    print(f"   ❌ Error procesando {peluqueria_key}: {e}")
+                    continue
             
-            except Exception as e:
-                print(f"   ❌ Error en sistema de recordatorios: {e}")
-                import traceback
-                traceback.print_exc()
+            print("   ✅ Verificación completada. Próxima en 1 hora.")
             
-            # Esperar 1 hora
-            time.sleep(3600)
+            self._reconciliar_estadisticas_nocturna()
+            
+            # fsync del ledger y limpieza por antigüedad (> 48hs)
+            self.recordatorios_enviados.flush()
+            eliminados = self.recordatorios_enviados.compactar()
+            if eliminados:
+                print(f"   🗑️ {eliminados} recordatorios vencidos eliminados del ledger")
+        
+        except Exception as e:
+            print(f"   ❌ Error en sistema de recordatorios: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def _reconciliar_estadisticas_nocturna(self):
+        """Recalcula las estadísticas una vez por día, a partir de HORA_RECONCILIACION (UTC)"""
+        if not MONGODB_DISPONIBLE:
+            return
+        
+        ahora = datetime.utcnow()
+        if ahora.hour < HORA_RECONCILIACION or self.ultima_reconciliacion == ahora.date():
+            return
+        
+        print("   📊 Reconciliando estadísticas...")
+        if reconciliar_estadisticas() is not None:
+            self.ultima_reconciliacion = ahora.date()
     
     def iniciar_sistema_recordatorios(self):
         """
@@ -435,7 +781,7 @@ class NotificationService:
             )
             
             print(f"📱 Notificando a {peluquero['nombre']}")
-            resultado = whatsapp_service.enviar_mensaje(mensaje, telefono_peluquero)
+            resultado = whatsapp_service.enviar_mensaje(mensaje, telefono_peluquero, prioridad=PRIORIDAD_NOTIFICACION)
             
             if resultado:
                 print("✅ Notificación enviada al peluquero")
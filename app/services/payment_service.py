@@ -8,6 +8,7 @@ import requests
 import hmac
 import hashlib
 from datetime import datetime, timedelta
+from app.core.metricas import medir
 
 
 class PaymentService:
@@ -34,6 +35,26 @@ class PaymentService:
         if self.mercadopago_access_token:
             print("   ✅ MercadoPago configurado")
     
+    def _request(self, proveedor, operacion, metodo, url, peluqueria_key=None, **kwargs):
+        """
+        Request HTTP a un proveedor de pagos, medido en /metrics
+        
+        Args:
+            proveedor: "mercadopago" o "lemonsqueezy"
+            operacion: Nombre de la operación para las métricas
+            metodo: "get" o "post"
+            url: URL de la API
+            peluqueria_key: Peluquería del pago (None = la del request actual)
+            **kwargs: Parámetros de requests (json, headers)
+        
+        Returns:
+            Response
+        """
+        with medir(proveedor, operacion, peluqueria_key) as medicion:
+            response = requests.request(metodo, url, **kwargs)
+            medicion.http(response.status_code)
+        return response
+    
     # ==================== LEMONSQUEEZY (INTERNACIONAL) ====================
     
     def crear_checkout_lemonsqueezy(self, turno_data):
@@ -117,7 +138,8 @@ class PaymentService:
                 }
             }
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._request("lemonsqueezy", "crear_checkout", "post", url, json=payload, headers=headers,
+                                     peluqueria_key=turno_data["peluqueria_key"])
             
             if response.status_code == 201:
                 data = response.json()
@@ -242,7 +264,8 @@ class PaymentService:
                 "expiration_date_to": (datetime.now() + timedelta(hours=2)).isoformat()
             }
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._request("mercadopago", "crear_preferencia", "post", url, json=payload, headers=headers,
+                                     peluqueria_key=turno_data["peluqueria_key"])
             
             if response.status_code == 201:
                 data = response.json()
@@ -285,7 +308,7 @@ class PaymentService:
                 "Authorization": f"Bearer {self.mercadopago_access_token}"
             }
             
-            response = requests.get(url, headers=headers)
+            response = self._request("mercadopago", "obtener_pago", "get", url, headers=headers)
             
             if response.status_code == 200:
                 return response.json()
@@ -368,7 +391,7 @@ class PaymentService:
                 }
             }
 
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._request("lemonsqueezy", "crear_checkout_onboarding", "post", url, json=payload, headers=headers)
 
             if response.status_code == 201:
                 data = response.json()
@@ -423,7 +446,7 @@ class PaymentService:
                 "back_url": f"{self.app_url}/gracias?plan=argentina",
                 "status": "pending",
             }
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._request("mercadopago", "crear_suscripcion_onboarding", "post", url, json=payload, headers=headers)
             if response.status_code == 201:
                 data = response.json()
                 print(f"Suscripcion MercadoPago creada: {data['id']}")
@@ -491,7 +514,7 @@ class PaymentService:
             if monto:
                 payload["amount"] = float(monto)
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._request("mercadopago", "crear_reembolso", "post", url, json=payload, headers=headers)
             
             if response.status_code == 201:
                 refund_data = response.json()
@@ -538,7 +561,7 @@ class PaymentService:
             if monto:
                 payload["data"]["attributes"]["amount"] = int(monto * 100)  # Centavos
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = self._request("lemonsqueezy", "crear_reembolso", "post", url, json=payload, headers=headers)
             
             if response.status_code == 201:
                 refund_data = response.json()
@@ -0,0 +1,229 @@
+"""
+Registro de Recordatorios Enviados
+Ledger append-only en disco para deduplicar recordatorios cuando Redis no está disponible
+"""
+
+import os
+import json
+import time
+from threading import Lock
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (desarrollo): sin lock entre procesos
+    fcntl = None
+
+# Tiempo que se recuerda un envío (igual que la expiración de las claves rec:* en Redis)
+RETENCION_SEGUNDOS = 48 * 3600
+
+# Cada cuántas escrituras pendientes se fuerza un fsync
+FSYNC_CADA = 50
+
+
+class RecordatoriosLedger:
+    """
+    Registro append-only de recordatorios enviados
+
+    Cada envío se agrega como una línea "<timestamp>\\t<recordatorio_id>".
+    Las escrituras se bufferean y se hace fsync en lote (cada FSYNC_CADA
+    entradas o al llamar a flush()). La compactación reescribe el archivo
+    dejando solo las entradas más nuevas que RETENCION_SEGUNDOS.
+
+    Varios workers de gunicorn comparten el archivo: las escrituras toman un
+    flock compartido sobre "<ruta>.lock" y la compactación uno exclusivo. Antes
+    de escribir se reabre el archivo si otro proceso lo reemplazó al compactar,
+    así ninguna escritura queda en el inode viejo.
+    """
+
+    def __init__(self, ruta, retencion_segundos=RETENCION_SEGUNDOS):
+        """
+        Inicializa el ledger y carga las entradas vigentes
+
+        Args:
+            ruta: Ruta del archivo del ledger
+            retencion_segundos: Antigüedad máxima de una entrada
+        """
+        self.ruta = ruta
+        self.retencion = retencion_segundos
+        self.lock = Lock()
+        self.entradas = {}  # recordatorio_id -> timestamp
+        self.pendientes_fsync = 0
+        self.lineas_en_disco = 0
+        self.archivo = None
+        self.archivo_lock = open(f"{self.ruta}.lock", "a") if fcntl else None
+
+        with self._bloqueo(exclusivo=False):
+            self._cargar()
+            self.archivo = open(self.ruta, "a", encoding="utf-8")
+
+    @contextmanager
+    def _bloqueo(self, exclusivo):
+        """flock entre procesos (compartido para escribir, exclusivo para compactar)"""
+        if self.archivo_lock is None:
+            yield
+            return
+
+        fcntl.flock(self.archivo_lock, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.archivo_lock, fcntl.LOCK_UN)
+
+    def _reabrir_si_reemplazado(self):
+        """Reabre el archivo si otro proceso lo compactó (os.replace cambia el inode)"""
+        try:
+            reemplazado = os.stat(self.ruta).st_ino != os.fstat(self.archivo.fileno()).st_ino
+        except FileNotFoundError:
+            reemplazado = True
+
+        if reemplazado:
+            self.archivo.close()
+            self.archivo = open(self.ruta, "a", encoding="utf-8")
+
+    def _cargar(self):
+        """Lee el ledger descartando entradas vencidas o líneas corruptas"""
+        if not os.path.exists(self.ruta):
+            return
+
+        limite = time.time() - self.retencion
+        self.lineas_en_disco = 0
+
+        with open(self.ruta, "r", encoding="utf-8") as f:
+            for linea in f:
+                self.lineas_en_disco += 1
+                try:
+                    ts, recordatorio_id = linea.rstrip("\n").split("\t", 1)
+                    ts = float(ts)
+                except ValueError:
+                    continue
+                if ts >= limite and ts > self.entradas.get(recordatorio_id, 0):
+                    self.entradas[recordatorio_id] = ts
+
+    def importar_json_legacy(self, ruta_json):
+        """
+        Migra el viejo recordatorios_enviados.json (lista sin fechas)
+        Las entradas se importan con la fecha actual y el archivo se renombra
+
+        Todos los workers lo llaman al arrancar: corre con el flock exclusivo, así
+        uno solo importa y el resto ve el archivo ya renombrado. Si el JSON no
+        está, otro worker pudo haberlo migrado después de que este cargó el ledger:
+        se relee para tener esas entradas.
+        """
+        with self.lock, self._bloqueo(exclusivo=True):
+            try:
+                with open(ruta_json, "r", encoding="utf-8") as f:
+                    datos = json.load(f)
+            except FileNotFoundError:
+                self._cargar()
+                return 0
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"⚠️ No se pudo migrar {ruta_json}: {e}")
+                return 0
+
+            if datos:
+                self._escribir(datos)
+            self._fsync()
+            try:
+                os.replace(ruta_json, f"{ruta_json}.migrado")
+            except FileNotFoundError:
+                # Lo movió alguien sin flock (ej: a mano): las entradas ya quedaron escritas
+                pass
+
+        print(f"📂 Migrados {len(datos)} recordatorios desde {ruta_json}")
+        return len(datos)
+
+    def __contains__(self, recordatorio_id):
+        with self.lock:
+            ts = self.entradas.get(recordatorio_id)
+        return ts is not None and ts >= time.time() - self.retencion
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entradas)
+
+    def agregar(self, recordatorio_id):
+        """Registra un recordatorio enviado"""
+        self.agregar_varios([recordatorio_id])
+
+    def agregar_varios(self, recordatorio_ids):
+        """Registra varios recordatorios con una sola escritura"""
+        if not recordatorio_ids:
+            return
+
+        with self.lock, self._bloqueo(exclusivo=False):
+            self._escribir(recordatorio_ids)
+            if self.pendientes_fsync >= FSYNC_CADA:
+                self._fsync()
+
+    def _escribir(self, recordatorio_ids):
+        """Agrega las líneas al archivo (el caller tiene el lock y el flock)"""
+        ahora = time.time()
+        for rid in recordatorio_ids:
+            self.entradas[rid] = ahora
+        self._reabrir_si_reemplazado()
+        self.archivo.write("".join(f"{ahora}\t{rid}\n" for rid in recordatorio_ids))
+        # Al kernel ya (no espera al fsync): el archivo puede reemplazarse al soltar el flock
+        self.archivo.flush()
+        self.lineas_en_disco += len(recordatorio_ids)
+        self.pendientes_fsync += len(recordatorio_ids)
+
+    def flush(self):
+        """Fuerza el fsync de las escrituras pendientes"""
+        with self.lock:
+            self._fsync()
+
+    def _fsync(self):
+        """fsync sin tomar el lock (el caller ya lo tiene)"""
+        if not self.pendientes_fsync:
+            return
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+        self.pendientes_fsync = 0
+
+    def compactar(self):
+        """
+        Descarta entradas más viejas que la retención y reescribe el archivo
+        Solo reescribe si más de la mitad de las líneas en disco están vencidas.
+        Con el flock exclusivo relee el archivo para no perder lo que agregaron
+        otros workers
+
+        Returns:
+            int: Cantidad de entradas eliminadas
+        """
+        limite = time.time() - self.retencion
+
+        with self.lock, self._bloqueo(exclusivo=True):
+            vencidas = [rid for rid, ts in self.entradas.items() if ts < limite]
+            for rid in vencidas:
+                del self.entradas[rid]
+
+            self._fsync()
+            self._cargar()
+
+            if self.lineas_en_disco <= 2 * len(self.entradas):
+                self._reabrir_si_reemplazado()
+                return len(vencidas)
+
+            self.archivo.close()
+
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write("".join(f"{ts}\t{rid}\n" for rid, ts in self.entradas.items()))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.ruta)
+
+            self.lineas_en_disco = len(self.entradas)
+            self.archivo = open(self.ruta, "a", encoding="utf-8")
+
+        return len(vencidas)
+
+    def cerrar(self):
+        """Hace fsync y cierra el archivo"""
+        with self.lock:
+            self._fsync()
+            self.archivo.close()
+            if self.archivo_lock is not None:
+                self.archivo_lock.close()
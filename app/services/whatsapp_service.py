@@ -1,132 +1,634 @@
 """
-Configuración centralizada de la aplicación
+Servicio de WhatsApp
+Envío de mensajes por Twilio con cola de salida, reintentos y seguimiento de entrega
 """
+
 import os
-import sys
 import json
-from dotenv import load_dotenv
-from zoneinfo import available_timezones
-
-# Detectar modo de ejecución
-MODO_DESARROLLO = 'run_local' in sys.argv[0] or os.getenv('FLASK_ENV') == 'development'
-
-# Cargar variables de entorno según el modo
-if MODO_DESARROLLO:
-    print("=" * 60)
-    print("🧪 MODO DESARROLLO ACTIVADO")
-    print("=" * 60)
-    load_dotenv('.env.local')
-else:
-    print("=" * 60)
-    print("🚀 MODO PRODUCCIÓN")
-    print("=" * 60)
-    load_dotenv()
-
-
-class Config:
-    """Clase de configuración base"""
-    
-    # Flask
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
-    
-    # Twilio/WhatsApp
-    TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
-    TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-    TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
-    VERIFY_TOKEN = os.getenv("VERIFY_TOKEN")
-    
-    # Plantillas de WhatsApp
-    USAR_PLANTILLAS = os.getenv("USAR_PLANTILLAS", "True").lower() == "true"
-    TEMPLATE_CONFIRMACION = os.getenv("TEMPLATE_CONFIRMACION", "HXxxxxx")
-    TEMPLATE_RECORDATORIO = os.getenv("TEMPLATE_RECORDATORIO", "HXxxxxx")
-    TEMPLATE_NUEVO_TURNO = os.getenv("TEMPLATE_NUEVO_TURNO", "HXxxxxx")
-    TEMPLATE_MODIFICADO = os.getenv("TEMPLATE_MODIFICADO", "HXxxxxx")
-    
-    # Google Calendar
-    GOOGLE_SCOPES = ['https://www.googleapis.com/auth/calendar']
-    
-    # Archivos
-    ARCHIVO_RECORDATORIOS = "recordatorios_enviados.json"
-    ARCHIVO_ESTADOS = "user_states.json"
-    ARCHIVO_CLIENTES = "clientes.json"
-    
-    # Directorios
-    DIR_TOKENS = "tokens"
-    DIR_CONFIG = "config"
-    
-    # MongoDB (opcional)
-    MONGODB_URI = os.getenv("MONGODB_URI")
-    MONGODB_DB = os.getenv("MONGODB_DB", "peluqueria_bot")
-    
-    # Redis (opcional)
-    REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-    REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-    REDIS_DB = int(os.getenv("REDIS_DB", 0))
-    REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
-    
-    @classmethod
-    def validar(cls):
-        """Valida que las configuraciones necesarias estén presentes"""
-        # Validar Twilio
-        if not all([cls.TWILIO_ACCOUNT_SID, cls.TWILIO_AUTH_TOKEN, cls.TWILIO_WHATSAPP_NUMBER]):
-            raise ValueError("❌ Faltan variables de entorno de Twilio")
-        
-        # Validar plantillas si están activas
-        if cls.USAR_PLANTILLAS:
-            faltantes = [
-                nombre for nombre, valor in {
-                    "TEMPLATE_CONFIRMACION": cls.TEMPLATE_CONFIRMACION,
-                    "TEMPLATE_RECORDATORIO": cls.TEMPLATE_RECORDATORIO,
-                    "TEMPLATE_NUEVO_TURNO": cls.TEMPLATE_NUEVO_TURNO,
-                    "TEMPLATE_MODIFICADO": cls.TEMPLATE_MODIFICADO,
-                }.items() if not valor or valor == "HXxxxxx"
-            ]
-            
-            if faltantes:
-                print("⚠️ ADVERTENCIA: Faltan Content SIDs de WhatsApp:")
-                for f in faltantes:
-                    print(f"   - {f}")
-        
-        print("✅ Configuración validada correctamente")
-
-
-def cargar_clientes():
-    """Carga la configuración de clientes desde JSON"""
-    ruta_clientes = os.path.join(Config.DIR_CONFIG, Config.ARCHIVO_CLIENTES)
-    
-    # Intentar cargar desde config/
-    if not os.path.exists(ruta_clientes):
-        # Fallback a raíz del proyecto
-        ruta_clientes = Config.ARCHIVO_CLIENTES
-    
+import time
+import uuid
+import random
+import heapq
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as ErrorConexion, ConnectTimeout
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+from app.core.metricas import medir, peluqueria_actual
+
+# Prioridades de la cola (menor número = sale primero)
+PRIORIDAD_CONVERSACION = 0   # Respuestas al usuario dentro de la conversación
+PRIORIDAD_NOTIFICACION = 5   # Avisos al peluquero / dueño
+PRIORIDAD_RECORDATORIO = 10  # Recordatorios automáticos
+
+# Códigos HTTP de Twilio que vale la pena reintentar
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Cuánto se guarda el registro de entrega de cada mensaje en Redis
+TTL_REGISTRO_ENTREGA = 7 * 24 * 3600
+
+# Largo máximo del body de un mensaje de WhatsApp en Twilio
+LIMITE_CARACTERES = 1600
+
+# Separador entre las partes de una respuesta agrupada
+SEPARADOR_PARTES = "\n\n"
+
+
+class MensajeSaliente:
+    """Mensaje encolado para enviar por WhatsApp"""
+
+    __slots__ = ("mensaje_id", "destino", "cuerpo", "content_sid", "variables",
+                 "prioridad", "intentos", "encolado_en", "peluqueria", "al_terminar")
+
+    def __init__(self, destino, cuerpo=None, content_sid=None, variables=None,
+                 prioridad=PRIORIDAD_CONVERSACION, al_terminar=None):
+        self.mensaje_id = uuid.uuid4().hex
+        self.destino = destino
+        self.cuerpo = cuerpo
+        self.content_sid = content_sid
+        self.variables = variables
+        self.prioridad = prioridad
+        self.intentos = 0
+        self.encolado_en = time.time()
+        # Se envía desde otro thread: la peluquería de las métricas se toma al encolar
+        self.peluqueria = peluqueria_actual()
+        # al_terminar(sid, error): se llama una vez, cuando Twilio lo aceptó o se descartó
+        self.al_terminar = al_terminar
+
+
+class WhatsAppService:
+    """
+    Servicio para enviar mensajes de WhatsApp vía Twilio
+
+    Los mensajes se encolan con prioridad y los envía un pool de workers
+    que comparten un único cliente HTTP con pool de conexiones. Los mensajes
+    a un mismo número salen de a uno y en el orden en que se encolaron (la
+    prioridad ordena entre números distintos). Se reintentan
+    con backoff exponencial solo los errores en los que Twilio seguro no creó
+    el mensaje: no se pudo conectar, 429 y 5xx. Un timeout de lectura o una
+    conexión cortada después de mandar el request no se reintentan (el mensaje
+    pudo haberse creado y se mandaría dos veces).
+    Un mensaje que Twilio ya aceptó (tiene SID) nunca se reenvía.
+    """
+
+    def __init__(self):
+        """Inicializa el servicio (los workers arrancan con el primer envío)"""
+        self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+        self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+        self.numero_origen = os.getenv("TWILIO_WHATSAPP_NUMBER", "")
+        self.status_callback = os.getenv("TWILIO_STATUS_CALLBACK_URL")
+
+        self.num_workers = int(os.getenv("WHATSAPP_WORKERS", 4))
+        self.max_reintentos = int(os.getenv("WHATSAPP_MAX_REINTENTOS", 5))
+        self.backoff_base = float(os.getenv("WHATSAPP_BACKOFF_BASE", 1.0))
+
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        # Cola con prioridad: (prioridad, listo_en, secuencia, mensaje). Solo tiene el
+        # primer mensaje de cada destino; el resto espera en _por_destino (FIFO)
+        self._cola = []
+        self._por_destino = {}  # destino -> deque de mensajes (el primero está en la cola o enviándose)
+        self._cola_cond = threading.Condition()
+        self._secuencia = 0
+        self._workers = []
+        self._pid = None
+
+        # Registro local de entregas (fallback si Redis no está disponible)
+        self._entregas = {}
+        self._entregas_lock = threading.Lock()
+
+        # Buffer de respuesta del turno actual (uno por thread de request)
+        self._buffer = threading.local()
+
+    # ==================== CLIENTE HTTP ====================
+
+    def _get_client(self):
+        """Cliente de Twilio compartido, con pool de conexiones del tamaño del pool de workers"""
+        with self._client_lock:
+            if self._client is None:
+                if not all([self.account_sid, self.auth_token]):
+                    raise ValueError("❌ Faltan variables de entorno de Twilio")
+
+                http_client = TwilioHttpClient(pool_connections=True)
+                adaptador = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=max(self.num_workers, 1)
+                )
+                http_client.session.mount("https://", adaptador)
+
+                self._client = Client(self.account_sid, self.auth_token, http_client=http_client)
+            return self._client
+
+    # ==================== API PÚBLICA ====================
+
+    def enviar_mensaje(self, mensaje, numero, prioridad=PRIORIDAD_CONVERSACION, al_terminar=None):
+        """
+        Encola un mensaje de texto
+
+        Args:
+            mensaje: Texto a enviar
+            numero: Número destino (con o sin prefijo whatsapp:)
+            prioridad: PRIORIDAD_CONVERSACION, PRIORIDAD_NOTIFICACION o PRIORIDAD_RECORDATORIO
+            al_terminar: Callback (sid, error) cuando Twilio lo acepta (sid) o se descarta
+                         (sid None); corre en un worker de la cola
+
+        Returns:
+            str: ID interno del mensaje (truthy) o None si no se pudo encolar.
+                 Que se haya encolado no significa que Twilio lo haya aceptado
+        """
+        if not mensaje or not numero:
+            return None
+
+        # Dentro de respuesta_agrupada, las respuestas al mismo usuario se acumulan
+        partes = self._partes_buffer(numero)
+        if partes is not None and prioridad == PRIORIDAD_CONVERSACION and al_terminar is None:
+            partes.append(mensaje.strip())
+            return "agrupado"
+
+        return self._encolar(MensajeSaliente(numero, cuerpo=mensaje, prioridad=prioridad, al_terminar=al_terminar))
+
+    def enviar_con_plantilla(self, telefono, content_sid, variables, prioridad=PRIORIDAD_RECORDATORIO,
+                             al_terminar=None):
+        """
+        Encola un mensaje con plantilla aprobada de WhatsApp (Content API)
+
+        Args:
+            telefono: Número destino
+            content_sid: SID de la plantilla (HX...)
+            variables: Dict con las variables de la plantilla
+            prioridad: Prioridad en la cola
+            al_terminar: Callback (sid, error), como en enviar_mensaje
+
+        Returns:
+            str: ID interno del mensaje o None si no se pudo encolar
+        """
+        if not content_sid or not telefono:
+            return None
+
+        # Una plantilla no se puede agrupar: enviar antes lo acumulado para respetar el orden
+        if self._partes_buffer(telefono):
+            self._vaciar_buffer()
+
+        return self._encolar(MensajeSaliente(
+            telefono,
+            content_sid=content_sid,
+            variables=variables or {},
+            prioridad=prioridad,
+            al_terminar=al_terminar
+        ))
+
+    def enviar_mensaje_sync(self, mensaje, numero):
+        """
+        Envía un mensaje sin pasar por la cola (bloquea hasta que Twilio responde)
+        Útil para scripts de administración
+
+        Returns:
+            str: SID de Twilio o None si falló
+        """
+        msg = MensajeSaliente(numero, cuerpo=mensaje)
+        try:
+            return self._enviar(msg)
+        except Exception as e:
+            print(f"❌ Error enviando mensaje a {numero}: {e}")
+            return None
+
+    @contextmanager
+    def respuesta_agrupada(self, numero):
+        """
+        Agrupa en un solo mensaje todas las respuestas a `numero` del turno actual
+
+        Mientras el bloque está activo, enviar_mensaje(..., numero) acumula las
+        partes y al salir se envían unidas. Solo se divide en varios mensajes si
+        se supera el límite de caracteres de WhatsApp.
+
+        Uso:
+            with whatsapp_service.respuesta_agrupada(numero):
+                handler.procesar(...)
+        """
+        if getattr(self._buffer, "numero", None) is not None:
+            # Ya hay un buffer activo en este thread (bloques anidados)
+            yield
+            return
+
+        self._buffer.numero = _formatear_numero(numero)
+        self._buffer.partes = []
+        try:
+            yield
+        finally:
+            self._vaciar_buffer()
+            self._buffer.numero = None
+            self._buffer.partes = None
+
+    def _partes_buffer(self, numero):
+        """Lista de partes acumuladas si hay un buffer activo para este número"""
+        numero_buffer = getattr(self._buffer, "numero", None)
+        if numero_buffer is None or numero_buffer != _formatear_numero(numero):
+            return None
+        return self._buffer.partes
+
+    def _vaciar_buffer(self):
+        """Encola lo acumulado en el buffer como la menor cantidad de mensajes posible"""
+        partes = getattr(self._buffer, "partes", None)
+        if not partes:
+            return
+
+        numero = self._buffer.numero
+        self._buffer.partes = []
+
+        # Todas las partes juntas: otro thread no puede meter un mensaje al mismo número en el medio
+        self._encolar_varios([
+            MensajeSaliente(numero, cuerpo=cuerpo, prioridad=PRIORIDAD_CONVERSACION)
+            for cuerpo in dividir_mensaje(SEPARADOR_PARTES.join(p for p in partes if p))
+        ])
+
+    def pendientes(self):
+        """Cantidad de mensajes sin terminar (en la cola, esperando su turno o enviándose)"""
+        with self._cola_cond:
+            return sum(len(fila) for fila in self._por_destino.values())
+
+    def abandonar_pendientes(self):
+        """
+        Descarta los mensajes que todavía no empezaron a enviarse (al apagar el proceso)
+        Sus callbacks reciben el error, así quien los encoló puede reintentarlos después.
+        Los que un worker está enviando no se tocan.
+
+        Returns:
+            int: Cantidad de mensajes descartados
+        """
+        with self._cola_cond:
+            en_cola = {id(item[3]) for item in self._cola}
+            abandonados = []
+            for destino, fila in list(self._por_destino.items()):
+                # El primero de la fila está enviándose si no está en la cola
+                enviando = fila[0] if id(fila[0]) not in en_cola else None
+                abandonados.extend(msg for msg in fila if msg is not enviando)
+                if enviando:
+                    self._por_destino[destino] = deque([enviando])
+                else:
+                    del self._por_destino[destino]
+            self._cola = []
+
+        for msg in abandonados:
+            self._avisar(msg, None, "no enviado: el proceso se apagó")
+        return len(abandonados)
+
+    # ==================== COLA Y WORKERS ====================
+
+    def _encolar(self, msg):
+        """Agrega un mensaje a la cola y se asegura de que haya workers corriendo"""
+        return self._encolar_varios([msg])
+
+    def _encolar_varios(self, mensajes):
+        """
+        Encola varios mensajes como una unidad: quedan seguidos y en orden en
+        la fila de su destino (ej: las partes de una respuesta larga)
+
+        Returns:
+            str: ID interno del primer mensaje o None si no se pudieron encolar
+        """
+        if not mensajes:
+            return None
+
+        try:
+            self._asegurar_workers()
+            with self._cola_cond:
+                for msg in mensajes:
+                    self._agregar(msg)
+            return mensajes[0].mensaje_id
+        except Exception as e:
+            print(f"❌ Error encolando mensaje para {mensajes[0].destino}: {e}")
+            return None
+
+    def _agregar(self, msg):
+        """Pone el mensaje al final de la fila de su destino (con _cola_cond tomado)"""
+        destino = _formatear_numero(msg.destino)
+        fila = self._por_destino.get(destino)
+        if fila:
+            fila.append(msg)
+            return
+
+        self._por_destino[destino] = deque([msg])
+        self._programar(msg)
+
+    def _programar(self, msg, demora=0.0):
+        """Pasa a la cola el primer mensaje de un destino (con _cola_cond tomado)"""
+        self._secuencia += 1
+        heapq.heappush(self._cola, (msg.prioridad, time.time() + demora, self._secuencia, msg))
+        self._cola_cond.notify()
+
+    def _terminar(self, msg):
+        """Saca de su fila un mensaje enviado o descartado y libera el siguiente del destino"""
+        destino = _formatear_numero(msg.destino)
+        with self._cola_cond:
+            fila = self._por_destino.get(destino)
+            if fila and fila[0] is msg:
+                fila.popleft()
+            if fila:
+                self._programar(fila[0])
+            else:
+                self._por_destino.pop(destino, None)
+
+    def _asegurar_workers(self):
+        """Arranca el pool de workers (una vez por proceso, también después de un fork)"""
+        if self._pid == os.getpid() and self._workers:
+            return
+
+        with self._client_lock:
+            if self._pid == os.getpid() and self._workers:
+                return
+
+            # Después de un fork los threads y conexiones del padre no existen;
+            # lo que tenía encolado lo envía el padre
+            self._client = None
+            self._workers = []
+            self._pid = os.getpid()
+            with self._cola_cond:
+                self._cola = []
+                self._por_destino = {}
+
+            for i in range(max(self.num_workers, 1)):
+                worker = threading.Thread(
+                    target=self._loop_worker,
+                    daemon=True,
+                    name=f"WhatsAppWorker-{i}"
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _tomar_siguiente(self):
+        """Bloquea hasta que haya un mensaje listo para enviar"""
+        with self._cola_cond:
+            while True:
+                if not self._cola:
+                    self._cola_cond.wait()
+                    continue
+
+                ahora = time.time()
+                if self._cola[0][1] <= ahora:
+                    return heapq.heappop(self._cola)[3]
+
+                # El primero está esperando un reintento: buscar otro que ya esté listo
+                listos = [item for item in self._cola if item[1] <= ahora]
+                if listos:
+                    item = min(listos)
+                    self._cola.remove(item)
+                    heapq.heapify(self._cola)
+                    return item[3]
+
+                proximo = min(item[1] for item in self._cola)
+                self._cola_cond.wait(timeout=max(proximo - ahora, 0.01))
+
+    def _loop_worker(self):
+        """Loop de cada worker: toma mensajes de la cola y los envía"""
+        while True:
+            msg = self._tomar_siguiente()
+            reprogramado = False
+            try:
+                reprogramado = self._procesar(msg)
+            except Exception as e:
+                print(f"❌ Error inesperado en worker de WhatsApp: {e}")
+            finally:
+                # Mientras se reintenta, el resto de los mensajes al mismo número espera
+                if not reprogramado:
+                    self._avisar(msg, None, "error inesperado en el worker")
+                    self._terminar(msg)
+
+    def _avisar(self, msg, sid, error=None):
+        """Llama una sola vez al callback del mensaje (si tiene)"""
+        al_terminar, msg.al_terminar = msg.al_terminar, None
+        if al_terminar is None:
+            return
+        try:
+            al_terminar(sid, error)
+        except Exception as e:
+            print(f"❌ Error en el callback del mensaje a {msg.destino}: {e}")
+
+    def _procesar(self, msg):
+        """
+        Envía un mensaje y lo reprograma si el error es transitorio
+
+        Returns:
+            bool: True si quedó programado un reintento
+        """
+        msg.intentos += 1
+
+        try:
+            sid = self._enviar(msg)
+            self.registrar_envio(msg, sid)
+            self._avisar(msg, sid)
+            return False
+
+        except TwilioRestException as e:
+            reintentable = e.status in ESTADOS_REINTENTABLES
+            error = f"{e.status} {e.code}: {e.msg}"
+
+        except Exception as e:
+            # Sin respuesta de Twilio: solo es seguro reintentar si el request no salió
+            reintentable = _fallo_al_conectar(e)
+            error = str(e) if reintentable else f"{e} (sin respuesta de Twilio, puede haberse enviado)"
+
+        if reintentable and msg.intentos < self.max_reintentos:
+            demora = self.backoff_base * (2 ** (msg.intentos - 1)) + random.uniform(0, self.backoff_base)
+            print(f"⚠️ Falló envío a {msg.destino} (intento {msg.intentos}): {error}. Reintento en {demora:.1f}s")
+            with self._cola_cond:
+                self._programar(msg, demora=demora)
+            return True
+
+        print(f"❌ Mensaje a {msg.destino} descartado tras {msg.intentos} intento(s): {error}")
+        self.registrar_envio(msg, None, error=error)
+        self._avisar(msg, None, error)
+        return False
+
+    def _enviar(self, msg):
+        """
+        Hace la llamada a Twilio
+
+        Returns:
+            str: SID del mensaje creado
+        """
+        parametros = {
+            "from_": _formatear_numero(self.numero_origen),
+            "to": _formatear_numero(msg.destino),
+        }
+
+        if msg.content_sid:
+            parametros["content_sid"] = msg.content_sid
+            parametros["content_variables"] = json.dumps(msg.variables, ensure_ascii=False)
+        else:
+            parametros["body"] = msg.cuerpo
+
+        if self.status_callback:
+            parametros["status_callback"] = self.status_callback
+
+        with medir("twilio", "messages.create", msg.peluqueria):
+            mensaje = self._get_client().messages.create(**parametros)
+        return mensaje.sid
+
+    # ==================== SEGUIMIENTO DE ENTREGA ====================
+
+    def registrar_envio(self, msg, sid, error=None):
+        """Crea el registro de entrega de un mensaje enviado (o descartado)"""
+        registro = {
+            "mensaje_id": msg.mensaje_id,
+            "sid": sid or "",
+            "destino": msg.destino,
+            "estado": "enviado" if sid else "fallido",
+            "intentos": msg.intentos,
+            "error": error or "",
+            "actualizado_en": datetime.utcnow().isoformat(),
+        }
+        self._guardar_registro(sid or msg.mensaje_id, registro)
+
+    def registrar_estado(self, sid, estado, error_code=None):
+        """
+        Incorpora al registro de entrega un callback de estado de Twilio
+        (queued, sent, delivered, read, failed, undelivered)
+
+        Args:
+            sid: MessageSid de Twilio
+            estado: MessageStatus
+            error_code: ErrorCode si el mensaje falló
+        """
+        if not sid:
+            return
+
+        registro = self.obtener_registro(sid) or {"sid": sid}
+        registro["estado"] = estado
+        registro["actualizado_en"] = datetime.utcnow().isoformat()
+        if error_code:
+            registro["error"] = str(error_code)
+
+        self._guardar_registro(sid, registro)
+
+    def obtener_registro(self, sid):
+        """Devuelve el registro de entrega de un mensaje o None"""
+        redis = _get_redis()
+        if redis:
+            try:
+                datos = redis.hgetall(f"wa:msg:{sid}")
+                if datos:
+                    return datos
+            except Exception:
+                pass
+
+        with self._entregas_lock:
+            registro = self._entregas.get(sid)
+            return dict(registro) if registro else None
+
+    def _guardar_registro(self, clave, registro):
+        """Guarda el registro en Redis (compartido entre workers) o en memoria"""
+        redis = _get_redis()
+        if redis:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                pipe.hset(f"wa:msg:{clave}", mapping=registro)
+                pipe.expire(f"wa:msg:{clave}", TTL_REGISTRO_ENTREGA)
+                pipe.execute()
+                return
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar registro de entrega en Redis: {e}")
+
+        with self._entregas_lock:
+            self._entregas[clave] = registro
+            # Evitar crecimiento sin límite en memoria
+            if len(self._entregas) > 10000:
+                for vieja in list(self._entregas)[:1000]:
+                    del self._entregas[vieja]
+
+
+def dividir_mensaje(texto, limite=LIMITE_CARACTERES):
+    """
+    Divide un texto en mensajes de hasta `limite` caracteres
+    Corta preferentemente entre párrafos, después entre líneas y solo
+    como último recurso en medio de una línea
+
+    Returns:
+        list: Lista de mensajes
+    """
+    if len(texto) <= limite:
+        return [texto]
+
+    mensajes = []
+    actual = ""
+
+    for bloque in _bloques(texto, limite):
+        candidato = f"{actual}{SEPARADOR_PARTES}{bloque}" if actual else bloque
+        if len(candidato) <= limite:
+            actual = candidato
+        else:
+            mensajes.append(actual)
+            actual = bloque
+
+    if actual:
+        mensajes.append(actual)
+
+    return mensajes
+
+
+def _bloques(texto, limite):
+    """Parte el texto en párrafos, y los párrafos demasiado largos en líneas o trozos"""
+    for parrafo in texto.split(SEPARADOR_PARTES):
+        if len(parrafo) <= limite:
+            yield parrafo
+            continue
+
+        linea_actual = ""
+        for linea in parrafo.split("\n"):
+            while len(linea) > limite:
+                if linea_actual:
+                    yield linea_actual
+                    linea_actual = ""
+                yield linea[:limite]
+                linea = linea[limite:]
+
+            candidato = f"{linea_actual}\n{linea}" if linea_actual else linea
+            if len(candidato) <= limite:
+                linea_actual = candidato
+            else:
+                yield linea_actual
+                linea_actual = linea
+
+        if linea_actual:
+            yield linea_actual
+
+
+def _fallo_al_conectar(error):
+    """
+    True si el error ocurrió antes de mandar el request (Twilio no recibió nada)
+
+    requests envuelve los errores de urllib3: ConnectTimeout al conectar y
+    ConnectionError con un NewConnectionError (DNS, conexión rechazada) como causa.
+    Un ConnectionError por una conexión reseteada o un ReadTimeout no cuentan.
+    """
+    if isinstance(error, ConnectTimeout):
+        return True
+    if isinstance(error, ErrorConexion):
+        causa = error.args[0] if error.args else None
+        causa = getattr(causa, "reason", causa)  # MaxRetryError -> error de urllib3
+        return isinstance(causa, (NewConnectionError, ConnectTimeoutError))
+    return False
+
+
+def _formatear_numero(numero):
+    """Asegura el prefijo whatsapp: que requiere Twilio"""
+    numero = str(numero).strip()
+    return numero if numero.startswith("whatsapp:") else f"whatsapp:{numero}"
+
+
+def _get_redis():
+    """Cliente Redis compartido (import tardío para no crear dependencias circulares)"""
     try:
-        with open(ruta_clientes, "r", encoding="utf-8") as f:
-            peluquerias = json.load(f)
-        
-        # Validar timezones
-        for cliente_id, config in peluquerias.items():
-            tz = config.get("timezone")
-            if not tz:
-                raise ValueError(f"❌ Cliente {cliente_id} no tiene timezone configurado")
-            if tz not in available_timezones():
-                raise ValueError(f"❌ Timezone inválido para {cliente_id}: {tz}")
-        
-        print(f"✅ Clientes cargados: {len(peluquerias)}")
-        for key, config in peluquerias.items():
-            print(f"   • {config['nombre']} ({key})")
-        
-        return peluquerias
-        
-    except FileNotFoundError:
-        raise FileNotFoundError(f"❌ No se encontró {ruta_clientes}")
-    except json.JSONDecodeError:
-        raise ValueError(f"❌ {ruta_clientes} está corrupto")
-
-
-# Inicializar
-Config.validar()
-PELUQUERIAS = cargar_clientes()
-
-# Crear directorios necesarios
-os.makedirs(Config.DIR_TOKENS, exist_ok=True)
-os.makedirs(Config.DIR_CONFIG, exist_ok=True)
\ No newline at end of file
+        from app.bot.states.state_manager import get_redis_client
+        return get_redis_client()
+    except Exception:
+        return None
+
+
+# Instancia global del servicio
+whatsapp_service = WhatsAppService()
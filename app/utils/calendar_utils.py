@@ -9,8 +9,7 @@ from app.services.calendar_service import CalendarService
 from app.utils.time_utils import ahora_local, crear_datetime_local
 
 try:
-    from app.core.database import obtener_turnos_por_telefono
-    MONGODB_DISPONIBLE = True
+    from app.core.database import obtener_turnos_por_telefono, MONGODB_DISPONIBLE
 except ImportError:
     MONGODB_DISPONIBLE = False
     def obtener_turnos_por_telefono(*args, **kwargs): return []
@@ -218,7 +217,7 @@ class CalendarUtils:
             
             for idx, rango in enumerate(horarios_dia):
                 # Validación estricta
-                if not isinstance(rango, list) or len(rango) != 2:
+                if not isinstance(rango, (list, tuple)) or len(rango) != 2:
                     print(f"❌ Rango inválido en posición {idx}: {rango}")
                     continue
                 
@@ -345,7 +344,7 @@ class CalendarUtils:
                 horarios_dia = peluquero.get("horarios", {}).get(dia_nombre)
                 if horarios_dia:
                     # Manejar formato partidos
-                    if isinstance(horarios_dia[0], list):
+                    if isinstance(horarios_dia[0], (list, tuple)):
                         # Formato nuevo: [["09:00", "13:00"], ["14:00", "18:00"]]
                         # Tomar el cierre del último rango
                         hora_cierre_str = horarios_dia[-1][1]
@@ -412,7 +411,18 @@ class CalendarUtils:
             if MONGODB_DISPONIBLE:
                 turnos_db = obtener_turnos_por_telefono(peluqueria_key, telefono)
                 if turnos_db:
-                    return turnos_db
+                    tz = pytz.timezone(self.peluquerias.get(peluqueria_key, {}).get(
+                        "timezone", "America/Argentina/Buenos_Aires"
+                    ))
+                    # Mismo formato que los turnos de Calendar (el id es el del evento)
+                    return [
+                        {
+                            "id": turno.google_event_id or turno.id,
+                            "resumen": turno.resumen,
+                            "inicio": turno.inicio_en(tz)
+                        }
+                        for turno in turnos_db
+                    ]
             
             # Fallback a Google Calendar
             if peluqueria_key not in self.peluquerias:
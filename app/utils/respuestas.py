@@ -0,0 +1,150 @@
+"""
+Respuestas Precompiladas
+- Las traducciones se compilan una sola vez (campos detectados, textos fijos sin formatear)
+- Las respuestas estáticas de cada peluquería (menú, servicios, FAQ, ubicación)
+  se renderizan una vez por (peluquería, idioma, versión de configuración)
+
+Cuando la configuración se recarga cambia PELUQUERIAS.version y las respuestas
+renderizadas con la versión anterior se descartan solas.
+"""
+
+import threading
+from string import Formatter
+from types import MappingProxyType
+
+from app.utils.translations import TRANSLATIONS
+
+IDIOMA_POR_DEFECTO = "es"
+
+_SIN_CONFIG = MappingProxyType({})
+
+
+class PlantillaTexto:
+    """
+    Texto de una traducción ya analizado
+    Si no tiene campos, render() devuelve el texto sin formatear nada
+    """
+
+    __slots__ = ("texto", "campos")
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.campos = frozenset(
+            campo.split(".")[0].split("[")[0]
+            for _, campo, _, _ in Formatter().parse(texto)
+            if campo
+        )
+
+    def render(self, **valores):
+        if not self.campos:
+            return self.texto
+        try:
+            return self.texto.format_map(valores)
+        except KeyError:
+            # Igual que t(): si falta una variable se devuelve el texto sin formatear
+            return self.texto
+
+
+def compilar_traducciones(traducciones):
+    """
+    Compila todas las traducciones
+
+    Args:
+        traducciones: Dict idioma -> {clave: texto}
+
+    Returns:
+        dict: idioma -> {clave: PlantillaTexto}
+    """
+    compiladas = {
+        idioma: {clave: PlantillaTexto(texto) for clave, texto in textos.items()}
+        for idioma, textos in traducciones.items()
+    }
+
+    # Una traducción con otros campos que la de referencia rompería al formatear
+    base = compiladas[IDIOMA_POR_DEFECTO]
+    for idioma, plantillas in compiladas.items():
+        for clave, plantilla in plantillas.items():
+            if clave in base and plantilla.campos != base[clave].campos:
+                print(f"⚠️ Traducción '{clave}' ({idioma}) usa campos distintos: {sorted(plantilla.campos)}")
+
+    return compiladas
+
+
+PLANTILLAS = compilar_traducciones(TRANSLATIONS)
+
+
+def plantilla(clave, idioma=IDIOMA_POR_DEFECTO):
+    """
+    Plantilla compilada de una traducción (fallback a español y a la clave)
+
+    Returns:
+        PlantillaTexto
+    """
+    plantillas = PLANTILLAS.get(idioma, PLANTILLAS[IDIOMA_POR_DEFECTO])
+    encontrada = plantillas.get(clave)
+    if encontrada is None:
+        encontrada = plantillas[clave] = PlantillaTexto(clave)
+    return encontrada
+
+
+class CacheRespuestas:
+    """
+    Respuestas estáticas ya renderizadas por (peluquería, idioma, respuesta)
+
+    Cada entrada guarda la versión y el objeto de config con que se generó:
+    si la configuración se recargó (o la peluquería cambió) se vuelve a generar.
+
+    Uso:
+        texto = respuestas.obtener(self.peluquerias, peluqueria_key, "servicios",
+                                   self._generar_servicios)
+    """
+
+    def __init__(self):
+        self.entradas = {}  # (peluqueria_key, idioma, nombre) -> (version, config, texto)
+        self.version = None
+        self.lock = threading.Lock()
+
+    def obtener(self, peluquerias, peluqueria_key, nombre, generar, idioma=None):
+        """
+        Devuelve la respuesta renderizada, generándola si hace falta
+
+        Args:
+            peluquerias: Registro de configuración (PELUQUERIAS o un dict)
+            peluqueria_key: Identificador del cliente (None = respuesta genérica)
+            nombre: Nombre de la respuesta (ej: "menu", "faq")
+            generar: Función (config, idioma) -> str
+            idioma: Idioma (None = el configurado en la peluquería)
+
+        Returns:
+            str: Texto de la respuesta
+        """
+        config = peluquerias.get(peluqueria_key, _SIN_CONFIG) if peluqueria_key else _SIN_CONFIG
+        version = getattr(peluquerias, "version", None)
+        idioma = idioma or config.get("idioma", IDIOMA_POR_DEFECTO)
+        clave = (peluqueria_key, idioma, nombre)
+
+        entrada = self.entradas.get(clave)
+        if entrada is not None and entrada[0] == version and entrada[1] is config:
+            return entrada[2]
+
+        texto = generar(config, idioma)
+
+        with self.lock:
+            if version != self.version:
+                # Configuración nueva: todo lo renderizado antes quedó viejo
+                self.entradas.clear()
+                self.version = version
+            self.entradas[clave] = (version, config, texto)
+
+        return texto
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+
+    def __len__(self):
+        return len(self.entradas)
+
+
+# Instancia global
+respuestas = CacheRespuestas()
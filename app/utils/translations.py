@@ -8,6 +8,7 @@ TRANSLATIONS = {
     "es": {
         # Menú
         "menu_welcome": "👋 *¡Bienvenido a {nombre}!*",
+        "menu_question": "¿Qué querés hacer?",
         "menu_option_1": "1️⃣ Pedir turno",
         "menu_option_2": "2️⃣ Ver mis turnos",
         "menu_option_3": "3️⃣ Cancelar turno",
@@ -20,6 +21,7 @@ TRANSLATIONS = {
         
         # Mensajes comunes
         "invalid_option": "❓ No entendí '{texto}'",
+        "choose_menu_number": "Por favor elegí un número del menú:",
         "operation_cancelled": "❌ Operación cancelada",
         "error_occurred": "❌ Ocurrió un error",
         "back_to_menu": "Escribí *menu* para volver",
@@ -35,12 +37,14 @@ TRANSLATIONS = {
         
         # Despedida
         "goodbye": "👋 ¡Gracias por contactarnos!",
+        "welcome_message": "👋 ¡Hola! Bienvenido al sistema de turnos de {nombre}",
         "come_back": "Cuando quieras volver, escribí *hola* o *menu*"
     },
     
     "en": {
         # Menu
         "menu_welcome": "👋 *Welcome to {nombre}!*",
+        "menu_question": "What would you like to do?",
         "menu_option_1": "1️⃣ Book appointment",
         "menu_option_2": "2️⃣ View my appointments",
         "menu_option_3": "3️⃣ Cancel appointment",
@@ -53,6 +57,7 @@ TRANSLATIONS = {
         
         # Common messages
         "invalid_option": "❓ I didn't understand '{texto}'",
+        "choose_menu_number": "Please choose a number from the menu:",
         "operation_cancelled": "❌ Operation cancelled",
         "error_occurred": "❌ An error occurred",
         "back_to_menu": "Type *menu* to go back",
@@ -68,12 +73,14 @@ TRANSLATIONS = {
         
         # Goodbye
         "goodbye": "👋 Thanks for contacting us!",
+        "welcome_message": "👋 Hello! Welcome to {nombre}'s booking system",
         "come_back": "Type *hello* or *menu* anytime to come back"
     },
     
     "pt": {
         # Menu
         "menu_welcome": "👋 *Bem-vindo ao {nombre}!*",
+        "menu_question": "O que você quer fazer?",
         "menu_option_1": "1️⃣ Marcar horário",
         "menu_option_2": "2️⃣ Ver meus horários",
         "menu_option_3": "3️⃣ Cancelar horário",
@@ -86,6 +93,7 @@ TRANSLATIONS = {
         
         # Common messages
         "invalid_option": "❓ Não entendi '{texto}'",
+        "choose_menu_number": "Por favor escolha um número do menu:",
         "operation_cancelled": "❌ Operação cancelada",
         "error_occurred": "❌ Ocorreu um erro",
         "back_to_menu": "Digite *menu* para voltar",
@@ -101,11 +109,41 @@ TRANSLATIONS = {
         
         # Goodbye
         "goodbye": "👋 Obrigado por entrar em contato!",
+        "welcome_message": "👋 Olá! Bem-vindo ao sistema de agendamento de {nombre}",
         "come_back": "Digite *olá* ou *menu* quando quiser voltar"
     }
 }
 
 
+# Frases que disparan cada intención (se normalizan al compilar: sin acentos,
+# signos ni mayúsculas; ver app/bot/utils/intenciones.py)
+INTENCIONES = {
+    "es": {
+        "menu": [
+            "menu", "inicio", "hola", "hi", "hey",
+            "buenas", "buenos dias", "buenas tardes", "buen dia", "buenas noches"
+        ],
+        "cancelar": ["cancelar", "salir", "abortar", "stop", "volver"],
+        "si": ["si", "s", "dale", "ok", "okay", "claro", "confirmo", "confirmar", "de una"],
+        "no": ["no", "n", "nop", "no gracias", "mejor no"]
+    },
+    
+    "en": {
+        "menu": ["menu", "start", "hello", "hi", "hey", "good morning", "good afternoon", "good evening"],
+        "cancelar": ["cancel", "exit", "quit", "stop", "back"],
+        "si": ["yes", "y", "yeah", "yep", "ok", "okay", "sure", "confirm"],
+        "no": ["no", "n", "nope", "no thanks"]
+    },
+    
+    "pt": {
+        "menu": ["menu", "inicio", "ola", "oi", "bom dia", "boa tarde", "boa noite"],
+        "cancelar": ["cancelar", "sair", "parar", "voltar"],
+        "si": ["sim", "s", "ok", "claro", "confirmo", "confirmar", "pode ser"],
+        "no": ["nao", "n", "nao obrigado"]
+    }
+}
+
+
 def t(key, idioma="es", **kwargs):
     """
     Obtiene una traducción
@@ -118,20 +156,9 @@ def t(key, idioma="es", **kwargs):
     Returns:
         str: Texto traducido
     """
-    # Obtener traducciones del idioma (fallback a español)
-    translations = TRANSLATIONS.get(idioma, TRANSLATIONS["es"])
-    
-    # Obtener texto (fallback a la clave si no existe)
-    texto = translations.get(key, key)
-    
-    # Formatear con variables si hay
-    if kwargs:
-        try:
-            texto = texto.format(**kwargs)
-        except KeyError:
-            pass
-    
-    return texto
+    # Plantilla compilada una sola vez (fallback a español y a la clave)
+    from app.utils.respuestas import plantilla
+    return plantilla(key, idioma).render(**kwargs)
 
 
 def get_available_languages():
@@ -14,7 +14,23 @@ Flujo:
 import os
 from datetime import datetime, timedelta
 from app.core.database import clientes_collection
-from app.services.whatsapp_service import whatsapp_service
+from app.core.cache_invalidation import CacheTTL
+from app.services.whatsapp_service import whatsapp_service, PRIORIDAD_NOTIFICACION
+
+# Documento de suscripción por peluquería. Los cambios hechos por fuera del bot
+# (scripts, webhooks de pagos) llegan por invalidación, así que el TTL puede ser largo
+cache_suscripciones = CacheTTL(
+    "suscripciones",
+    ttl=int(os.getenv("CACHE_SUSCRIPCION_TTL", "3600")),
+    coleccion="clientes",
+    campo_clave="peluqueria_key"
+)
+
+# Campos que usa la verificación
+PROYECCION_SUSCRIPCION = {
+    "estado_pago": 1, "suscripcion_activa": 1, "trial_inicio": 1, "gracia_inicio": 1,
+    "telefono": 1, "plan": 1, "payment_url": 1, "nombre_negocio": 1,
+}
 
 
 def verificar_suscripcion(peluqueria_key: str) -> dict:
@@ -29,7 +45,10 @@ def verificar_suscripcion(peluqueria_key: str) -> dict:
         }
     """
     try:
-        cliente = clientes_collection.find_one({"peluqueria_key": peluqueria_key})
+        cliente = cache_suscripciones.obtener_o_cargar(
+            peluqueria_key,
+            lambda: clientes_collection.find_one({"peluqueria_key": peluqueria_key}, PROYECCION_SUSCRIPCION)
+        )
 
         # No está en MongoDB → es demo/dev, dejar pasar siempre
         if not cliente:
@@ -107,6 +126,7 @@ def _iniciar_gracia_y_avisar(cliente: dict, peluqueria_key: str):
                 "actualizado_en": ahora,
             }}
         )
+        cache_suscripciones.invalidar(peluqueria_key)
 
         # Obtener teléfono del dueño y link de pago
         telefono_dueno = cliente.get("telefono", "")
@@ -128,7 +148,7 @@ def _iniciar_gracia_y_avisar(cliente: dict, peluqueria_key: str):
             f"¿Consultas? Escribinos al wa.me/5492975375667"
         )
 
-        whatsapp_service.enviar_mensaje(mensaje, f"whatsapp:{telefono_dueno}")
+        whatsapp_service.enviar_mensaje(mensaje, f"whatsapp:{telefono_dueno}", prioridad=PRIORIDAD_NOTIFICACION)
         print(f"✅ Aviso de vencimiento enviado al dueño de {peluqueria_key}: {telefono_dueno}")
 
     except Exception as e:
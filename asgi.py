@@ -0,0 +1,98 @@
+"""
+Entry Point ASGI
+Sirve el webhook de WhatsApp desde el event loop; el procesamiento de cada mensaje
+corre en el pool de threads de OrquestadorEnThreads (los handlers siguen siendo
+sync). El resto de las rutas (pagos, health, status) siguen en la app Flask a través de asgiref.
+
+Uso:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+"""
+
+import os
+import sys
+import asyncio
+from urllib.parse import parse_qsl
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app import create_app, startup, shutdown
+from app.bot.orchestrator_async import get_orquestador_threads
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    # Los servicios arrancan en el lifespan, no al importar
+    flask_asgi = WsgiToAsgi(create_app(iniciar_servicios=False))
+except ImportError:
+    print("⚠️ asgiref no instalado - solo /api/webhook disponible por ASGI")
+    flask_asgi = None
+
+RUTA_WEBHOOK = "/api/webhook"
+
+
+async def _leer_body(receive):
+    """Lee el body completo del request"""
+    body = b""
+    while True:
+        mensaje = await receive()
+        body += mensaje.get("body", b"")
+        if not mensaje.get("more_body"):
+            return body
+
+
+async def _responder(send, status, body=b""):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; charset=utf-8")]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    """Arranque y apagado del worker ASGI"""
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            await asyncio.to_thread(startup)
+            get_orquestador_threads()
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            from app.bot.states import state_manager_async
+            from app.core import database_async
+            await state_manager_async.cerrar_conexion()
+            database_async.cerrar_conexion()
+            get_orquestador_threads().cerrar()
+            await asyncio.to_thread(shutdown)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """Aplicación ASGI"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] == "http" and scope["path"] == RUTA_WEBHOOK and scope["method"] == "POST":
+        body = await _leer_body(receive)
+        data = dict(parse_qsl(body.decode("utf-8")))
+
+        try:
+            status = await get_orquestador_threads().procesar_webhook(data)
+        except Exception as e:
+            print(f"❌ Error en webhook ASGI: {e}")
+            import traceback
+            traceback.print_exc()
+            status = 500
+
+        await _responder(send, status)
+        return
+
+    if flask_asgi is None:
+        await _responder(send, 404, b"Not found")
+        return
+
+    await flask_asgi(scope, receive, send)
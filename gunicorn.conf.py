@@ -0,0 +1,144 @@
+"""
+Configuración de gunicorn para producción
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+En gthread el master importa la app una vez (preload_app) y los workers se forkean de él:
+- En el master solo se cargan cosas inmutables (blueprints, configuración de clientes)
+- post_fork descarta los clientes de MongoDB/Redis heredados (cada worker abre su pool)
+- post_worker_init llama a startup(): threads de recordatorios, relay de reservas,
+  recarga de configuración e invalidación de caches arrancan en cada worker
+- worker_exit llama a shutdown(): vacía la cola de WhatsApp y cierra conexiones
+- Las métricas de /metrics se comparten entre workers por PROMETHEUS_MULTIPROC_DIR
+
+Modos (GUNICORN_MODO):
+- gthread (por defecto): WEB_CONCURRENCY workers x GUNICORN_THREADS threads.
+  Es el modo recomendado: el bot usa threads y clientes bloqueantes (pymongo, redis, Twilio)
+- gevent: un solo thread por worker con greenlets, para muchas conexiones lentas.
+  Requiere `pip install gevent` (no está en requirements.txt). gunicorn aplica el
+  monkey patching en cada worker, así que en este modo no hay preload_app: si el
+  master importara la app, pymongo, redis y threading quedarían sin parchear.
+
+Variables:
+    PORT               Puerto (por defecto 3000)
+    WEB_CONCURRENCY    Workers (por defecto las CPUs del contenedor, entre 2 y 4:
+                       cada worker arranca sus threads y pools de conexiones)
+    GUNICORN_MODO      gthread | gevent
+    GUNICORN_THREADS   Threads por worker en gthread (por defecto 8)
+    GUNICORN_CONEXIONES Conexiones por worker en gevent (por defecto 1000)
+    GUNICORN_TIMEOUT   Segundos antes de reiniciar un worker colgado (por defecto 60)
+    PROMETHEUS_MULTIPROC_DIR Directorio de métricas compartidas (por defecto en /tmp)
+"""
+
+import gc
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+# wsgi.py deja el arranque de servicios para post_worker_init
+os.environ.setdefault("SERVICIOS_EN_WORKER", "1")
+
+# /metrics junta las métricas de todos los workers (prometheus_client en modo
+# multiproceso). Tiene que estar definido antes de importar la app.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "bot-peluqueria-metricas"))
+
+MODO = os.getenv("GUNICORN_MODO", "gthread").lower()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+# Con gevent cada worker importa la app después del monkey patching
+preload_app = MODO != "gevent"
+
+
+def _cpus_contenedor():
+    """
+    CPUs que puede usar el proceso: la cuota del cgroup si hay una (Docker, Railway)
+    y si no las CPUs asignadas al proceso. cpu_count() devuelve las del host.
+    """
+    try:
+        # cgroup v2: "<cuota> <período>" o "max <período>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            return max(1, int(cuota) // int(periodo))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            cuota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            periodo = int(f.read())
+        if cuota > 0 and periodo > 0:
+            return max(1, cuota // periodo)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+workers = int(os.getenv("WEB_CONCURRENCY", min(4, max(2, _cpus_contenedor()))))
+
+if MODO == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("GUNICORN_CONEXIONES", "1000"))
+else:
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# shutdown() espera hasta ESPERA_COLA_AL_APAGAR (10s) a que se vacíe la cola de WhatsApp
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Archivos de métricas de una ejecución anterior
+    directorio = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+
+
+def when_ready(server):
+    # Lo cargado en el master queda fuera del GC: los workers no tocan esas
+    # páginas al recolectar y siguen compartidas (copy-on-write)
+    if preload_app:
+        gc.freeze()
+    server.log.info(f"🚀 gunicorn listo: {workers} workers ({MODO})")
+
+
+def post_fork(server, worker):
+    # Sin preload no hay nada heredado, y post_fork corre antes del monkey patching
+    # de gevent: importar la app acá la dejaría sin parchear
+    if not preload_app:
+        return
+
+    from app.core.database import reiniciar_conexion as reiniciar_mongo
+    from app.bot.states.state_manager import reiniciar_conexion as reiniciar_redis
+
+    # Los sockets heredados del master no se comparten entre procesos
+    reiniciar_mongo()
+    reiniciar_redis()
+
+
+def post_worker_init(worker):
+    from app import startup
+    startup()
+
+
+def worker_exit(server, worker):
+    from app import shutdown
+    shutdown()
+
+
+def child_exit(server, worker):
+    from app.core.metricas import marcar_proceso_terminado
+    marcar_proceso_terminado(worker.pid)
@@ -28,6 +28,12 @@ client = MongoClient(MONGO_URI)
 db = client["peluqueria_bot"]
 clientes_collection = db["clientes"]
 
+# Solo los campos que muestra y usa el script
+PROYECCION_PENDIENTES = {
+    "nombre": 1, "apellido": 1, "nombre_negocio": 1, "telefono": 1,
+    "email": 1, "plan": 1, "ubicacion": 1, "creado_en": 1, "timezone": 1,
+}
+
 # ── Cargar clientes.json para obtener las peluqueria_keys ────
 def cargar_peluquerias():
     for ruta in ["config/clientes.json", "clientes.json"]:
@@ -46,7 +52,7 @@ def mostrar_clientes_pendientes():
             {"trial_inicio": {"$exists": False}},
             {"peluqueria_key": {"$exists": False}},
         ]
-    }).sort("creado_en", -1))
+    }, PROYECCION_PENDIENTES).sort("creado_en", -1))
 
     if not pendientes:
         print("\n✅ No hay clientes pendientes de activar.")
@@ -6,8 +6,13 @@ VERSIÓN CORREGIDA - Enero 2026
 import json
 import os
 import re
+import sys
 from datetime import datetime
 
+# Con CONFIG_FUENTE=mongodb el cliente se guarda en la colección configuraciones
+# (los bots lo toman sin reiniciar) en lugar de editar clientes.json
+CONFIG_FUENTE = os.getenv("CONFIG_FUENTE", "json").lower()
+
 def validar_calendar_id(calendar_id):
     """Valida formato básico de Calendar ID de Google"""
     # Formato: algo@group.calendar.google.com o email@gmail.com
@@ -34,41 +39,69 @@ def hacer_backup(archivo):
         return backup
     return None
 
+def cargar_clientes_mongodb():
+    """Configuraciones actuales desde MongoDB (para validar keys repetidas)"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.core.database import MONGODB_DISPONIBLE, obtener_configuraciones
+    
+    if not MONGODB_DISPONIBLE:
+        print("❌ ERROR: CONFIG_FUENTE=mongodb pero MONGODB_URI no está configurada")
+        return None
+    
+    try:
+        return {
+            documento["_id"]: documento["config"]
+            for documento in obtener_configuraciones()
+            if not documento.get("eliminado")
+        }
+    except Exception as e:
+        print(f"❌ ERROR leyendo configuraciones de MongoDB: {e}")
+        return None
+
 def agregar_cliente():
     print("🎯 AGREGAR NUEVO CLIENTE AL BOT SAAS")
     print("="*50)
     
-    # Buscar clientes.json en varios lugares
-    posibles_rutas = [
-        "clientes.json",
-        "config/clientes.json",
-        "../clientes.json"
-    ]
-    
     archivo_clientes = None
-    for ruta in posibles_rutas:
-        if os.path.exists(ruta):
-            archivo_clientes = ruta
-            break
     
-    if not archivo_clientes:
-        print("❌ ERROR: No se encontró clientes.json")
-        print("   Buscado en:", ", ".join(posibles_rutas))
-        print("   Crea el archivo primero o ejecuta desde el directorio correcto")
-        return
+    if CONFIG_FUENTE == "mongodb":
+        clientes = cargar_clientes_mongodb()
+        if clientes is None:
+            return
+        print(f"✅ Usando MongoDB ({len(clientes)} clientes)")
+    else:
+        # Buscar clientes.json en varios lugares
+        posibles_rutas = [
+            "clientes.json",
+            "config/clientes.json",
+            "../clientes.json"
+        ]
     
-    print(f"✅ Usando: {archivo_clientes}")
+        archivo_clientes = None
+        for ruta in posibles_rutas:
+            if os.path.exists(ruta):
+                archivo_clientes = ruta
+                break
+    
+        if not archivo_clientes:
+            print("❌ ERROR: No se encontró clientes.json")
+            print("   Buscado en:", ", ".join(posibles_rutas))
+            print("   Crea el archivo primero o ejecuta desde el directorio correcto")
+            return
+    
+        print(f"✅ Usando: {archivo_clientes}")
+    
+        # Leer archivo actual
+        try:
+            with open(archivo_clientes, "r", encoding="utf-8") as f:
+                clientes = json.load(f)
+        except json.JSONDecodeError:
+            print("❌ ERROR: clientes.json está corrupto")
+            return
+        except Exception as e:
+            print(f"❌ ERROR al leer archivo: {e}")
+            return
     
-    # Leer archivo actual
-    try:
-        with open(archivo_clientes, "r", encoding="utf-8") as f:
-            clientes = json.load(f)
-    except json.JSONDecodeError:
-        print("❌ ERROR: clientes.json está corrupto")
-        return
-    except Exception as e:
-        print(f"❌ ERROR al leer archivo: {e}")
-        return
     
     # Solicitar datos con validación
     print("\n📝 Ingresa los datos del nuevo cliente:")
@@ -295,18 +328,26 @@ def agregar_cliente():
         print("❌ Operación cancelada")
         return
     
-    # Hacer backup
-    hacer_backup(archivo_clientes)
-    
-    # Guardar (CORREGIDO - sin sobrescribir)
-    try:
-        with open(archivo_clientes, "w", encoding="utf-8") as f:
-            json.dump(clientes, f, indent=2, ensure_ascii=False)
+    if CONFIG_FUENTE == "mongodb":
+        from app.core.database import guardar_configuracion
         
-        print("\n✅ Cliente agregado exitosamente!")
-    except Exception as e:
-        print(f"❌ ERROR al guardar: {e}")
-        return
+        if not guardar_configuracion(key, nuevo_cliente):
+            print("❌ ERROR al guardar en MongoDB")
+            return
+        print("\n✅ Cliente agregado exitosamente! (los bots lo toman sin reiniciar)")
+    else:
+        # Hacer backup
+        hacer_backup(archivo_clientes)
+        
+        # Guardar (CORREGIDO - sin sobrescribir)
+        try:
+            with open(archivo_clientes, "w", encoding="utf-8") as f:
+                json.dump(clientes, f, indent=2, ensure_ascii=False)
+            
+            print("\n✅ Cliente agregado exitosamente!")
+        except Exception as e:
+            print(f"❌ ERROR al guardar: {e}")
+            return
     
     # Próximos pasos
     print("\n📋 PRÓXIMOS PASOS:")
@@ -325,6 +366,9 @@ def agregar_cliente():
     if email_cliente:
         print(f"   - Con: {email_cliente}")
 
+    print("\n5. Si ya tiene turnos en otro sistema, importalos:")
+    print(f"   python scripts/migrar_turnos.py importar {key} turnos.csv --calendar")
+
     print("\n💰 MODELO DE COBRO SaaS:")
     print(f"   Cobra al cliente: USD $80-100/mes")
     print(f"   Costos por cliente:")
@@ -0,0 +1,128 @@
+"""
+Benchmark del detector de intenciones
+Compara el matcher compilado (app/bot/utils/intenciones.py) con la comparación
+anterior contra listas literales: tiempo por mensaje y cuántos mensajes reconoce cada uno.
+
+Uso:
+    python scripts/benchmark_intenciones.py                          # corpus de ejemplo
+    python scripts/benchmark_intenciones.py --archivo mensajes.txt   # un mensaje por línea
+    python scripts/benchmark_intenciones.py --archivo mensajes.csv --columna Body
+
+El corpus real se puede bajar de la consola de Twilio (Monitor > Messaging > Export CSV):
+la columna Body tiene el texto de cada mensaje entrante.
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.bot.utils.intenciones import detectar_intencion, parsear_numero
+
+# Mensajes típicos que llegan al webhook (incluye typos y variantes reales)
+CORPUS_EJEMPLO = [
+    "hola", "Hola", "Hola!", "holaa", "holaaaa", "HOLA", "ola", "hola buen día",
+    "Buenas", "buenas tardes", "Buenas noches!", "buen dia", "buenos días",
+    "menu", "Menú", "menú!", "MENU", "mneu", "meni", "inicio",
+    "1", "2", "3", "4", "5", "6", "7", "0", "1️⃣", "opción 3", "el 2", "tres",
+    "cancelar", "Cancelar", "cancelr", "salir", "volver", "stop",
+    "si", "Si", "SI", "sí", "Sí!", "dale", "ok", "no", "No", "nop",
+    "Juan Pérez", "Lola", "quiero un turno", "a qué hora abren?", "gracias!",
+    "1,3", "1 y 3", "Corte", "barba",
+]
+
+# Listas que usaba el orquestador antes del matcher
+COMANDOS_MENU = [
+    "menu", "menú", "inicio", "hola", "hi", "hey",
+    "buenas", "buenos dias", "buenas tardes", "buen dia",
+    "buenos días", "buenas noches"
+]
+COMANDOS_CANCELAR = ["cancelar", "salir", "abortar", "stop", "volver"]
+OPCIONES_MENU = ["0", "1", "2", "3", "4", "5", "6", "7"]
+
+
+def detectar_anterior(texto):
+    texto_lower = texto.lower()
+    if texto_lower in COMANDOS_MENU:
+        return "menu"
+    if texto_lower in COMANDOS_CANCELAR:
+        return "cancelar"
+    if texto.upper() in ("SI", "NO"):
+        return texto.lower()
+    if texto in OPCIONES_MENU:
+        return f"opcion_{texto}"
+    return None
+
+
+def detectar_nuevo(texto):
+    intencion = detectar_intencion(texto, prefijo=True)
+    if intencion is None:
+        numero = parsear_numero(texto)
+        if numero is not None:
+            return f"opcion_{numero}"
+    return intencion
+
+
+def cargar_corpus(archivo, columna):
+    with open(archivo, encoding="utf-8", newline="") as f:
+        if columna:
+            return [fila[columna] for fila in csv.DictReader(f) if fila.get(columna)]
+        return [linea.strip() for linea in f if linea.strip()]
+
+
+def medir(detectar, corpus, repeticiones):
+    """Microsegundos por mensaje (mejor de 3 corridas)"""
+    mejor = float("inf")
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            for texto in corpus:
+                detectar(texto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / (repeticiones * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del detector de intenciones")
+    parser.add_argument("--archivo", help="Corpus: un mensaje por línea, o CSV con --columna")
+    parser.add_argument("--columna", help="Columna del CSV con el texto (ej: Body)")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--mostrar", action="store_true", help="Listar las diferencias mensaje por mensaje")
+    args = parser.parse_args()
+
+    corpus = cargar_corpus(args.archivo, args.columna) if args.archivo else CORPUS_EJEMPLO
+    repeticiones = max(1, args.repeticiones * len(CORPUS_EJEMPLO) // len(corpus))
+
+    # Primera llamada: compila el matcher (no entra en la medición)
+    detectar_nuevo("hola")
+
+    us_anterior = medir(detectar_anterior, corpus, repeticiones)
+    us_nuevo = medir(detectar_nuevo, corpus, repeticiones)
+
+    anteriores = [detectar_anterior(texto) for texto in corpus]
+    nuevos = [detectar_nuevo(texto) for texto in corpus]
+
+    print(f"\n🧪 DETECTOR DE INTENCIONES ({len(corpus)} mensajes)")
+    print("=" * 60)
+    print(f"Listas literales:  {us_anterior:6.2f} µs/msg  reconoce {sum(1 for i in anteriores if i)}")
+    print(f"Matcher compilado: {us_nuevo:6.2f} µs/msg  reconoce {sum(1 for i in nuevos if i)}")
+
+    print("\n📦 Intenciones del matcher")
+    for intencion, cantidad in Counter(i or "(ninguna)" for i in nuevos).most_common():
+        print(f"   {cantidad:6d}  {intencion}")
+
+    diferencias = [(t, a, n) for t, a, n in zip(corpus, anteriores, nuevos) if a != n]
+    print(f"\n🔀 {len(diferencias)} mensajes con resultado distinto")
+    if args.mostrar:
+        for texto, anterior, nuevo in diferencias:
+            print(f"   {texto!r:30} {anterior or '-':>12} -> {nuevo or '-'}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark de latencia por mensaje del webhook de WhatsApp
+Manda mensajes simulados de Twilio en paralelo y mide p50/p99 de cada request.
+
+Uso (comparar los dos modos contra el mismo tenant de prueba):
+    gunicorn wsgi:app -b :3000            # modo sync
+    uvicorn asgi:app --port 3001          # modo async
+
+    python scripts/benchmark_mensajes.py --url http://localhost:3000/api/webhook --to whatsapp:+14155238886
+    python scripts/benchmark_mensajes.py --url http://localhost:3001/api/webhook --to whatsapp:+14155238886
+
+Cada usuario simulado manda la secuencia de MENSAJES (menú, ver servicios, ubicación),
+así se ejercitan Redis, MongoDB y el envío de respuestas. Usá un tenant de prueba:
+los números de origen son ficticios y las respuestas se encolan a Twilio.
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Conversación de cada usuario simulado
+MENSAJES = ["hola", "4", "menu", "7", "menu"]
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada"""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+def simular_usuario(url, numero_destino, indice, sesion):
+    """
+    Manda la conversación completa de un usuario (en orden)
+
+    Returns:
+        tuple: (latencias en ms, cantidad de errores)
+    """
+    numero = f"whatsapp:+1555{indice:07d}"
+    latencias = []
+    errores = 0
+
+    for texto in MENSAJES:
+        inicio = time.perf_counter()
+        try:
+            respuesta = sesion.post(url, data={
+                "From": numero,
+                "To": numero_destino,
+                "Body": texto,
+                "NumMedia": "0"
+            }, timeout=30)
+            if respuesta.status_code != 200:
+                errores += 1
+        except requests.RequestException:
+            errores += 1
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    return latencias, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark p50/p99 del webhook")
+    parser.add_argument("--url", required=True, help="URL del webhook (…/api/webhook)")
+    parser.add_argument("--to", required=True, help="Número de Twilio del tenant de prueba")
+    parser.add_argument("--usuarios", type=int, default=100, help="Usuarios simulados")
+    parser.add_argument("--concurrencia", type=int, default=20, help="Usuarios en paralelo")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.usuarios} usuarios x {len(MENSAJES)} mensajes, concurrencia {args.concurrencia}")
+    print(f"🌐 {args.url}")
+
+    sesion = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrencia)
+    sesion.mount("http://", adapter)
+    sesion.mount("https://", adapter)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(
+            lambda i: simular_usuario(args.url, args.to, i, sesion),
+            range(args.usuarios)
+        ))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(l for lat, _ in resultados for l in lat)
+    errores = sum(e for _, e in resultados)
+
+    print("\n📊 RESULTADOS")
+    print("=" * 40)
+    print(f"Mensajes:    {len(latencias)} ({errores} con error)")
+    print(f"Throughput:  {len(latencias) / duracion:.1f} msg/s")
+    print(f"p50:         {percentil(latencias, 50):.1f} ms")
+    print(f"p90:         {percentil(latencias, 90):.1f} ms")
+    print(f"p99:         {percentil(latencias, 99):.1f} ms")
+    print(f"Promedio:    {statistics.mean(latencias):.1f} ms")
+    print(f"Máximo:      {latencias[-1]:.1f} ms")
+
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
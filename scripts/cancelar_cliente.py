@@ -21,12 +21,22 @@ client = MongoClient(MONGO_URI)
 db = client["peluqueria_bot"]
 col = db["clientes"]
 
+# Solo los campos que muestra y usa el script
+PROYECCION_ACTIVOS = {
+    "nombre": 1, "apellido": 1, "nombre_negocio": 1, "peluqueria_key": 1,
+    "telefono": 1, "plan": 1, "estado_pago": 1, "suscripcion_activa": 1,
+    "trial_inicio": 1, "gracia_inicio": 1, "payment_url": 1,
+}
+PROYECCION_CANCELADOS = {
+    "nombre_negocio": 1, "cancelado_en": 1, "motivo_cancelacion": 1,
+}
+
 
 def listar_activos():
     clientes = list(col.find({
         "estado_pago": {"$in": ["pagado", "pendiente"]},
         "bot_configurado": True,
-    }).sort("creado_en", -1))
+    }, PROYECCION_ACTIVOS).sort("creado_en", -1))
 
     if not clientes:
         print("\n No hay clientes activos.")
@@ -156,7 +166,7 @@ def main():
         cancelar(c, motivo)
 
     elif accion == 2:
-        cancelados = list(col.find({"estado_pago": "cancelado"}).sort("cancelado_en", -1))
+        cancelados = list(col.find({"estado_pago": "cancelado"}, PROYECCION_CANCELADOS).sort("cancelado_en", -1))
         if not cancelados:
             print("\n No hay clientes cancelados.")
             return
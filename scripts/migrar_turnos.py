@@ -0,0 +1,424 @@
+"""
+Script para migrar turnos de otro sistema (importar / exportar)
+Complementa agregar_cliente.py: después de dar de alta la peluquería, carga sus
+turnos futuros en MongoDB y en su Google Calendar.
+
+Uso:
+    python scripts/migrar_turnos.py importar peluqueria_sol turnos.csv --calendar
+    python scripts/migrar_turnos.py importar peluqueria_sol turnos.ndjson --validar
+    python scripts/migrar_turnos.py exportar peluqueria_sol backup.csv --desde 2026-01-01
+
+Formato (CSV con encabezado o NDJSON, un turno por línea):
+    fecha_hora   "2026-03-14 10:30", "14/03/2026 10:30" o ISO (sin zona = hora local)
+    cliente      Nombre del cliente
+    telefono     Teléfono con código de país (+549...)
+    servicio     Opcional
+    peluquero    Opcional (nombre como figura en clientes.json)
+    precio       Opcional
+    duracion     Opcional, minutos (30 por defecto)
+    estado       Opcional: confirmado (defecto), cancelado o completado
+
+Cómo funciona la importación:
+    - El archivo se lee en streaming y se procesa de a --lote filas (memoria acotada)
+    - Cada turno tiene un ID determinístico (peluquería + teléfono + fecha + peluquero)
+      que se usa como reserva_id y como ID del evento de Calendar: reimportar no duplica
+    - MongoDB: insert_many(ordered=False); los duplicados se cuentan y se saltean
+    - Calendar (--calendar): batch requests de hasta 50 eventos, solo turnos confirmados futuros
+    - Después de cada lote se guarda <archivo>.checkpoint.json; si se corta, volver a
+      correr el mismo comando sigue desde ahí (--reiniciar lo ignora)
+    - Las filas con error van a <archivo>.errores.ndjson para corregirlas y reimportarlas
+"""
+
+import os
+import sys
+import csv
+import json
+import hashlib
+import argparse
+import itertools
+from datetime import datetime, timedelta
+
+import pytz
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from pymongo.errors import BulkWriteError
+
+from app.core.database import (
+    MONGODB_DISPONIBLE,
+    turnos_collection,
+    iterar,
+    reconciliar_estadisticas
+)
+from app.services.calendar_service import CalendarService, cuerpo_evento
+
+CAMPOS = ["fecha_hora", "cliente", "telefono", "servicio", "peluquero", "precio", "duracion", "estado"]
+ESTADOS_VALIDOS = ("confirmado", "cancelado", "completado")
+FORMATOS_FECHA = ("%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M:%S")
+
+LOTE_DEFAULT = 500
+
+_ERROR_CLAVE_DUPLICADA = 11000
+
+
+# ── Utilidades ───────────────────────────────────────────────
+
+def cargar_peluquerias():
+    for ruta in ["config/clientes.json", "clientes.json"]:
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                return json.load(f)
+    print("❌ No se encontró clientes.json")
+    return {}
+
+
+def detectar_formato(ruta, formato=None):
+    """csv o ndjson según --formato o la extensión del archivo"""
+    if formato:
+        return formato
+    return "csv" if ruta.lower().endswith(".csv") else "ndjson"
+
+
+def leer_filas(ruta, formato):
+    """Genera las filas del archivo de a una (no lo carga entero)"""
+    with open(ruta, "r", encoding="utf-8-sig", newline="") as f:
+        if formato == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for linea in f:
+                linea = linea.strip()
+                if linea:
+                    yield json.loads(linea)
+
+
+def id_turno(peluqueria_key, telefono, fecha_hora_utc, peluquero):
+    """
+    ID determinístico del turno importado
+    Solo usa caracteres base32hex (0-9, a-v), válido como ID de evento de Calendar
+    """
+    base = f"{peluqueria_key}|{telefono}|{fecha_hora_utc.isoformat()}|{peluquero or ''}"
+    return "imp" + hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def parsear_fecha(valor, tz):
+    """Fecha del archivo -> datetime UTC (sin zona = hora local de la peluquería)"""
+    valor = str(valor or "").strip()
+    fecha = None
+
+    try:
+        fecha = datetime.fromisoformat(valor)
+    except ValueError:
+        for formato in FORMATOS_FECHA:
+            try:
+                fecha = datetime.strptime(valor, formato)
+                break
+            except ValueError:
+                continue
+
+    if fecha is None:
+        raise ValueError(f"fecha_hora inválida: {valor!r}")
+
+    if fecha.tzinfo is None:
+        fecha = tz.localize(fecha)
+    return fecha.astimezone(pytz.utc)
+
+
+def normalizar_fila(fila, peluqueria_key, tz, ahora):
+    """
+    Valida una fila del archivo y la convierte en documento de turno
+
+    Raises:
+        ValueError: Si falta un dato obligatorio o tiene formato inválido
+    """
+    cliente = str(fila.get("cliente") or "").strip()
+    telefono = str(fila.get("telefono") or "").replace("whatsapp:", "").replace(" ", "").strip()
+
+    if not cliente:
+        raise ValueError("falta cliente")
+    if not telefono:
+        raise ValueError("falta telefono")
+
+    fecha_hora = parsear_fecha(fila.get("fecha_hora"), tz)
+
+    estado = str(fila.get("estado") or "confirmado").strip().lower()
+    if estado not in ESTADOS_VALIDOS:
+        raise ValueError(f"estado inválido: {estado!r}")
+
+    peluquero = str(fila.get("peluquero") or "").strip() or None
+    turno_id = id_turno(peluqueria_key, telefono, fecha_hora, peluquero)
+
+    return {
+        "peluqueria": peluqueria_key,
+        "telefono": telefono,
+        "cliente": cliente.title(),
+        "servicio": str(fila.get("servicio") or "").strip() or None,
+        "fecha_hora": fecha_hora,
+        "peluquero": peluquero,
+        "precio": float(fila.get("precio") or 0),
+        "duracion": int(fila.get("duracion") or 30),
+        "google_event_id": None,
+        "estado": estado,
+        "reserva_id": turno_id,
+        "importado": True,
+        "creado_en": ahora,
+        "actualizado_en": ahora
+    }
+
+
+# ── Checkpoint y errores ─────────────────────────────────────
+
+def leer_checkpoint(ruta):
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_checkpoint(ruta, progreso):
+    """Escritura atómica: un corte a mitad de escritura no deja el checkpoint roto"""
+    progreso["actualizado_en"] = datetime.utcnow().isoformat()
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(progreso, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+def registrar_error(archivo_errores, numero_fila, fila, error):
+    archivo_errores.write(json.dumps(
+        {**fila, "_fila": numero_fila, "_error": str(error)},
+        ensure_ascii=False,
+        default=str
+    ) + "\n")
+
+
+# ── Importar ─────────────────────────────────────────────────
+
+def crear_eventos(calendar_service, peluqueria_key, config, lote, ahora):
+    """
+    Crea en Calendar los turnos confirmados futuros del lote
+
+    Returns:
+        dict: {reserva_id: error} de los eventos que no se pudieron crear
+    """
+    timezone = config["timezone"]
+    eventos = []
+
+    for _, _, turno in lote:
+        if turno["estado"] != "confirmado" or turno["fecha_hora"] < ahora:
+            continue
+
+        inicio = turno["fecha_hora"].astimezone(pytz.timezone(timezone))
+        eventos.append(cuerpo_evento(
+            turno["peluquero"] or config.get("nombre", peluqueria_key),
+            turno["cliente"],
+            turno["telefono"],
+            inicio,
+            turno["duracion"],
+            timezone,
+            turno["reserva_id"]
+        ))
+
+    if not eventos:
+        return {}
+
+    resultados = calendar_service.crear_eventos_lote(peluqueria_key, eventos)
+
+    for _, _, turno in lote:
+        if turno["reserva_id"] in resultados and resultados[turno["reserva_id"]] is None:
+            turno["google_event_id"] = turno["reserva_id"]
+
+    return {evento_id: error for evento_id, error in resultados.items() if error}
+
+
+def insertar_lote(lote, archivo_errores, progreso):
+    """insert_many sin orden: un duplicado no frena el resto del lote"""
+    if not lote:
+        return
+
+    try:
+        resultado = turnos_collection.insert_many([turno for _, _, turno in lote], ordered=False)
+        progreso["importados"] += len(resultado.inserted_ids)
+
+    except BulkWriteError as e:
+        detalle = e.details
+        progreso["importados"] += detalle.get("nInserted", 0)
+
+        for error in detalle.get("writeErrors", []):
+            numero_fila, fila, _ = lote[error["index"]]
+            if error.get("code") == _ERROR_CLAVE_DUPLICADA:
+                progreso["duplicados"] += 1
+            else:
+                progreso["errores"] += 1
+                registrar_error(archivo_errores, numero_fila, fila, error.get("errmsg"))
+
+
+def importar(args):
+    peluquerias = cargar_peluquerias()
+    config = peluquerias.get(args.peluqueria)
+    if not config:
+        print(f"❌ {args.peluqueria} no está en clientes.json")
+        return 1
+
+    formato = detectar_formato(args.archivo, args.formato)
+    tz = pytz.timezone(config.get("timezone", "America/Argentina/Buenos_Aires"))
+    ruta_checkpoint = f"{args.archivo}.checkpoint.json"
+    ruta_errores = f"{args.archivo}.errores.ndjson"
+
+    progreso = None if args.reiniciar or args.validar else leer_checkpoint(ruta_checkpoint)
+    if progreso:
+        print(f"↩️  Retomando desde la fila {progreso['filas'] + 1} ({ruta_checkpoint})")
+    else:
+        progreso = {"archivo": args.archivo, "filas": 0, "importados": 0, "duplicados": 0, "errores": 0}
+
+    calendar_service = None
+    if args.calendar and not args.validar:
+        calendar_service = CalendarService(peluquerias)
+
+    print(f"📥 Importando {args.archivo} ({formato}) en {args.peluqueria}, lotes de {args.lote}")
+
+    ahora = datetime.utcnow()
+    ahora_utc = pytz.utc.localize(ahora)
+    filas = itertools.islice(enumerate(leer_filas(args.archivo, formato), start=1), progreso["filas"], None)
+
+    with open(ruta_errores, "a", encoding="utf-8") as archivo_errores:
+        while True:
+            # Solo el lote actual vive en memoria
+            bloque = list(itertools.islice(filas, args.lote))
+            if not bloque:
+                break
+
+            lote = []
+            for numero_fila, fila in bloque:
+                try:
+                    lote.append((numero_fila, fila, normalizar_fila(fila, args.peluqueria, tz, ahora)))
+                except (ValueError, TypeError) as e:
+                    progreso["errores"] += 1
+                    registrar_error(archivo_errores, numero_fila, fila, e)
+
+            if not args.validar:
+                if calendar_service:
+                    errores_calendar = crear_eventos(calendar_service, args.peluqueria, config, lote, ahora_utc)
+                    if errores_calendar:
+                        for n, f, turno in lote:
+                            if turno["reserva_id"] in errores_calendar:
+                                progreso["errores"] += 1
+                                registrar_error(archivo_errores, n, f, errores_calendar[turno["reserva_id"]])
+                        lote = [t for t in lote if t[2]["reserva_id"] not in errores_calendar]
+
+                insertar_lote(lote, archivo_errores, progreso)
+
+            progreso["filas"] = numero_fila
+            archivo_errores.flush()
+            if not args.validar:
+                guardar_checkpoint(ruta_checkpoint, progreso)
+
+            print(f"   … {progreso['filas']} filas ({progreso['importados']} importados, "
+                  f"{progreso['duplicados']} duplicados, {progreso['errores']} con error)")
+
+    print("\n📊 RESULTADO")
+    print("=" * 40)
+    print(f"Filas leídas: {progreso['filas']}")
+    print(f"Importados:   {progreso['importados']}")
+    print(f"Duplicados:   {progreso['duplicados']} (ya estaban)")
+    print(f"Con error:    {progreso['errores']}")
+
+    if progreso["errores"]:
+        print(f"\n⚠️ Revisá {ruta_errores}: se puede corregir y volver a importar")
+    elif os.path.exists(ruta_errores) and os.path.getsize(ruta_errores) == 0:
+        os.remove(ruta_errores)
+
+    if args.validar:
+        return 1 if progreso["errores"] else 0
+
+    # Los contadores diarios se cuentan por creado_en: recalcular hoy
+    reconciliar_estadisticas(args.peluqueria, dias=1)
+    return 0
+
+
+# ── Exportar ─────────────────────────────────────────────────
+
+def exportar(args):
+    peluquerias = cargar_peluquerias()
+    config = peluquerias.get(args.peluqueria, {})
+    tz = pytz.timezone(config.get("timezone", "America/Argentina/Buenos_Aires"))
+    formato = detectar_formato(args.archivo, args.formato)
+
+    filtro = {"peluqueria": args.peluqueria}
+    rango = {}
+    if args.desde:
+        rango["$gte"] = tz.localize(datetime.strptime(args.desde, "%Y-%m-%d")).astimezone(pytz.utc)
+    if args.hasta:
+        rango["$lt"] = tz.localize(datetime.strptime(args.hasta, "%Y-%m-%d") + timedelta(days=1)).astimezone(pytz.utc)
+    if rango:
+        filtro["fecha_hora"] = rango
+
+    turnos = iterar(
+        turnos_collection,
+        filtro,
+        proyeccion={"_id": 0, **{campo: 1 for campo in CAMPOS}},
+        orden=[("fecha_hora", 1)],
+        batch_size=1000
+    )
+
+    print(f"📤 Exportando {args.peluqueria} a {args.archivo} ({formato})")
+
+    total = 0
+    with open(args.archivo, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS) if formato == "csv" else None
+        if escritor:
+            escritor.writeheader()
+
+        for turno in turnos:
+            fila = {campo: turno.get(campo) for campo in CAMPOS}
+            if fila["fecha_hora"]:
+                fila["fecha_hora"] = pytz.utc.localize(fila["fecha_hora"]).astimezone(tz).strftime("%Y-%m-%d %H:%M")
+
+            if escritor:
+                escritor.writerow(fila)
+            else:
+                f.write(json.dumps(fila, ensure_ascii=False, default=str) + "\n")
+            total += 1
+
+    print(f"✅ {total} turnos exportados")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar/exportar turnos de una peluquería")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_importar = subparsers.add_parser("importar", help="CSV/NDJSON -> MongoDB (+ Google Calendar)")
+    p_importar.add_argument("peluqueria", help="peluqueria_key de clientes.json")
+    p_importar.add_argument("archivo")
+    p_importar.add_argument("--formato", choices=["csv", "ndjson"])
+    p_importar.add_argument("--lote", type=int, default=LOTE_DEFAULT, help="Filas por lote")
+    p_importar.add_argument("--calendar", action="store_true", help="Crear también los eventos en Calendar")
+    p_importar.add_argument("--validar", action="store_true", help="Solo validar el archivo, sin escribir")
+    p_importar.add_argument("--reiniciar", action="store_true", help="Ignorar el checkpoint y empezar de cero")
+    p_importar.set_defaults(funcion=importar)
+
+    p_exportar = subparsers.add_parser("exportar", help="MongoDB -> CSV/NDJSON")
+    p_exportar.add_argument("peluqueria", help="peluqueria_key de clientes.json")
+    p_exportar.add_argument("archivo")
+    p_exportar.add_argument("--formato", choices=["csv", "ndjson"])
+    p_exportar.add_argument("--desde", help="YYYY-MM-DD (inclusive)")
+    p_exportar.add_argument("--hasta", help="YYYY-MM-DD (inclusive)")
+    p_exportar.set_defaults(funcion=exportar)
+
+    args = parser.parse_args()
+
+    if not MONGODB_DISPONIBLE and not getattr(args, "validar", False):
+        print("❌ MONGODB_URI no configurada")
+        return 1
+
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n❌ Operación cancelada (volvé a correr el comando para retomar)")
+        sys.exit(1)
@@ -0,0 +1,113 @@
+"""
+Perfil de arranque en frío
+Mide cuánto tarda en importarse la app (sin servicios) y qué módulos pesan más,
+usando `python -X importtime` en un proceso nuevo.
+
+Uso:
+    python scripts/perfil_arranque.py                       # importar + create_app(iniciar_servicios=False)
+    python scripts/perfil_arranque.py --con-servicios       # incluye startup() (Redis, MongoDB, threads)
+    python scripts/perfil_arranque.py --top 30 --presupuesto-ms 1500
+
+Sale con código 1 si el arranque supera el presupuesto (sirve como chequeo en CI).
+Sin --con-servicios no debería abrir ninguna conexión: si tarda como si lo
+hiciera, algún módulo volvió a conectar al importarse.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+# Presupuesto de arranque en frío (ms), sin servicios
+PRESUPUESTO_ARRANQUE_MS = int(os.getenv("PRESUPUESTO_ARRANQUE_MS", "2500"))
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Línea de -X importtime: "import time:   self [us] |  cumulative | imported package"
+_LINEA_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def es_de_app(modulo):
+    return modulo == "app" or modulo.startswith("app.")
+
+
+def codigo_arranque(con_servicios):
+    return (
+        "from app import create_app\n"
+        f"create_app(iniciar_servicios={con_servicios})\n"
+    )
+
+
+def medir(con_servicios):
+    """
+    Ejecuta el arranque en un proceso nuevo
+
+    Returns:
+        tuple: (ms totales, lista de (módulo, self_us, acumulado_us, nivel))
+    """
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo_arranque(con_servicios)],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True
+    )
+    total_ms = (time.perf_counter() - inicio) * 1000
+
+    if proceso.returncode != 0:
+        errores = [l for l in proceso.stderr.splitlines() if not l.startswith("import time:")]
+        print("❌ El arranque falló:")
+        print("\n".join(errores[-20:]))
+        sys.exit(2)
+
+    modulos = []
+    for linea in proceso.stderr.splitlines():
+        match = _LINEA_IMPORTTIME.match(linea)
+        if match:
+            self_us, acumulado_us, sangria, modulo = match.groups()
+            modulos.append((modulo, int(self_us), int(acumulado_us), len(sangria) // 2))
+
+    return total_ms, modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de arranque en frío")
+    parser.add_argument("--con-servicios", action="store_true", help="Incluir startup()")
+    parser.add_argument("--top", type=int, default=20, help="Módulos a mostrar")
+    parser.add_argument("--presupuesto-ms", type=int, default=PRESUPUESTO_ARRANQUE_MS)
+    args = parser.parse_args()
+
+    total_ms, modulos = medir(args.con_servicios)
+    imports_ms = sum(self_us for _, self_us, _, _ in modulos) / 1000
+
+    print(f"\n⏱️  ARRANQUE EN FRÍO ({'con' if args.con_servicios else 'sin'} servicios)")
+    print("=" * 70)
+    print(f"Total del proceso: {total_ms:.0f} ms (imports: {imports_ms:.0f} ms, {len(modulos)} módulos)")
+
+    print("\n📦 Paquetes más pesados (suma del tiempo propio de sus módulos)")
+    por_paquete = {}
+    for modulo, self_us, _, _ in modulos:
+        if not es_de_app(modulo):
+            paquete = modulo.split(".")[0]
+            por_paquete[paquete] = por_paquete.get(paquete, 0) + self_us
+    for paquete, self_us in sorted(por_paquete.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"   {self_us / 1000:8.1f} ms  {paquete}")
+
+    print("\n🏠 Módulos de app (tiempo propio, sin sus imports)")
+    propios = [m for m in modulos if es_de_app(m[0])]
+    for modulo, self_us, acumulado_us, _ in sorted(propios, key=lambda m: -m[1])[:args.top]:
+        print(f"   {self_us / 1000:8.1f} ms  {modulo}  (acumulado {acumulado_us / 1000:.1f} ms)")
+
+    print()
+    if total_ms > args.presupuesto_ms:
+        print(f"❌ Arranque de {total_ms:.0f} ms supera el presupuesto de {args.presupuesto_ms} ms")
+        return 1
+
+    print(f"✅ Dentro del presupuesto ({args.presupuesto_ms} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
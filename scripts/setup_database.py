@@ -0,0 +1,54 @@
+"""
+Script para preparar los índices de MongoDB
+Aplica el registro de índices de app/core/database.py y muestra cuánto se usa cada uno.
+
+Uso:
+    python scripts/setup_database.py            # crear índices + reporte
+    python scripts/setup_database.py --reporte  # solo reporte de uso
+
+El bot también aplica los índices al arrancar (CREATE_INDEXES=false lo desactiva).
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from app.core.database import MONGODB_DISPONIBLE, INDICES, crear_indices, reporte_uso_indices
+
+
+def mostrar_reporte():
+    """Imprime el uso de los índices (los que nunca se usan aparecen primero)"""
+    reporte = reporte_uso_indices()
+
+    if not reporte:
+        print("\n⚠️ No hay estadísticas de índices disponibles.")
+        return
+
+    print("\n📊 USO DE ÍNDICES")
+    print("=" * 60)
+
+    for r in reporte:
+        marca = "⚠️" if r["accesos"] == 0 else "✅"
+        desde = r["desde"].strftime("%d/%m/%Y %H:%M") if r["desde"] else "?"
+        print(f"{marca} {r['coleccion']:<15} {r['indice']:<40} {r['accesos']:>8} usos (desde {desde})")
+
+    sin_uso = [r for r in reporte if r["accesos"] == 0 and r["indice"] != "_id_"]
+    if sin_uso:
+        print(f"\n💡 {len(sin_uso)} índice(s) sin uso desde el último reinicio de MongoDB")
+
+
+if __name__ == "__main__":
+    if not MONGODB_DISPONIBLE:
+        print("❌ MONGODB_URI no configurada")
+        sys.exit(1)
+
+    if "--reporte" not in sys.argv:
+        total = sum(len(indices) for indices in INDICES.values())
+        print(f"🔧 Aplicando {total} índices en {len(INDICES)} colecciones...")
+        if not crear_indices():
+            sys.exit(1)
+
+    mostrar_reporte()
@@ -0,0 +1,544 @@
+"""
+Simulador de conversaciones y prueba de carga
+Levanta la app en el mismo proceso con dobles locales de Twilio, Google Calendar
+(app/services/calendar_falso.py), Redis (fakeredis) y MongoDB (mongomock), y manda
+a /api/webhook miles de clientes sintéticos recorriendo flujos reales (reservar, cancelar, reagendar, consultas).
+
+No usa ninguna cuenta real: sirve como línea de base para cada cambio de performance.
+Para medir contra un servidor real (Redis/Mongo/Twilio de verdad) usá
+scripts/benchmark_mensajes.py.
+
+Requiere (solo para este script):
+    pip install fakeredis mongomock
+
+Uso:
+    python scripts/simulador_carga.py                                   # 500 clientes, 50 en paralelo
+    python scripts/simulador_carga.py --clientes 5000 --concurrencia 200
+    python scripts/simulador_carga.py --latencia-twilio-ms 150 --latencia-calendar-ms 120 --error-calendar 0.01
+    python scripts/simulador_carga.py --mezcla reservar=5,cancelar=2,reagendar=1,consultas=2 --json resultado.json
+
+Cada cliente elige qué responder según el paso en que lo dejó el bot (se lee de
+su estado en Redis), así que los flujos siguen funcionando aunque cambien los textos.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib.util
+import tempfile
+import threading
+import contextlib
+import statistics
+from types import SimpleNamespace
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Máximo de mensajes por conversación (corta loops si un flujo cambia)
+MAX_MENSAJES_CONVERSACION = 15
+
+# Respuesta genérica del orquestador cuando un handler lanzó una excepción
+TEXTO_ERROR_BOT = "Ocurrió un error temporal"
+
+# Opciones del menú que elige cada flujo, en orden (cancelar y reagendar reservan antes)
+FLUJOS = {
+    "reservar": ["1"],
+    "cancelar": ["1", "3"],
+    "reagendar": ["1", "5"],
+    "consultas": ["4", "6", "7", "2"]
+}
+
+MEZCLA_POR_DEFECTO = "reservar=5,cancelar=2,reagendar=1,consultas=2"
+
+
+# ==================== CONTADORES ====================
+
+class Contadores:
+    """Llamadas a servicios externos (thread-safe)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.llamadas = Counter()
+
+    def sumar(self, servicio, operacion, cantidad=1):
+        with self.lock:
+            self.llamadas[(servicio, operacion)] += cantidad
+
+    def por_servicio(self):
+        totales = Counter()
+        for (servicio, _), cantidad in self.llamadas.items():
+            totales[servicio] += cantidad
+        return totales
+
+
+contadores = Contadores()
+
+
+class Latencia:
+    """Demora y tasa de errores inyectadas en un doble"""
+
+    def __init__(self, media_ms=0.0, tasa_error=0.0):
+        self.media_ms = media_ms
+        self.tasa_error = tasa_error
+
+    def aplicar(self, servicio):
+        if self.media_ms:
+            time.sleep(random.uniform(0.5, 1.5) * self.media_ms / 1000)
+        if self.tasa_error and random.random() < self.tasa_error:
+            raise ErrorSimulado(f"Error simulado de {servicio}")
+
+
+class ErrorSimulado(Exception):
+    pass
+
+
+# ==================== TWILIO ====================
+
+class TwilioFalso:
+    """Cliente de Twilio que registra los mensajes en memoria"""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.enviados = defaultdict(list)  # destino -> cuerpos
+        self.lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._crear)
+
+    def _crear(self, to, from_=None, body=None, content_sid=None, **kwargs):
+        contadores.sumar("twilio", "messages.create")
+        self.latencia.aplicar("twilio")
+        with self.lock:
+            self.enviados[to].append(body or content_sid)
+        return SimpleNamespace(sid=f"SM{random.getrandbits(64):016x}", status="queued")
+
+    def respuestas_con_error(self):
+        with self.lock:
+            return sum(
+                1 for cuerpos in self.enviados.values()
+                for cuerpo in cuerpos if cuerpo and TEXTO_ERROR_BOT in cuerpo
+            )
+
+
+# ==================== REDIS Y MONGODB ====================
+
+def instalar_redis_falso():
+    """Todos los clientes Redis del proceso apuntan a un servidor fakeredis compartido"""
+    import fakeredis
+
+    servidor = fakeredis.FakeServer()
+
+    class RedisContado(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            contadores.sumar("redis", str(args[0]).lower())
+            return super().execute_command(*args, **kwargs)
+
+        def pipeline(self, *args, **kwargs):
+            contadores.sumar("redis", "pipeline")
+            return super().pipeline(*args, **kwargs)
+
+    def desde_url(url, decode_responses=False, **kwargs):
+        return RedisContado(server=servidor, decode_responses=decode_responses)
+
+    from app.bot.states import state_manager
+    state_manager.redis = SimpleNamespace(Redis=SimpleNamespace(from_url=desde_url))
+
+    # Cliente propio del simulador (no suma a los contadores)
+    return fakeredis.FakeRedis(server=servidor, decode_responses=True)
+
+
+def instalar_mongo_falso():
+    """MongoClient de database.py reemplazado por mongomock, contando operaciones"""
+    import mongomock
+    from app.core import database
+
+    operaciones = (
+        "find", "find_one", "insert_one", "insert_many", "update_one", "update_many",
+        "replace_one", "delete_one", "delete_many", "find_one_and_update",
+        "count_documents", "aggregate", "bulk_write", "distinct"
+    )
+    for operacion in operaciones:
+        original = getattr(mongomock.collection.Collection, operacion, None)
+        if original is None:
+            continue
+
+        def contado(self, *args, _original=original, _operacion=operacion, **kwargs):
+            contadores.sumar("mongo", _operacion)
+            return _original(self, *args, **kwargs)
+
+        setattr(mongomock.collection.Collection, operacion, contado)
+
+    database.MongoClient = lambda *args, **kwargs: mongomock.MongoClient()
+
+
+# ==================== ENTORNO ====================
+
+def peluquerias_sinteticas(cantidad):
+    """Configuración de clientes de prueba (abiertos todos los días, todo el día)"""
+    horario = ["00:00", "23:30"]
+    dias = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+
+    peluquerias = {}
+    for i in range(cantidad):
+        peluquerias[f"simulada_{i:03d}"] = {
+            "nombre": f"Peluquería Simulada {i}",
+            "numero_twilio": f"+1444{i:07d}",
+            "calendar_id": f"simulada_{i:03d}@group.calendar.google.com",
+            "timezone": "America/Argentina/Buenos_Aires",
+            "idioma": "es",
+            "moneda": "ARS",
+            "requiere_pago": False,
+            "ubicacion": {"direccion": f"Calle Falsa {i}", "telefono": "+5491100000000"},
+            "horarios": {dia: horario for dia in dias},
+            "servicios": [
+                {"nombre": "Corte", "duracion": 30, "precio": 15000},
+                {"nombre": "Barba", "duracion": 20, "precio": 5000},
+                {"nombre": "Tintura", "duracion": 60, "precio": 20000}
+            ],
+            "peluqueros": [
+                {
+                    "id": f"peluquero_{j}",
+                    "nombre": f"Peluquero {j}",
+                    "activo": True,
+                    "especialidades": ["Corte", "Barba", "Tintura"],
+                    "dias_trabajo": dias,
+                    "horarios": {dia: horario for dia in dias}
+                }
+                for j in range(3)
+            ]
+        }
+    return peluquerias
+
+
+def preparar_entorno(args):
+    """
+    Configura el proceso para correr sin servicios reales y crea la app
+
+    Returns:
+        tuple: (app Flask, peluquerias, twilio falso, backend de Calendar, cliente redis del simulador)
+    """
+    os.environ.update({
+        "MONGODB_URI": "mongodb://simulador/",
+        "REDIS_URL": "redis://simulador:6379/0",
+        "TWILIO_ACCOUNT_SID": "ACsimulador",
+        "TWILIO_AUTH_TOKEN": "simulador",
+        "TWILIO_WHATSAPP_NUMBER": "+14440000000",
+        "CONFIG_FUENTE": "json",
+        "CONFIG_RECARGA": "false",
+        "CACHE_INVALIDACION": "false",
+        "FLASK_ENV": "development",  # sin el thread de recordatorios
+        "USAR_PLANTILLAS": "false",
+    })
+
+    peluquerias = peluquerias_sinteticas(args.peluquerias)
+    ruta = os.path.join(tempfile.mkdtemp(prefix="simulador_"), "clientes.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(peluquerias, f, ensure_ascii=False)
+
+    redis_simulador = instalar_redis_falso()
+    instalar_mongo_falso()
+
+    from app.core.config import PELUQUERIAS
+    PELUQUERIAS.ruta = ruta
+
+    twilio = TwilioFalso(Latencia(args.latencia_twilio_ms, args.error_twilio))
+    from app.services.whatsapp_service import whatsapp_service
+    # Por _get_client y no por _client: el primer envío arranca los workers y
+    # _asegurar_workers() descarta el cliente cacheado
+    whatsapp_service._get_client = lambda: twilio
+
+    from app.services.calendar_service import configurar_proveedor
+    from app.services.calendar_falso import ProveedorCalendarFalso, LatenciaSimulada
+    calendario = ProveedorCalendarFalso(LatenciaSimulada(
+        mediana_ms=args.latencia_calendar_ms,
+        dispersion=args.dispersion_calendar,
+        tasa_error=args.error_calendar,
+        semilla=args.semilla
+    ))
+    configurar_proveedor(calendario)
+
+    from app import create_app
+    app = create_app()
+
+    return app, peluquerias, twilio, calendario.backend, redis_simulador
+
+
+# ==================== CLIENTES SINTÉTICOS ====================
+
+def responder(flujo, paso, enviados, indice):
+    """
+    Qué escribe el cliente según el flujo y el paso en que está
+
+    Returns:
+        tuple: (texto, etiqueta del paso) o None si terminó
+    """
+    if paso is None:
+        return "hola", "inicio"
+
+    opciones = FLUJOS[flujo]
+    elegidas = sum(1 for _, etiqueta in enviados if etiqueta.startswith("menu:"))
+
+    if paso == "menu":
+        if elegidas >= len(opciones):
+            return None
+        return opciones[elegidas], f"menu:{opciones[elegidas]}"
+
+    if paso == "finalizado":
+        # Cualquier mensaje lo reactiva y vuelve al menú
+        return ("hola", paso) if elegidas < len(opciones) else None
+
+    if paso == "nombre":
+        return f"Cliente Simulado {indice}", paso
+    if paso == "servicio":
+        return random.choice(["1", "2", "1,2"]), paso
+    if paso == "seleccionar_horario":
+        return str(random.randint(1, 3)), paso
+    if paso == "confirmar_cancelacion":
+        return random.choice(["si", "SI", "sí"]), paso
+
+    # seleccionar_peluquero, seleccionar_dia, seleccionar_turno_*: la primera opción
+    return "1", paso
+
+
+def leer_paso(redis_simulador, numero_limpio):
+    dato = redis_simulador.get(f"user_state:{numero_limpio}")
+    return json.loads(dato).get("paso") if dato else None
+
+
+def simular_cliente(indice, flujo, contexto):
+    """
+    Recorre un flujo completo para un cliente sintético
+
+    Returns:
+        list: (etiqueta, latencia en ms, status HTTP) por mensaje
+    """
+    app, peluquerias_keys, redis_simulador, args = contexto
+    peluqueria = peluquerias_keys[indice % len(peluquerias_keys)]
+    numero_limpio = f"+1555{indice:07d}"
+    numero_destino = f"whatsapp:+1444{int(peluqueria.rsplit('_', 1)[1]):07d}"
+
+    cliente_http = app.test_client()
+    enviados = []
+    mediciones = []
+
+    for _ in range(MAX_MENSAJES_CONVERSACION):
+        siguiente = responder(flujo, leer_paso(redis_simulador, numero_limpio), enviados, indice)
+        if siguiente is None:
+            break
+        texto, etiqueta = siguiente
+
+        inicio = time.perf_counter()
+        respuesta = cliente_http.post("/api/webhook", data={
+            "From": f"whatsapp:{numero_limpio}",
+            "To": numero_destino,
+            "Body": texto,
+            "NumMedia": "0"
+        })
+        mediciones.append((f"{flujo}:{etiqueta}", (time.perf_counter() - inicio) * 1000, respuesta.status_code))
+        enviados.append((texto, etiqueta))
+
+        if args.pausa_ms:
+            time.sleep(random.uniform(0, 2) * args.pausa_ms / 1000)
+
+    return flujo, mediciones
+
+
+def parsear_mezcla(texto):
+    flujos = []
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre.strip() not in FLUJOS:
+            raise ValueError(f"Flujo desconocido: {nombre} (opciones: {', '.join(FLUJOS)})")
+        flujos.extend([nombre.strip()] * int(peso or 1))
+    return flujos
+
+
+# ==================== REPORTE ====================
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ya ordenada"""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+def resumen_latencias(valores):
+    valores = sorted(valores)
+    return {
+        "mensajes": len(valores),
+        "p50_ms": round(percentil(valores, 50), 2),
+        "p95_ms": round(percentil(valores, 95), 2),
+        "p99_ms": round(percentil(valores, 99), 2),
+        "promedio_ms": round(statistics.mean(valores), 2) if valores else 0
+    }
+
+
+def armar_reporte(resultados, duracion, twilio):
+    from app.bot.pasos import pasos
+
+    por_etiqueta = defaultdict(list)
+    todas = []
+    errores_http = 0
+    flujos = Counter()
+
+    for flujo, mediciones in resultados:
+        flujos[flujo] += 1
+        for etiqueta, latencia, status in mediciones:
+            por_etiqueta[etiqueta].append(latencia)
+            todas.append(latencia)
+            errores_http += status != 200
+
+    conversaciones = len(resultados)
+    errores_handlers = sum(m["errores"] for m in pasos.resumen().values())
+
+    return {
+        "conversaciones": conversaciones,
+        "flujos": dict(flujos),
+        "mensajes": len(todas),
+        "duracion_s": round(duracion, 2),
+        "throughput_msg_s": round(len(todas) / duracion, 1) if duracion else 0,
+        "latencia": resumen_latencias(todas),
+        "latencia_por_paso": {etiqueta: resumen_latencias(v) for etiqueta, v in sorted(por_etiqueta.items())},
+        "llamadas_por_conversacion": {
+            servicio: round(cantidad / conversaciones, 2)
+            for servicio, cantidad in sorted(contadores.por_servicio().items())
+        },
+        "llamadas": {f"{s}.{o}": c for (s, o), c in sorted(contadores.llamadas.items())},
+        "errores": {
+            "http": errores_http,
+            "handlers": errores_handlers,
+            "respuestas_de_error": twilio.respuestas_con_error(),
+            "tasa_http": round(errores_http / len(todas), 4) if todas else 0
+        },
+        "pasos": pasos.resumen()
+    }
+
+
+def validar_reporte(reporte):
+    """
+    Condiciones para que la corrida sirva como línea de base
+
+    Returns:
+        list: Problemas encontrados (vacía si la corrida es válida)
+    """
+    problemas = []
+    llamadas = reporte["llamadas_por_conversacion"]
+    errores = reporte["errores"]
+
+    if not llamadas.get("twilio"):
+        problemas.append("El Twilio falso no recibió envíos (las respuestas no pasaron por el doble)")
+    if errores["http"]:
+        problemas.append(f"{errores['http']} respuestas HTTP con error")
+    if errores["handlers"]:
+        problemas.append(f"{errores['handlers']} excepciones en handlers de pasos (ver 'pasos' en el reporte)")
+    if errores["respuestas_de_error"]:
+        problemas.append(f"{errores['respuestas_de_error']} respuestas de error enviadas a clientes")
+    return problemas
+
+
+def imprimir_reporte(reporte):
+    print(f"\n📊 SIMULACIÓN: {reporte['conversaciones']} conversaciones, {reporte['mensajes']} mensajes")
+    print("=" * 78)
+    print(f"Flujos:      {reporte['flujos']}")
+    print(f"Duración:    {reporte['duracion_s']} s")
+    print(f"Throughput:  {reporte['throughput_msg_s']} msg/s")
+    latencia = reporte["latencia"]
+    print(f"Latencia:    p50 {latencia['p50_ms']} ms | p95 {latencia['p95_ms']} ms | p99 {latencia['p99_ms']} ms")
+
+    print(f"\n⏱️  Por paso{'':26}{'msgs':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for etiqueta, datos in reporte["latencia_por_paso"].items():
+        print(f"   {etiqueta:32}{datos['mensajes']:>8}{datos['p50_ms']:>9}{datos['p95_ms']:>9}{datos['p99_ms']:>9}")
+
+    print("\n🌐 Llamadas externas por conversación")
+    for servicio, promedio in reporte["llamadas_por_conversacion"].items():
+        print(f"   {servicio:10} {promedio}")
+
+    errores = reporte["errores"]
+    print(f"\n❌ Errores: HTTP {errores['http']} ({errores['tasa_http']:.2%}) | "
+          f"handlers {errores['handlers']} | respuestas de error {errores['respuestas_de_error']}")
+
+    abandonos = {
+        paso: datos["abandonos"] for paso, datos in reporte["pasos"].items() if datos["abandonos"]
+    }
+    if abandonos:
+        print(f"🚪 Abandonos: {abandonos}")
+
+
+# ==================== MAIN ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de conversaciones con servicios falsos")
+    parser.add_argument("--clientes", type=int, default=500, help="Conversaciones a simular")
+    parser.add_argument("--concurrencia", type=int, default=50, help="Clientes en paralelo")
+    parser.add_argument("--peluquerias", type=int, default=3, help="Tenants sintéticos")
+    parser.add_argument("--mezcla", default=MEZCLA_POR_DEFECTO, help="Pesos de cada flujo")
+    parser.add_argument("--pausa-ms", type=float, default=0, help="Pausa media entre mensajes de un cliente")
+    parser.add_argument("--latencia-twilio-ms", type=float, default=0)
+    parser.add_argument("--latencia-calendar-ms", type=float, default=0)
+    parser.add_argument("--dispersion-calendar", type=float, default=0.5,
+                        help="Sigma de la log-normal de latencia de Calendar")
+    parser.add_argument("--error-twilio", type=float, default=0, help="Tasa de errores de Twilio (0-1)")
+    parser.add_argument("--error-calendar", type=float, default=0, help="Tasa de errores de Calendar (0-1)")
+    parser.add_argument("--espera-final", type=float, default=10, help="Segundos para vaciar colas al final")
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--json", help="Guardar el reporte en este archivo")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los logs del bot")
+    args = parser.parse_args()
+
+    faltantes = [modulo for modulo in ("fakeredis", "mongomock") if importlib.util.find_spec(modulo) is None]
+    if faltantes:
+        print(f"❌ Falta {', '.join(faltantes)}: pip install fakeredis mongomock")
+        return 2
+
+    if args.semilla is not None:
+        random.seed(args.semilla)
+
+    flujos = parsear_mezcla(args.mezcla)
+    silencio = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+    print(f"🚀 {args.clientes} clientes, concurrencia {args.concurrencia}, {args.peluquerias} peluquerías")
+
+    with silencio:
+        app, peluquerias, twilio, calendario, redis_simulador = preparar_entorno(args)
+        contexto = (app, sorted(peluquerias), redis_simulador, args)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            resultados = list(pool.map(
+                lambda i: simular_cliente(i, random.choice(flujos), contexto),
+                range(args.clientes)
+            ))
+        duracion = time.perf_counter() - inicio
+
+        # Envíos y reservas en background que quedaron en cola
+        from app.services.whatsapp_service import whatsapp_service
+        limite = time.monotonic() + args.espera_final
+        while whatsapp_service.pendientes() and time.monotonic() < limite:
+            time.sleep(0.1)
+
+        for metodo, cantidad in calendario.llamadas.items():
+            contadores.sumar("calendar", metodo, cantidad)
+        reporte = armar_reporte(resultados, duracion, twilio)
+
+    imprimir_reporte(reporte)
+
+    problemas = validar_reporte(reporte)
+    for problema in problemas:
+        print(f"❌ {problema}")
+    if problemas:
+        print("⛔ Corrida inválida: no usar estos números como línea de base")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en {args.json}")
+
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Script para mover la configuración de clientes entre clientes.json y MongoDB
+Con CONFIG_FUENTE=mongodb los bots leen la colección configuraciones; este script
+hace la migración inicial y permite volver a un archivo (backup o rollback).
+
+Uso:
+    python scripts/sincronizar_configuracion.py subir                      # clientes.json -> MongoDB
+    python scripts/sincronizar_configuracion.py subir --peluqueria cliente_001
+    python scripts/sincronizar_configuracion.py bajar backup_clientes.json # MongoDB -> archivo
+    python scripts/sincronizar_configuracion.py eliminar cliente_001
+
+Cada escritura incrementa la versión global: los procesos traen el cambio en la
+próxima sincronización (CONFIG_INTERVALO_RECARGA) sin reiniciar.
+"""
+
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from app.core.config import cargar_clientes
+from app.core.database import (
+    MONGODB_DISPONIBLE,
+    guardar_configuracion,
+    eliminar_configuracion,
+    obtener_configuraciones,
+    obtener_version_configuracion
+)
+
+
+def subir(args):
+    peluquerias = cargar_clientes(args.archivo)
+
+    if args.peluqueria:
+        if args.peluqueria not in peluquerias:
+            print(f"❌ {args.peluqueria} no está en el archivo")
+            return 1
+        peluquerias = {args.peluqueria: peluquerias[args.peluqueria]}
+
+    print(f"📤 Subiendo {len(peluquerias)} configuraciones a MongoDB...")
+    fallidas = [key for key, config in peluquerias.items() if not guardar_configuracion(key, config)]
+
+    print(f"\n✅ Versión actual: {obtener_version_configuracion()}")
+    if fallidas:
+        print(f"❌ Fallaron: {', '.join(fallidas)}")
+        return 1
+    return 0
+
+
+def bajar(args):
+    peluquerias = {
+        documento["_id"]: documento["config"]
+        for documento in obtener_configuraciones()
+        if not documento.get("eliminado")
+    }
+
+    with open(args.archivo, "w", encoding="utf-8") as f:
+        json.dump(peluquerias, f, indent=2, ensure_ascii=False, default=str)
+
+    print(f"✅ {len(peluquerias)} configuraciones guardadas en {args.archivo}")
+    return 0
+
+
+def eliminar(args):
+    if input(f"¿Dar de baja la configuración de {args.peluqueria}? (s/n): ").strip().lower() != "s":
+        print("❌ Operación cancelada")
+        return 1
+
+    if eliminar_configuracion(args.peluqueria) is None:
+        print(f"❌ {args.peluqueria} no existe en MongoDB")
+        return 1
+
+    print(f"✅ {args.peluqueria} dada de baja")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Configuración de clientes: clientes.json <-> MongoDB")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_subir = subparsers.add_parser("subir", help="clientes.json -> MongoDB")
+    p_subir.add_argument("--archivo", help="Ruta de clientes.json (por defecto config/clientes.json)")
+    p_subir.add_argument("--peluqueria", help="Subir solo esta peluquería")
+    p_subir.set_defaults(funcion=subir)
+
+    p_bajar = subparsers.add_parser("bajar", help="MongoDB -> archivo JSON")
+    p_bajar.add_argument("archivo")
+    p_bajar.set_defaults(funcion=bajar)
+
+    p_eliminar = subparsers.add_parser("eliminar", help="Baja lógica de una peluquería")
+    p_eliminar.add_argument("peluqueria")
+    p_eliminar.set_defaults(funcion=eliminar)
+
+    args = parser.parse_args()
+
+    if not MONGODB_DISPONIBLE:
+        print("❌ MONGODB_URI no configurada")
+        return 1
+
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
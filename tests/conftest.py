@@ -0,0 +1,112 @@
+"""
+Fixtures de los tests unitarios: MongoDB en memoria (mongomock) y Google Calendar
+en memoria (app/services/calendar_falso.py), sin red ni credenciales.
+
+test_json.py y test_plantillas.py son scripts manuales (leen clientes.json y
+mandan mensajes reales al importarse): se corren a mano, pytest no los junta.
+"""
+
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from twilio.base.exceptions import TwilioRestException
+
+collect_ignore = ["test_json.py", "test_plantillas.py"]
+
+PELUQUERIA_TEST = "peluqueria_test"
+
+PELUQUERIAS_TEST = {
+    PELUQUERIA_TEST: {
+        "nombre": "Peluquería Test",
+        "numero_twilio": "+14440000001",
+        "calendar_id": "test@group.calendar.google.com",
+        "timezone": "America/Argentina/Buenos_Aires",
+        "idioma": "es",
+        "servicios": [{"nombre": "Corte", "duracion": 30, "precio": 15000}],
+        "peluqueros": [{"id": "p1", "nombre": "Peluquero Test", "activo": True}]
+    }
+}
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Base de datos mongomock detrás de todas las colecciones de app/core/database.py"""
+    mongomock = pytest.importorskip("mongomock")
+    from app.core import database
+
+    db = mongomock.MongoClient()["tests"]
+    monkeypatch.setattr(database, "get_db", lambda: db)
+    monkeypatch.setattr(database, "MONGODB_DISPONIBLE", True)
+    # Los índices únicos son parte del comportamiento (ej: un recordatorio por turno y tipo)
+    database.crear_indices()
+    return db
+
+
+@pytest.fixture
+def calendar_falso():
+    """Proveedor de Calendar en memoria, sin demoras y determinístico"""
+    from app.services import calendar_service
+    from app.services.calendar_falso import ProveedorCalendarFalso, LatenciaSimulada
+
+    anterior = calendar_service._proveedor
+    proveedor = ProveedorCalendarFalso(LatenciaSimulada(dormir=False, semilla=7))
+    calendar_service.configurar_proveedor(proveedor)
+    yield proveedor
+    calendar_service.configurar_proveedor(anterior)
+
+
+class TwilioFalso:
+    """
+    Cliente de Twilio con messages.create en memoria y demora aleatoria chica
+
+    Args:
+        fallas: {cuerpo: cantidad de 503 antes de aceptarlo}
+        rechazar: Si True, todo envío falla con un 400 (no se reintenta)
+    """
+
+    def __init__(self, fallas=None, rechazar=False, semilla=3):
+        self.enviados = []
+        self.fallas = dict(fallas or {})
+        self.rechazar = rechazar
+        self.random = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._crear)
+
+    def _crear(self, to, from_=None, body=None, content_sid=None, **kwargs):
+        with self.lock:
+            demora = self.random.uniform(0, 0.005)
+            falla = self.fallas.get(body, 0)
+            if falla:
+                self.fallas[body] = falla - 1
+        time.sleep(demora)
+        if self.rechazar:
+            raise TwilioRestException(400, "https://api.twilio.com", msg="Invalid To", code=21211)
+        if falla:
+            raise TwilioRestException(503, "https://api.twilio.com", msg="Service Unavailable")
+        with self.lock:
+            self.enviados.append((to, body or content_sid))
+            return SimpleNamespace(sid=f"SM{len(self.enviados):032d}")
+
+
+def esperar_cola(servicio, limite=5):
+    """Espera a que la cola de WhatsApp termine todo lo encolado"""
+    fin = time.monotonic() + limite
+    while servicio.pendientes() and time.monotonic() < fin:
+        time.sleep(0.01)
+    assert servicio.pendientes() == 0
+
+
+@pytest.fixture
+def whatsapp_falso(monkeypatch):
+    """El whatsapp_service global manda a un TwilioFalso (el test puede cambiarle el comportamiento)"""
+    from app.services.whatsapp_service import whatsapp_service
+
+    twilio = TwilioFalso()
+    monkeypatch.setattr(whatsapp_service, "_get_client", lambda: twilio)
+    monkeypatch.setattr(whatsapp_service, "_guardar_registro", lambda clave, registro: None)
+    monkeypatch.setattr(whatsapp_service, "backoff_base", 0.01)
+    yield twilio
+    esperar_cola(whatsapp_service)
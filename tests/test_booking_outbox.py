@@ -0,0 +1,66 @@
+"""
+Outbox de reservas: una reserva aplicada por el relay se puede cancelar
+con el ID del evento de Calendar (como hace cancellation_handler)
+"""
+
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from bson.objectid import ObjectId
+
+from tests.conftest import PELUQUERIA_TEST, PELUQUERIAS_TEST
+
+
+def _reservar(monkeypatch):
+    from app.services import booking_service
+
+    monkeypatch.setattr(booking_service, "MONGODB_DISPONIBLE", True)
+    servicio = booking_service.BookingService(PELUQUERIAS_TEST)
+    # El relay se ejecuta a mano, sin el thread de fondo
+    monkeypatch.setattr(servicio, "iniciar_relay", lambda: None)
+
+    config = PELUQUERIAS_TEST[PELUQUERIA_TEST]
+    fecha_hora = (datetime.now(ZoneInfo(config["timezone"])) + timedelta(days=2)).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    )
+    assert servicio.crear_reserva(
+        PELUQUERIA_TEST, fecha_hora, "Cliente Test", config["servicios"], 30,
+        "5491100000000", config["peluqueros"][0]
+    ) is True
+    assert servicio.procesar_siguiente() is True
+
+
+def test_evento_de_reserva_no_parece_object_id(mongo, calendar_falso, monkeypatch):
+    _reservar(monkeypatch)
+
+    turno = mongo.turnos.find_one()
+    assert turno["google_event_id"].startswith("res")
+    assert not ObjectId.is_valid(turno["google_event_id"])
+    assert calendar_falso.backend.eventos(PELUQUERIAS_TEST[PELUQUERIA_TEST]["calendar_id"])
+
+
+def test_cancelar_turno_creado_por_el_outbox(mongo, calendar_falso, monkeypatch):
+    from app.core.database import cancelar_turno_db
+
+    _reservar(monkeypatch)
+    evento_id = mongo.turnos.find_one()["google_event_id"]
+
+    assert cancelar_turno_db(evento_id, PELUQUERIA_TEST) is True
+    assert mongo.turnos.find_one()["estado"] == "cancelado"
+
+
+def test_cancelar_evento_viejo_con_id_de_reserva(mongo):
+    """Eventos creados antes del prefijo: el ID es el _id de la reserva (24 hex)"""
+    from app.core.database import cancelar_turno_db
+
+    evento_id = str(ObjectId())
+    mongo.turnos.insert_one({
+        "peluqueria": PELUQUERIA_TEST,
+        "google_event_id": evento_id,
+        "fecha_hora": datetime.utcnow() + timedelta(days=1),
+        "estado": "confirmado",
+        "creado_en": datetime.utcnow()
+    })
+
+    assert cancelar_turno_db(evento_id, PELUQUERIA_TEST) is True
+    assert mongo.turnos.find_one()["estado"] == "cancelado"
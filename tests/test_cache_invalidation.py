@@ -0,0 +1,82 @@
+"""
+CacheTTL: invalidaciones durante una carga y borrados vistos por el polling
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.core import cache_invalidation
+from app.core.cache_invalidation import CacheTTL, ListenerInvalidaciones
+
+
+def test_invalidacion_durante_la_carga_no_guarda_el_valor_viejo():
+    cache = CacheTTL("test", ttl=60)
+
+    def cargar():
+        # El documento cambia mientras se lee
+        cache.invalidar("clave")
+        return "viejo"
+
+    assert cache.obtener_o_cargar("clave", cargar) == "viejo"
+    assert cache.get("clave") is None
+    assert cache.obtener_o_cargar("clave", lambda: "nuevo") == "nuevo"
+    assert cache.get("clave") == "nuevo"
+
+
+def test_limpiar_durante_la_carga_no_guarda_el_valor_viejo():
+    cache = CacheTTL("test", ttl=60)
+
+    def cargar():
+        cache.limpiar()
+        return "viejo"
+
+    cache.obtener_o_cargar("clave", cargar)
+    assert len(cache) == 0
+    assert not cache.en_curso
+
+
+def test_invalidar_otra_clave_no_afecta_la_carga():
+    cache = CacheTTL("test", ttl=60)
+
+    def cargar():
+        cache.invalidar("otra")
+        return "valor"
+
+    cache.obtener_o_cargar("clave", cargar)
+    assert cache.get("clave") == "valor"
+
+
+@pytest.fixture
+def polling(mongo, monkeypatch):
+    """Listener sin Redis con un cache de clientes por teléfono"""
+    monkeypatch.setattr(cache_invalidation, "_get_redis", lambda: None)
+    monkeypatch.setattr(cache_invalidation, "_caches", [])
+    listener = ListenerInvalidaciones()
+    monkeypatch.setattr(cache_invalidation, "listener", listener)
+    cache = CacheTTL("clientes_test", ttl=60, coleccion="clientes", campo_clave="telefono")
+    return listener, cache
+
+
+def test_polling_invalida_clientes_borrados(polling, mongo):
+    listener, cache = polling
+    for telefono in ("5491100000001", "5491100000002"):
+        mongo.clientes.insert_one({"telefono": telefono, "peluqueria": "p", "actualizado_en": datetime.utcnow()})
+    listener._poll()
+
+    cache.set("5491100000001", "cliente 1")
+    cache.set("5491100000002", "cliente 2")
+    mongo.clientes.delete_one({"telefono": "5491100000001"})
+    listener._poll()
+
+    assert cache.get("5491100000001") is None
+    assert cache.get("5491100000002") == "cliente 2"
+
+
+def test_primer_poll_sin_foto_vacia_el_cache(polling, mongo):
+    listener, cache = polling
+    cache.set("5491100000001", "cliente 1")
+
+    listener._poll()
+
+    assert len(cache) == 0
@@ -0,0 +1,122 @@
+"""
+Backend de Calendar en memoria inyectado con configurar_proveedor:
+syncToken, IDs duplicados y callbacks de los lotes
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.services import calendar_service
+from app.services.calendar_falso import LatenciaSimulada, ProveedorCalendarFalso
+from app.services.calendar_service import CalendarService, configurar_proveedor
+from tests.conftest import PELUQUERIA_TEST, PELUQUERIAS_TEST
+
+CALENDAR_ID = PELUQUERIAS_TEST[PELUQUERIA_TEST]["calendar_id"]
+
+
+def _evento(evento_id=None, horas=24):
+    inicio = (datetime.now() + timedelta(hours=horas)).replace(microsecond=0)
+    evento = {
+        "summary": "Corte - Peluquero Test - Cliente Test",
+        "start": {"dateTime": inicio.isoformat()},
+        "end": {"dateTime": (inicio + timedelta(minutes=30)).isoformat()}
+    }
+    if evento_id:
+        evento["id"] = evento_id
+    return evento
+
+
+def _servicio():
+    # Mismo camino que el bot: CalendarService pide el servicio al proveedor configurado
+    return CalendarService(PELUQUERIAS_TEST).get_calendar_service(PELUQUERIA_TEST)
+
+
+def test_servicio_sale_del_proveedor_configurado(calendar_falso):
+    _servicio().events().insert(calendarId=CALENDAR_ID, body=_evento()).execute()
+
+    assert len(calendar_falso.backend.eventos(CALENDAR_ID)) == 1
+    assert calendar_falso.backend.llamadas["events.insert"] == 1
+
+
+def test_list_con_sync_token_trae_solo_los_cambios(calendar_falso):
+    eventos = _servicio().events()
+    primero = eventos.insert(calendarId=CALENDAR_ID, body=_evento()).execute()
+
+    completa = eventos.list(calendarId=CALENDAR_ID).execute()
+    assert [evento["id"] for evento in completa["items"]] == [primero["id"]]
+    token = completa["nextSyncToken"]
+
+    segundo = eventos.insert(calendarId=CALENDAR_ID, body=_evento(horas=48)).execute()
+    eventos.delete(calendarId=CALENDAR_ID, eventId=primero["id"]).execute()
+
+    incremental = eventos.list(calendarId=CALENDAR_ID, syncToken=token).execute()
+    estados = {evento["id"]: evento["status"] for evento in incremental["items"]}
+    # Los borrados llegan como "cancelled"
+    assert estados == {primero["id"]: "cancelled", segundo["id"]: "confirmed"}
+
+    sin_cambios = eventos.list(calendarId=CALENDAR_ID, syncToken=incremental["nextSyncToken"]).execute()
+    assert sin_cambios["items"] == []
+
+
+def test_sync_token_invalido_pide_sincronizacion_completa(calendar_falso):
+    with pytest.raises(HttpError) as error:
+        _servicio().events().list(calendarId=CALENDAR_ID, syncToken="999").execute()
+    assert error.value.resp.status == 410
+
+
+def test_insert_con_id_repetido_devuelve_409(calendar_falso):
+    eventos = _servicio().events()
+    eventos.insert(calendarId=CALENDAR_ID, body=_evento("res0001")).execute()
+
+    with pytest.raises(HttpError) as error:
+        eventos.insert(calendarId=CALENDAR_ID, body=_evento("res0001")).execute()
+    assert error.value.resp.status == 409
+
+    # Tampoco se reutiliza el ID de un evento borrado
+    eventos.delete(calendarId=CALENDAR_ID, eventId="res0001").execute()
+    with pytest.raises(HttpError) as error:
+        eventos.insert(calendarId=CALENDAR_ID, body=_evento("res0001")).execute()
+    assert error.value.resp.status == 409
+
+
+@pytest.fixture
+def calendar_con_errores(monkeypatch):
+    """Proveedor que falla el 30% de los requests (determinístico por la semilla)"""
+    proveedor = ProveedorCalendarFalso(LatenciaSimulada(tasa_error=0.3, dormir=False, semilla=11))
+    monkeypatch.setattr(calendar_service, "_proveedor", None)
+    configurar_proveedor(proveedor)
+    # Sin las esperas entre reintentos de crear_eventos_lote
+    monkeypatch.setattr(calendar_service.time, "sleep", lambda segundos: None)
+    return proveedor
+
+
+def test_lote_llama_al_callback_de_cada_request(calendar_con_errores):
+    servicio = _servicio()
+    respuestas = {}
+
+    def callback(request_id, respuesta, excepcion):
+        respuestas[request_id] = excepcion.resp.status if excepcion else respuesta["id"]
+
+    lote = servicio.new_batch_http_request(callback=callback)
+    for i in range(20):
+        evento_id = f"lote{i:04d}"
+        lote.add(servicio.events().insert(calendarId=CALENDAR_ID, body=_evento(evento_id)), request_id=evento_id)
+    lote.execute()
+
+    assert len(respuestas) == 20
+    errores = {request_id: estado for request_id, estado in respuestas.items() if not isinstance(estado, str)}
+    assert errores and set(errores.values()) <= {429, 503}
+    # Los que fallaron no quedaron creados
+    creados = {evento["id"] for evento in calendar_con_errores.backend.eventos(CALENDAR_ID)}
+    assert creados == set(respuestas) - set(errores)
+
+
+def test_crear_eventos_lote_reintenta_los_errores(calendar_con_errores):
+    eventos = [_evento(f"res{i:04d}", horas=24 + i) for i in range(10)]
+
+    resultados = CalendarService(PELUQUERIAS_TEST).crear_eventos_lote(PELUQUERIA_TEST, eventos, reintentos=5)
+
+    assert resultados == {evento["id"]: None for evento in eventos}
+    assert len(calendar_con_errores.backend.eventos(CALENDAR_ID)) == 10
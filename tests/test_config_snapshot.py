@@ -0,0 +1,54 @@
+"""
+Configuración de clientes congelada: las configs del registro no se pueden
+modificar en ningún nivel y se pueden serializar al guardar el estado
+"""
+
+import json
+
+import pytest
+
+from app.bot.states.state_manager import serializar_estado
+from app.core.config import RegistroPeluquerias, descongelar
+from tests.conftest import PELUQUERIA_TEST, PELUQUERIAS_TEST
+
+
+@pytest.fixture
+def config(tmp_path):
+    peluquerias = json.loads(json.dumps(PELUQUERIAS_TEST))
+    peluquerias[PELUQUERIA_TEST]["peluqueros"][0]["horarios"] = {
+        "lunes": [["09:00", "13:00"], ["17:00", "20:00"]]
+    }
+    ruta = tmp_path / "clientes.json"
+    ruta.write_text(json.dumps(peluquerias), encoding="utf-8")
+    return RegistroPeluquerias(str(ruta))[PELUQUERIA_TEST]
+
+
+def test_config_congelada_en_todos_los_niveles(config):
+    with pytest.raises(TypeError):
+        config["nombre"] = "Otra"
+    with pytest.raises(TypeError):
+        config["servicios"][0]["precio"] = 1
+    with pytest.raises(AttributeError):
+        config["servicios"].append({"nombre": "Color"})
+    with pytest.raises(TypeError):
+        config["peluqueros"][0]["horarios"]["lunes"][0][0] = "08:00"
+
+
+def test_descongelar_devuelve_una_copia_mutable(config):
+    copia = descongelar(config)
+
+    copia["servicios"].append({"nombre": "Color", "duracion": 60, "precio": 20000})
+    copia["peluqueros"][0]["horarios"]["lunes"][0][0] = "08:00"
+
+    assert len(config["servicios"]) == 1
+    assert config["peluqueros"][0]["horarios"]["lunes"][0][0] == "09:00"
+
+
+def test_estado_con_datos_de_la_config_se_serializa(config):
+    # Como booking_handler: el peluquero elegido se guarda en el estado (Redis)
+    estado = {"paso": "fecha", "peluquero": config["peluqueros"][0]}
+
+    serializado = json.loads(json.dumps(serializar_estado(estado)))
+
+    assert serializado["peluquero"]["nombre"] == "Peluquero Test"
+    assert serializado["peluquero"]["horarios"]["lunes"] == [["09:00", "13:00"], ["17:00", "20:00"]]
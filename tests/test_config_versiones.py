@@ -0,0 +1,71 @@
+"""
+Configuración en MongoDB: dos escritores que publican versiones fuera de orden
+"""
+
+import copy
+
+import pytest
+
+from tests.conftest import PELUQUERIA_TEST, PELUQUERIAS_TEST
+
+
+def _config(nombre):
+    config = copy.deepcopy(PELUQUERIAS_TEST[PELUQUERIA_TEST])
+    config["nombre"] = nombre
+    return config
+
+
+@pytest.fixture
+def registro(mongo, tmp_path):
+    from app.core.config import RegistroPeluqueriasMongo
+
+    return RegistroPeluqueriasMongo(ruta_snapshot=str(tmp_path / "snapshot.json"))
+
+
+def test_version_escrita_tarde_no_se_pierde(registro, mongo):
+    from app.core import database
+
+    database.guardar_configuracion("primera", _config("Primera"))
+    assert registro.recargar()
+
+    # El escritor A toma la versión pero escribe después que B
+    version_a = database._siguiente_version_configuracion()
+    database.guardar_configuracion("segunda", _config("Segunda"))
+    assert registro.recargar()
+    assert "tercera" not in registro.keys()
+
+    database.configuraciones_collection.replace_one(
+        {"_id": "tercera"},
+        {"config": _config("Tercera"), "version": version_a, "eliminado": False},
+        upsert=True
+    )
+    assert registro.recargar()
+    assert registro.get("tercera")["nombre"] == "Tercera"
+
+
+def test_hueco_vencido_no_se_vuelve_a_pedir(registro, mongo):
+    from app.core import database
+
+    database._siguiente_version_configuracion()  # escritura que nunca llega
+    database.guardar_configuracion("primera", _config("Primera"))
+    assert registro.recargar()
+    assert registro._huecos
+
+    # Vencido: se asume que esa escritura falló
+    registro._huecos = dict.fromkeys(registro._huecos, 0)
+    assert not registro.recargar()
+    assert not registro._huecos
+
+
+def test_snapshot_en_disco_guarda_la_version_antes_del_hueco(registro, mongo, tmp_path):
+    import json
+    from app.core import database
+
+    database.guardar_configuracion("primera", _config("Primera"))
+    registro.recargar()
+    hueco = database._siguiente_version_configuracion()
+    database.guardar_configuracion("segunda", _config("Segunda"))
+    registro.recargar()
+
+    with open(tmp_path / "snapshot.json", encoding="utf-8") as f:
+        assert json.load(f)["version"] == hueco - 1
@@ -0,0 +1,67 @@
+"""
+database_async.guardar_turno sobre mongomock: mismo documento e idempotencia
+por reserva_id que la versión sync de app/core/database.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.conftest import PELUQUERIA_TEST
+
+
+class _ColeccionAsync:
+    """Expone los métodos de una colección de mongomock como corutinas (como Motor)"""
+
+    def __init__(self, coleccion):
+        self.coleccion = coleccion
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self.coleccion, nombre)
+
+        async def llamar(*args, **kwargs):
+            return metodo(*args, **kwargs)
+
+        return llamar
+
+
+@pytest.fixture
+def database_async(mongo, monkeypatch):
+    from app.core import database_async
+
+    monkeypatch.setattr(database_async, "_coleccion", lambda nombre: _ColeccionAsync(mongo[nombre]))
+    return database_async
+
+
+def _guardar(modulo, reserva_id=None):
+    return modulo.guardar_turno(
+        PELUQUERIA_TEST, "5491100000000", "Cliente Test", "Corte",
+        datetime.utcnow() + timedelta(days=1), {"nombre": "Peluquero Test"},
+        15000, 30, "evento_1", reserva_id=reserva_id
+    )
+
+
+def _comparables(turno):
+    variables = ("_id", "reserva_id", "fecha_hora", "creado_en", "actualizado_en")
+    return {campo: valor for campo, valor in turno.items() if campo not in variables}
+
+
+def test_guardar_turno_con_reserva_es_idempotente(database_async, mongo):
+    primero = asyncio.run(_guardar(database_async, reserva_id="reserva_1"))
+    segundo = asyncio.run(_guardar(database_async, reserva_id="reserva_1"))
+
+    assert primero == segundo
+    assert mongo.turnos.count_documents({"reserva_id": "reserva_1"}) == 1
+
+
+def test_guardar_turno_async_arma_el_mismo_documento_que_el_sync(database_async, mongo):
+    from app.core import database
+
+    asyncio.run(_guardar(database_async, reserva_id="reserva_async"))
+    _guardar(database, reserva_id="reserva_sync")
+
+    turno_async = mongo.turnos.find_one({"reserva_id": "reserva_async"})
+    turno_sync = mongo.turnos.find_one({"reserva_id": "reserva_sync"})
+    assert _comparables(turno_async) == _comparables(turno_sync)
+    assert mongo.estadisticas_diarias.find_one()["estados"]["confirmado"] == 2
@@ -0,0 +1,126 @@
+"""
+Detección de intenciones y números de opción (app/bot/utils/intenciones.py)
+"""
+
+import pytest
+
+from app.bot.pasos import RegistroPasos
+from app.bot.utils.intenciones import (
+    MatcherIntenciones,
+    detectar_intencion,
+    parsear_numero,
+    parsear_numeros
+)
+
+
+@pytest.mark.parametrize("texto, intencion", [
+    ("menu", "menu"),
+    ("¡Menú!", "menu"),
+    ("Holaaa", "menu"),
+    ("cancelar", "cancelar"),
+    ("confirmo", "si"),
+    ("No gracias", "no"),
+])
+def test_frases_exactas_y_normalizadas(texto, intencion):
+    assert detectar_intencion(texto) == intencion
+
+
+@pytest.mark.parametrize("texto, intencion", [
+    ("meni", "menu"),           # letra cambiada
+    ("cancelr", "cancelar"),    # letra de menos
+    ("cancelarx", "cancelar"),  # letra de más
+    ("confirme", "si"),
+])
+def test_un_error_de_tipeo(texto, intencion):
+    assert detectar_intencion(texto) == intencion
+
+
+def test_dos_errores_no_coinciden():
+    assert detectar_intencion("mnuu") is None
+    assert detectar_intencion("cncelr") is None
+
+
+def test_frases_cortas_no_se_corrigen():
+    # "si" / "no" están a un error de muchas palabras
+    assert detectar_intencion("sa") is None
+    assert detectar_intencion("ni") is None
+
+
+def test_coincidencia_difusa_ambigua_se_rechaza():
+    matcher = MatcherIntenciones({"a": ["casas"], "b": ["cosas"]})
+
+    assert matcher.detectar("casas") == "a"
+    assert matcher.detectar("cosas") == "b"
+    # A un error de las dos frases: no se adivina
+    assert matcher.detectar("csas") is None
+    assert matcher.detectar("cesas") is None
+
+
+def test_mismo_error_hacia_frases_de_la_misma_intencion_no_es_ambiguo():
+    matcher = MatcherIntenciones({"menu": ["casas", "cosas"]})
+
+    assert matcher.detectar("csas") == "menu"
+
+
+def test_prefijo_solo_si_se_pide():
+    texto = "hola buen dia, quiero un turno"
+
+    assert detectar_intencion(texto) is None
+    assert detectar_intencion(texto, prefijo=True) == "menu"
+
+
+def test_otro_idioma():
+    assert detectar_intencion("quit", "en") == "cancelar"
+    assert detectar_intencion("sim", "pt") == "si"
+    # Idioma desconocido: español
+    assert detectar_intencion("salir", "fr") == "cancelar"
+
+
+@pytest.mark.parametrize("texto, numeros", [
+    ("2", [2]),
+    ("1️⃣", [1]),
+    ("opción 3", [3]),
+    ("el 3", [3]),
+    ("1, 3 y 4", [1, 3, 4]),
+    ("dos", [2]),
+    ("3 tijeras", None),
+    ("", None),
+])
+def test_parsear_numeros(texto, numeros):
+    assert parsear_numeros(texto) == numeros
+
+
+def test_parsear_numeros_en_otro_idioma():
+    assert parsear_numeros("two", "en") == [2]
+    assert parsear_numeros("option 2 and 3", "en") == [2, 3]
+
+
+@pytest.mark.parametrize("texto", ["-1", "1-3", "1 - 3", "1 – 3", "−2"])
+def test_parsear_numeros_con_guion_no_es_opcion(texto):
+    # normalizar() borra el guion: sin el chequeo "-1" sería 1 y "1-3" [1, 3]
+    assert parsear_numeros(texto) is None
+
+
+def test_parsear_numero_exige_uno_solo():
+    assert parsear_numero("opción 2") == 2
+    assert parsear_numero("1 y 2") is None
+
+
+def test_paso_de_texto_libre_no_corrige_typos():
+    registro = RegistroPasos()
+    registro.registrar("nombre", lambda mensaje: None, texto_libre=True)
+    registro.registrar("servicio", lambda mensaje: None)
+
+    # Como en BotOrchestrator.procesar_mensaje: difuso solo fuera de texto libre
+    def intencion(paso, texto):
+        return detectar_intencion(texto, difuso=not registro.es_texto_libre(paso))
+
+    assert registro.es_texto_libre("nombre")
+    assert not registro.es_texto_libre("servicio")
+    assert not registro.es_texto_libre("no_registrado")
+
+    # "Lola" es un nombre, no "hola" con un typo
+    assert intencion("nombre", "Lola") is None
+    assert intencion("servicio", "Lola") == "menu"
+    # Las frases exactas valen en cualquier paso
+    assert intencion("nombre", "cancelar") == "cancelar"
@@ -0,0 +1,112 @@
+"""
+Registro de pasos de conversación (app/bot/pasos.py)
+"""
+
+import pytest
+
+from app.bot.pasos import Mensaje, RegistroPasos, PASO_MENU
+
+
+def _mensaje(texto="hola"):
+    return Mensaje("5491100000000", texto, "peluqueria_test", "whatsapp:+5491100000000")
+
+
+@pytest.fixture
+def registro():
+    return RegistroPasos()
+
+
+def test_despachar_llama_al_handler_y_mide(registro):
+    recibidos = []
+    registro.registrar("nombre", recibidos.append)
+
+    mensaje = _mensaje("Lola")
+    assert registro.despachar("nombre", mensaje) is True
+    assert recibidos == [mensaje]
+
+    resumen = registro.resumen()["nombre"]
+    assert resumen["mensajes"] == 1
+    assert resumen["errores"] == 0
+
+
+def test_despachar_paso_no_registrado(registro):
+    assert registro.despachar("no_existe", _mensaje()) is False
+
+
+def test_error_del_handler_se_cuenta_y_se_propaga(registro):
+    def handler(mensaje):
+        raise RuntimeError("falla")
+
+    registro.registrar("servicio", handler)
+
+    with pytest.raises(RuntimeError):
+        registro.despachar("servicio", _mensaje())
+    assert registro.resumen()["servicio"]["errores"] == 1
+
+
+def test_decorador_y_reemplazo(registro):
+    @registro.paso("encuesta", timeout=600)
+    def primero(mensaje):
+        pass
+
+    def segundo(mensaje):
+        pass
+
+    assert registro.get("encuesta").handler is primero
+    registro.registrar("encuesta", segundo)
+    assert registro.get("encuesta").handler is segundo
+
+
+def test_opciones_de_menu(registro):
+    llamadas = []
+    registro.registrar_opcion_menu(9, lambda mensaje: llamadas.append(9), titulo="9️⃣ Reseña")
+    registro.registrar_opcion_menu(8, lambda mensaje: llamadas.append(8), titulo="8️⃣ Encuesta")
+    registro.registrar_opcion_menu(7, lambda mensaje: llamadas.append(7))
+
+    assert registro.despachar_opcion_menu(8, _mensaje()) is True
+    assert registro.despachar_opcion_menu(5, _mensaje()) is False
+    assert llamadas == [8]
+    # Ordenados por número, sin las que ya están en las traducciones
+    assert registro.titulos_extra_menu() == ["8️⃣ Encuesta", "9️⃣ Reseña"]
+    assert registro.resumen()[f"{PASO_MENU}:8"]["mensajes"] == 1
+
+
+def test_transiciones(registro):
+    registro.registrar("fecha", None, siguientes=("horario",))
+    registro.registrar("horario", None, siguientes=("nombre",))
+
+    assert registro.registrar_transicion("fecha", "horario") is True
+    # Volver al menú o repetir el paso siempre vale
+    assert registro.registrar_transicion("fecha", PASO_MENU) is True
+    assert registro.registrar_transicion("fecha", "fecha") is True
+    assert registro.registrar_transicion("fecha", "nombre") is False
+    # Paso sin declarar: no se restringe
+    assert registro.registrar_transicion("otro", "nombre") is True
+
+    resumen = registro.resumen()
+    assert resumen["fecha"]["transiciones"] == {"horario": 1, PASO_MENU: 1, "nombre": 1}
+    assert resumen["fecha"]["transiciones_invalidas"] == 1
+    assert resumen["horario"]["entradas"] == 1
+
+
+def test_vencido(registro):
+    registro.registrar("fecha", None, timeout=900)
+    registro.registrar("menu", None)
+
+    assert registro.vencido("fecha", 901)
+    assert not registro.vencido("fecha", 60)
+    # Sin timeout propio vence con el TTL del estado, no acá
+    assert not registro.vencido("menu", 10 ** 6)
+    assert not registro.vencido("no_existe", 10 ** 6)
+
+
+def test_tasa_de_abandono(registro):
+    registro.registrar("fecha", None, siguientes=("horario",))
+    for _ in range(4):
+        registro.registrar_transicion(PASO_MENU, "fecha")
+    registro.registrar_abandono("fecha", "timeout")
+    registro.registrar_abandono("fecha", "cancelar")
+
+    resumen = registro.resumen()["fecha"]
+    assert resumen["abandonos"] == {"timeout": 1, "cancelar": 1}
+    assert resumen["tasa_abandono"] == 0.5
@@ -0,0 +1,123 @@
+"""
+Pasada de recordatorios con Calendar, MongoDB y Twilio falsos
+"""
+
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from tests.conftest import PELUQUERIA_TEST, PELUQUERIAS_TEST, esperar_cola
+
+CONFIG = PELUQUERIAS_TEST[PELUQUERIA_TEST]
+TELEFONO = "+5491100000003"
+
+
+@pytest.fixture
+def notificaciones(mongo, calendar_falso, whatsapp_falso, monkeypatch, tmp_path):
+    """NotificationService con el ledger en un directorio temporal y sin Redis"""
+    from app.services import notification_service
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(notification_service, "MONGODB_DISPONIBLE", True)
+    monkeypatch.setattr(notification_service, "_get_redis", lambda: None)
+    return notification_service.NotificationService(PELUQUERIAS_TEST)
+
+
+def _turno_en(calendar_falso, horas):
+    inicio = (datetime.now(ZoneInfo(CONFIG["timezone"])) + timedelta(hours=horas)).replace(microsecond=0)
+    return calendar_falso.backend.insertar(CONFIG["calendar_id"], {
+        "summary": "Corte - Peluquero Test - Cliente Test",
+        "description": f"Cliente: Cliente Test\nTel: {TELEFONO}",
+        "start": {"dateTime": inicio.isoformat()},
+        "end": {"dateTime": (inicio + timedelta(minutes=30)).isoformat()}
+    })
+
+
+def _pasada(notificaciones):
+    from app.services.whatsapp_service import whatsapp_service
+
+    notificaciones._pasada_recordatorios()
+    esperar_cola(whatsapp_service)
+
+
+def test_recordatorio_aceptado_queda_marcado(notificaciones, calendar_falso, whatsapp_falso, mongo):
+    evento = _turno_en(calendar_falso, 24)
+
+    _pasada(notificaciones)
+
+    assert len(whatsapp_falso.enviados) == 1
+    assert mongo.recordatorios.count_documents({"turno_id": evento["id"], "tipo": "24h"}) == 1
+    assert f"{evento['id']}_24h" in notificaciones.recordatorios_enviados
+
+    # La pasada siguiente no lo repite
+    _pasada(notificaciones)
+    assert len(whatsapp_falso.enviados) == 1
+
+
+def test_recordatorio_rechazado_por_twilio_se_libera(notificaciones, calendar_falso, whatsapp_falso, mongo):
+    evento = _turno_en(calendar_falso, 24)
+    whatsapp_falso.rechazar = True
+
+    _pasada(notificaciones)
+
+    assert mongo.recordatorios.count_documents({}) == 0
+    assert f"{evento['id']}_24h" not in notificaciones.recordatorios_enviados
+
+    # Con Twilio andando, la pasada siguiente lo envía
+    whatsapp_falso.rechazar = False
+    _pasada(notificaciones)
+    assert len(whatsapp_falso.enviados) == 1
+    assert mongo.recordatorios.count_documents({"turno_id": evento["id"]}) == 1
+
+
+def test_recordatorio_sin_enviar_al_apagar_se_libera(notificaciones, mongo, monkeypatch):
+    from app.services import notification_service
+    from app.services.whatsapp_service import WhatsAppService
+
+    # Cola sin workers: el mensaje queda esperando, como al apagar con envíos pendientes
+    whatsapp_service = WhatsAppService()
+    monkeypatch.setattr(whatsapp_service, "_asegurar_workers", lambda: None)
+    monkeypatch.setattr(notification_service, "whatsapp_service", whatsapp_service)
+
+    turno = {
+        "id": "evento_apagado",
+        "google_event_id": "evento_apagado",
+        "telefono": TELEFONO,
+        "inicio": datetime.now(ZoneInfo(CONFIG["timezone"])) + timedelta(hours=24),
+        "resumen": "Corte",
+        "peluqueria": PELUQUERIA_TEST
+    }
+    assert notificaciones._reclamar_recordatorio(turno, 24)
+    assert notificaciones.enviar_recordatorio(
+        turno, horas_anticipacion=24, verificado=True,
+        al_terminar=notificaciones._al_terminar_recordatorio(turno, 24)
+    )
+    assert whatsapp_service.abandonar_pendientes() == 1
+
+    assert mongo.recordatorios.count_documents({}) == 0
+
+
+def _turno_a(horas):
+    inicio = datetime.now(ZoneInfo(CONFIG["timezone"])) + timedelta(hours=horas)
+    return {"id": f"turno_{horas}", "inicio": inicio}
+
+
+def test_agrupar_por_anticipacion(notificaciones):
+    turnos = [_turno_a(horas) for horas in (0.5, 1.5, 2.5, 5, 23.5, 24.9, 26)]
+
+    grupos = notificaciones.agrupar_por_anticipacion(PELUQUERIA_TEST, turnos, [2, 24])
+
+    assert [turno["id"] for turno in grupos[2]] == ["turno_1.5", "turno_2.5"]
+    assert [turno["id"] for turno in grupos[24]] == ["turno_23.5", "turno_24.9"]
+
+
+def test_agrupar_anticipaciones_que_se_solapan(notificaciones):
+    grupos = notificaciones.agrupar_por_anticipacion(PELUQUERIA_TEST, [_turno_a(2.5)], [2, 3])
+
+    # Cae en las dos ventanas: cada anticipación tiene su propio recordatorio
+    assert len(grupos[2]) == 1 and len(grupos[3]) == 1
+
+
+def test_agrupar_sin_turnos(notificaciones):
+    assert notificaciones.agrupar_por_anticipacion(PELUQUERIA_TEST, [], [24, 2]) == {24: [], 2: []}
@@ -0,0 +1,34 @@
+"""
+Ledger de recordatorios: migración del JSON viejo con varios workers
+"""
+
+import json
+import os
+
+from app.services.recordatorios_ledger import RecordatoriosLedger
+
+
+def _ledger(tmp_path):
+    return RecordatoriosLedger(str(tmp_path / "recordatorios_enviados.log"))
+
+
+def test_json_legacy_se_importa_una_sola_vez(tmp_path):
+    ruta_json = tmp_path / "recordatorios_enviados.json"
+    ruta_json.write_text(json.dumps(["t1_24h", "t2_2h"]), encoding="utf-8")
+
+    # Dos workers arrancan con el mismo archivo
+    primero, segundo = _ledger(tmp_path), _ledger(tmp_path)
+
+    assert primero.importar_json_legacy(str(ruta_json)) == 2
+    assert segundo.importar_json_legacy(str(ruta_json)) == 0
+
+    assert not ruta_json.exists()
+    assert os.path.exists(f"{ruta_json}.migrado")
+    # El que no importó igual ve las entradas migradas
+    assert "t1_24h" in segundo and "t2_2h" in segundo
+    with open(tmp_path / "recordatorios_enviados.log", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_json_legacy_inexistente(tmp_path):
+    assert _ledger(tmp_path).importar_json_legacy(str(tmp_path / "no_existe.json")) == 0
@@ -0,0 +1,85 @@
+"""
+Cola de salida de WhatsApp: orden por destino y reintentos, con un Twilio falso
+"""
+
+from app.services.whatsapp_service import WhatsAppService, dividir_mensaje, SEPARADOR_PARTES
+from tests.conftest import TwilioFalso, esperar_cola
+
+
+def _servicio(twilio, workers=4):
+    servicio = WhatsAppService()
+    servicio.num_workers = workers
+    servicio.backoff_base = 0.01
+    servicio._get_client = lambda: twilio
+    servicio._guardar_registro = lambda clave, registro: None
+    return servicio
+
+
+def _por_destino(enviados):
+    resultado = {}
+    for destino, cuerpo in enviados:
+        resultado.setdefault(destino, []).append(cuerpo)
+    return resultado
+
+
+def test_mensajes_a_un_numero_salen_en_orden():
+    twilio = TwilioFalso()
+    servicio = _servicio(twilio)
+    numeros = [f"+54911000000{i}" for i in range(3)]
+
+    for i in range(30):
+        numero = numeros[i % 3]
+        assert servicio.enviar_mensaje(f"{numero}-{i}", numero)
+
+    esperar_cola(servicio)
+    for numero, cuerpos in _por_destino(twilio.enviados).items():
+        indices = [int(cuerpo.rsplit("-", 1)[1]) for cuerpo in cuerpos]
+        assert indices == sorted(indices)
+        assert len(indices) == 10
+
+
+def test_reintento_no_deja_pasar_al_siguiente_mensaje():
+    twilio = TwilioFalso(fallas={"confirmacion": 2})
+    servicio = _servicio(twilio)
+
+    servicio.enviar_mensaje("confirmacion", "+5491100000001")
+    servicio.enviar_mensaje("menu", "+5491100000001")
+
+    esperar_cola(servicio)
+    assert [cuerpo for _, cuerpo in twilio.enviados] == ["confirmacion", "menu"]
+
+
+def test_dividir_mensaje_corto_no_se_divide():
+    assert dividir_mensaje("hola") == ["hola"]
+
+
+def test_dividir_mensaje_corta_entre_parrafos_y_respeta_el_limite():
+    parrafos = [f"Párrafo {i} " + "x" * 50 for i in range(10)]
+    texto = SEPARADOR_PARTES.join(parrafos)
+
+    mensajes = dividir_mensaje(texto, limite=150)
+
+    assert all(len(mensaje) <= 150 for mensaje in mensajes)
+    assert SEPARADOR_PARTES.join(mensajes) == texto
+
+
+def test_dividir_mensaje_linea_mas_larga_que_el_limite():
+    mensajes = dividir_mensaje("a" * 250, limite=100)
+
+    assert [len(mensaje) for mensaje in mensajes] == [100, 100, 50]
+
+
+def test_respuesta_agrupada_larga_llega_en_orden():
+    twilio = TwilioFalso()
+    servicio = _servicio(twilio)
+    numero = "+5491100000002"
+    partes = [f"Parte {i}: " + "y" * 400 for i in range(12)]
+
+    with servicio.respuesta_agrupada(numero):
+        for parte in partes:
+            servicio.enviar_mensaje(parte, numero)
+
+    esperar_cola(servicio)
+    cuerpos = [cuerpo for _, cuerpo in twilio.enviados]
+    assert len(cuerpos) > 1
+    assert SEPARADOR_PARTES.join(cuerpos) == SEPARADOR_PARTES.join(partes)
@@ -0,0 +1,33 @@
+"""
+Entry Point WSGI (gunicorn)
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Con gunicorn.conf.py (preload_app) este módulo se importa una sola vez en el
+master: acá solo se carga lo inmutable (blueprints, configuración de clientes)
+y cada worker arranca sus servicios después del fork (post_worker_init).
+Sin gunicorn.conf.py los servicios arrancan al importar, como en run.py.
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app import create_app
+
+SERVICIOS_EN_WORKER = os.getenv("SERVICIOS_EN_WORKER") == "1"
+
+app = create_app(iniciar_servicios=not SERVICIOS_EN_WORKER)
+
+if SERVICIOS_EN_WORKER:
+    # Snapshot inmutable de configuración: los workers lo comparten (copy-on-write)
+    from app.core.config import PELUQUERIAS
+    PELUQUERIAS.iniciar_carga()
+    
+    # Traducciones compiladas (se compilan al importar el módulo)
+    import app.utils.respuestas  # noqa: F401